@@ -1,10 +1,16 @@
+import asyncio
 from typing import Any, Dict, List, Text
 
-import openai
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.types import DomainDict
 
+from actions.llm import GENERATION_TIMEOUT, chat_completion
+from actions.metrics import TIMEOUTS
+from actions.structured_logging import get_logger
+
+LOG = get_logger("human_handoff")
+
 
 class ActionHumanHandoff(Action):
     def name(self) -> Text:
@@ -27,13 +33,17 @@ class ActionHumanHandoff(Action):
             f"important context. Conversation: "
             f"{convo}"
         )
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-        )
-        summarised_conversation = (
-            response.choices[0].message.content or "No summary available"
-        )
+        try:
+            summarised_conversation = await chat_completion(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": prompt}],
+            )
+        except asyncio.TimeoutError:
+            # The transfer goes on without a summary rather than failing the action
+            LOG.warning("handoff_summary_timeout", session=tracker.sender_id, timeout=GENERATION_TIMEOUT)
+            TIMEOUTS.inc(stage="handoff_summary")
+            summarised_conversation = ""
+        summarised_conversation = summarised_conversation or "No summary available"
         dispatcher.utter_message(
             response="utter_transfer_to_manager", summary=summarised_conversation
         )
@@ -6,21 +6,44 @@ from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 import os
-import glob
 import openai
-import numpy as np
 from pathlib import Path
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import asyncio
+import logging
+import re
+import threading
+import time
+
+from actions.caching import QueryEmbeddingCache, SemanticAnswerCache, docs_key, get_shared_client
+from actions.docs_index import load_or_build_index
+from actions.embeddings import get_embedder
+from actions.intent_router import AFTER_RAG, BEFORE_RAG, KeywordRouter
+from actions.language_id import LanguageIdentifier, SessionLanguages, response_language
+from actions.lexical_index import load_or_build_lexical_index, passage_key, reciprocal_rank_fusion
+from actions.llm import GENERATION_TIMEOUT, RETRIEVAL_TIMEOUT, stream_chat_completion
+from actions.mail_outbox import MailOutbox
+from actions.metrics import (ERRORS, STAGE_SECONDS, TIMEOUTS, TTFT_SECONDS, TURNS, CallbackMetric,
+                             start_metrics_server)
+from actions.session_store import Session, SessionStore, get_conversation_backend
+from actions.startup import StartupTimeline
+from actions.streaming import STREAMS, start_stream_server
+from actions.structured_logging import configure_logging, dropped_records, get_logger
+from actions.unanswered_digest import UnansweredDigest
+from actions.vector_index import VectorIndex
+
+# Structured JSON logs written by a background thread (LOG_LEVEL, LOG_FORMAT); configured
+# before the outbox and the session store so that their exit flushes are still logged
+configure_logging()
+LOG = get_logger('actions')
+TIMELINE = StartupTimeline('actions')
+TIMELINE.mark('imports')
 
 # CRITICAL: Log file load timestamp
-print("="*80)
-print("🔥 ACTIONS.PY LOADED - TIMESTAMP: 2025-11-10 21:00:00 UTC")
-print("🔥 OPTIMIZED: Reduced docs from 170 to 50 - 4min to <5s loading")
-print("="*80)
+LOG.info('actions_loaded', build='2025-11-10 21:00:00 UTC',
+         rag='chunked passages over the full docs/ corpus (prebuilt index)')
 
 # Load environment variables from .env file
 try:
@@ -35,7 +58,7 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 if OPENAI_API_KEY:
     openai.api_key = OPENAI_API_KEY
 else:
-    print("⚠️ WARNING: OPENAI_API_KEY not set! Using default from environment.")
+    LOG.warning('openai_api_key_missing')
 
 # Email configuration
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')  # Default to Gmail
@@ -44,28 +67,51 @@ SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')  # Set this in environment
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')  # Set this in environment
 NOTIFICATION_EMAIL = 'bot@expobetonrdc.com'
 
+# Durable outbox drained by a background worker over one reused SMTP connection.
+# Created before CONVERSATION_LOGS: its exit flush then runs after the store's,
+# which may still queue the transcripts of the remaining sessions.
+MAIL_OUTBOX = MailOutbox(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD)
+MAIL_OUTBOX.start()
+
 # Cache for document embeddings
 DOCS_CACHE = None
 EMBEDDINGS_CACHE = None
+VECTOR_INDEX = None  # Pre-normalized search index over EMBEDDINGS_CACHE
+DOCS_INDEX_VERSION = None  # Changes whenever the docs index content changes
+_DOCS_LOCK = threading.Lock()  # One load at a time: the preload thread and the first RAG questions
+DOCS_INDEX_PRELOAD = os.getenv('DOCS_INDEX_PRELOAD', '1') == '1'  # Load the index in the background at startup
+DOCS_INDEX_REBUILD = os.getenv('DOCS_INDEX_REBUILD', '0') == '1'  # Re-embed a missing/stale index with a billed embedder (OpenAI)
+
+# BM25 index over the same passages, searched without any network call
+LEXICAL_INDEX = None
+_LEXICAL_LOCK = threading.Lock()
+# 'vector' (embeddings), 'lexical' (BM25 only) or 'hybrid' (both, fused by reciprocal rank)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+# Hybrid: seconds to wait for the query embedding before answering from BM25 alone
+QUERY_EMBEDDING_TIMEOUT = float(os.getenv('QUERY_EMBEDDING_TIMEOUT', '1.5'))
+RETRIEVAL_CANDIDATES = 4  # per ranking fused, times top_k
+
+# Embedding backend shared by the docs index and the queries (EMBEDDING_BACKEND=local: CPU model
+# trained on docs/, no network call; hash: deterministic local stub for tests)
+EMBEDDER = get_embedder()
 
-# Conversation tracking
-CONVERSATION_LOGS = {}
-SESSION_LANGUAGES = {}  # Track detected language per session for consistency
+# LRU/TTL cache of query embeddings (shared across replicas when CACHE_REDIS_URL is set)
+QUERY_EMBEDDINGS = QueryEmbeddingCache(EMBEDDER, shared=get_shared_client())
 
-def send_conversation_email(session_id: str, user_info: dict, messages: list):
-    """Send complete conversation transcript via email"""
+# GPT-4o answers reused for near-identical questions over the same passages
+ANSWER_CACHE = SemanticAnswerCache()
+
+
+def send_conversation_email(session_id: str, user_info: dict, messages: list, continued: bool = False):
+    """Send conversation transcript via email (`continued`: only the messages since the last email)"""
     try:
-        # Debug: Print SMTP configuration
-        print(f"[EMAIL DEBUG] SMTP_SERVER: {SMTP_SERVER}")
-        print(f"[EMAIL DEBUG] SMTP_PORT: {SMTP_PORT}")
-        print(f"[EMAIL DEBUG] SMTP_USERNAME: {SMTP_USERNAME}")
-        print(f"[EMAIL DEBUG] SMTP_PASSWORD: {'***' if SMTP_PASSWORD else 'NOT SET'}")
-        print(f"[EMAIL DEBUG] NOTIFICATION_EMAIL: {NOTIFICATION_EMAIL}")
+        LOG.debug('smtp_config', server=SMTP_SERVER, port=SMTP_PORT, username=SMTP_USERNAME,
+                  password_set=bool(SMTP_PASSWORD), to=NOTIFICATION_EMAIL)
         
         msg = MIMEMultipart()
         msg['From'] = SMTP_USERNAME or 'noreply@expobetonrdc.com'
         msg['To'] = NOTIFICATION_EMAIL
-        msg['Subject'] = f'[Bot] Conversation - {user_info.get("name", "Utilisateur")} - {datetime.now().strftime("%Y-%m-%d %H:%M")}'
+        msg['Subject'] = f'[Bot] Conversation{" (suite)" if continued else ""} - {user_info.get("name", "Utilisateur")} - {datetime.now().strftime("%Y-%m-%d %H:%M")}'
         
         # Build conversation transcript
         transcript = ""
@@ -97,7 +143,7 @@ Téléphone: {user_info.get('phone', 'Non fourni')}
 Email: {user_info.get('email', 'Non fourni')}
 Session ID: {session_id}
 
-=== CONVERSATION ===
+=== CONVERSATION{" (SUITE, NOUVEAUX MESSAGES)" if continued else ""} ===
 {transcript}
 === FIN DE CONVERSATION ===
 
@@ -111,202 +157,247 @@ Bot ExpoBeton RDC
         msg.attach(MIMEText(body, 'plain'))
         
         if SMTP_USERNAME and SMTP_PASSWORD:
-            print(f"[EMAIL DEBUG] Attempting to connect to {SMTP_SERVER}:{SMTP_PORT}")
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()
-            print(f"[EMAIL DEBUG] TLS started, logging in as {SMTP_USERNAME}")
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            print(f"[EMAIL DEBUG] Logged in, sending email to {NOTIFICATION_EMAIL}")
-            server.send_message(msg)
-            server.quit()
-            print(f"✅ [SUCCESS] Conversation email sent for session: {session_id}")
+            # Sent by the outbox worker, the action does not wait for the mail server
+            MAIL_OUTBOX.enqueue(msg, f"conversation {session_id}")
+            LOG.info('conversation_email_queued', session=session_id, messages=len(messages), continued=continued)
         else:
-            print(f"⚠️ [WARNING] SMTP not configured. Email not sent for session: {session_id}")
-            print(f"[CONVERSATION LOG] Logging to file instead...")
+            LOG.warning('smtp_not_configured', session=session_id, written_to='conversations.log')
             log_file = Path(__file__).parent.parent / 'conversations.log'
             with open(log_file, 'a', encoding='utf-8') as f:
                 f.write(f"\n{'='*50}\n")
                 f.write(body)
                 f.write(f"\n{'='*50}\n")
-    except Exception as e:
-        print(f"❌ [ERROR] Error sending conversation email: {e}")
-        import traceback
-        traceback.print_exc()
-
-def log_conversation_message(session_id: str, sender: str, text: str, user_info: dict = None):
-    """Log a message in the conversation"""
-    if session_id not in CONVERSATION_LOGS:
-        CONVERSATION_LOGS[session_id] = {
-            'messages': [],
-            'user_info': user_info or {},
-            'started_at': datetime.now(),
-            'last_activity': datetime.now()
-        }
-    
-    CONVERSATION_LOGS[session_id]['messages'].append({
-        'sender': sender,
-        'text': text,
-        'timestamp': datetime.now()
-    })
-    CONVERSATION_LOGS[session_id]['last_activity'] = datetime.now()
-    CONVERSATION_LOGS[session_id]['user_info'] = user_info or CONVERSATION_LOGS[session_id]['user_info']
-
-def send_unanswered_question_email(user_question: str):
-    """Send email notification for unanswered questions"""
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_USERNAME or 'noreply@expobetonrdc.com'
-        msg['To'] = NOTIFICATION_EMAIL
-        msg['Subject'] = f'[Bot] Question sans réponse - {datetime.now().strftime("%Y-%m-%d %H:%M")}'
-        
-        # Email body
-        body = f"""
-        Bonjour,
-        
-        Le chatbot ExpoBeton RDC a reçu une question à laquelle il n'a pas pu répondre.
-        
-        Question de l'utilisateur:
-        "{user_question}"
-        
-        Date et heure: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-        
-        Veuillez envisager d'ajouter cette information à la base de connaissances du bot.
-        
-        Cordialement,
-        Bot ExpoBeton RDC
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email only if SMTP is configured
-        if SMTP_USERNAME and SMTP_PASSWORD:
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-            server.quit()
-            print(f"Email sent for unanswered question: {user_question}")
-        else:
-            # Log to console if email not configured
-            print(f"[UNANSWERED QUESTION] Email not configured. Question logged: {user_question}")
-            # Optionally, write to a file
-            log_file = Path(__file__).parent.parent / 'unanswered_questions.log'
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {user_question}\n")
-            
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        # Still log to file as backup
-        try:
-            log_file = Path(__file__).parent.parent / 'unanswered_questions.log'
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {user_question}\n")
-        except:
-            pass
+    except Exception:
+        LOG.exception('conversation_email_failed', session=session_id)
 
-def load_and_embed_docs():
-    """Load all docs and create OpenAI embeddings"""
-    global DOCS_CACHE, EMBEDDINGS_CACHE
-    
-    if DOCS_CACHE is not None:
-        return DOCS_CACHE, EMBEDDINGS_CACHE
-    
-    docs_path = Path(__file__).parent.parent / 'docs'
-    documents = []
-    
-    print(f"📚 Loading documents from {docs_path}...")
+def flush_session_transcript(session: Session):
+    """Transcript sink for sessions evicted from SESSIONS (idle, over capacity or at shutdown)"""
+    if any(message.sender == 'user' for message in session.messages):
+        LOG.info('session_evicted', session=session.session_id, messages=len(session.messages))
+        emit_conversation_transcript(session.session_id, session.user_info, session.transcript())
+
+# Conversation tracking: bounded, idle sessions are evicted and flushed to the transcript sink.
+# CONVERSATION_STORE=sqlite|redis keeps them across restarts and shares them between replicas.
+CONVERSATION_LOGS = SessionStore(get_conversation_backend(), on_evict=flush_session_transcript)
+CONVERSATION_LOGS.start_sweeper()
+
+# Character n-gram language identification (actions/language_id.py), cached per message.
+# The language of each conversation is smoothed over its messages and kept in the
+# conversation store; SESSION_LANGUAGES caches it so reading it costs no backend round trip.
+LANGUAGE_ID = LanguageIdentifier.load()
+SESSION_LANGUAGES = SessionLanguages(LANGUAGE_ID, max_sessions=CONVERSATION_LOGS.max_sessions,
+                                     load=CONVERSATION_LOGS.get_language, store=CONVERSATION_LOGS.set_language)
+
+def emit_conversation_transcript(session_id: str, user_info: dict, messages: list) -> bool:
+    """Email the messages of the conversation that were not emailed yet
     
-    # Read all .txt files (limit to first 4000 chars to avoid token limits)
-    # Also limit total number of docs to 50 most important ones
-    all_files = list(docs_path.glob('*.txt'))
+    Goodbye, fallback, end of conversation and eviction all go through the
+    emission ledger of CONVERSATION_LOGS: each message is sent exactly once,
+    even across replicas, and later emails only carry the new messages.
+    """
+    delta = CONVERSATION_LOGS.claim_transcript(session_id, messages)
+    if not delta:
+        LOG.info('transcript_already_sent', session=session_id)
+        return False
+    send_conversation_email(session_id, user_info, delta, continued=len(delta) < len(messages))
+    return True
+
+async def log_conversation_message(session_id: str, sender: str, text: str, user_info: dict = None):
+    """Log a message in the conversation (the backend writes run off the event loop)"""
+    with STAGE_SECONDS.time(stage='transcript_log'):
+        await CONVERSATION_LOGS.aappend(session_id, sender, text, user_info)
+
+def send_unanswered_digest_email(digest: dict):
+    """Send the periodic digest of unanswered questions, most frequent first"""
+    lines = []
+    for rank, question in enumerate(digest['questions'], 1):
+        lines.append(f"{rank}. \"{question['question']}\" - {question['count']} fois "
+                     f"({question['sessions']} session(s), dernière: {question['last_seen']})")
+        for variant in question['variants'][1:]:
+            lines.append(f"     ~ \"{variant}\"")
+    questions = "\n".join(lines)
     
-    # Prioritize important files (brochures, reports)
-    priority_keywords = ['brochure', 'rapport', 'final', '2024', '2025', '2026', 'invitation']
-    priority_files = [f for f in all_files if any(kw in f.name.lower() for kw in priority_keywords)]
-    other_files = [f for f in all_files if f not in priority_files]
+    if not (SMTP_USERNAME and SMTP_PASSWORD):
+        LOG.info('unanswered_digest_logged', questions=digest['unique'], requests=digest['total'])
+        log_file = Path(__file__).parent.parent / 'unanswered_questions.log'
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(f"[{digest['window_start']} - {digest['window_end']}]\n{questions}\n")
+        return
     
-    # Take top 30 priority + top 20 others = 50 total
-    selected_files = priority_files[:30] + other_files[:20]
+    msg = MIMEMultipart()
+    msg['From'] = SMTP_USERNAME or 'noreply@expobetonrdc.com'
+    msg['To'] = NOTIFICATION_EMAIL
+    msg['Subject'] = (f'[Bot] Questions sans réponse - {digest["unique"]} question(s), '
+                      f'{digest["total"]} demande(s) - {datetime.now().strftime("%Y-%m-%d %H:%M")}')
     
-    print(f"📄 Selected {len(selected_files)} documents out of {len(all_files)} (prioritizing recent/important ones)")
+    # Email body
+    body = f"""
+Bonjour,
+
+Voici les questions auxquelles le chatbot ExpoBeton RDC n'a pas pu répondre
+entre {digest['window_start']} et {digest['window_end']}, des plus fréquentes aux moins fréquentes.
+
+{questions}
+
+Total: {digest['total']} demande(s), {digest['unique']} question(s) distincte(s).
+
+Veuillez envisager d'ajouter ces informations à la base de connaissances du bot.
+
+Cordialement,
+Bot ExpoBeton RDC
+"""
     
-    for file_path in selected_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Limit content to 4000 chars (more aggressive than before)
-                content = content[:4000] if len(content) > 4000 else content
-                documents.append({
-                    'filename': file_path.name,
-                    'content': content
-                })
-        except Exception as e:
-            print(f"⚠️ Error reading {file_path.name}: {e}")
-            continue
+    msg.attach(MIMEText(body, 'plain'))
+    MAIL_OUTBOX.enqueue(msg, f"unanswered digest ({digest['unique']} questions)")
+    LOG.info('unanswered_digest_queued', questions=digest['unique'], requests=digest['total'])
+
+# Unanswered questions are deduplicated and sent as one digest per UNANSWERED_DIGEST_WINDOW
+UNANSWERED_QUESTIONS = UnansweredDigest(on_digest=send_unanswered_digest_email)
+UNANSWERED_QUESTIONS.start()
+
+def load_and_embed_docs():
+    """Load the persisted docs embedding index (built with `python -m actions.docs_index`)"""
+    if DOCS_CACHE is not None:
+        return DOCS_CACHE, EMBEDDINGS_CACHE
+    # Bounded wait: while the preload rebuilds a stale index, questions fall back instead of piling up threads
+    if not _DOCS_LOCK.acquire(timeout=RETRIEVAL_TIMEOUT):
+        LOG.warning('docs_index_loading', waited_s=RETRIEVAL_TIMEOUT)
+        return [], []
+    try:
+        if DOCS_CACHE is not None:
+            return DOCS_CACHE, EMBEDDINGS_CACHE
+        return _load_docs_index()
+    finally:
+        _DOCS_LOCK.release()
+
+def _load_docs_index():
+    global DOCS_CACHE, EMBEDDINGS_CACHE, VECTOR_INDEX, DOCS_INDEX_VERSION, RETRIEVAL_MODE
+    try:
+        # Memory-maps the prebuilt index; only re-embeds files that changed since the build,
+        # and with a billed embedder (OpenAI) only when DOCS_INDEX_REBUILD=1
+        index = load_or_build_index(EMBEDDER, rebuild=DOCS_INDEX_REBUILD or not EMBEDDER.billed)
+    except Exception:
+        LOG.exception('docs_index_load_failed')
+        return [], []
     
-    if not documents:
-        print("⚠️ No documents found!")
+    if index is None:
+        # Embedding the ~3400 passages here would be billed: BM25 answers until the index is built
+        LOG.warning('docs_index_missing', model=EMBEDDER.model_name, fallback='lexical',
+                    hint='python -m actions.docs_index, or DOCS_INDEX_REBUILD=1')
+        RETRIEVAL_MODE = 'lexical'
         return [], []
     
-    print(f"✅ Loaded {len(documents)} documents, creating OpenAI embeddings...")
+    if len(index) == 0:
+        LOG.warning('docs_index_empty')
+        return [], []
     
-    # Create embeddings with OpenAI (batch processing)
-    texts = [doc['content'] for doc in documents]
+    EMBEDDINGS_CACHE = index.embeddings
+    DOCS_INDEX_VERSION = index.version
+    # Rows saved unit-norm: searched on the memory map without a copy (VECTOR_INDEX_MODE=ivf for approximate search)
+    VECTOR_INDEX = VectorIndex(EMBEDDINGS_CACHE, normalized=index.normalized)
+    # Set last: readers without the lock take a non-None DOCS_CACHE as a complete index
+    DOCS_CACHE = index.documents
+    return DOCS_CACHE, EMBEDDINGS_CACHE
+
+def load_lexical_index():
+    """Load (or build, from docs/ alone) the BM25 index"""
+    global LEXICAL_INDEX
+    if LEXICAL_INDEX is not None:
+        return LEXICAL_INDEX
+    if not _LEXICAL_LOCK.acquire(timeout=RETRIEVAL_TIMEOUT):
+        LOG.warning('lexical_index_loading', waited_s=RETRIEVAL_TIMEOUT)
+        return None
     try:
-        response = openai.embeddings.create(
-            input=texts,
-            model="text-embedding-3-small"  # Fast, multilingual, cost-effective
-        )
-        embeddings = [item.embedding for item in response.data]
-        
-        DOCS_CACHE = documents
-        EMBEDDINGS_CACHE = np.array(embeddings)
-        
-        print(f"✅ Successfully created {len(embeddings)} OpenAI embeddings")
-        return documents, embeddings
+        if LEXICAL_INDEX is None:
+            LEXICAL_INDEX = load_or_build_lexical_index()
+        return LEXICAL_INDEX
+    except Exception:
+        LOG.exception('lexical_index_load_failed')
+        return None
+    finally:
+        _LEXICAL_LOCK.release()
+
+async def find_relevant_docs(query: str, top_k: int = 5):
+    """Find the most relevant passages (filename, start/end offsets, content) for RETRIEVAL_MODE
+
+    Hybrid mode fuses the BM25 and embedding rankings by reciprocal rank; when the query embedding is
+    not there within QUERY_EMBEDDING_TIMEOUT (OpenAI slow or over quota) the BM25 ranking is used alone.
+    """
+    if RETRIEVAL_MODE == 'vector':
+        return await find_similar_docs(query, top_k)
+
+    lexical_index = LEXICAL_INDEX or await asyncio.to_thread(load_lexical_index)
+    lexical_docs = []
+    if lexical_index is not None:
+        with STAGE_SECONDS.time(stage='lexical_search'):
+            indices, scores = lexical_index.search(query, top_k * RETRIEVAL_CANDIDATES)
+        lexical_docs = [lexical_index.documents[i] for i in indices]
+        LOG.info('lexical_passages_found', query=query, count=len(lexical_docs),
+                 top_score=round(float(scores[0]), 2) if len(scores) else None)
+    if RETRIEVAL_MODE == 'lexical':
+        return lexical_docs[:top_k]
+
+    try:
+        vector_docs = await asyncio.wait_for(find_similar_docs(query, top_k * RETRIEVAL_CANDIDATES),
+                                             QUERY_EMBEDDING_TIMEOUT)
+    except asyncio.TimeoutError:
+        LOG.warning('vector_search_skipped', reason='timeout', timeout=QUERY_EMBEDDING_TIMEOUT)
+        TIMEOUTS.inc(stage='query_embedding')
+        vector_docs = []
     except Exception as e:
-        print(f"❌ Error creating OpenAI embeddings: {e}")
-        import traceback
-        traceback.print_exc()
-        return documents, []
-
-def find_relevant_docs(query: str, top_k: int = 3):
-    """Find most relevant documents using OpenAI embeddings"""
-    documents, doc_embeddings = load_and_embed_docs()
+        LOG.warning('vector_search_skipped', reason=type(e).__name__, error=str(e))
+        ERRORS.inc(stage='query_embedding')
+        vector_docs = []
+
+    # Same passages in both indexes, identified by (filename, start)
+    passages = {passage_key(doc): doc for doc in vector_docs + lexical_docs}
+    fused = reciprocal_rank_fusion([[passage_key(doc) for doc in lexical_docs],
+                                    [passage_key(doc) for doc in vector_docs]])
+    return [passages[key] for key in fused[:top_k]]
+
+async def find_similar_docs(query: str, top_k: int = 5):
+    """Find the passages closest to the query in the docs embedding index"""
+    if DOCS_CACHE is None:
+        # Index not loaded yet (preload still running, or disabled): wait for it off the event loop,
+        # within RETRIEVAL_TIMEOUT like the rest of the retrieval
+        documents, doc_embeddings = await asyncio.to_thread(load_and_embed_docs)
+    else:
+        documents, doc_embeddings = DOCS_CACHE, EMBEDDINGS_CACHE
     
     if not documents or len(doc_embeddings) == 0:
-        print("⚠️ No documents or embeddings available")
+        LOG.warning('no_documents')
         return []
     
+    # Embed the query with the same backend as the index (cached per normalized text)
+    with STAGE_SECONDS.time(stage='query_embedding'):
+        query_embedding = await QUERY_EMBEDDINGS.aembed(query)
+    
+    # Cosine similarity top_k over the pre-normalized vectors
+    with STAGE_SECONDS.time(stage='vector_search'):
+        top_indices, similarities = VECTOR_INDEX.search(query_embedding, top_k)
+    relevant_docs = [documents[i] for i in top_indices]
+    
+    LOG.info('passages_found', query=query, count=len(relevant_docs),
+             top_similarity=round(float(similarities[0]), 3) if len(relevant_docs) else None)
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug('passages', query=query, passages=[
+            f"{doc['filename']} [{doc['start']}:{doc['end']}] {similarities[i]:.3f}" for i, doc in enumerate(relevant_docs)])
+    
+    return relevant_docs
+
+async def query_embedding_for_cache(query: str):
+    """Query embedding for the answer cache, or None in lexical mode or when not there in time"""
+    if RETRIEVAL_MODE == 'lexical':
+        return None
     try:
-        # Create embedding for query with OpenAI
-        query_response = openai.embeddings.create(
-            input=[query],
-            model="text-embedding-3-small"
-        )
-        query_embedding = np.array(query_response.data[0].embedding)
-        
-        # Calculate cosine similarity
-        doc_embeddings_array = np.array(doc_embeddings)
-        similarities = np.dot(doc_embeddings_array, query_embedding) / (
-            np.linalg.norm(doc_embeddings_array, axis=1) * np.linalg.norm(query_embedding)
-        )
-        
-        # Get top_k most relevant docs
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-        relevant_docs = [documents[i] for i in top_indices]
-        
-        print(f"🔍 Found {len(relevant_docs)} relevant documents for query: {query[:50]}...")
-        for i, doc in enumerate(relevant_docs):
-            print(f"  {i+1}. {doc['filename']} (similarity: {similarities[top_indices[i]]:.3f})")
-        
-        return relevant_docs
-    except Exception as e:
-        print(f"❌ Error finding relevant docs with OpenAI: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        # Already cached by the retrieval in vector and hybrid modes, unless it failed there
+        return await asyncio.wait_for(QUERY_EMBEDDINGS.aembed(query), QUERY_EMBEDDING_TIMEOUT)
+    except Exception:
+        return None
+
+def is_meaningful_answer(answer: str) -> bool:
+    """Check that a generated answer is not just a "je ne sais pas" non-answer"""
+    return len(answer) > 50 and 'ne sais pas' not in answer.lower() and 'ne peux pas' not in answer.lower()
 
 # Multilingual content dictionary
 MULTILINGUAL_CONTENT = {
@@ -384,44 +475,139 @@ MULTILINGUAL_CONTENT = {
     }
 }
 
+# Answers of the keyword routes in actions/routes.yml (French only)
+STATIC_ANSWERS = {
+    'history': "📜 **Histoire d'ExpoBeton RDC**\n\n🚀 **Création:** 2016 par Jean Bamanisa Saïdi\n\n🎯 **Mission:** Promouvoir les infrastructures, la construction et le développement urbain en RDC\n\n🏆 **Évolution:**\n• 2016-2022: Éditions à Kinshasa (focus capital)\n• 2023: Expansion vers Kolwezi (mines, Grand Katanga)\n• 2024: Double phase Kinshasa + Matadi (corridor ouest)\n• 2026: Lubumbashi (carrefour stratégique africain)\n\n💡 **Impact:**\n• Création du Ministère de la Politique de la Ville (2024)\n• Recommandations adoptées par le gouvernement\n• Plateforme B2B, B2G majeure en RDC\n• Think tanks thématiques annuels\n\n👥 **Fondateurs:** Jean Bamanisa Saïdi (Président) + Momo Sungunza (Vice-Président)",
+    'editions_count': "📅 **Historique des éditions ExpoBeton RDC:**\n\n✅ **10 éditions organisées** depuis 2016\n\n1️⃣ 2016: 1ère édition - Kinshasa\n2️⃣ 2017: 2ème édition - Kinshasa\n3️⃣ 2018: 3ème édition - Kinshasa\n4️⃣ 2019: 4ème édition - Kinshasa\n5️⃣ 2021: 5ème édition - Kinshasa\n6️⃣ 2022: 6ème édition - Kinshasa\n7️⃣ 2023: 7ème édition - Kolwezi (Lualaba)\n8️⃣ 2024: 8ème édition - Kinshasa + Matadi\n9️⃣ 2025: 9ème édition\n🔟 2025: 10ème édition\n\n🎯 **Prochaine (11ème):** 30 avril - 1er mai 2026 à Lubumbashi",
+    'lubumbashi': "ExpoBeton 2026 se tiendra à Lubumbashi car cette édition se concentre sur le Grand Katanga comme carrefour stratégique. Lubumbashi, capitale du Haut-Katanga, est au cœur des corridors africains du Sud, de l'Ouest et de l'Est, avec un potentiel énorme en matière d'infrastructures et de développement économique grâce aux réserves massives de cobalt et cuivre de la région.",
+    'duration': "L'événement ExpoBeton RDC 2026 durera 2 jours : du 30 avril au 1er mai 2026.",
+    'katanga_cities': "Les trois villes principales du Grand Katanga sont :\n\n1️⃣ **Lubumbashi** (capitale du Haut-Katanga) - centre économique et industriel\n2️⃣ **Kolwezi** (capitale du Lualaba) - capitale mondiale du cobalt\n3️⃣ **Kalemie** (capitale du Tanganyika) - port stratégique sur le lac Tanganyika\n\nCes trois villes sont les piliers du développement régional au cœur d'ExpoBeton 2026.",
+    'kolwezi': "Kolwezi est la capitale de la province du Lualaba et l'une des trois villes clés du Grand Katanga. Elle est connue comme la **capitale mondiale du cobalt** grâce à ses réserves immenses. Kolwezi joue un rôle stratégique dans l'industrie minière de la RDC et est un pilier majeur du développement économique de la région, au cœur du thème d'ExpoBeton 2026.",
+    'kalemie': "Kalemie est la capitale de la province du Tanganyika et l'une des trois villes clés du Grand Katanga. C'est un **port stratégique** sur le lac Tanganyika, reliant la RDC aux corridors africains de l'Est. Kalemie est essentielle pour le transport et le commerce régional, faisant partie intégrante du thème d'ExpoBeton 2026 : 'Grand Katanga : Carrefour Stratégique'.",
+    'kamoa': "KAMOA-KAKULA est l'un des plus grands projets de cuivre au monde, situé dans la province du Lualaba (Grand Katanga). Développé par Ivanhoe Mines, ce projet a été présenté lors d'ExpoBeton comme un exemple majeur du potentiel minier de la région. KAMOA contribue significativement aux 70% des exportations nationales que représente le Grand Katanga.",
+    'presidential_speech_2024': "Lors de l'ouverture d'ExpoBeton 2024 (8ème édition), le Président Félix Tshisekedi a souligné plusieurs points clés :\n\n🏆 **Thème 2024:** 'Révolution urbaine et solutions durables du corridor ouest pour Kinshasa et Kongo-Central'\n\n🛣️ **3 Engagements majeurs:**\n1️⃣ Création d'un **ministère dédié à la politique de la ville**\n2️⃣ **Désenclavement des territoires** comme priorité absolue (initiative présidentielle)\n3️⃣ **Partenariats publics-privés** pour les infrastructures\n\n🏛️ **Vision:** Faire du secteur de la construction un **levier majeur de transformation économique**, garantir l'égalité d'accès aux services de base pour tous les Congolais.\n\nLe Président a déclaré : 'La question du désenclavement de nos territoires est une priorité absolue pour moi, car elle touche directement à l'égalité des chances pour tous.'",
+    'final_report_2024': "📊 **Rapport Final ExpoBeton 2024 (8ème édition)** \n\n✅ **Deux phases:**\n• Phase 1: Kinshasa (10-12 sept 2024)\n• Phase 2: Matadi, Kongo-Central (18-19 sept 2024)\n\n🎯 **Thème:** 'Révolution urbaine : Des solutions durables du corridor ouest pour Kinshasa et Kongo-Central'\n\n📈 **Chiffres clés:**\n• 200+ participants (experts, décideurs, entreprises)\n• 5 sessions thématiques\n• Concours étudiants avec 5 universités\n• Expositions et stands d'entreprises\n\n💡 **Recommandations majeures:**\n• Modernisation des infrastructures routières et portuaires\n• Création de cités satellites le long de la rocade\n• PPP pour financement des projets\n• Gestion durable des déchets\n\nPour plus de détails, consultez le rapport complet sur https://expobetonrdc.com/",
+    'edition_2023': "🏆 **ExpoBeton 2023 (7ème édition) - Kolwezi, Lualaba**\n\n📍 **Lieu:** Kolwezi\n🎯 **Thème:** 'Kolwezi-Lualaba, Eldorado du corridor sud de la RDC-SADC'\n\n👥 **Intervenants clés:**\n• TFM (Tenke Fungurume Mining) - Edouard Swana\n• FONER - Pierre Bundoki (DG)\n• CAMI - Popol Mabolia Yenga (DG)\n• KAMOA - Guy Muswil\n• Ministre de l'Industrie - Julien Paluku\n\n💎 **Focus minier:** Exploitation minière responsable, protection environnementale, développement communautaire, cobalt et cuivre\n\n📊 **Résultats:** Recommandations sur RSE, corridors de développement, zones économiques spéciales",
+    'stands': "🎪 **Types de stands ExpoBeton RDC:**\n\n🥇 **Stand Premium (Grand format):**\n• Surface: 12m² minimum\n• Visibilité maximale\n• Emplacement stratégique\n\n🥈 **Stand Standard:**\n• Surface: 6m² - 9m²\n• Bonne visibilité\n• Équipements de base\n\n🥉 **Stand Startup/PME:**\n• Surface: 3m² - 6m²\n• Tarif préférentiel\n• Support jeunes entrepreneurs\n\n💼 **Services inclus:**\n• Mobilier (table, chaises)\n• Éclairage\n• Connexion internet\n• Badges participants\n\n📞 **Réservation:** Contactez info@expobetonrdc.com ou consultez https://expobetonrdc.com/",
+    'how_to_register': "✍️ **Comment s'inscrire à ExpoBeton RDC?**\n\n👉 **Étape 1:** Visitez https://expobetonrdc.com/#tg_register\n\n👉 **Étape 2:** Remplissez le formulaire d'inscription avec:\n• Nom et coordonnées\n• Type de participation (visiteur, exposant, partenaire)\n• Secteur d'activité\n\n👉 **Étape 3:** Choisissez votre formule (si exposant)\n\n👉 **Étape 4:** Validez votre inscription\n\n📧 **Contact:** info@expobetonrdc.com\n📞 **Tél:** +243 826 158 411\n\n✅ **Inscription gratuite pour visiteurs!**\n💰 **Tarifs préférentiels pour exposants avant le 1er mars 2026**",
+    'african_corridors': "🌍 **Les corridors africains du Grand Katanga:**\n\n👇 **Corridor Sud (SADC):**\n• Lubumbashi → Zambie → Afrique du Sud\n• Axes miniers et commerciaux\n• Ports: Durban, Maputo\n\n➡️ **Corridor Est:**\n• Kalemie (Lac Tanganyika) → Tanzanie\n• Port de Dar es Salaam\n• Connexion Océan Indien\n\n⬅️ **Corridor Ouest:**\n• Lubumbashi → Kolwezi → Kinshasa → Matadi\n• Océan Atlantique\n• Ports: Matadi, Boma, Banana\n\n🎯 **Importance stratégique:**\n• Exportation cobalt et cuivre\n• Importation équipements et biens\n• Intégration régionale africaine\n• Développement économique\n\n💡 Thème ExpoBeton 2026: 'Grand Katanga : Carrefour Stratégique au cœur des corridors africains'",
+    'special_economic_zones': "🏭 **Zones Économiques Spéciales (ZES) en RDC:**\n\n🎯 **Définition:** Zones avec régime fiscal et douanier avantageux pour attirer investissements\n\n📍 **ZES Grand Katanga:**\n1️⃣ **Lukala** (Kongo-Central) - Cimenterie\n2️⃣ **Kimpese** (Kongo-Central) - Industrie\n3️⃣ **Songololo** (Kongo-Central) - Cimenterie\n4️⃣ **Kolwezi** (Lualaba) - Transformation minière\n5️⃣ **Lubumbashi** (Haut-Katanga) - Industrielle\n\n✅ **Avantages:**\n• Exonérations fiscales (5-10 ans)\n• Facilités douanières\n• Infrastructures modernes\n• Procédures simplifiées\n\n🏛️ **Gestion:** AZES (Agence des Zones Économiques Spéciales)\n\n📞 **Info:** Intervenant ExpoBeton 2024",
+    'west_corridor': "🌅 **Corridor Ouest de la RDC:**\n\n📍 **Trajet:** Lubumbashi → Kinshasa → Matadi → Océan Atlantique\n\n🏛️ **Provinces traversées:**\n• Haut-Katanga, Lualaba (Grand Katanga)\n• Kinshasa (capitale)\n• Kongo-Central (ports)\n\n🚢 **Ports majeurs:**\n1️⃣ **Matadi** - Principal port RDC\n2️⃣ **Boma** - Port secondaire\n3️⃣ **Banana** - Port en eau profonde (en construction)\n\n🛣️ **Infrastructures:**\n• Route Nationale N°1 (550 km)\n• Chemin de fer Matadi-Kinshasa (366 km)\n• Fleuve Congo (transport fluvial)\n\n🎯 **Thème ExpoBeton 2024:** 'Révolution urbaine : Des solutions durables du corridor ouest pour Kinshasa et Kongo-Central'\n\n💡 **Enjeux:** Développement urbain, infrastructures, mobilité, énergie",
+    'kinshasa_role': "🏛️ **Rôle de Kinshasa dans le développement RDC:**\n\n📊 **Capitale politique et économique:**\n• 15+ millions d'habitants\n• 40% du PIB national\n• Siège du gouvernement\n\n🏭 **Centre économique:**\n• Hub commercial et financier\n• Port fluvial majeur\n• Industries et services\n\n🛣️ **Défis infrastructurels:**\n• Congestion urbaine\n• Déficit logements (2M unités)\n• Mobilité et transport\n• Assainissement et déchets\n\n💡 **Projets prioritaires:**\n• Rocade sud-est (décongestion)\n• Cités satellites (Maluku, SOSAK)\n• Métro Kinshasa (METROKIN)\n• Ministère Politique de la Ville\n\n🎯 **Projection 2050:** 30M habitants - Nécessite transformation urgente\n\n📜 **Source:** ExpoBeton 2024, discours Président Félix Tshisekedi",
+    'speakers_2023': "🎯 **Intervenants ExpoBeton 2023 (Kolwezi, Lualaba):**\n\n👥 **Autorités:**\n• SEM Julien Paluku - Ministre de l'Industrie\n• Jacques Kaumba - Sénateur\n\n🏭 **Entreprises minières:**\n• Prof Dr Edouard Swana (TFM) - RSE et environnement\n• Guy Muswil (KAMOA-KAKULA) - Projet cuivre\n\n🏛️ **Institutions publiques:**\n• Pierre Bundoki (FONER) - Entretien routier\n• Popol Mabolia Yenga (CAMI) - Cadastre minier\n• Christian Basunga - Expert BTP\n\n🎯 **Thématiques:**\n• Exploitation minière responsable\n• Protection environnementale\n• Développement communautaire\n• Corridors de développement\n• Zones économiques spéciales\n\n📜 **Rapport complet disponible sur expobetonrdc.com**",
+    'minister_industry': "🏭 **Ministre de l'Industrie - ExpoBeton:**\n\n👨‍💼 **SEM Julien Paluku Kahongya**\n\n💼 **Fonction:** Ministre de l'Industrie de la RDC\n\n🎯 **Intervention ExpoBeton 2023 (Kolwezi):**\n• Promotion de l'industrialisation locale\n• Transformation des matières premières\n• Développement des PME/PMI\n• Zones économiques spéciales\n\n💡 **Messages clés:**\n• Nécessité de transformer cobalt et cuivre localement\n• Création d'emplois par l'industrie\n• Partenariats public-privé\n• Financement innovant\n\n📜 **Documents:** Présentations disponibles dans archives ExpoBeton 2023",
+    'governor_kinshasa': "🏛️ **Gouverneur de Kinshasa - ExpoBeton 2024:**\n\n👨‍💼 **SEM BUMBA LUBAKI Daniel**\n\n💼 **Fonction:** Gouverneur de la Ville-Province de Kinshasa\n\n🎯 **Intervention ExpoBeton 2024:**\n• Support à l'événement ExpoBeton\n• Défis urbains de Kinshasa\n• Prix d'encouragement universités\n\n💡 **Priorités gouvernorat:**\n• Amélioration voiries urbaines\n• Gestion des déchets\n• Mobilité et transport\n• Développement cités satellites\n• Assainissement et drainage\n\n🏆 **Action ExpoBeton:** Remise 1er prix concours étudiants INBTP\n\n📜 **Rapport ExpoBeton 2024** pour détails complets",
+    'tfm': "🏭 **TFM (Tenke Fungurume Mining)**\n\n📍 **Localisation:** Province du Lualaba, Kolwezi\n⚙️ **Activité:** Exploitation minière (cuivre et cobalt)\n\n🌍 **RSE & Environnement:**\n✅ Certifications ISO 9001, 14001, 18001, 45001\n✅ Réduction des émissions CO2 et NO2\n✅ Énergie propre (turbine à gaz, hydro-électricité)\n✅ Promotion voitures électriques (cobalt)\n\n🏘️ **Développement communautaire:**\n• 31 millions USD investis (2021-2025)\n• Santé: HGR 200 lits, centres de santé\n• Éducation: écoles, bibliothèques, ISTA\n• Économie: centre agricole, coopératives\n• Infrastructures: routes, ponts, marchés\n\n👨‍💼 **Intervenant ExpoBeton 2023:** Prof Dr Edouard Swana (Manager Relations Communautaires)",
+    'foner': "🛣️ **FONER (Fonds National d'Entretien Routier)**\n\n📋 **Création:** 2008\n🎯 **Mission:** Financer l'entretien et la protection du patrimoine routier RDC\n\n💰 **Ressources:**\n• Redevances sur lubrifiants et carburants\n• Droits de péage\n• Allocations budgétaires État\n\n📊 **Réalisations 2019-2022:** 435 millions USD investis\n📈 **Projection 2023:** 170 millions USD mobilisés\n\n🚧 **Travaux financés:**\n• 60% réseau routier national\n• 40% réseau provincial et local\n• Entretien routes, ponts, voiries urbaines\n\n⚠️ **Défis:** Besoins annuels de 380 millions USD vs 170 millions disponibles\n\n👨‍💼 **DG:** Pierre Bundoki (intervenant ExpoBeton 2023)",
+    'cami': "⛏️ **CAMI (Cadastre Minier)**\n\n📋 **Nature:** Établissement public\n🎯 **Mission:** Gestion du domaine minier et des titres miniers/carrières\n\n📜 **Types d'autorisations:**\n1️⃣ Recherches de produits de carrières\n2️⃣ Exploitation de carrière temporaire\n3️⃣ Exploitation de carrière permanente\n\n📊 **Lualaba (chiffres clés):**\n• 201 droits de carrières actifs\n• 122 ARPC (61%)\n• 73 AECP (36%)\n• 6 CUP (3%)\n\n🏗️ **Programme PDL 145:**\n• 38.936 Km routes à réhabiliter\n• 418 mini centrales solaires\n• 238 marchés modernes\n• 788 centres de santé\n\n👨‍💼 **DG:** Popol Mabolia Yenga (intervenant ExpoBeton 2023)",
+    'bcc': "🏦 **BCC (Banque Centrale du Congo)**\n\n🎯 **Rôle:** Financement du secteur productif RDC\n\n📊 **Chiffres:**\n• Crédit à l'économie: 2.010,7 milliards CDF (2017)\n• Part bancaire: 93,9%\n• Ratio crédit/PIB: 8,3% (très faible vs Afrique du Sud 63,4%)\n\n⚠️ **Défis:**\n• Faible niveau d'épargne domestique\n• Absence de marché financier organisé\n• Dollarisation de l'économie\n• Déficit en infrastructures\n\n💡 **Solutions proposées:**\n• Amélioration climat des affaires\n• Création institutions financières spécialisées\n• Guichet de refinancement long\n• Émission valeurs du Trésor\n• Fonds de garantie de dépôts\n\n👨‍💼 **Vice-Gouverneur** (intervenant ExpoBeton 2018)",
+    'theme': "Le thème de l'édition 2026 (11ème) est : 'Grand Katanga : Carrefour Stratégique au cœur des corridors africains du Sud, de l'Ouest et de l'Est'. Cette édition se concentre sur Lubumbashi, Kalemie et Kolwezi comme piliers du développement régional.",
+    'founder': "Jean Bamanisa Saïdi est le président, promoteur, créateur et fondateur d'ExpoBeton RDC. C'est un homme d'affaires et personnalité politique congolaise, ancien gouverneur de la province de l'Ituri. Il porte la vision stratégique de l'événement et met en avant la reconstruction, l'urbanisation et le développement durable de la RDC.",
+    'vice_president': "Momo Sungunza est le vice-président d'ExpoBeton RDC. Il assure la coordination opérationnelle et organisationnelle du forum, et travaille en tandem avec Jean Bamanisa pour mobiliser les partenaires publics et privés.",
+}
+
+# Follow-up suggestions uttered after some static answers
+STATIC_SUGGESTIONS = {
+    'founder': "\n💡 Vous pourriez aussi demander :\n• Qui est le vice-président ?\n• Comment devenir ambassadeur ?\n• Quelles sont les dates de l'événement ?",
+    'vice_president': "\n💡 Vous pourriez aussi demander :\n• Qui est le fondateur ?\n• C'est quoi le thème de l'édition 2025 ?\n• Comment participer ?",
+    'theme': "\n💡 Vous pourriez aussi demander :\n• Qui sont les fondateurs ?\n• Comment devenir ambassadeur ?\n• Où se déroule l'événement ?",
+}
+
+# Friendly 'how are you' replies (asks back, unlike MULTILINGUAL_CONTENT['how_are_you'])
+HOW_ARE_YOU_REPLIES = {
+    'fr': "Je vais très bien, merci de demander! 😊 Et vous, comment allez-vous? Que souhaitez-vous savoir sur ExpoBeton RDC?",
+    'en': "I'm doing great, thanks for asking! 😊 And you, how are you? What would you like to know about ExpoBeton RDC?",
+    'zh': "我很好，谢谢关心！😊 您呢，您好吗？您想了解关于ExpoBeton RDC的什么信息？",
+    'ru': "У меня все отлично, спасибо, что спросили! 😊 А у вас как дела? Что вы хотите узнать о ExpoBeton RDC?",
+    'es': "¡Estoy muy bien, gracias por preguntar! 😊 ¿Y usted, cómo está? ¿Qué le gustaría saber sobre ExpoBeton RDC?",
+    'ar': "أنا بخير، شكراً لسؤالك! 😊 وأنت، كيف حالك؟ ماذا تريد أن تعرف عن ExpoBeton RDC؟",
+}
+
+# Name introductions recognized in greetings
+NAME_PATTERNS = [
+    r"je m['\u2019]appelle\s+([A-Za-zÀ-ÿ]+(?:\s+[A-Za-zÀ-ÿ]+)*)",  # French - capture name with spaces
+    r"my name is\s+([A-Za-z]+(?:\s+[A-Za-z]+)*)",  # English - capture name with spaces
+    r"i['\u2019]m\s+([A-Za-z]+(?:\s+[A-Za-z]+)*)",  # English - capture name with spaces
+    r"me llamo\s+([A-Za-z]+(?:\s+[A-Za-z]+)*)",  # Spanish - capture name with spaces
+]
+
+# Suggestions after a generic greeting
+GREETING_SUGGESTIONS = {
+    'fr': "\n💡 Vous pourriez me demander:\n• C'est quoi ExpoBeton?\n• Quelles sont les dates?\n• Comment devenir ambassadeur?",
+    'en': "\n💡 You could ask me:\n• What is ExpoBeton?\n• What are the dates?\n• How to become an ambassador?",
+    'zh': "\n💡 您可以问我：\n• 什么是ExpoBeton？\n• 日期是什么时候？\n• 如何成为大使？",
+    'ru': "\n💡 Вы можете спросить меня:\n• Что такое ExpoBeton?\n• Какие даты?\n• Как стать послом?",
+    'es': "\n💡 Podría preguntarme:\n• ¿Qué es ExpoBeton?\n• ¿Cuáles son las fechas?\n• ¿Cómo convertirse en embajador?",
+    'ar': "\n💡 يمكنك أن تسألني:\n• ما هو ExpoBeton؟\n• ما هي التواريخ؟\n• كيف تصبح سفيرا؟",
+}
+
+# Ambassador answer and suggestion (English, else French)
+AMBASSADOR_ANSWERS = {
+    'en': ("To become an ExpoBeton RDC Ambassador:\n\n✅ Membership is by selection\n✅ Apply online at https://expobetonrdc.com/\n\nProfiles sought:\n• Technical and scientific experts\n• Opinion leaders and influencers\n• Construction professionals\n• Innovative entrepreneurs\n• Academics and researchers\n\nAs an Ambassador, you participate in thematic Think Tanks, contribute to reconstruction policies, and benefit from a national and international network of influence.",
+           "\n💡 You might also ask:\n• What is ExpoBeton?\n• What are the event dates?\n• Who are the founders?"),
+    'fr': ("Pour devenir Ambassadeur d'Expo Béton RDC :\n\n✅ L'adhésion se fait sur sélection\n✅ Postulez en ligne sur https://expobetonrdc.com/\n\nProfils recherchés :\n• Experts techniques et scientifiques\n• Leaders d'opinion et influenceurs\n• Professionnels du BTP\n• Entrepreneurs innovants\n• Universitaires et chercheurs\n\nEn tant qu'Ambassadeur, vous participez aux Think Tanks thématiques, contribuez aux politiques de reconstruction, et bénéficiez d'un réseau d'influence national et international.",
+           "\n💡 Vous pourriez aussi me demander :\n• C'est quoi ExpoBeton ?\n• Quelles sont les dates de l'événement ?\n• Qui sont les fondateurs ?"),
+}
+
+# Grand Katanga answer (French, else English)
+GRAND_KATANGA_ANSWERS = {
+    'fr': "Le Grand Katanga est une région stratégique de la RDC comprenant trois provinces : Haut-Katanga (capitale Lubumbashi), Lualaba (capitale Kolwezi) et Tanganyika (capitale Kalemie). Cette région représente 70% des exportations nationales grâce à ses réserves massives de cobalt et cuivre. ExpoBeton 2026 se concentre sur cette région comme carrefour stratégique au cœur des corridors africains du Sud, de l'Ouest et de l'Est.",
+    'en': "Grand Katanga is a strategic region of the DRC comprising three provinces: Haut-Katanga (capital Lubumbashi), Lualaba (capital Kolwezi) and Tanganyika (capital Kalemie). This region represents 70% of national exports thanks to its massive reserves of cobalt and copper. ExpoBeton 2026 focuses on this region as a strategic hub at the heart of African corridors from the South, West and East.",
+}
+
+# Keyword routes of ActionAnswerExpoBeton, compiled once (see actions/routes.yml)
+ROUTER = KeywordRouter.from_yaml()
+
+# Streams GPT-4o tokens to the webhook layer while an answer is generated (see actions/streaming.py)
+start_stream_server()
+
+# Cache and queue sizes are read from their own counters when /metrics is scraped
+CallbackMetric('expobeton_cache_requests_total', 'Cache lookups by cache and result',
+               lambda: {(name, result): cache.stats()[result]
+                        for name, cache in (('query_embedding', QUERY_EMBEDDINGS), ('answer', ANSWER_CACHE))
+                        for result in ('hits', 'misses')},
+               kind='counter', labelnames=['cache', 'result'])
+CallbackMetric('expobeton_answer_cache_saved_seconds_total', 'Generation time saved by answer cache hits',
+               lambda: ANSWER_CACHE.stats()['saved_seconds'], kind='counter')
+CallbackMetric('expobeton_answer_cache_invalidations_total', 'Answer cache flushes on a new docs index version',
+               lambda: ANSWER_CACHE.stats()['invalidations'], kind='counter')
+CallbackMetric('expobeton_sessions', 'Conversations in the session store', lambda: len(CONVERSATION_LOGS))
+CallbackMetric('expobeton_mail_outbox_pending', 'Emails waiting in the outbox', lambda: len(MAIL_OUTBOX))
+CallbackMetric('expobeton_log_records_dropped_total', 'Log records dropped on a full log queue', dropped_records,
+               kind='counter')
+start_metrics_server()
+TIMELINE.mark('setup')
+
+
+def preload_docs_index():
+    """Load the docs indexes before the first RAG question; keyword answers are served meanwhile"""
+    if RETRIEVAL_MODE != 'vector':
+        with TIMELINE.phase('lexical_index') as phase:
+            if load_lexical_index() is None:
+                phase.fail('no lexical index')
+    if RETRIEVAL_MODE != 'lexical':
+        with TIMELINE.phase('docs_index') as phase:
+            # The loaders log and swallow their errors: an empty result is the failure
+            documents, _ = load_and_embed_docs()
+            if not documents:
+                phase.fail('no docs index')
+    TIMELINE.ready()
+
+
+if DOCS_INDEX_PRELOAD:
+    threading.Thread(target=preload_docs_index, name='docs-index-preload', daemon=True).start()
+else:
+    TIMELINE.ready()
+
 def detect_language(text: str) -> str:
-    """Detect language from user text. Returns language code."""
-    text_lower = text.lower()
-    
-    # French keywords
-    french_keywords = ['bonjour', 'salut', 'merci', 'quoi', 'comment', 'pourquoi', 'quand', 'où', 'est-ce', 'c\'est', 'quelles', 'quel', 'quelle']
-    # English keywords  
-    english_keywords = ['hello', 'hi', 'thank', 'what', 'how', 'why', 'when', 'where', 'is', 'are', 'can', 'could', 'would']
-    # Spanish keywords
-    spanish_keywords = ['hola', 'gracias', 'qué', 'cómo', 'cuándo', 'dónde', 'por qué', 'buenos', 'días']
-    # Russian keywords (Cyrillic)
-    russian_keywords = ['привет', 'спасибо', 'что', 'как', 'когда', 'где', 'почему', 'здравствуй']
-    # Chinese characters detection
-    has_chinese = any('\u4e00' <= char <= '\u9fff' for char in text)
-    # Arabic characters detection
-    has_arabic = any('\u0600' <= char <= '\u06ff' for char in text)
-    
-    # Count matches
-    french_score = sum(1 for keyword in french_keywords if keyword in text_lower)
-    english_score = sum(1 for keyword in english_keywords if keyword in text_lower)
-    spanish_score = sum(1 for keyword in spanish_keywords if keyword in text_lower)
-    russian_score = sum(1 for keyword in russian_keywords if keyword in text_lower)
-    
-    if has_chinese:
-        return 'zh'
-    if has_arabic:
-        return 'ar'
-    if russian_score > 0:
-        return 'ru'
-    if spanish_score > english_score and spanish_score > french_score:
-        return 'es'
-    if english_score > french_score:
-        return 'en'
-    if french_score > 0:
-        return 'fr'
-    
-    # Default to French
-    return 'fr'
+    """Detect language from user text. Returns the code of the language to answer in."""
+    return response_language(LANGUAGE_ID.detect(text))
+
+async def conversation_language(session_id: str, text: str) -> str:
+    """Language to answer in for the conversation, `text` decides for conversations not seen yet"""
+    # A session not cached on this replica is read from the store: off the event loop
+    stored = await CONVERSATION_LOGS.offload(SESSION_LANGUAGES.get, session_id)
+    return response_language(stored or LANGUAGE_ID.detect(text))
 
 def get_multilingual_response(key: str, lang: str = 'fr') -> str:
     """Get response in the specified language."""
@@ -440,7 +626,7 @@ class ActionGreetPersonalized(Action):
     def name(self) -> Text:
         return "action_greet_personalized"
     
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
@@ -448,7 +634,9 @@ class ActionGreetPersonalized(Action):
         user_message = tracker.latest_message.get('text', '').lower()
         
         # CRITICAL DEBUG: Log that this action was called
-        print(f"👋👋👋 [ACTION_GREET_PERSONALIZED] CALLED! user_message={tracker.latest_message.get('text', '')}, intent={tracker.latest_message.get('intent', {}).get('name', 'UNKNOWN')}")
+        LOG.info('action_called', action=self.name(), session=tracker.sender_id,
+                 text=tracker.latest_message.get('text', ''),
+                 intent=tracker.latest_message.get('intent', {}).get('name', 'UNKNOWN'))
         
         # =============================================================
         # CRITICAL: Check if this is actually a QUESTION, not a greeting!
@@ -462,14 +650,14 @@ class ActionGreetPersonalized(Action):
         # If ANY variant is mentioned, answer immediately!
         for variant in lubumbashi_variants:
             if variant in user_message:
-                print(f"🔥🔥🔥 [GREET DEBUG] LUBUMBASHI DETECTED (variant={variant})! user_message={user_message}")
+                LOG.info('greet_question_matched', topic='lubumbashi', variant=variant)
                 answer = "ExpoBeton 2026 se tiendra à Lubumbashi car cette édition se concentre sur le Grand Katanga comme carrefour stratégique. Lubumbashi, capitale du Haut-Katanga, est au cœur des corridors africains du Sud, de l'Ouest et de l'Est, avec un potentiel énorme en matière d'infrastructures et de développement économique grâce aux réserves massives de cobalt et cuivre de la région."
                 dispatcher.utter_message(text=answer)
                 return []
         
         # History of ExpoBeton
         if any(word in user_message for word in ['histoire', 'history', 'historique']):
-            print(f"🎯🎯🎯 [GREET DEBUG] HISTOIRE CHECK MATCHED IN GREET! user_message={user_message}")
+            LOG.info('greet_question_matched', topic='history')
             answer = "📜 **Histoire d'ExpoBeton RDC**\n\n🚀 **Création:** 2016 par Jean Bamanisa Saïdi\n\n🎯 **Mission:** Promouvoir les infrastructures, la construction et le développement urbain en RDC\n\n🏆 **Évolution:**\n• 2016-2022: Éditions à Kinshasa (focus capital)\n• 2023: Expansion vers Kolwezi (mines, Grand Katanga)\n• 2024: Double phase Kinshasa + Matadi (corridor ouest)\n• 2026: Lubumbashi (carrefour stratégique africain)\n\n💡 **Impact:**\n• Création du Ministère de la Politique de la Ville (2024)\n• Recommandations adoptées par le gouvernement\n• Plateforme B2B, B2G majeure en RDC\n• Think tanks thématiques annuels\n\n👥 **Fondateurs:** Jean Bamanisa Saïdi (Président) + Momo Sungunza (Vice-Président)"
             dispatcher.utter_message(text=answer)
             return []
@@ -489,7 +677,8 @@ class ActionGreetPersonalized(Action):
         
         # Detect language
         user_message_original = tracker.latest_message.get('text', '')
-        detected_lang = detect_language(user_message_original)
+        detected_lang = response_language(
+            await CONVERSATION_LOGS.offload(SESSION_LANGUAGES.update, tracker.sender_id, user_message_original))
         
         if person:
             # Personalized greeting with name
@@ -514,7 +703,17 @@ class ActionAnswerExpoBeton(Action):
     def name(self) -> Text:
         return "action_answer_expobeton"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
+            tracker: Tracker,
+            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        try:
+            with STAGE_SECONDS.time(stage='turn'):
+                return await self.answer(dispatcher, tracker, domain)
+        finally:
+            # Every turn ends the token stream, also keyword answers, fallbacks and errors
+            STREAMS.publish(tracker.sender_id, {'type': 'end'})
+
+    async def answer(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
@@ -524,514 +723,131 @@ class ActionAnswerExpoBeton(Action):
         metadata = tracker.latest_message.get('metadata', {})
         
         # CRITICAL DEBUG: Log that this action was called
-        print(f"🚨🚨🚨 [ACTION_ANSWER_EXPOBETON] CALLED! user_message={user_message_original}, intent={tracker.latest_message.get('intent', {}).get('name', 'UNKNOWN')}")
+        LOG.info('action_called', action=self.name(), session=session_id, text=user_message_original,
+                 intent=tracker.latest_message.get('intent', {}).get('name', 'UNKNOWN'))
         
-        # Detect user's language for EACH message (not session-based)
-        detected_lang = detect_language(user_message_original)
-        print(f"[MULTILINGUAL] Detected language: {detected_lang} for message: {user_message_original[:50]}")
+        # Language of the conversation, smoothed over its messages (short replies keep it)
+        with STAGE_SECONDS.time(stage='language'):
+            detected_lang = response_language(
+                await CONVERSATION_LOGS.offload(SESSION_LANGUAGES.update, session_id, user_message_original))
+        LOG.debug('language_detected', session=session_id, language=detected_lang)
         
         # Log user message
-        log_conversation_message(session_id, 'user', user_message_original, metadata)
-        
-        bot_response = ""
-        
-        # How are you? responses (CHECK FIRST - more specific than greeting, more friendly)
-        user_question_clean = user_question.replace('?', '').replace('!', '').strip()
-        if any(phrase in user_question_clean for phrase in ['how are you', 'comment allez-vous', 'comment vas-tu', 'comment allez vous', 'comment vas tu', 'ça va', 'ca va', 'cómo estás', '如何', 'как дела', 'كيف حالك']):
-            # Friendly response with emoji
-            if detected_lang == 'fr':
-                answer = "Je vais très bien, merci de demander! 😊 Et vous, comment allez-vous? Que souhaitez-vous savoir sur ExpoBeton RDC?"
-            elif detected_lang == 'en':
-                answer = "I'm doing great, thanks for asking! 😊 And you, how are you? What would you like to know about ExpoBeton RDC?"
-            elif detected_lang == 'zh':
-                answer = "我很好，谢谢关心！😊 您呢，您好吗？您想了解关于ExpoBeton RDC的什么信息？"
-            elif detected_lang == 'ru':
-                answer = "У меня все отлично, спасибо, что спросили! 😊 А у вас как дела? Что вы хотите узнать о ExpoBeton RDC?"
-            elif detected_lang == 'es':
-                answer = "¡Estoy muy bien, gracias por preguntar! 😊 ¿Y usted, cómo está? ¿Qué le gustaría saber sobre ExpoBeton RDC?"
-            elif detected_lang == 'ar':
-                answer = "أنا بخير، شكراً لسؤالك! 😊 وأنت، كيف حالك؟ ماذا تريد أن تعرف عن ExpoBeton RDC؟"
-            else:
-                answer = get_multilingual_response('how_are_you', detected_lang)
-            
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # ====================================================================
-        # CRITICAL: CHECK SPECIFIC QUESTIONS FIRST (BEFORE GENERIC GREETINGS)
-        # ====================================================================
-        
-        # History of ExpoBeton - CHECK BEFORE "HI" TO AVOID "HISTOIRE" COLLISION!
-        if any(word in user_question for word in ['histoire', 'history', 'historique']):
-            print(f"✅✅✅ [DEBUG] HISTOIRE CHECK MATCHED! user_question={user_question}")
-            answer = "📜 **Histoire d'ExpoBeton RDC**\n\n🚀 **Création:** 2016 par Jean Bamanisa Saïdi\n\n🎯 **Mission:** Promouvoir les infrastructures, la construction et le développement urbain en RDC\n\n🏆 **Évolution:**\n• 2016-2022: Éditions à Kinshasa (focus capital)\n• 2023: Expansion vers Kolwezi (mines, Grand Katanga)\n• 2024: Double phase Kinshasa + Matadi (corridor ouest)\n• 2026: Lubumbashi (carrefour stratégique africain)\n\n💡 **Impact:**\n• Création du Ministère de la Politique de la Ville (2024)\n• Recommandations adoptées par le gouvernement\n• Plateforme B2B, B2G majeure en RDC\n• Think tanks thématiques annuels\n\n👥 **Fondateurs:** Jean Bamanisa Saïdi (Président) + Momo Sungunza (Vice-Président)"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Number of editions - CHECK BEFORE GREETINGS (TO AVOID "COMBIEN" FALSE POSITIVE)
-        if any(word in user_question for word in ['combien', 'how many']) and any(word in user_question for word in ['édition', 'edition']):
-            answer = "📅 **Historique des éditions ExpoBeton RDC:**\n\n✅ **10 éditions organisées** depuis 2016\n\n1️⃣ 2016: 1ère édition - Kinshasa\n2️⃣ 2017: 2ème édition - Kinshasa\n3️⃣ 2018: 3ème édition - Kinshasa\n4️⃣ 2019: 4ème édition - Kinshasa\n5️⃣ 2021: 5ème édition - Kinshasa\n6️⃣ 2022: 6ème édition - Kinshasa\n7️⃣ 2023: 7ème édition - Kolwezi (Lualaba)\n8️⃣ 2024: 8ème édition - Kinshasa + Matadi\n9️⃣ 2025: 9ème édition\n🔟 2025: 10ème édition\n\n🎯 **Prochaine (11ème):** 30 avril - 1er mai 2026 à Lubumbashi"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Greetings and politeness responses (FRIENDLY with emojis)
-        if any(word in user_question for word in ['bonjour', 'salut', 'hello', 'hi', 'bonsoir', 'hola', 'привет', '你好', 'مرحبا']):
-            print(f"🔥🔥🔥 [ANSWER_EXPOBETON DEBUG] GREETING CHECK MATCHED! user_question={user_question}")
-            # Extract user's name if provided
-            user_name = None
-            import re
-            name_patterns = [
-                r"je m['\u2019]appelle\s+([A-Za-zÀ-ÿ]+(?:\s+[A-Za-zÀ-ÿ]+)*)",  # French - capture name with spaces
-                r"my name is\s+([A-Za-z]+(?:\s+[A-Za-z]+)*)",  # English - capture name with spaces
-                r"i['\u2019]m\s+([A-Za-z]+(?:\s+[A-Za-z]+)*)",  # English - capture name with spaces
-                r"me llamo\s+([A-Za-z]+(?:\s+[A-Za-z]+)*)",  # Spanish - capture name with spaces
-            ]
-            for pattern in name_patterns:
-                match = re.search(pattern, user_message_original, re.IGNORECASE)
-                if match:
-                    user_name = match.group(1).strip().title()
-                    break
-            
-            # Build personalized greeting with FRIENDLY tone and emoji
-            if user_name and detected_lang == 'fr':
-                answer = f"Bonjour {user_name}! 😊 Enchanté de faire votre connaissance! Comment allez-vous? Qu'aimeriez-vous savoir sur ExpoBeton RDC?"
-            elif user_name and detected_lang == 'en':
-                answer = f"Hello {user_name}! 😊 Nice to meet you! How are you doing? What would you like to know about ExpoBeton RDC?"
-            else:
-                # Add emoji to generic greeting
-                base_answer = get_multilingual_response('greeting', detected_lang)
-                if detected_lang == 'fr':
-                    answer = base_answer.replace("Bonjour!", "Bonjour! 😊")
-                elif detected_lang == 'en':
-                    answer = base_answer.replace("Hello!", "Hello! 😊")
-                else:
-                    answer = base_answer
-            
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            
-            # Language-specific suggestions (only if no name given)
-            if not user_name:
-                if detected_lang == 'fr':
-                    suggestion = "\n💡 Vous pourriez me demander:\n• C'est quoi ExpoBeton?\n• Quelles sont les dates?\n• Comment devenir ambassadeur?"
-                elif detected_lang == 'en':
-                    suggestion = "\n💡 You could ask me:\n• What is ExpoBeton?\n• What are the dates?\n• How to become an ambassador?"
-                elif detected_lang == 'zh':
-                    suggestion = "\n💡 您可以问我：\n• 什么是ExpoBeton？\n• 日期是什么时候？\n• 如何成为大使？"
-                elif detected_lang == 'ru':
-                    suggestion = "\n💡 Вы можете спросить меня:\n• Что такое ExpoBeton?\n• Какие даты?\n• Как стать послом?"
-                elif detected_lang == 'es':
-                    suggestion = "\n💡 Podría preguntarme:\n• ¿Qué es ExpoBeton?\n• ¿Cuáles son las fechas?\n• ¿Cómo convertirse en embajador?"
-                elif detected_lang == 'ar':
-                    suggestion = "\n💡 يمكنك أن تسألني:\n• ما هو ExpoBeton؟\n• ما هي التواريخ؟\n• كيف تصبح سفيرا؟"
-                else:
-                    suggestion = "\n💡 Vous pourriez me demander:\n• C'est quoi ExpoBeton?\n• Quelles sont les dates?\n• Comment devenir ambassadeur?"
-                dispatcher.utter_message(text=suggestion)
-                bot_response += suggestion
-            
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Thank you responses
-        if any(word in user_question for word in ['merci', 'thanks', 'thank you', 'thank', 'danke', 'gracias', 'спасибо', 'شكرا']):
-            answer = get_multilingual_response('thank_you', detected_lang)
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Registration / Participation (CHECK BEFORE GOODBYE!)
-        if any(word in user_question for word in ['inscription', 'register', 'participer', 'participate', 'subscribe', 'join', 'enroll', 'comment participer']):
-            answer = get_multilingual_response('registration', detected_lang)
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Goodbye responses (CHECK LAST - be more specific!)
-        # Exclude messages with 'oui' or 'comment' that might be questions
-        is_goodbye = any(word in user_question for word in ['au revoir', 'bye', 'goodbye', 'à bientôt', 'adieu', 'ciao', 'adiós', 'пока', '再见', 'مع السلامة'])
-        is_question = any(word in user_question for word in ['oui', 'comment', 'qui', 'quoi', 'où', 'quand', 'pourquoi'])
-        
-        if is_goodbye and not is_question:
-            answer = get_multilingual_response('goodbye', detected_lang)
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            # Send conversation email
-            if session_id in CONVERSATION_LOGS:
-                conversation = CONVERSATION_LOGS[session_id]
-                if len(conversation['messages']) > 0:
-                    send_conversation_email(
-                        session_id,
-                        conversation['user_info'],
-                        conversation['messages']
-                    )
-            return []
-        
-        # ====================================================================
-        # CRITICAL: CHECK SPECIFIC QUESTIONS FIRST (BEFORE GENERIC "WHAT IS")
-        # ====================================================================
-        
-        # History of ExpoBeton - CHECK FIRST TO AVOID "WHAT IS" COLLISION
-        if any(word in user_question for word in ['histoire', 'history', 'historique']):
-            print(f"\u2705\u2705\u2705 [DEBUG] HISTOIRE CHECK MATCHED! user_question={user_question}")
-            answer = "📜 **Histoire d'ExpoBeton RDC**\n\n🚀 **Création:** 2016 par Jean Bamanisa Saïdi\n\n🎯 **Mission:** Promouvoir les infrastructures, la construction et le développement urbain en RDC\n\n🏆 **Évolution:**\n• 2016-2022: Éditions à Kinshasa (focus capital)\n• 2023: Expansion vers Kolwezi (mines, Grand Katanga)\n• 2024: Double phase Kinshasa + Matadi (corridor ouest)\n• 2026: Lubumbashi (carrefour stratégique africain)\n\n💡 **Impact:**\n• Création du Ministère de la Politique de la Ville (2024)\n• Recommandations adoptées par le gouvernement\n• Plateforme B2B, B2G majeure en RDC\n• Think tanks thématiques annuels\n\n👥 **Fondateurs:** Jean Bamanisa Saïdi (Président) + Momo Sungunza (Vice-Président)"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Number of editions - CHECK BEFORE "COMBIEN DE JOURS" (DURATION)
-        if any(word in user_question for word in ['combien', 'how many']) and any(word in user_question for word in ['édition', 'edition']):
-            answer = "📅 **Historique des éditions ExpoBeton RDC:**\n\n✅ **10 éditions organisées** depuis 2016\n\n1️⃣ 2016: 1ère édition - Kinshasa\n2️⃣ 2017: 2ème édition - Kinshasa\n3️⃣ 2018: 3ème édition - Kinshasa\n4️⃣ 2019: 4ème édition - Kinshasa\n5️⃣ 2021: 5ème édition - Kinshasa\n6️⃣ 2022: 6ème édition - Kinshasa\n7️⃣ 2023: 7ème édition - Kolwezi (Lualaba)\n8️⃣ 2024: 8ème édition - Kinshasa + Matadi\n9️⃣ 2025: 9ème édition\n🔟 2025: 10ème édition\n\n🎯 **Prochaine (11ème):** 30 avril - 1er mai 2026 à Lubumbashi"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # ANY mention of Lubumbashi - ULTRA BROAD MATCH (no conditions!)
-        # Match ANY variation of Lubumbashi, with or without question mark
-        # Common typos: lubumabshi, lubumbachi, loubumbashi, etc.
-        lubumbashi_variants = ['lubumbashi', 'lubumabshi', 'lubumbachi', 'loubumbashi', 'lubumbash', 'lumumbashi']
-        
-        # If ANY variant is mentioned, answer immediately!
-        for variant in lubumbashi_variants:
-            if variant in user_question:
-                print(f"🔥🔥🔥 [DEBUG LUBUMBASHI] DETECTED (variant={variant})! user_question={user_question}")
-                answer = "ExpoBeton 2026 se tiendra à Lubumbashi car cette édition se concentre sur le Grand Katanga comme carrefour stratégique. Lubumbashi, capitale du Haut-Katanga, est au cœur des corridors africains du Sud, de l'Ouest et de l'Est, avec un potentiel énorme en matière d'infrastructures et de développement économique grâce aux réserves massives de cobalt et cuivre de la région."
-                dispatcher.utter_message(text=answer)
-                bot_response = answer
-                log_conversation_message(session_id, 'bot', bot_response, metadata)
-                return []
-        
-        # ====================================================================
-        # END CRITICAL CHECKS - NOW PROCEED TO OTHER CHECKS
-        # ====================================================================
-        
-        # Ambassador questions - MULTILINGUAL SUPPORT
-        if any(word in user_question for word in ['ambassadeur', 'ambassador', 'devenir', 'rejoindre', 'become']):
-            # Check if we have multilingual content for ambassador
-            if detected_lang == 'en':
-                answer = "To become an ExpoBeton RDC Ambassador:\n\n✅ Membership is by selection\n✅ Apply online at https://expobetonrdc.com/\n\nProfiles sought:\n• Technical and scientific experts\n• Opinion leaders and influencers\n• Construction professionals\n• Innovative entrepreneurs\n• Academics and researchers\n\nAs an Ambassador, you participate in thematic Think Tanks, contribute to reconstruction policies, and benefit from a national and international network of influence."
-                suggestion = "\n💡 You might also ask:\n• What is ExpoBeton?\n• What are the event dates?\n• Who are the founders?"
-            else:  # French (default)
-                answer = "Pour devenir Ambassadeur d'Expo Béton RDC :\n\n✅ L'adhésion se fait sur sélection\n✅ Postulez en ligne sur https://expobetonrdc.com/\n\nProfils recherchés :\n• Experts techniques et scientifiques\n• Leaders d'opinion et influenceurs\n• Professionnels du BTP\n• Entrepreneurs innovants\n• Universitaires et chercheurs\n\nEn tant qu'Ambassadeur, vous participez aux Think Tanks thématiques, contribuez aux politiques de reconstruction, et bénéficiez d'un réseau d'influence national et international."
-                suggestion = "\n💡 Vous pourriez aussi me demander :\n• C'est quoi ExpoBeton ?\n• Quelles sont les dates de l'événement ?\n• Qui sont les fondateurs ?"
-            
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            dispatcher.utter_message(text=suggestion)
-            bot_response += suggestion
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
+        await log_conversation_message(session_id, 'user', user_message_original, metadata)
+        
+        # Keyword routes answered before the document search (actions/routes.yml),
+        # one scan of the message gives the keywords for both stages
+        with STAGE_SECONDS.time(stage='routing'):
+            keyword_mask = ROUTER.match(user_question)
+            route = ROUTER.route(user_question, BEFORE_RAG, keyword_mask)
+        if route:
+            LOG.info('route_matched', session=session_id, route=route, stage=BEFORE_RAG)
+            await self.respond(route, dispatcher, user_message_original, detected_lang, session_id, metadata)
+            TURNS.inc(outcome='keyword')
             return []
         
         # Try to find relevant documents using OpenAI for unmatched questions
-        # TIMEOUT: 5 seconds to ensure fast response time
+        # Retrieval and generation each get their own deadline (RETRIEVAL_TIMEOUT, GENERATION_TIMEOUT);
+        # an expired deadline cancels the pending OpenAI request
         try:
-            # Create executor with timeout
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(find_relevant_docs, tracker.latest_message.get('text', ''), 3)
-                try:
-                    relevant_docs = future.result(timeout=5)  # 5 seconds max for user experience
-                except FuturesTimeoutError:
-                    print(f"⏰ OpenAI search timed out after 5 seconds - returning fallback response immediately")
-                    relevant_docs = []
-            
-            if relevant_docs:
-                # Use OpenAI GPT-4o to generate answer from relevant documents
-                try:
-                    # Prepare context from documents
-                    context_parts = []
-                    for i, doc in enumerate(relevant_docs):
-                        # Limit each doc to 3000 chars to stay within token limits
-                        content = doc['content'][:3000] if len(doc['content']) > 3000 else doc['content']
-                        context_parts.append(f"Document {i+1} ({doc['filename']}):\n{content}")
-                    
-                    context = "\n\n".join(context_parts)
-                    
-                    # Call OpenAI GPT-4o
-                    response = openai.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "Tu es un assistant intelligent pour ExpoBeton RDC. Réponds de manière précise et concise en français, en te basant UNIQUEMENT sur les documents fournis. Si l'information n'est pas dans les documents, dis-le clairement. Utilise des emojis et une mise en forme claire (bullet points, numéros) pour rendre la réponse facile à lire."
-                            },
-                            {
-                                "role": "user",
-                                "content": f"Question: {user_message_original}\n\nDocuments de référence:\n{context}"
-                            }
-                        ],
-                        temperature=0.3,
-                        max_tokens=500
-                    )
+            with STAGE_SECONDS.time(stage='retrieval'):
+                relevant_docs = await asyncio.wait_for(find_relevant_docs(user_message_original, 5), RETRIEVAL_TIMEOUT)
+        except asyncio.TimeoutError:
+            LOG.warning('retrieval_timeout', session=session_id, timeout=RETRIEVAL_TIMEOUT)
+            TIMEOUTS.inc(stage='retrieval')
+            relevant_docs = []
+        except Exception:
+            LOG.exception('retrieval_failed', session=session_id)
+            ERRORS.inc(stage='retrieval')
+            relevant_docs = []
+        
+        if relevant_docs:
+            # Use OpenAI GPT-4o to generate answer from relevant documents
+            try:
+                # Prepare context from the retrieved passages
+                context_parts = []
+                for i, doc in enumerate(relevant_docs):
+                    context_parts.append(f"Document {i+1} ({doc['filename']}, caractères {doc['start']}-{doc['end']}):\n{doc['content']}")
+                
+                context = "\n\n".join(context_parts)
+                
+                # Reuse a cached answer for a near-identical question over the same passages
+                # (skipped when the query embedding is not available: BM25 passages only)
+                query_embedding = await query_embedding_for_cache(user_message_original)
+                passages_key = docs_key(relevant_docs)
+                answer = None
+                if query_embedding is not None:
+                    answer = ANSWER_CACHE.lookup(query_embedding, passages_key, DOCS_INDEX_VERSION)
+                if answer is not None:
+                    LOG.info('answer_cache_hit', session=session_id)
+                    STREAMS.publish(session_id, {'type': 'token', 'text': answer})
+                    STREAMS.publish(session_id, {'type': 'end'})
+                else:
+                    # Call OpenAI GPT-4o, streaming the tokens to the webhook layer as they arrive
+                    def publish_token(token):
+                        STREAMS.publish(session_id, {'type': 'token', 'text': token})
                     
-                    answer = response.choices[0].message.content.strip()
+                    generation_start = time.perf_counter()
+                    try:
+                        answer, ttft = await stream_chat_completion(
+                            model="gpt-4o",
+                            messages=[
+                                {
+                                    "role": "system",
+                                    "content": "Tu es un assistant intelligent pour ExpoBeton RDC. Réponds de manière précise et concise en français, en te basant UNIQUEMENT sur les documents fournis. Si l'information n'est pas dans les documents, dis-le clairement. Utilise des emojis et une mise en forme claire (bullet points, numéros) pour rendre la réponse facile à lire."
+                                },
+                                {
+                                    "role": "user",
+                                    "content": f"Question: {user_message_original}\n\nDocuments de référence:\n{context}"
+                                }
+                            ],
+                            on_token=publish_token,
+                            timeout=GENERATION_TIMEOUT,
+                            temperature=0.3,
+                            max_tokens=500
+                        )
+                    finally:
+                        # Tell the stream subscribers the generation is over, even on timeout
+                        STREAMS.publish(session_id, {'type': 'end'})
+                    generation_latency = time.perf_counter() - generation_start
+                    STAGE_SECONDS.observe(generation_latency, stage='generation')
+                    if ttft is not None:
+                        TTFT_SECONDS.observe(ttft)
+                    LOG.info('generation_done', session=session_id, ttft_ms=round((ttft or 0) * 1000),
+                             total_ms=round(generation_latency * 1000))
                     
-                    # Check if answer is meaningful (not just "Je ne sais pas")
-                    if len(answer) > 50 and 'ne sais pas' not in answer.lower() and 'ne peux pas' not in answer.lower():
-                        print(f"✅ OpenAI GPT-4o generated answer: {answer[:100]}...")
-                        dispatcher.utter_message(text=answer)
-                        bot_response = answer
-                        log_conversation_message(session_id, 'bot', bot_response, metadata)
-                        return []
-                    else:
-                        print(f"⚠️ OpenAI answer not meaningful: {answer}")
-                except Exception as e:
-                    print(f"❌ Error generating OpenAI response: {e}")
-                    import traceback
-                    traceback.print_exc()
-        except Exception as e:
-            print(f"❌ Error finding relevant docs: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # Default: show help and log unanswered question
-        if any(word in user_question for word in ['fondateur', 'créateur', 'président', 'qui est', 'qui sont']):
-            if 'jean' in user_question or 'bamanisa' in user_question or 'fondateur' in user_question or 'créateur' in user_question:
-                answer = "Jean Bamanisa Saïdi est le président, promoteur, créateur et fondateur d'ExpoBeton RDC. C'est un homme d'affaires et personnalité politique congolaise, ancien gouverneur de la province de l'Ituri. Il porte la vision stratégique de l'événement et met en avant la reconstruction, l'urbanisation et le développement durable de la RDC."
-                dispatcher.utter_message(text=answer)
-                suggestion = "\n💡 Vous pourriez aussi demander :\n• Qui est le vice-président ?\n• Comment devenir ambassadeur ?\n• Quelles sont les dates de l'événement ?"
-                dispatcher.utter_message(text=suggestion)
-                return []
-            if 'momo' in user_question or 'sungunza' in user_question or 'vice' in user_question:
-                answer = "Momo Sungunza est le vice-président d'ExpoBeton RDC. Il assure la coordination opérationnelle et organisationnelle du forum, et travaille en tandem avec Jean Bamanisa pour mobiliser les partenaires publics et privés."
-                dispatcher.utter_message(text=answer)
-                suggestion = "\n💡 Vous pourriez aussi demander :\n• Qui est le fondateur ?\n• C'est quoi le thème de l'édition 2025 ?\n• Comment participer ?"
-                dispatcher.utter_message(text=suggestion)
-                return []
-        
-        # What is ExpoBeton (handle typos like 'expbeton', 'expo beton')
-        if any(word in user_question for word in ['quoi', 'what', 'est-ce', 'c\'est', 'qué', '什么', 'что', 'ما']):
-            # Check for 'grand katanga' FIRST
-            if 'grand katanga' in user_question or 'katanga' in user_question:
-                if detected_lang == 'fr':
-                    answer = "Le Grand Katanga est une région stratégique de la RDC comprenant trois provinces : Haut-Katanga (capitale Lubumbashi), Lualaba (capitale Kolwezi) et Tanganyika (capitale Kalemie). Cette région représente 70% des exportations nationales grâce à ses réserves massives de cobalt et cuivre. ExpoBeton 2026 se concentre sur cette région comme carrefour stratégique au cœur des corridors africains du Sud, de l'Ouest et de l'Est."
+                    answer = answer.strip()
+                    if query_embedding is not None and is_meaningful_answer(answer):
+                        ANSWER_CACHE.store(query_embedding, passages_key, answer, generation_latency, DOCS_INDEX_VERSION)
+                
+                # Check if answer is meaningful (not just "Je ne sais pas")
+                if is_meaningful_answer(answer):
+                    LOG.info('rag_answer', session=session_id, answer=answer)
+                    dispatcher.utter_message(text=answer)
+                    bot_response = answer
+                    await log_conversation_message(session_id, 'bot', bot_response, metadata)
+                    TURNS.inc(outcome='rag')
+                    return []
                 else:
-                    answer = "Grand Katanga is a strategic region of the DRC comprising three provinces: Haut-Katanga (capital Lubumbashi), Lualaba (capital Kolwezi) and Tanganyika (capital Kalemie). This region represents 70% of national exports thanks to its massive reserves of cobalt and copper. ExpoBeton 2026 focuses on this region as a strategic hub at the heart of African corridors from the South, West and East."
-                dispatcher.utter_message(text=answer)
-                bot_response = answer
-                log_conversation_message(session_id, 'bot', bot_response, metadata)
-                return []
-            # Check for 'expobeton' or common typos like 'expbeton'
-            if 'expobeton' in user_question or 'expbeton' in user_question or 'expo beton' in user_question or 'expo béton' in user_question:
-                answer = get_multilingual_response('what_is_expobeton', detected_lang)
-                dispatcher.utter_message(text=answer)
-                bot_response = answer
-                log_conversation_message(session_id, 'bot', bot_response, metadata)
-                return []
-        
-        # Dates
-        if any(word in user_question for word in ['date', 'when', 'quand', 'cuándo', 'когда', '什么时候', 'متى']):
-            answer = get_multilingual_response('dates', detected_lang)
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Location
-        if any(word in user_question for word in ['lieu', 'where', 'où', 'dónde', 'где', '哪里', 'أين']):
-            answer = get_multilingual_response('location', detected_lang)
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Ambassador questions - MULTILINGUAL SUPPORT (moved earlier - see line 646)
-        
-        # Duration / Number of days
-        if any(word in user_question for word in ['combien de jours', 'durée', 'how many days', 'duration']):
-            answer = "L'événement ExpoBeton RDC 2026 durera 2 jours : du 30 avril au 1er mai 2026."
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Why Lubumbashi in 2026? - DUPLICATE CHECK REMOVED (moved to line 644)
-        
-        # Cities of Grand Katanga
-        if any(word in user_question for word in ['villes', 'quelles villes', 'cities', 'which cities']):
-            if 'grand katanga' in user_question or 'katanga' in user_question:
-                answer = "Les trois villes principales du Grand Katanga sont :\n\n1️⃣ **Lubumbashi** (capitale du Haut-Katanga) - centre économique et industriel\n2️⃣ **Kolwezi** (capitale du Lualaba) - capitale mondiale du cobalt\n3️⃣ **Kalemie** (capitale du Tanganyika) - port stratégique sur le lac Tanganyika\n\nCes trois villes sont les piliers du développement régional au cœur d'ExpoBeton 2026."
-                dispatcher.utter_message(text=answer)
-                bot_response = answer
-                log_conversation_message(session_id, 'bot', bot_response, metadata)
-                return []
-        
-        # Kolwezi
-        if 'kolwezi' in user_question:
-            answer = "Kolwezi est la capitale de la province du Lualaba et l'une des trois villes clés du Grand Katanga. Elle est connue comme la **capitale mondiale du cobalt** grâce à ses réserves immenses. Kolwezi joue un rôle stratégique dans l'industrie minière de la RDC et est un pilier majeur du développement économique de la région, au cœur du thème d'ExpoBeton 2026."
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Kalemie
-        if 'kalemie' in user_question:
-            answer = "Kalemie est la capitale de la province du Tanganyika et l'une des trois villes clés du Grand Katanga. C'est un **port stratégique** sur le lac Tanganyika, reliant la RDC aux corridors africains de l'Est. Kalemie est essentielle pour le transport et le commerce régional, faisant partie intégrante du thème d'ExpoBeton 2026 : 'Grand Katanga : Carrefour Stratégique'."
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # KAMOA (mining project)
-        if 'kamoa' in user_question:
-            answer = "KAMOA-KAKULA est l'un des plus grands projets de cuivre au monde, situé dans la province du Lualaba (Grand Katanga). Développé par Ivanhoe Mines, ce projet a été présenté lors d'ExpoBeton comme un exemple majeur du potentiel minier de la région. KAMOA contribue significativement aux 70% des exportations nationales que représente le Grand Katanga."
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Presidential speech 2024
-        if any(word in user_question for word in ['président', 'president', 'discours', 'speech']) and ('2024' in user_question or 'dit' in user_question or 'said' in user_question or 'ouverture' in user_question or 'opening' in user_question):
-            answer = "Lors de l'ouverture d'ExpoBeton 2024 (8ème édition), le Président Félix Tshisekedi a souligné plusieurs points clés :\n\n🏆 **Thème 2024:** 'Révolution urbaine et solutions durables du corridor ouest pour Kinshasa et Kongo-Central'\n\n🛣️ **3 Engagements majeurs:**\n1️⃣ Création d'un **ministère dédié à la politique de la ville**\n2️⃣ **Désenclavement des territoires** comme priorité absolue (initiative présidentielle)\n3️⃣ **Partenariats publics-privés** pour les infrastructures\n\n🏛️ **Vision:** Faire du secteur de la construction un **levier majeur de transformation économique**, garantir l'égalité d'accès aux services de base pour tous les Congolais.\n\nLe Président a déclaré : 'La question du désenclavement de nos territoires est une priorité absolue pour moi, car elle touche directement à l'égalité des chances pour tous.'"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Rapport final 2024
-        if any(word in user_question for word in ['rapport', 'report']) and '2024' in user_question:
-            answer = "📊 **Rapport Final ExpoBeton 2024 (8ème édition)** \n\n✅ **Deux phases:**\n• Phase 1: Kinshasa (10-12 sept 2024)\n• Phase 2: Matadi, Kongo-Central (18-19 sept 2024)\n\n🎯 **Thème:** 'Révolution urbaine : Des solutions durables du corridor ouest pour Kinshasa et Kongo-Central'\n\n📈 **Chiffres clés:**\n• 200+ participants (experts, décideurs, entreprises)\n• 5 sessions thématiques\n• Concours étudiants avec 5 universités\n• Expositions et stands d'entreprises\n\n💡 **Recommandations majeures:**\n• Modernisation des infrastructures routières et portuaires\n• Création de cités satellites le long de la rocade\n• PPP pour financement des projets\n• Gestion durable des déchets\n\nPour plus de détails, consultez le rapport complet sur https://expobetonrdc.com/"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # What happened in 2023
-        if ('2023' in user_question or 'sept' in user_question) and any(word in user_question for word in ['passé', 'happened', 'edition', 'édition']):
-            answer = "🏆 **ExpoBeton 2023 (7ème édition) - Kolwezi, Lualaba**\n\n📍 **Lieu:** Kolwezi\n🎯 **Thème:** 'Kolwezi-Lualaba, Eldorado du corridor sud de la RDC-SADC'\n\n👥 **Intervenants clés:**\n• TFM (Tenke Fungurume Mining) - Edouard Swana\n• FONER - Pierre Bundoki (DG)\n• CAMI - Popol Mabolia Yenga (DG)\n• KAMOA - Guy Muswil\n• Ministre de l'Industrie - Julien Paluku\n\n💎 **Focus minier:** Exploitation minière responsable, protection environnementale, développement communautaire, cobalt et cuivre\n\n📊 **Résultats:** Recommandations sur RSE, corridors de développement, zones économiques spéciales"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Types of stands
-        if any(word in user_question for word in ['stand', 'stands', 'types']) and not any(word in user_question for word in ['meilleur', 'best']):
-            answer = "🎪 **Types de stands ExpoBeton RDC:**\n\n🥇 **Stand Premium (Grand format):**\n• Surface: 12m² minimum\n• Visibilité maximale\n• Emplacement stratégique\n\n🥈 **Stand Standard:**\n• Surface: 6m² - 9m²\n• Bonne visibilité\n• Équipements de base\n\n🥉 **Stand Startup/PME:**\n• Surface: 3m² - 6m²\n• Tarif préférentiel\n• Support jeunes entrepreneurs\n\n💼 **Services inclus:**\n• Mobilier (table, chaises)\n• Éclairage\n• Connexion internet\n• Badges participants\n\n📞 **Réservation:** Contactez info@expobetonrdc.com ou consultez https://expobetonrdc.com/"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # How to register / subscribe
-        if any(word in user_question for word in ['inscrire', 'inscription', 's\'inscrire', 'register', 'registration']):
-            answer = "✍️ **Comment s'inscrire à ExpoBeton RDC?**\n\n👉 **Étape 1:** Visitez https://expobetonrdc.com/#tg_register\n\n👉 **Étape 2:** Remplissez le formulaire d'inscription avec:\n• Nom et coordonnées\n• Type de participation (visiteur, exposant, partenaire)\n• Secteur d'activité\n\n👉 **Étape 3:** Choisissez votre formule (si exposant)\n\n👉 **Étape 4:** Validez votre inscription\n\n📧 **Contact:** info@expobetonrdc.com\n📞 **Tél:** +243 826 158 411\n\n✅ **Inscription gratuite pour visiteurs!**\n💰 **Tarifs préférentiels pour exposants avant le 1er mars 2026**"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # African corridors
-        if any(word in user_question for word in ['corridor', 'corridors']) and 'africain' in user_question:
-            answer = "🌍 **Les corridors africains du Grand Katanga:**\n\n👇 **Corridor Sud (SADC):**\n• Lubumbashi → Zambie → Afrique du Sud\n• Axes miniers et commerciaux\n• Ports: Durban, Maputo\n\n➡️ **Corridor Est:**\n• Kalemie (Lac Tanganyika) → Tanzanie\n• Port de Dar es Salaam\n• Connexion Océan Indien\n\n⬅️ **Corridor Ouest:**\n• Lubumbashi → Kolwezi → Kinshasa → Matadi\n• Océan Atlantique\n• Ports: Matadi, Boma, Banana\n\n🎯 **Importance stratégique:**\n• Exportation cobalt et cuivre\n• Importation équipements et biens\n• Intégration régionale africaine\n• Développement économique\n\n💡 Thème ExpoBeton 2026: 'Grand Katanga : Carrefour Stratégique au cœur des corridors africains'"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Special Economic Zones (ZES)
-        if any(word in user_question for word in ['zes', 'zone', 'zones', 'zés']) and any(word in user_question for word in ['économique', 'economic', 'spéciale', 'special']):
-            answer = "🏭 **Zones Économiques Spéciales (ZES) en RDC:**\n\n🎯 **Définition:** Zones avec régime fiscal et douanier avantageux pour attirer investissements\n\n📍 **ZES Grand Katanga:**\n1️⃣ **Lukala** (Kongo-Central) - Cimenterie\n2️⃣ **Kimpese** (Kongo-Central) - Industrie\n3️⃣ **Songololo** (Kongo-Central) - Cimenterie\n4️⃣ **Kolwezi** (Lualaba) - Transformation minière\n5️⃣ **Lubumbashi** (Haut-Katanga) - Industrielle\n\n✅ **Avantages:**\n• Exonérations fiscales (5-10 ans)\n• Facilités douanières\n• Infrastructures modernes\n• Procédures simplifiées\n\n🏛️ **Gestion:** AZES (Agence des Zones Économiques Spéciales)\n\n📞 **Info:** Intervenant ExpoBeton 2024"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # West corridor
-        if any(word in user_question for word in ['corridor ouest', 'ouest', 'west corridor']):
-            answer = "🌅 **Corridor Ouest de la RDC:**\n\n📍 **Trajet:** Lubumbashi → Kinshasa → Matadi → Océan Atlantique\n\n🏛️ **Provinces traversées:**\n• Haut-Katanga, Lualaba (Grand Katanga)\n• Kinshasa (capitale)\n• Kongo-Central (ports)\n\n🚢 **Ports majeurs:**\n1️⃣ **Matadi** - Principal port RDC\n2️⃣ **Boma** - Port secondaire\n3️⃣ **Banana** - Port en eau profonde (en construction)\n\n🛣️ **Infrastructures:**\n• Route Nationale N°1 (550 km)\n• Chemin de fer Matadi-Kinshasa (366 km)\n• Fleuve Congo (transport fluvial)\n\n🎯 **Thème ExpoBeton 2024:** 'Révolution urbaine : Des solutions durables du corridor ouest pour Kinshasa et Kongo-Central'\n\n💡 **Enjeux:** Développement urbain, infrastructures, mobilité, énergie"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Role of Kinshasa
-        if any(word in user_question for word in ['kinshasa', 'rôle', 'role']) and 'kinshasa' in user_question:
-            answer = "🏛️ **Rôle de Kinshasa dans le développement RDC:**\n\n📊 **Capitale politique et économique:**\n• 15+ millions d'habitants\n• 40% du PIB national\n• Siège du gouvernement\n\n🏭 **Centre économique:**\n• Hub commercial et financier\n• Port fluvial majeur\n• Industries et services\n\n🛣️ **Défis infrastructurels:**\n• Congestion urbaine\n• Déficit logements (2M unités)\n• Mobilité et transport\n• Assainissement et déchets\n\n💡 **Projets prioritaires:**\n• Rocade sud-est (décongestion)\n• Cités satellites (Maluku, SOSAK)\n• Métro Kinshasa (METROKIN)\n• Ministère Politique de la Ville\n\n🎯 **Projection 2050:** 30M habitants - Nécessite transformation urgente\n\n📜 **Source:** ExpoBeton 2024, discours Président Félix Tshisekedi"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Who spoke at ExpoBeton 2023
-        if ('2023' in user_question or 'kolwezi' in user_question) and any(word in user_question for word in ['parlé', 'spoke', 'intervenant', 'speaker']):
-            answer = "🎯 **Intervenants ExpoBeton 2023 (Kolwezi, Lualaba):**\n\n👥 **Autorités:**\n• SEM Julien Paluku - Ministre de l'Industrie\n• Jacques Kaumba - Sénateur\n\n🏭 **Entreprises minières:**\n• Prof Dr Edouard Swana (TFM) - RSE et environnement\n• Guy Muswil (KAMOA-KAKULA) - Projet cuivre\n\n🏛️ **Institutions publiques:**\n• Pierre Bundoki (FONER) - Entretien routier\n• Popol Mabolia Yenga (CAMI) - Cadastre minier\n• Christian Basunga - Expert BTP\n\n🎯 **Thématiques:**\n• Exploitation minière responsable\n• Protection environnementale\n• Développement communautaire\n• Corridors de développement\n• Zones économiques spéciales\n\n📜 **Rapport complet disponible sur expobetonrdc.com**"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Minister of Industry
-        if any(word in user_question for word in ['ministre', 'minister']) and any(word in user_question for word in ['industrie', 'industry']):
-            answer = "🏭 **Ministre de l'Industrie - ExpoBeton:**\n\n👨‍💼 **SEM Julien Paluku Kahongya**\n\n💼 **Fonction:** Ministre de l'Industrie de la RDC\n\n🎯 **Intervention ExpoBeton 2023 (Kolwezi):**\n• Promotion de l'industrialisation locale\n• Transformation des matières premières\n• Développement des PME/PMI\n• Zones économiques spéciales\n\n💡 **Messages clés:**\n• Nécessité de transformer cobalt et cuivre localement\n• Création d'emplois par l'industrie\n• Partenariats public-privé\n• Financement innovant\n\n📜 **Documents:** Présentations disponibles dans archives ExpoBeton 2023"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Governor of Kinshasa
-        if any(word in user_question for word in ['gouverneur', 'governor']) and 'kinshasa' in user_question:
-            answer = "🏛️ **Gouverneur de Kinshasa - ExpoBeton 2024:**\n\n👨‍💼 **SEM BUMBA LUBAKI Daniel**\n\n💼 **Fonction:** Gouverneur de la Ville-Province de Kinshasa\n\n🎯 **Intervention ExpoBeton 2024:**\n• Support à l'événement ExpoBeton\n• Défis urbains de Kinshasa\n• Prix d'encouragement universités\n\n💡 **Priorités gouvernorat:**\n• Amélioration voiries urbaines\n• Gestion des déchets\n• Mobilité et transport\n• Développement cités satellites\n• Assainissement et drainage\n\n🏆 **Action ExpoBeton:** Remise 1er prix concours étudiants INBTP\n\n📜 **Rapport ExpoBeton 2024** pour détails complets"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # TFM (Tenke Fungurume Mining)
-        if 'tfm' in user_question or 'tenke' in user_question or 'fungurume' in user_question:
-            answer = "🏭 **TFM (Tenke Fungurume Mining)**\n\n📍 **Localisation:** Province du Lualaba, Kolwezi\n⚙️ **Activité:** Exploitation minière (cuivre et cobalt)\n\n🌍 **RSE & Environnement:**\n✅ Certifications ISO 9001, 14001, 18001, 45001\n✅ Réduction des émissions CO2 et NO2\n✅ Énergie propre (turbine à gaz, hydro-électricité)\n✅ Promotion voitures électriques (cobalt)\n\n🏘️ **Développement communautaire:**\n• 31 millions USD investis (2021-2025)\n• Santé: HGR 200 lits, centres de santé\n• Éducation: écoles, bibliothèques, ISTA\n• Économie: centre agricole, coopératives\n• Infrastructures: routes, ponts, marchés\n\n👨‍💼 **Intervenant ExpoBeton 2023:** Prof Dr Edouard Swana (Manager Relations Communautaires)"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # FONER (Fonds National d'Entretien Routier)
-        if 'foner' in user_question:
-            answer = "🛣️ **FONER (Fonds National d'Entretien Routier)**\n\n📋 **Création:** 2008\n🎯 **Mission:** Financer l'entretien et la protection du patrimoine routier RDC\n\n💰 **Ressources:**\n• Redevances sur lubrifiants et carburants\n• Droits de péage\n• Allocations budgétaires État\n\n📊 **Réalisations 2019-2022:** 435 millions USD investis\n📈 **Projection 2023:** 170 millions USD mobilisés\n\n🚧 **Travaux financés:**\n• 60% réseau routier national\n• 40% réseau provincial et local\n• Entretien routes, ponts, voiries urbaines\n\n⚠️ **Défis:** Besoins annuels de 380 millions USD vs 170 millions disponibles\n\n👨‍💼 **DG:** Pierre Bundoki (intervenant ExpoBeton 2023)"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # CAMI (Cadastre Minier)
-        if 'cami' in user_question or 'cadastre minier' in user_question:
-            answer = "⛏️ **CAMI (Cadastre Minier)**\n\n📋 **Nature:** Établissement public\n🎯 **Mission:** Gestion du domaine minier et des titres miniers/carrières\n\n📜 **Types d'autorisations:**\n1️⃣ Recherches de produits de carrières\n2️⃣ Exploitation de carrière temporaire\n3️⃣ Exploitation de carrière permanente\n\n📊 **Lualaba (chiffres clés):**\n• 201 droits de carrières actifs\n• 122 ARPC (61%)\n• 73 AECP (36%)\n• 6 CUP (3%)\n\n🏗️ **Programme PDL 145:**\n• 38.936 Km routes à réhabiliter\n• 418 mini centrales solaires\n• 238 marchés modernes\n• 788 centres de santé\n\n👨‍💼 **DG:** Popol Mabolia Yenga (intervenant ExpoBeton 2023)"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # BCC (Banque Centrale du Congo)
-        if 'bcc' in user_question or 'banque centrale' in user_question:
-            answer = "🏦 **BCC (Banque Centrale du Congo)**\n\n🎯 **Rôle:** Financement du secteur productif RDC\n\n📊 **Chiffres:**\n• Crédit à l'économie: 2.010,7 milliards CDF (2017)\n• Part bancaire: 93,9%\n• Ratio crédit/PIB: 8,3% (très faible vs Afrique du Sud 63,4%)\n\n⚠️ **Défis:**\n• Faible niveau d'épargne domestique\n• Absence de marché financier organisé\n• Dollarisation de l'économie\n• Déficit en infrastructures\n\n💡 **Solutions proposées:**\n• Amélioration climat des affaires\n• Création institutions financières spécialisées\n• Guichet de refinancement long\n• Émission valeurs du Trésor\n• Fonds de garantie de dépôts\n\n👨‍💼 **Vice-Gouverneur** (intervenant ExpoBeton 2018)"
-            dispatcher.utter_message(text=answer)
-            bot_response = answer
-            log_conversation_message(session_id, 'bot', bot_response, metadata)
-            return []
-        
-        # Theme
-        if any(word in user_question for word in ['thème', 'theme', 'sujet']):
-            answer = "Le thème de l'édition 2026 (11ème) est : 'Grand Katanga : Carrefour Stratégique au cœur des corridors africains du Sud, de l'Ouest et de l'Est'. Cette édition se concentre sur Lubumbashi, Kalemie et Kolwezi comme piliers du développement régional."
-            dispatcher.utter_message(text=answer)
-            suggestion = "\n💡 Vous pourriez aussi demander :\n• Qui sont les fondateurs ?\n• Comment devenir ambassadeur ?\n• Où se déroule l'événement ?"
-            dispatcher.utter_message(text=suggestion)
+                    LOG.warning('rag_answer_not_meaningful', session=session_id, answer=answer)
+            except asyncio.TimeoutError:
+                LOG.warning('generation_timeout', session=session_id, timeout=GENERATION_TIMEOUT)
+                TIMEOUTS.inc(stage='generation')
+            except Exception:
+                LOG.exception('generation_failed', session=session_id)
+                ERRORS.inc(stage='generation')
+        
+        # Keyword routes only used when the document search found nothing
+        route = ROUTER.route(user_question, AFTER_RAG, keyword_mask)
+        if route:
+            LOG.info('route_matched', session=session_id, route=route, stage=AFTER_RAG)
+            await self.respond(route, dispatcher, user_message_original, detected_lang, session_id, metadata)
+            TURNS.inc(outcome='keyword_after_rag')
             return []
         
         # Default: show help and log unanswered question
-        user_message = tracker.latest_message.get('text', '')
-        session_id = tracker.sender_id
-        metadata = tracker.latest_message.get('metadata', {})
-        
-        # Send email notification for unanswered question
-        send_unanswered_question_email(user_message)
+        # Count the unanswered question for the next digest email
+        UNANSWERED_QUESTIONS.add(user_message_original, session_id)
         
         # Use multilingual fallback message
         fallback_message = get_multilingual_response('fallback', detected_lang)
@@ -1039,20 +855,86 @@ class ActionAnswerExpoBeton(Action):
         dispatcher.utter_message(text=fallback_message)
         
         # Log bot response
-        log_conversation_message(session_id, 'bot', fallback_message, metadata)
+        await log_conversation_message(session_id, 'bot', fallback_message, metadata)
         
         # Send conversation email after every 3 messages or fallback
-        if session_id in CONVERSATION_LOGS:
-            msg_count = len(CONVERSATION_LOGS[session_id]['messages'])
+        conversation = await CONVERSATION_LOGS.aget(session_id)
+        if conversation is not None:
+            msg_count = len(conversation.messages)
             if msg_count >= 4:  # Send after 4 messages (2 user + 2 bot minimum)
-                send_conversation_email(
+                await CONVERSATION_LOGS.offload(
+                    emit_conversation_transcript,
                     session_id,
-                    CONVERSATION_LOGS[session_id]['user_info'],
-                    CONVERSATION_LOGS[session_id]['messages']
+                    conversation.user_info,
+                    conversation.transcript()
                 )
         
+        TURNS.inc(outcome='fallback')
         return []
 
+    async def respond(self, route: Text, dispatcher: CollectingDispatcher, user_message: Text,
+                detected_lang: Text, session_id: Text, metadata: Dict[Text, Any]) -> None:
+        """Utter the answer of a keyword route and log it in the conversation"""
+        if route == 'how_are_you':
+            messages = [HOW_ARE_YOU_REPLIES.get(detected_lang) or get_multilingual_response('how_are_you', detected_lang)]
+        elif route == 'greeting':
+            messages = self.greeting_messages(user_message, detected_lang)
+        elif route == 'ambassador':
+            messages = list(AMBASSADOR_ANSWERS['en' if detected_lang == 'en' else 'fr'])
+        elif route == 'grand_katanga':
+            messages = [GRAND_KATANGA_ANSWERS['fr' if detected_lang == 'fr' else 'en']]
+        elif route in MULTILINGUAL_CONTENT:
+            messages = [get_multilingual_response(route, detected_lang)]
+        else:
+            messages = [STATIC_ANSWERS[route]]
+            if route in STATIC_SUGGESTIONS:
+                messages.append(STATIC_SUGGESTIONS[route])
+        
+        for text in messages:
+            dispatcher.utter_message(text=text)
+        await log_conversation_message(session_id, 'bot', ''.join(messages), metadata)
+        
+        # Send conversation email when the user says goodbye
+        conversation = await CONVERSATION_LOGS.aget(session_id) if route == 'goodbye' else None
+        if conversation is not None:
+            if len(conversation.messages) > 0:
+                await CONVERSATION_LOGS.offload(
+                    emit_conversation_transcript,
+                    session_id,
+                    conversation.user_info,
+                    conversation.transcript()
+                )
+
+    @staticmethod
+    def greeting_messages(user_message: Text, detected_lang: Text) -> List[Text]:
+        """Greeting (personalized if the user gave a name) plus suggestions"""
+        # Extract user's name if provided
+        user_name = None
+        for pattern in NAME_PATTERNS:
+            match = re.search(pattern, user_message, re.IGNORECASE)
+            if match:
+                user_name = match.group(1).strip().title()
+                break
+        
+        # Build personalized greeting with FRIENDLY tone and emoji
+        if user_name and detected_lang == 'fr':
+            return [f"Bonjour {user_name}! 😊 Enchanté de faire votre connaissance! Comment allez-vous? Qu'aimeriez-vous savoir sur ExpoBeton RDC?"]
+        if user_name and detected_lang == 'en':
+            return [f"Hello {user_name}! 😊 Nice to meet you! How are you doing? What would you like to know about ExpoBeton RDC?"]
+        
+        # Add emoji to generic greeting
+        answer = get_multilingual_response('greeting', detected_lang)
+        if detected_lang == 'fr':
+            answer = answer.replace("Bonjour!", "Bonjour! 😊")
+        elif detected_lang == 'en':
+            answer = answer.replace("Hello!", "Hello! 😊")
+        
+        # Language-specific suggestions (only if no name given)
+        if user_name:
+            return [answer]
+        return [answer, GREETING_SUGGESTIONS.get(detected_lang, GREETING_SUGGESTIONS['fr'])]
+
+
 class ActionAnswerAndSuggest(Action):
     def name(self) -> Text:
         return "action_answer_and_suggest"
@@ -1088,33 +970,45 @@ class ActionEndConversation(Action):
     def name(self) -> Text:
         return "action_end_conversation"
 
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
         session_id = tracker.sender_id
         metadata = tracker.latest_message.get('metadata', {})
         
-        print(f"\n{'='*60}")
-        print(f"[ACTION END CONVERSATION] Called for session: {session_id}")
-        print(f"[ACTION END CONVERSATION] Metadata received: {metadata}")
-        print(f"[ACTION END CONVERSATION] Has 'messages' in metadata: {'messages' in metadata}")
-        print(f"[ACTION END CONVERSATION] Has 'user_info' in metadata: {'user_info' in metadata}")
-        print(f"{'='*60}\n")
-        
-        # Get conversation data from metadata if provided by frontend
-        if 'messages' in metadata and 'user_info' in metadata:
-            print(f"[ACTION END CONVERSATION] Using metadata from frontend")
+        # The metadata carries the whole transcript: a field cut at LOG_MAX_FIELD_CHARS (sampled in full)
+        LOG.info('action_called', action=self.name(), session=session_id,
+                 has_messages='messages' in metadata, has_user_info='user_info' in metadata)
+        LOG.debug('end_conversation_metadata', session=session_id, metadata=metadata)
+        
+        # The stored conversation is removed atomically, so only one replica sends it.
+        # Its messages are numbered by the store: the emission ledger never compares
+        # the browser clock of the frontend copy with the server clock.
+        conversation = await CONVERSATION_LOGS.apop(session_id)
+        if conversation is not None and conversation.messages:
+            LOG.info('end_conversation_transcript', session=session_id,
+                     source=CONVERSATION_LOGS.backend.__class__.__name__, messages=len(conversation.messages))
+            if await CONVERSATION_LOGS.offload(
+                emit_conversation_transcript,
+                session_id,
+                metadata.get('user_info') or conversation.user_info,
+                conversation.transcript()
+            ):
+                LOG.info('conversation_ended', session=session_id)
+            
+        # Otherwise the frontend copy (e.g. the memory store of a restarted server lost it),
+        # only if nothing of the conversation was emailed: its numbering is not the store's
+        elif 'messages' in metadata and 'user_info' in metadata and not await CONVERSATION_LOGS.aemitted(session_id):
             # Frontend sent complete conversation data
             messages = metadata.get('messages', [])
             user_info = metadata.get('user_info', {})
             
-            print(f"[ACTION END CONVERSATION] Messages count: {len(messages)}")
-            print(f"[ACTION END CONVERSATION] User info: {user_info}")
+            LOG.info('end_conversation_transcript', session=session_id, source='frontend', messages=len(messages))
             
             # Convert frontend message format to backend format
             formatted_messages = []
-            for msg in messages:
+            for seq, msg in enumerate(messages, 1):
                 # Handle timestamp - JavaScript toISOString() adds 'Z' which needs to be replaced
                 timestamp = msg.get('timestamp')
                 if isinstance(timestamp, str):
@@ -1122,7 +1016,7 @@ class ActionEndConversation(Action):
                         # Replace 'Z' with '+00:00' for Python compatibility
                         timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
                     except Exception as e:
-                        print(f"[ERROR] Failed to parse timestamp '{timestamp}': {e}")
+                        LOG.warning('timestamp_parse_failed', session=session_id, timestamp=timestamp, error=str(e))
                         timestamp = datetime.now()
                 elif not isinstance(timestamp, datetime):
                     timestamp = datetime.now()
@@ -1130,35 +1024,18 @@ class ActionEndConversation(Action):
                 formatted_messages.append({
                     'sender': msg.get('sender'),
                     'text': msg.get('text'),
-                    'timestamp': timestamp
+                    'timestamp': timestamp,
+                    'seq': seq
                 })
             
-            # Send email with conversation
-            print(f"[ACTION END CONVERSATION] Sending email...")
-            send_conversation_email(session_id, user_info, formatted_messages)
-            print(f"✅ [ACTION END CONVERSATION] Conversation ended and email sent for session: {session_id}")
+            if await CONVERSATION_LOGS.offload(emit_conversation_transcript, session_id, user_info, formatted_messages):
+                LOG.info('conversation_ended', session=session_id)
             
-        # Or check if we have messages in our local storage
-        elif session_id in CONVERSATION_LOGS:
-            print(f"[ACTION END CONVERSATION] Using conversation logs from memory")
-            conversation = CONVERSATION_LOGS[session_id]
-            if len(conversation['messages']) > 0:
-                print(f"[ACTION END CONVERSATION] Messages in log: {len(conversation['messages'])}")
-                send_conversation_email(
-                    session_id,
-                    conversation['user_info'],
-                    conversation['messages']
-                )
-                # Clear conversation from memory
-                del CONVERSATION_LOGS[session_id]
-                print(f"✅ [ACTION END CONVERSATION] Conversation ended and email sent for session: {session_id}")
-            else:
-                print(f"⚠️ [ACTION END CONVERSATION] No messages found in conversation log")
+        elif conversation is not None:
+            LOG.warning('end_conversation_empty', session=session_id)
         else:
-            print(f"❌ [ACTION END CONVERSATION] No conversation data found!")
-            print(f"   - Not in metadata")
-            print(f"   - Not in CONVERSATION_LOGS")
-            print(f"   - Available CONVERSATION_LOGS keys: {list(CONVERSATION_LOGS.keys())}")
+            # Neither in CONVERSATION_LOGS nor still to send from the metadata (the session count is on /metrics)
+            LOG.warning('end_conversation_no_data', session=session_id)
         
         dispatcher.utter_message(
             text="👋 Merci pour votre visite! La conversation a été enregistrée."
@@ -1172,7 +1049,7 @@ class ActionAskFeedbackRating(Action):
     def name(self) -> Text:
         return "action_ask_feedback_rating"
     
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
@@ -1182,7 +1059,7 @@ class ActionAskFeedbackRating(Action):
         
         if user_messages:
             last_user_message = user_messages[-1].get('text', '')
-            detected_lang = detect_language(last_user_message)
+            detected_lang = await conversation_language(tracker.sender_id, last_user_message)
         else:
             detected_lang = 'fr'  # Default to French
         
@@ -1236,7 +1113,7 @@ class ActionThankYouPositive(Action):
     def name(self) -> Text:
         return "action_thankyou_positive"
     
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
@@ -1246,7 +1123,7 @@ class ActionThankYouPositive(Action):
         
         if user_messages:
             last_user_message = user_messages[-1].get('text', '')
-            detected_lang = detect_language(last_user_message)
+            detected_lang = await conversation_language(tracker.sender_id, last_user_message)
         else:
             detected_lang = 'fr'  # Default to French
         
@@ -1270,7 +1147,7 @@ class ActionThankYouNegative(Action):
     def name(self) -> Text:
         return "action_thankyou_negative"
     
-    def run(self, dispatcher: CollectingDispatcher,
+    async def run(self, dispatcher: CollectingDispatcher,
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
@@ -1280,7 +1157,7 @@ class ActionThankYouNegative(Action):
         
         if user_messages:
             last_user_message = user_messages[-1].get('text', '')
-            detected_lang = detect_language(last_user_message)
+            detected_lang = await conversation_language(tracker.sender_id, last_user_message)
         else:
             detected_lang = 'fr'  # Default to French
         
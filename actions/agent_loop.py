@@ -0,0 +1,136 @@
+# actions/agent_loop.py
+# One long-lived event loop for the Rasa agent served by flask_app.py
+#
+# Flask handles each request on its own thread, but the agent is async: the
+# webhook used to create a new event loop per message (never closed, one
+# selector and socket pair leaked per request) and to run the shared Agent
+# on whichever loop the request thread had, although the locks and HTTP
+# sessions it creates while handling messages are bound to their loop.
+# AgentLoop runs a single loop in a background thread; request threads hand
+# it coroutines with run_coroutine_threadsafe() and wait for the result:
+#
+#   AGENT_LOOP = AgentLoop()
+#   AGENT_LOOP.run(agent.handle_message(message), sender=sender_id)
+#
+# Messages of one sender are handled one at a time, in arrival order (a FIFO
+# asyncio.Lock per sender), so a quick second message never overtakes the
+# first. At most `max_in_flight` messages are handled at once; beyond
+# `max_pending` accepted messages (handled or waiting), submit() raises
+# AgentOverloaded right away and the webhook answers 503 with Retry-After
+# instead of queueing requests that would time out anyway.
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Coroutine, Dict, Optional, Text
+
+from actions.structured_logging import get_logger
+
+AGENT_MAX_IN_FLIGHT = int(os.getenv('AGENT_MAX_IN_FLIGHT', '16'))  # messages handled concurrently
+AGENT_MAX_PENDING = int(os.getenv('AGENT_MAX_PENDING', '200'))  # handled + waiting, rejected beyond
+AGENT_TIMEOUT = float(os.getenv('AGENT_TIMEOUT', '60'))  # seconds a request waits for its answer
+AGENT_RETRY_AFTER = int(os.getenv('AGENT_RETRY_AFTER', '2'))  # seconds, Retry-After of the 503
+
+LOG = get_logger('agent_loop')
+
+
+class AgentOverloaded(Exception):
+    """More than max_pending messages accepted: retry after `retry_after` seconds"""
+
+    def __init__(self, pending: int, retry_after: int = AGENT_RETRY_AFTER):
+        super().__init__(f"{pending} messages pending, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AgentLoop:
+    """Event loop thread running the agent's coroutines for the request threads"""
+
+    def __init__(self, max_in_flight: int = AGENT_MAX_IN_FLIGHT, max_pending: int = AGENT_MAX_PENDING,
+                 name: Text = 'agent-loop'):
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.loop = asyncio.new_event_loop()
+        self.in_flight = 0
+        self.rejected = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._senders = {}  # sender_id -> [asyncio.Lock, messages holding or waiting for it], loop thread only
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine: Coroutine, sender: Optional[Text] = None) -> concurrent.futures.Future:
+        """Schedule `coroutine` on the loop, after the earlier messages of `sender`"""
+        with self._pending_lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                coroutine.close()
+                raise AgentOverloaded(self._pending)
+            self._pending += 1
+        future = asyncio.run_coroutine_threadsafe(self._serve(coroutine, sender), self.loop)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, coroutine: Coroutine, sender: Optional[Text] = None, timeout: Optional[float] = AGENT_TIMEOUT) -> Any:
+        """submit() and wait for the result; on timeout the coroutine is cancelled and TimeoutError raised"""
+        future = self.submit(coroutine, sender)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            LOG.warning('agent_timeout', session=sender, timeout_s=timeout)
+            raise TimeoutError(f"No answer after {timeout}s") from None
+
+    def _release(self, future: concurrent.futures.Future) -> None:
+        with self._pending_lock:
+            self._pending -= 1
+
+    async def _serve(self, coroutine: Coroutine, sender: Optional[Text]) -> Any:
+        try:
+            if sender is None:
+                return await self._call(coroutine)
+            entry = self._senders.setdefault(sender, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                # The sender lock first: its waiting messages must not hold in-flight slots
+                async with entry[0]:
+                    return await self._call(coroutine)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._senders[sender]
+        finally:
+            coroutine.close()  # never started if cancelled while waiting
+
+    async def _call(self, coroutine: Coroutine) -> Any:
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await coroutine
+            finally:
+                self.in_flight -= 1
+
+    def ping(self, timeout: float = 2) -> bool:
+        """Liveness: the loop runs callbacks (not blocked, thread alive)"""
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self.loop.call_soon_threadsafe(done.set)
+        return done.wait(timeout)
+
+    def stats(self) -> Dict[Text, int]:
+        with self._pending_lock:
+            pending = self._pending
+        return {'in_flight': self.in_flight, 'waiting': max(pending - self.in_flight, 0),
+                'senders': len(self._senders), 'rejected': self.rejected}
+
+    def stop(self, timeout: float = 5) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
@@ -0,0 +1,274 @@
+# actions/caching.py
+# In-process LRU/TTL caches, optionally backed by a shared Redis so every
+# action-server replica benefits from the entries the others computed
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+
+from actions.structured_logging import get_logger
+
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')  # e.g. redis://redis:6379/0
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '2048'))
+QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', '86400'))  # seconds
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '1000'))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', '21600'))  # seconds
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.92'))  # cosine similarity
+
+LOG = get_logger('cache')
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    """Redis client for CACHE_REDIS_URL, or None if not configured/available"""
+    global _shared_client
+    if not CACHE_REDIS_URL:
+        return None
+    with _shared_client_lock:
+        if _shared_client is None:
+            try:
+                import redis
+                _shared_client = redis.Redis.from_url(CACHE_REDIS_URL, socket_timeout=0.5)
+            except ImportError:
+                LOG.warning('redis_package_missing', setting='CACHE_REDIS_URL')
+                return None
+        return _shared_client
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Text) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= self.clock():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Text, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (self.clock() + (ttl if ttl is not None else self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Text) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[Text, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+def normalize_query(text: Text) -> Text:
+    """Lowercase, collapse whitespace and drop surrounding punctuation"""
+    return ' '.join(text.lower().split()).strip(' ?!.,;:')
+
+
+class QueryEmbeddingCache:
+    """Caches query embeddings by (model, normalized text) in front of an embedder"""
+
+    def __init__(self, embedder, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL, shared=None):
+        self.embedder = embedder
+        self.local = TTLCache(maxsize, ttl)
+        self.shared = shared
+        self.shared_hits = 0
+        self.remote_calls = 0
+
+    def _key(self, normalized: Text) -> Text:
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        return f"qemb:{self.embedder.model_name}:{digest}"
+
+    def _lookup_shared(self, key: Text) -> Optional[np.ndarray]:
+        if self.shared is None:
+            return None
+        try:
+            raw = self.shared.get(key)
+        except Exception as e:
+            LOG.warning('shared_cache_read_failed', error=str(e))
+            return None
+        if raw is None:
+            return None
+        vector = np.frombuffer(raw, dtype=np.float32)
+        self.shared_hits += 1
+        self.local.set(key, vector)
+        return vector
+
+    def _store_local(self, key: Text, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        self.remote_calls += 1
+        self.local.set(key, vector)
+        return vector
+
+    def _store_shared(self, key: Text, vector: np.ndarray) -> None:
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(key, vector.tobytes(), ex=int(self.local.ttl))
+        except Exception as e:
+            LOG.warning('shared_cache_write_failed', error=str(e))
+
+    def embed(self, query: Text) -> np.ndarray:
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+        vector = self.local.get(key)
+        if vector is None:
+            vector = self._lookup_shared(key)
+        if vector is None:
+            vector = self._store_local(key, self.embedder.embed([normalized or query])[0])
+            self._store_shared(key, vector)
+        return vector
+
+    async def aembed(self, query: Text) -> np.ndarray:
+        """embed() for the event loop: Redis round trips in a worker thread, the embedder's async API"""
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+        vector = self.local.get(key)
+        if vector is None and self.shared is not None:
+            vector = await asyncio.to_thread(self._lookup_shared, key)
+        if vector is None:
+            vector = self._store_local(key, (await self.embedder.aembed([normalized or query]))[0])
+            if self.shared is not None:
+                await asyncio.to_thread(self._store_shared, key, vector)
+        return vector
+
+    def stats(self) -> Dict[Text, Any]:
+        stats = self.local.stats()
+        # A shared hit missed the local cache first: it counts as a hit, not as a miss
+        stats['hits'] += self.shared_hits
+        stats['misses'] -= self.shared_hits
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        stats['shared_hits'] = self.shared_hits
+        stats['embedding_calls'] = self.remote_calls
+        return stats
+
+
+def docs_key(documents: List[Dict[Text, Any]]) -> Tuple[Text, ...]:
+    """Order-independent key of a retrieved passage set"""
+    return tuple(sorted(f"{doc['filename']}:{doc.get('start', 0)}" for doc in documents))
+
+
+class SemanticAnswerCache:
+    """Reuses generated answers for near-identical questions over the same retrieved passages
+
+    A hit needs a cached question whose embedding has cosine similarity >= threshold
+    with the new one AND the same retrieved passage set. Everything is dropped when
+    the docs index version changes.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, maxsize: int = ANSWER_CACHE_SIZE,
+                 ttl: float = ANSWER_CACHE_TTL, clock=time.monotonic):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        self._entries = []  # dicts: key, answer, latency, expires_at
+        self._vectors = None  # normalized query embeddings, one row per entry
+        self._lock = threading.Lock()
+
+    def _sync_version(self, version: Optional[Text]) -> None:
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = []
+            self._vectors = None
+            self.version = version
+
+    def _purge_expired(self) -> None:
+        now = self.clock()
+        keep = [i for i, entry in enumerate(self._entries) if entry['expires_at'] > now]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = self._vectors[keep] if keep else None
+
+    def lookup(self, vector: np.ndarray, key: Tuple[Text, ...], version: Optional[Text] = None) -> Optional[Text]:
+        with self._lock:
+            self._sync_version(version)
+            self._purge_expired()
+            if self._vectors is not None:
+                query = np.asarray(vector, dtype=np.float32)
+                query = query / (np.linalg.norm(query) or 1.0)
+                similarities = self._vectors @ query
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.threshold:
+                        break
+                    entry = self._entries[i]
+                    if entry['key'] == key:
+                        self.hits += 1
+                        self.saved_seconds += entry['latency']
+                        return entry['answer']
+            self.misses += 1
+            return None
+
+    def store(self, vector: np.ndarray, key: Tuple[Text, ...], answer: Text,
+              latency: float, version: Optional[Text] = None) -> None:
+        """Cache an answer; latency is the generation time a future hit will save"""
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            self._sync_version(version)
+            self._purge_expired()
+            self._entries.append({'key': key, 'answer': answer, 'latency': latency,
+                                  'expires_at': self.clock() + self.ttl})
+            row = query[np.newaxis, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+            if len(self._entries) > self.maxsize:
+                # Drop the oldest entries
+                overflow = len(self._entries) - self.maxsize
+                self._entries = self._entries[overflow:]
+                self._vectors = self._vectors[overflow:]
+
+    def stats(self) -> Dict[Text, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'saved_seconds': round(self.saved_seconds, 3),
+            'invalidations': self.invalidations,
+        }
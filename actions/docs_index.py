@@ -0,0 +1,318 @@
+# actions/docs_index.py
+# Persistent embedding index for the docs/ corpus
+#
+# Build once with:  python -m actions.docs_index
+# Every file is split into overlapping passages (filename + character
+# offsets). The action server memory-maps the matrix instead of re-embedding
+# the corpus on its first RAG question. Files are keyed by SHA-256, so a
+# rebuild only re-embeds the documents that changed. Rows are stored
+# L2-normalized, so the search runs on the memory map without a copy.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+
+from actions.embeddings import EMBEDDING_BACKEND, get_embedder
+from actions.structured_logging import configure_logging, get_logger
+from actions.vector_index import normalize_rows
+
+DOCS_PATH = Path(__file__).parent.parent / 'docs'
+INDEX_DIR = Path(os.getenv('DOCS_INDEX_DIR', str(Path(__file__).parent.parent / 'docs_index')))
+
+MANIFEST_FILE = 'manifest.json'
+MATRIX_FILE = 'embeddings.npy'
+DOCUMENTS_FILE = 'documents.json'
+INDEX_FORMAT = 2
+
+# Every file is split into overlapping passages so the whole corpus is searchable
+CHUNK_SIZE = int(os.getenv('DOCS_CHUNK_SIZE', '1200'))
+CHUNK_OVERLAP = int(os.getenv('DOCS_CHUNK_OVERLAP', '200'))
+
+LOG = get_logger('docs_index')
+
+
+class DocsIndex:
+    """Loaded index: passages aligned row by row with the embedding matrix"""
+
+    def __init__(self, manifest: Dict[Text, Any], documents: List[Dict[Text, Any]], embeddings: np.ndarray):
+        self.manifest = manifest
+        self.documents = documents
+        self.embeddings = embeddings
+
+    @property
+    def model_name(self) -> Text:
+        return self.manifest['model']
+
+    @property
+    def normalized(self) -> bool:
+        """True if the rows were saved with unit L2 norm (indexes built before that were not)"""
+        return self.manifest.get('normalized', False)
+
+    @property
+    def version(self) -> Text:
+        """Short hash of the model and file hashes, changes whenever the index content changes"""
+        digest = hashlib.sha256(self.manifest['model'].encode('utf-8'))
+        for filename in sorted(self.manifest['files']):
+            digest.update(filename.encode('utf-8'))
+            digest.update(self.manifest['files'][filename]['sha256'].encode('ascii'))
+        return digest.hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def file_sha256(path: Path) -> Text:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def select_doc_files(docs_path: Path = DOCS_PATH) -> List[Path]:
+    """All the documents to index"""
+    return sorted(docs_path.glob('*.txt'))
+
+
+def chunk_text(text: Text, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    """Split text into overlapping (start, end) windows, cut on whitespace where possible"""
+    spans = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            # Prefer a paragraph break, then any whitespace, in the second half of the window
+            cut = text.rfind('\n\n', start + size // 2, end)
+            if cut == -1:
+                cut = max(text.rfind(' ', start + size // 2, end), text.rfind('\n', start + size // 2, end))
+            if cut != -1:
+                end = cut
+        spans.append((start, end))
+        if end >= length:
+            break
+        next_start = max(end - overlap, start + 1)
+        # Start the next passage on a word boundary
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+
+def split_document(filename: Text, content: Text) -> List[Dict[Text, Any]]:
+    """Turn one file into the passages that get embedded"""
+    passages = []
+    for start, end in chunk_text(content):
+        passage = content[start:end].strip()
+        if passage:
+            passages.append({'filename': filename, 'start': start, 'end': end, 'content': passage})
+    return passages
+
+
+def read_passages(docs_path: Path = DOCS_PATH) -> Tuple[List[Dict[Text, Any]], Dict[Text, Dict[Text, Text]]]:
+    """The passages of every document and the SHA-256 of every file (BM25 index, local embedder)"""
+    documents, files = [], {}
+    for file_path in select_doc_files(docs_path):
+        try:
+            raw = file_path.read_bytes()
+        except OSError as e:
+            LOG.warning('doc_read_failed', file=file_path.name, error=str(e))
+            continue
+        files[file_path.name] = {'sha256': hashlib.sha256(raw).hexdigest()}
+        documents.extend(split_document(file_path.name, raw.decode('utf-8', errors='replace')))
+    return documents, files
+
+
+# Persistence shared with actions/lexical_index.py and actions/local_embedder.py:
+# every file is written next to its target and renamed over it, manifest last
+
+def read_json(path: Path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def save_arrays(directory: Path, arrays: Dict[Text, np.ndarray]) -> None:
+    """Write each array to directory/name (.npy, memory-mappable)"""
+    for name, array in arrays.items():
+        tmp_path = directory / (name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, directory / name)
+
+
+def load_index(index_dir: Path = INDEX_DIR, model_name: Text = None) -> Optional[DocsIndex]:
+    """Load a persisted index (matrix memory-mapped). Returns None if missing or built for another model."""
+    manifest_path = index_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    manifest = read_json(manifest_path)
+    if manifest.get('format') != INDEX_FORMAT:
+        return None
+    if model_name and manifest.get('model') != model_name:
+        return None
+    documents = read_json(index_dir / DOCUMENTS_FILE)
+    embeddings = np.load(index_dir / MATRIX_FILE, mmap_mode='r')
+    if len(documents) != embeddings.shape[0]:
+        LOG.warning('docs_index_corrupted', directory=str(index_dir), passages=len(documents), rows=embeddings.shape[0])
+        return None
+    return DocsIndex(manifest, documents, embeddings)
+
+
+def is_stale(index, docs_path: Path = DOCS_PATH) -> bool:
+    """True if files were added, removed or changed since the index (or model) was built
+
+    Works for anything whose manifest records the `files` it was built from:
+    DocsIndex, LexicalIndex, LSAModel.
+    """
+    files = select_doc_files(docs_path)
+    indexed = index.manifest['files']
+    if [f.name for f in files] != list(indexed):
+        return True
+    return any(indexed[f.name]['sha256'] != file_sha256(f) for f in files)
+
+
+def build_index(embedder=None, docs_path: Path = DOCS_PATH, index_dir: Path = INDEX_DIR,
+                force: bool = False, save: bool = True) -> DocsIndex:
+    """Build (or incrementally update) the index, re-embedding only the files that changed"""
+    embedder = embedder or get_embedder()
+    previous = None if force else load_index(index_dir, embedder.model_name)
+    previous_files = previous.manifest['files'] if previous else {}
+
+    documents = []
+    blocks = []  # per file: matrix rows, either reused or None (to embed)
+    files = {}
+    pending = []  # (block position, entries) to embed
+    reused = 0
+
+    for file_path in select_doc_files(docs_path):
+        try:
+            raw = file_path.read_bytes()
+        except OSError as e:
+            LOG.warning('doc_read_failed', file=file_path.name, error=str(e))
+            continue
+        sha = hashlib.sha256(raw).hexdigest()
+        old = previous_files.get(file_path.name)
+        if old and old['sha256'] == sha:
+            start, end = old['rows']
+            entries = previous.documents[start:end]
+            if entries:
+                blocks.append(np.asarray(previous.embeddings[start:end], dtype=np.float32))
+            reused += 1
+        else:
+            entries = split_document(file_path.name, raw.decode('utf-8', errors='replace'))
+            if entries:
+                pending.append((len(blocks), entries))
+                blocks.append(None)
+        files[file_path.name] = {'sha256': sha, 'rows': [len(documents), len(documents) + len(entries)]}
+        documents.extend(entries)
+
+    if pending:
+        texts = [entry['content'] for _, entries in pending for entry in entries]
+        LOG.info('docs_index_embedding', passages=len(texts), files=len(pending), model=embedder.model_name,
+                 batch_size=embedder.batch_size, workers=embedder.workers)
+        start = time.perf_counter()
+        vectors = embedder.embed(texts)
+        LOG.info('docs_index_embedded', passages=len(texts),
+                 passages_per_s=round(len(texts) / max(time.perf_counter() - start, 1e-9)))
+        offset = 0
+        for position, entries in pending:
+            blocks[position] = vectors[offset:offset + len(entries)]
+            offset += len(entries)
+
+    dim = blocks[0].shape[1] if blocks else 0
+    # Reused rows of an index saved before normalization are normalized here too
+    embeddings = normalize_rows(np.concatenate(blocks)) if blocks else np.zeros((0, dim), dtype=np.float32)
+    manifest = {
+        'format': INDEX_FORMAT,
+        'model': embedder.model_name,
+        'dim': int(dim),
+        'normalized': True,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': files,
+    }
+    LOG.info('docs_index_built', passages=len(documents), files=len(files), reused=reused, re_embedded=len(pending))
+
+    index = DocsIndex(manifest, documents, embeddings)
+    if save:
+        save_index(index, index_dir)
+    return index
+
+
+def save_index(index: DocsIndex, index_dir: Path = INDEX_DIR) -> None:
+    """Persist the matrix, documents and manifest (manifest last)"""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    save_arrays(index_dir, {MATRIX_FILE: index.embeddings})
+    write_json(index_dir / DOCUMENTS_FILE, index.documents)
+    write_json(index_dir / MANIFEST_FILE, index.manifest)
+
+
+def load_or_build_index(embedder=None, docs_path: Path = DOCS_PATH, index_dir: Path = INDEX_DIR,
+                        rebuild: bool = True) -> Optional[DocsIndex]:
+    """Load the persisted index, rebuilding the changed parts if it is missing or stale
+
+    With rebuild=False nothing is embedded: a stale index is returned as it is, a missing one as None.
+    """
+    embedder = embedder or get_embedder()
+    start = time.perf_counter()
+    index = load_index(index_dir, embedder.model_name)
+    if index is not None and not is_stale(index, docs_path):
+        LOG.info('docs_index_loaded', passages=len(index), model=index.model_name, version=index.version,
+                 duration_ms=round((time.perf_counter() - start) * 1000, 1))
+        return index
+    if not rebuild:
+        LOG.warning('docs_index_not_rebuilt', directory=str(index_dir),
+                    state='stale, served as built' if index is not None else 'missing',
+                    hint='python -m actions.docs_index')
+        return index
+
+    LOG.warning('docs_index_rebuilding', directory=str(index_dir), reason='missing or stale')
+    index = build_index(embedder, docs_path, index_dir, save=False)
+    try:
+        save_index(index, index_dir)
+    except OSError as e:
+        # Read-only filesystem: keep the freshly built index in memory only
+        LOG.warning('docs_index_not_persisted', error=str(e))
+    return index
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Build the persistent embedding index for docs/')
+    parser.add_argument('--backend', choices=['openai', 'local', 'hash'], default=None,
+                        help='Embedding backend (default: EMBEDDING_BACKEND env var, else openai; '
+                             'local = TF-IDF + SVD trained on the documents, no network)')
+    parser.add_argument('--docs', type=Path, default=DOCS_PATH, help='Documents directory')
+    parser.add_argument('--out', type=Path, default=INDEX_DIR, help='Index directory')
+    parser.add_argument('--force', action='store_true', help='Re-embed every file')
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    # Progress is logged by build_index (structured log lines on stdout)
+    configure_logging()
+    start = time.perf_counter()
+    if (args.backend or EMBEDDING_BACKEND) == 'local':
+        from actions.local_embedder import LocalEmbedder
+        # Trained on (and saved next to) the documents being indexed
+        embedder = LocalEmbedder(args.docs, args.out)
+    else:
+        embedder = get_embedder(args.backend)
+    index = build_index(embedder, args.docs, args.out, force=args.force)
+    print(f"Index version {index.version} written to {args.out} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# actions/embeddings.py
+# Embedding backends used by the docs index and the RAG query path
+#
+# Every backend is an Embedder: embed_batch() embeds one batch of texts,
+# embed() (index builds) cuts the texts in batches of EMBEDDING_BATCH_SIZE and
+# runs them on EMBEDDING_WORKERS threads, aembed() serves the query path.
+# 'openai' calls the embeddings API, 'local' is a TF-IDF + SVD projection
+# trained on docs/ that runs on the CPU (actions/local_embedder.py) and
+# 'hash' a deterministic stub for tests.
+
+import asyncio
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Text
+
+import numpy as np
+
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')  # 'openai', 'local' or 'hash'
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))  # texts per request/batch
+EMBEDDING_WORKERS = int(os.getenv('EMBEDDING_WORKERS', '4'))  # batches embedded at once by index builds
+
+
+class Embedder:
+    """Interface of the embedding backends: `model_name` and embed_batch(), the rest is shared"""
+
+    model_name: Text
+    batch_size: int = EMBEDDING_BATCH_SIZE
+    workers: int = EMBEDDING_WORKERS
+    billed: bool = False  # every embedded text is charged: no index rebuild unless asked for
+
+    def embed_batch(self, texts: List[Text]) -> np.ndarray:
+        """Embed one batch (at most `batch_size` texts), one row per text"""
+        raise NotImplementedError
+
+    def embed(self, texts: List[Text]) -> np.ndarray:
+        """Embed any number of texts: batches of `batch_size`, `workers` batches at once, rows in order"""
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.workers <= 1 or len(batches) == 1:
+            blocks = [self.embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches)),
+                                    thread_name_prefix='embed') as pool:
+                blocks = list(pool.map(self.embed_batch, batches))
+        return np.concatenate(blocks).astype(np.float32, copy=False)
+
+    async def aembed(self, texts: List[Text]) -> np.ndarray:
+        """embed() off the event loop (query path of the action server)"""
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings through the OpenAI API (text-embedding-3-small by default)"""
+
+    billed = True
+
+    def __init__(self, model: Text = EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 workers: int = EMBEDDING_WORKERS):
+        self.model_name = model
+        # Batch the requests to stay under the API input limits
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def embed_batch(self, texts: List[Text]) -> np.ndarray:
+        import openai
+
+        response = openai.embeddings.create(input=texts, model=self.model_name)
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+    async def aembed(self, texts: List[Text]) -> np.ndarray:
+        """Same as embed() through the shared async client (query path of the action server)"""
+        from actions.llm import get_async_client
+
+        client = get_async_client()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = await client.embeddings.create(
+                input=texts[start:start + self.batch_size],
+                model=self.model_name
+            )
+            vectors.extend(item.embedding for item in response.data)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashEmbedder(Embedder):
+    """Deterministic local embedder (feature hashing of words), used for tests and offline runs"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model_name = f'hash-{dim}'
+        self.workers = 1  # pure Python, threads would only contend for the GIL
+
+    def embed_batch(self, texts: List[Text]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r'\w+', text.lower()):
+                # blake2b is stable across processes, unlike hash()
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, bucket] += sign
+        return vectors
+
+    async def aembed(self, texts: List[Text]) -> np.ndarray:
+        return self.embed(texts)
+
+
+def get_embedder(backend: Text = None) -> Embedder:
+    """Return the embedder configured by EMBEDDING_BACKEND"""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == 'hash':
+        return HashEmbedder()
+    if backend == 'local':
+        from actions.local_embedder import LocalEmbedder
+        return LocalEmbedder()
+    return OpenAIEmbedder()
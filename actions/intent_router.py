@@ -0,0 +1,125 @@
+# actions/intent_router.py
+# Compiled keyword router for ActionAnswerExpoBeton
+#
+# The routing table (actions/routes.yml) is compiled into one Aho-Corasick
+# automaton over all keywords. A message is scanned once to get the set of
+# keywords it contains (as a bitmask, overlapping matches included, so "hi"
+# is still found inside "histoire"), then the routes are checked in priority
+# order with integer mask tests instead of re-scanning the text per list.
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text
+
+import yaml
+
+ROUTES_FILE = Path(__file__).parent / 'routes.yml'
+
+BEFORE_RAG = 'before_rag'
+AFTER_RAG = 'after_rag'
+
+
+class KeywordRouter:
+    """Returns the answer key of the first route matching a message, in one pass over the text"""
+
+    def __init__(self, routes: List[Dict[Text, Any]]):
+        self.routes = routes
+        self.keywords = []  # keyword id -> keyword
+        keyword_ids = {}
+        for route in routes:
+            for keyword in [kw for group in route.get('all', []) for kw in group] + list(route.get('none', [])):
+                if keyword not in keyword_ids:
+                    keyword_ids[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+
+        self._build_automaton()
+
+        # Each route becomes (first group mask, other group masks, excluded mask, answer),
+        # listed per stage in priority order
+        self._compiled = {}
+        for route in routes:
+            groups = [self._mask(group, keyword_ids) for group in route.get('all', [])]
+            excluded = self._mask(route.get('none', []), keyword_ids)
+            self._compiled.setdefault(route.get('stage', BEFORE_RAG), []).append(
+                (groups[0], tuple(groups[1:]), excluded, route['answer']))
+
+    @classmethod
+    def from_yaml(cls, path: Path = ROUTES_FILE) -> 'KeywordRouter':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(yaml.safe_load(f)['routes'])
+
+    @staticmethod
+    def _mask(keywords: List[Text], keyword_ids: Dict[Text, int]) -> int:
+        mask = 0
+        for keyword in keywords:
+            mask |= 1 << keyword_ids[keyword]
+        return mask
+
+    def _build_automaton(self) -> None:
+        """Aho-Corasick trie with failure links, flattened into a full transition table"""
+        goto = [{}]
+        output = [0]
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append(0)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state] |= 1 << keyword_id
+
+        # Breadth-first: resolve failure links and complete every state's transitions
+        # so scanning needs exactly one dict lookup per character
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])]
+        delta.extend({} for _ in range(len(goto) - 1))
+        queue = list(goto[0].values())
+        while queue:
+            next_queue = []
+            for state in queue:
+                output[state] |= output[fail[state]]
+                delta[state] = dict(delta[fail[state]])
+                for char, child in goto[state].items():
+                    delta[state][char] = child
+                    fail[child] = delta[fail[state]].get(char, 0) if state else 0
+                    next_queue.append(child)
+            queue = next_queue
+        self._delta = delta
+        self._output = output
+
+    def match(self, text: Text) -> int:
+        """Bitmask of the keywords contained in text"""
+        delta = self._delta
+        output = self._output
+        state = 0
+        mask = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            mask |= output[state]
+        return mask
+
+    def matched_keywords(self, text: Text) -> List[Text]:
+        mask = self.match(text)
+        return [kw for i, kw in enumerate(self.keywords) if mask >> i & 1]
+
+    def route(self, text: Text, stage: Text = BEFORE_RAG, mask: Optional[int] = None) -> Optional[Text]:
+        """Answer key of the first matching route of this stage, or None"""
+        if mask is None:
+            mask = self.match(text)
+        if not mask:
+            return None
+        for first, others, excluded, answer in self._compiled.get(stage, ()):
+            # Most routes are rejected by their first group alone
+            if not mask & first or mask & excluded:
+                continue
+            for group in others:
+                if not mask & group:
+                    break
+            else:
+                return answer
+        return None
+
+    def subset(self, answers: List[Text]) -> 'KeywordRouter':
+        """Router restricted to some answers, checked in the given order"""
+        by_answer = {route['answer']: route for route in self.routes}
+        return KeywordRouter([by_answer[answer] for answer in answers])
@@ -0,0 +1,211 @@
+# actions/language_id.py
+# Character n-gram language identification for the chatbot messages
+#
+# Replaces the keyword counting of detect_language(), which matched 'is'
+# inside French words and 'hi' inside 'histoire'. Messages in Cyrillic,
+# Chinese or Arabic script are identified by their script (ru, zh, ar are
+# the only supported languages written in them); Latin-script messages are
+# scored with a naive Bayes model over character 1-3 grams of fr, en, es,
+# Lingala (ln) and Swahili (sw). The model is precomputed from the sentences
+# in actions/language_corpus/ into language_profiles.json:
+#
+#   python -m actions.language_id          # rebuild the profiles
+#
+# Results are cached per message text, and SessionLanguages smooths the
+# language over the messages of a conversation so that short, ambiguous
+# replies ("ok", "merci", "5") keep the language of the session. Messages
+# with fewer than MIN_NGRAMS n-grams ("ok", "hi") are not identified at all.
+
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+
+LATIN_LANGUAGES = ('fr', 'en', 'es', 'ln', 'sw')
+SCRIPT_LANGUAGES = ('ru', 'zh', 'ar')
+LANGUAGES = LATIN_LANGUAGES + SCRIPT_LANGUAGES
+# Languages the bot has answers for; the others are answered in French
+RESPONSE_LANGUAGES = frozenset(('fr', 'en', 'es', 'ru', 'zh', 'ar'))
+DEFAULT_LANGUAGE = 'fr'
+
+# Visitors of the site mostly write French: a slight prior settles near-ties
+PRIORS = {'fr': 0.40, 'en': 0.25, 'es': 0.10, 'ln': 0.10, 'sw': 0.10, 'ru': 0.05, 'zh': 0.05, 'ar': 0.05}
+SHARPNESS = 0.5  # scales the log-likelihoods into posteriors (lower = less confident on short texts)
+MAX_NGRAMS = 2000  # per language in the profiles
+SMOOTHING = 0.5  # additive smoothing of the n-gram counts
+MIN_NGRAMS = 10  # below (a lone 1-2 letter word), the language is unknown: session or default decides
+
+CORPUS_DIR = Path(__file__).parent / 'language_corpus'
+PROFILES_FILE = Path(__file__).parent / 'language_profiles.json'
+
+_SCRIPTS = {
+    'ru': re.compile(r'[\u0400-\u04ff]'),
+    'zh': re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'),
+    'ar': re.compile(r'[\u0600-\u06ff\u0750-\u077f]'),
+}
+_NON_LATIN = re.compile('|'.join(pattern.pattern for pattern in _SCRIPTS.values()))
+_LATIN_WORDS = re.compile(r"[a-zà-ÿœæ]+")
+
+
+def ngrams(text: Text) -> List[Text]:
+    """Character 1-3 grams of the Latin-script words of a text, words padded with spaces"""
+    grams = []
+    for word in _LATIN_WORDS.findall(text.lower()):
+        padded = f' {word} '
+        grams.extend(padded[i:i + 1] for i in range(1, len(padded) - 1))
+        grams.extend(padded[i:i + 2] for i in range(len(padded) - 1))
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def build_profiles(corpus_dir: Path = CORPUS_DIR, max_ngrams: int = MAX_NGRAMS) -> Dict:
+    """Log-probabilities of the most frequent n-grams of each Latin-script language"""
+    profiles = {}
+    for language in LATIN_LANGUAGES:
+        counts = Counter(ngrams((corpus_dir / f'{language}.txt').read_text(encoding='utf-8')))
+        total = sum(counts.values()) + SMOOTHING * (len(counts) + 1)
+        profiles[language] = {
+            'unseen': round(math.log(SMOOTHING / total), 4),
+            'ngrams': {gram: round(math.log((count + SMOOTHING) / total), 4)
+                       for gram, count in counts.most_common(max_ngrams)},
+        }
+    return profiles
+
+
+class LanguageIdentifier:
+    """Naive Bayes over character n-grams, one lookup per n-gram for all languages at once"""
+
+    def __init__(self, profiles: Dict):
+        vocabulary = sorted({gram for profile in profiles.values() for gram in profile['ngrams']})
+        self._index = {gram: i for i, gram in enumerate(vocabulary)}
+        # One row per n-gram plus a last row of "unseen" log-probabilities
+        self._log_probs = np.array(
+            [[profiles[lang]['ngrams'].get(gram, profiles[lang]['unseen']) for lang in LATIN_LANGUAGES]
+             for gram in vocabulary] + [[profiles[lang]['unseen'] for lang in LATIN_LANGUAGES]],
+            dtype=np.float32)
+        self._unseen_row = len(vocabulary)
+        self._log_priors = [math.log(PRIORS[lang]) for lang in LATIN_LANGUAGES]
+        self.identify = lru_cache(maxsize=4096)(self._identify)
+        # Words repeat a lot more than messages: their n-gram sums are cached too
+        self._word_scores = lru_cache(maxsize=65536)(self._score_word)
+
+    def _score_word(self, word: Text) -> Tuple[float, ...]:
+        """Summed log-probabilities of the n-grams of one word per language, then their number"""
+        grams = ngrams(word)
+        sums = self._log_probs[[self._index.get(gram, self._unseen_row) for gram in grams]].sum(axis=0)
+        return tuple(float(value) for value in sums) + (len(grams),)
+
+    @classmethod
+    def load(cls, path: Path = PROFILES_FILE) -> 'LanguageIdentifier':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _identify(self, text: Text) -> Tuple[Optional[Text], Tuple[float, ...]]:
+        """(best language or None if the text is too short to tell, posteriors in LANGUAGES order)"""
+        lowered = text.lower()
+        if _NON_LATIN.search(text):
+            # The script decides, unless it is a stray character in a Latin-script message
+            script_counts = [len(pattern.findall(text)) for pattern in _SCRIPTS.values()]
+            if max(script_counts) >= 2 or not _LATIN_WORDS.search(lowered):
+                posteriors = [0.0] * len(LANGUAGES)
+                best = SCRIPT_LANGUAGES[script_counts.index(max(script_counts))]
+                posteriors[LANGUAGES.index(best)] = 1.0
+                return best, tuple(posteriors)
+        words = _LATIN_WORDS.findall(lowered)
+        if not words:
+            return None, tuple(PRIORS[lang] for lang in LANGUAGES)
+        # Plain floats: faster than numpy for five languages
+        totals = [0.0] * (len(LATIN_LANGUAGES) + 1)
+        for word in words:
+            totals = [total + value for total, value in zip(totals, self._word_scores(word))]
+        count = totals.pop()
+        if count < MIN_NGRAMS:
+            return None, tuple(PRIORS[lang] for lang in LANGUAGES)
+        scale = SHARPNESS / math.sqrt(count)
+        scores = [prior + scale * total for prior, total in zip(self._log_priors, totals)]
+        top = max(scores)
+        weights = [math.exp(score - top) for score in scores]
+        norm = sum(weights)
+        posteriors = tuple(weight / norm for weight in weights)
+        best = LATIN_LANGUAGES[scores.index(top)]
+        return best, posteriors + (0.0,) * len(SCRIPT_LANGUAGES)
+
+    def detect(self, text: Text, default: Text = DEFAULT_LANGUAGE) -> Text:
+        language, _ = self.identify(text)
+        return language or default
+
+
+def response_language(language: Optional[Text]) -> Text:
+    """Language to answer in: Lingala, Swahili and unknown messages get French"""
+    return language if language in RESPONSE_LANGUAGES else DEFAULT_LANGUAGE
+
+
+class SessionLanguages:
+    """Exponentially smoothed language of each conversation (local LRU of posteriors)
+
+    `load` and `store` connect it to the session store: the language is read
+    once per session and written only when it changes.
+    """
+
+    def __init__(self, identifier: LanguageIdentifier, decay: float = 0.3, full_weight_chars: int = 15,
+                 max_sessions: int = 5000, load: Optional[Callable[[Text], Optional[Text]]] = None,
+                 store: Optional[Callable[[Text, Text], None]] = None):
+        self.identifier = identifier
+        self.decay = decay
+        self.full_weight_chars = full_weight_chars
+        self.max_sessions = max_sessions
+        self.load = load
+        self.store = store
+        self._sessions = OrderedDict()  # session_id -> (smoothed posteriors, language)
+        self._lock = threading.Lock()
+
+    def _stored_state(self, session_id: Text) -> Tuple[np.ndarray, Optional[Text]]:
+        """State of a session not in the local cache, from the session store (other replica, restart)"""
+        # Called without the lock: a backend round trip must not hold up the other sessions
+        language = self.load(session_id) if self.load is not None else None
+        scores = np.zeros(len(LANGUAGES))
+        if language in LANGUAGES:
+            scores[LANGUAGES.index(language)] = 1.0
+        return scores, language
+
+    def update(self, session_id: Text, text: Text) -> Text:
+        """Fold a user message into the session language and return it"""
+        language, posteriors = self.identifier.identify(text)
+        with self._lock:
+            state = self._sessions.get(session_id)
+        stored = self._stored_state(session_id) if state is None else None
+        with self._lock:
+            # Recheck: another message of the session may have been folded in meanwhile
+            scores, previous = self._sessions.get(session_id) or state or stored
+            if language is not None:
+                # Messages count less the shorter they are: "ok" does not switch a French
+                # conversation, one full sentence outweighs the history (at most decay / (1 - decay))
+                weight = min(1.0, len(text.strip()) / self.full_weight_chars)
+                scores = self.decay * scores + weight * np.asarray(posteriors)
+            current = LANGUAGES[int(scores.argmax())] if scores.any() else previous
+            self._sessions[session_id] = (scores, current)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        if current != previous and current is not None and self.store is not None:
+            self.store(session_id, current)
+        return current or DEFAULT_LANGUAGE
+
+    def get(self, session_id: Text) -> Optional[Text]:
+        with self._lock:
+            state = self._sessions.get(session_id)
+        return (state or self._stored_state(session_id))[1]
+
+
+if __name__ == '__main__':
+    profiles = build_profiles()
+    with open(PROFILES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    sizes = ', '.join(f"{lang}: {len(profile['ngrams'])} n-grams" for lang, profile in profiles.items())
+    print(f"✅ Wrote {PROFILES_FILE} ({sizes})")
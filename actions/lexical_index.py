@@ -0,0 +1,283 @@
+# actions/lexical_index.py
+# BM25 index over the docs/ passages: retrieval without any network call
+#
+# Build once with:  python -m actions.lexical_index
+# (the action server rebuilds it itself when docs/ changed: it only takes
+# about a second, nothing is sent to the embeddings API)
+#
+# Passages are those of the embedding index (actions/docs_index.split_document),
+# so the two rankings can be fused with reciprocal_rank_fusion(). Text is
+# folded to lowercase ASCII (é -> e), French elisions (l', d', qu'...) and
+# fr/en stopwords are dropped and a final "s" is stripped, so "Où sont les
+# exposants ?" matches "exposant". The BM25 weight of every (term, passage)
+# pair is computed at build time and stored as inverted lists (CSR arrays,
+# memory-mapped): a query is one bincount over the postings of its terms.
+# Passages are stored as (file, start, end) spans, their text is read from
+# docs/ when a result is used: the action server keeps no second copy of the
+# corpus next to the docs index.
+
+import argparse
+import functools
+import os
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Text, Tuple, Union
+
+import numpy as np
+
+from actions.docs_index import (DOCS_PATH, INDEX_DIR, is_stale, read_json, read_passages, save_arrays,
+                                 write_json)
+from actions.structured_logging import get_logger
+from actions.vector_index import top_k_indices
+
+LEXICAL_DIR = 'bm25'  # inside the docs index directory
+MANIFEST_FILE = 'manifest.json'
+TERMS_FILE = 'terms.json'
+SPANS_FILE = 'spans.npy'
+OFFSETS_FILE = 'offsets.npy'
+POSTINGS_FILE = 'postings.npy'
+WEIGHTS_FILE = 'weights.npy'
+INDEX_FORMAT = 2
+
+BM25_K1 = float(os.getenv('BM25_K1', '1.2'))  # term frequency saturation
+BM25_B = float(os.getenv('BM25_B', '0.75'))  # passage length normalization
+RRF_K = int(os.getenv('RRF_K', '60'))  # reciprocal rank fusion constant: higher = flatter
+
+LOG = get_logger('lexical_index')
+
+# Accent-free, lowercase (as produced by fold())
+STOPWORDS = frozenset("""
+a au aux avec ce ces cet cette dans de des du elle elles en est et etait etre eu il ils je la le les leur
+leurs lui ma mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses si son sont
+sur ta te tes toi ton tu un une vos votre vous y ete sera seront ont avez avons ai as comment quand quel
+quelle quelles quels combien pourquoi quoi dont cela ca ceci plus tres aussi bien tout tous toute toutes
+the of and to in is are was were be been for on at by with from as an or it its this that these those what
+which who whom when where why how do does did can could will would should i you he she we they me my your
+our their his her them us not no yes there here have has had about into than then so if
+""".split())
+
+_ELISION = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’]")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_LIGATURES = str.maketrans({'œ': 'oe', 'Œ': 'oe', 'æ': 'ae', 'Æ': 'ae', 'ß': 'ss'})
+
+
+def fold(text: Text) -> Text:
+    """Lowercase ASCII form of a text: accents and ligatures folded, other characters dropped"""
+    text = unicodedata.normalize('NFKD', text.lower().translate(_LIGATURES))
+    return text.encode('ascii', 'ignore').decode('ascii')
+
+
+def tokenize(text: Text) -> List[Text]:
+    """Index terms of a text: folded words without elisions and stopwords, final "s" stripped"""
+    terms = []
+    for token in _TOKEN.findall(fold(_ELISION.sub(' ', text.lower()))):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def passage_key(document: Dict[Text, Any]) -> Tuple[Text, int]:
+    """Identity of a passage shared by the lexical and embedding indexes"""
+    return document['filename'], document['start']
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K) -> List[Hashable]:
+    """Merge rankings (best first) by the sum of 1 / (k + rank) of every item, best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+@functools.lru_cache(maxsize=64)
+def _file_text(path: Path, mtime_ns: int) -> Text:
+    # Keyed by modification time: an edited file is read again
+    return path.read_bytes().decode('utf-8', errors='replace')
+
+
+class Passages(Sequence):
+    """Passages of a loaded index as (file, start, end) spans, their content read from docs/ on access"""
+
+    def __init__(self, filenames: List[Text], spans: np.ndarray, docs_path: Path = DOCS_PATH):
+        self.filenames = filenames
+        self.spans = spans  # rows of (position in filenames, start, end)
+        self.docs_path = docs_path
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        file_id, start, end = (int(value) for value in self.spans[i])
+        path = self.docs_path / self.filenames[file_id]
+        # Same passage as split_document() gave at build time (the index is rebuilt when docs/ changes)
+        content = _file_text(path, path.stat().st_mtime_ns)[start:end].strip()
+        return {'filename': path.name, 'start': start, 'end': end, 'content': content}
+
+
+class LexicalIndex:
+    """Inverted lists of precomputed BM25 weights: postings of term t are rows offsets[t]:offsets[t + 1]"""
+
+    def __init__(self, manifest: Dict[Text, Any], terms: List[Text],
+                 documents: Union[List[Dict[Text, Any]], Passages],
+                 offsets: np.ndarray, postings: np.ndarray, weights: np.ndarray):
+        self.manifest = manifest
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.documents = documents
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: Text, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, BM25 scores) of the top_k passages sharing a term with the query, best first"""
+        ids = sorted({self.term_ids[term] for term in tokenize(query) if term in self.term_ids})
+        if not ids or not self.documents:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        spans = [(self.offsets[i], self.offsets[i + 1]) for i in ids]
+        postings = np.concatenate([self.postings[start:end] for start, end in spans])
+        weights = np.concatenate([self.weights[start:end] for start, end in spans])
+        scores = np.bincount(postings, weights=weights, minlength=len(self.documents))
+        indices = top_k_indices(scores, min(top_k, np.count_nonzero(scores)))
+        return indices, scores[indices].astype(np.float32)
+
+
+def build_lexical_index(docs_path: Path = DOCS_PATH, k1: float = BM25_K1, b: float = BM25_B) -> LexicalIndex:
+    """Split docs/ into passages and compute their BM25 inverted lists"""
+    documents, files = read_passages(docs_path)
+
+    # Term frequencies per passage, then postings grouped by term
+    term_ids, lengths = {}, np.zeros(len(documents), dtype=np.float32)
+    term_column, doc_column, tf_column = [], [], []
+    for doc_id, document in enumerate(documents):
+        counts = {}
+        for term in tokenize(document['content']):
+            counts[term] = counts.get(term, 0) + 1
+        lengths[doc_id] = sum(counts.values())
+        for term, count in counts.items():
+            term_column.append(term_ids.setdefault(term, len(term_ids)))
+            doc_column.append(doc_id)
+            tf_column.append(count)
+
+    terms = sorted(term_ids)
+    remap = np.empty(len(terms), dtype=np.int64)
+    for new_id, term in enumerate(terms):
+        remap[term_ids[term]] = new_id
+    term_column = remap[np.asarray(term_column, dtype=np.int64)]
+    order = np.lexsort((np.asarray(doc_column), term_column))
+    term_column = term_column[order]
+    postings = np.asarray(doc_column, dtype=np.int32)[order]
+    tf = np.asarray(tf_column, dtype=np.float32)[order]
+    df = np.bincount(term_column, minlength=len(terms))
+    offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+    # BM25 (Lucene idf, never negative)
+    n = len(documents)
+    average_length = float(lengths.mean()) if n else 0.0
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = k1 * (1 - b + b * lengths[postings] / max(average_length, 1e-9))
+    weights = (idf[term_column] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    manifest = {
+        'format': INDEX_FORMAT,
+        'k1': k1,
+        'b': b,
+        'documents': n,
+        'terms': len(terms),
+        'average_length': round(average_length, 2),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': files,
+    }
+    return LexicalIndex(manifest, terms, documents, offsets, postings, weights)
+
+
+def save_lexical_index(index: LexicalIndex, index_dir: Path = INDEX_DIR) -> None:
+    """Persist the arrays, terms and passage spans, then the manifest"""
+    directory = index_dir / LEXICAL_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    file_ids = {filename: i for i, filename in enumerate(index.manifest['files'])}
+    spans = np.array([(file_ids[document['filename']], document['start'], document['end'])
+                      for document in index.documents], dtype=np.int64).reshape(-1, 3)
+    save_arrays(directory, {OFFSETS_FILE: index.offsets, POSTINGS_FILE: index.postings, WEIGHTS_FILE: index.weights,
+                            SPANS_FILE: spans})
+    write_json(directory / TERMS_FILE, index.terms)
+    write_json(directory / MANIFEST_FILE, index.manifest)
+
+
+def load_lexical_index(index_dir: Path = INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B,
+                       docs_path: Path = DOCS_PATH) -> Optional[LexicalIndex]:
+    """Load a persisted index (arrays memory-mapped, passages read from docs_path).
+    Returns None if missing or built with other parameters."""
+    directory = index_dir / LEXICAL_DIR
+    manifest_path = directory / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    manifest = read_json(manifest_path)
+    if manifest.get('format') != INDEX_FORMAT or manifest.get('k1') != k1 or manifest.get('b') != b:
+        return None
+    terms = read_json(directory / TERMS_FILE)
+    documents = Passages(list(manifest['files']), np.load(directory / SPANS_FILE, mmap_mode='r'), docs_path)
+    offsets = np.load(directory / OFFSETS_FILE, mmap_mode='r')
+    postings = np.load(directory / POSTINGS_FILE, mmap_mode='r')
+    weights = np.load(directory / WEIGHTS_FILE, mmap_mode='r')
+    if len(offsets) != len(terms) + 1 or len(postings) != len(weights) or len(documents) != manifest['documents']:
+        LOG.warning('lexical_index_corrupted', directory=str(directory))
+        return None
+    return LexicalIndex(manifest, terms, documents, offsets, postings, weights)
+
+
+def load_or_build_lexical_index(docs_path: Path = DOCS_PATH, index_dir: Path = INDEX_DIR) -> LexicalIndex:
+    """Load the persisted index, rebuilding it if it is missing or stale"""
+    start = time.perf_counter()
+    index = load_lexical_index(index_dir, docs_path=docs_path)
+    if index is not None and not is_stale(index, docs_path):
+        LOG.info('lexical_index_loaded', passages=len(index), terms=len(index.terms),
+                 duration_ms=round((time.perf_counter() - start) * 1000, 1))
+        return index
+
+    LOG.warning('lexical_index_rebuilding', directory=str(index_dir / LEXICAL_DIR), reason='missing or stale')
+    index = build_lexical_index(docs_path)
+    try:
+        save_lexical_index(index, index_dir)
+    except OSError as e:
+        # Read-only filesystem: keep the freshly built index in memory only
+        LOG.warning('lexical_index_not_persisted', error=str(e))
+    LOG.info('lexical_index_built', passages=len(index), terms=len(index.terms),
+             duration_s=round(time.perf_counter() - start, 1))
+    return index
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Build the BM25 index for docs/')
+    parser.add_argument('--docs', type=Path, default=DOCS_PATH, help='Documents directory')
+    parser.add_argument('--out', type=Path, default=INDEX_DIR, help='Index directory (written to its bm25/ subdirectory)')
+    parser.add_argument('--query', help='Search the built index and print the top passages')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = build_lexical_index(args.docs)
+    save_lexical_index(index, args.out)
+    print(f"{len(index)} passages, {len(index.terms)} terms, {len(index.postings)} postings written to "
+          f"{args.out / LEXICAL_DIR} in {time.perf_counter() - start:.1f}s")
+    if args.query:
+        indices, scores = index.search(args.query)
+        for i, score in zip(indices, scores):
+            document = index.documents[i]
+            print(f"{score:6.2f}  {document['filename']} [{document['start']}:{document['end']}]  "
+                  f"{document['content'][:100]!r}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
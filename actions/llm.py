@@ -0,0 +1,83 @@
+# actions/llm.py
+# Shared async OpenAI client for the action server
+#
+# The action server runs all actions on one asyncio event loop, so OpenAI calls
+# go through a single AsyncOpenAI client (one pooled httpx connection pool per
+# loop) instead of blocking threads. Deadlines use asyncio.wait_for, which
+# cancels the underlying HTTP request when it expires.
+
+import asyncio
+import os
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
+
+import httpx
+import openai
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '100'))
+OPENAI_MAX_KEEPALIVE = int(os.getenv('OPENAI_MAX_KEEPALIVE', '20'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))  # seconds
+RETRIEVAL_TIMEOUT = float(os.getenv('RETRIEVAL_TIMEOUT', '5'))  # seconds, query embedding + search
+GENERATION_TIMEOUT = float(os.getenv('GENERATION_TIMEOUT', '20'))  # seconds, GPT-4o answer
+
+# httpx connection pools are bound to the event loop that created them
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """AsyncOpenAI client shared by every call made on the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                                max_keepalive_connections=OPENAI_MAX_KEEPALIVE),
+        )
+        # Deadlines are enforced by the callers, retries would only blow them
+        client = openai.AsyncOpenAI(api_key=openai.api_key or os.getenv('OPENAI_API_KEY'),
+                                    http_client=http_client, max_retries=0,
+                                    timeout=httpx.Timeout(None, connect=OPENAI_CONNECT_TIMEOUT))
+        _clients[loop] = client
+    return client
+
+
+async def chat_completion(messages: List[Dict[Text, Any]], model: Text = 'gpt-4o',
+                          timeout: float = GENERATION_TIMEOUT, **kwargs) -> Text:
+    """Content of a chat completion, cancelled with asyncio.TimeoutError after `timeout` seconds"""
+    response = await asyncio.wait_for(
+        get_async_client().chat.completions.create(model=model, messages=messages, **kwargs),
+        timeout
+    )
+    return response.choices[0].message.content or ''
+
+
+async def stream_chat_completion(messages: List[Dict[Text, Any]], on_token: Optional[Callable[[Text], None]] = None,
+                                 model: Text = 'gpt-4o', timeout: float = GENERATION_TIMEOUT,
+                                 **kwargs) -> Tuple[Text, Optional[float]]:
+    """Streamed chat completion: calls on_token with each content delta as it arrives
+
+    Returns (full text, time to first token in seconds or None). The deadline
+    covers the whole stream, not just the first token.
+    """
+    start = time.perf_counter()
+    parts = []
+    ttft = None
+
+    async def consume():
+        nonlocal ttft
+        stream = await get_async_client().chat.completions.create(
+            model=model, messages=messages, stream=True, **kwargs)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(delta)
+                if on_token is not None:
+                    on_token(delta)
+
+    await asyncio.wait_for(consume(), timeout)
+    return ''.join(parts), ttft
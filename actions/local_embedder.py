@@ -0,0 +1,266 @@
+# actions/local_embedder.py
+# CPU embedder trained on docs/: TF-IDF vectors projected by a truncated SVD
+#
+# EMBEDDING_BACKEND=local embeds the docs index and the queries without any
+# network call, so the index can be rebuilt offline (CI, air-gapped hosts):
+#     EMBEDDING_BACKEND=local python -m actions.docs_index
+# The model (latent semantic analysis) is trained on the docs/ passages on
+# first use (about ten seconds on one core) and saved to docs_index/local_embedder/
+# (projection memory-mapped). Terms are those of the BM25 index
+# (actions/lexical_index.tokenize). A text is embedded as its sublinear
+# TF-IDF vector, L2-normalized, times the terms x LOCAL_EMBEDDING_DIM
+# projection: a query is a few hundred multiply-adds. The model name carries
+# a fingerprint of docs/ and of the parameters, so a model retrained after
+# docs/ changed never mixes with vectors of the previous one (the docs index
+# is keyed by model name and is re-embedded).
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+
+from actions.docs_index import (DOCS_PATH, INDEX_DIR, file_sha256, is_stale, read_json, read_passages, save_arrays,
+                                 select_doc_files, write_json)
+from actions.embeddings import EMBEDDING_BATCH_SIZE, EMBEDDING_WORKERS, Embedder
+from actions.lexical_index import tokenize
+from actions.structured_logging import get_logger
+
+MODEL_DIR = 'local_embedder'  # inside the docs index directory
+MANIFEST_FILE = 'manifest.json'
+TERMS_FILE = 'terms.json'
+IDF_FILE = 'idf.npy'
+COMPONENTS_FILE = 'components.npy'
+MODEL_FORMAT = 1
+
+LOCAL_EMBEDDING_DIM = int(os.getenv('LOCAL_EMBEDDING_DIM', '256'))  # SVD components kept
+LOCAL_EMBEDDING_MAX_TERMS = int(os.getenv('LOCAL_EMBEDDING_MAX_TERMS', '20000'))  # most frequent terms kept
+
+SVD_OVERSAMPLING = 10
+SVD_ITERATIONS = 1  # power iterations of the randomized SVD (more did not improve retrieval on docs/)
+SVD_CHUNK = 65536  # nonzero entries multiplied at once while training
+
+LOG = get_logger('local_embedder')
+
+
+class LSAModel:
+    """Term idf weights and term projections (`components` rows aligned with `terms`)"""
+
+    def __init__(self, manifest: Dict[Text, Any], terms: List[Text], idf: np.ndarray, components: np.ndarray):
+        self.manifest = manifest
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.idf = idf
+        self.components = components
+
+    @property
+    def name(self) -> Text:
+        return model_name(self.manifest['fingerprint'], self.manifest['dim'])
+
+    def transform(self, texts: List[Text]) -> np.ndarray:
+        """L2-normalized embeddings of texts (zero vectors for texts without any known term)"""
+        rows, ids, tf = [], [], []
+        for row, text in enumerate(texts):
+            counts = Counter(self.term_ids[term] for term in tokenize(text) if term in self.term_ids)
+            rows.extend([row] * len(counts))
+            ids.extend(counts)
+            tf.extend(counts.values())
+        vectors = np.zeros((len(texts), self.components.shape[1]), dtype=np.float32)
+        if not ids:
+            return vectors
+        rows, ids = np.asarray(rows), np.asarray(ids)
+        weights = (1 + np.log(np.asarray(tf, dtype=np.float32))) * self.idf[ids]
+        weights /= np.sqrt(np.bincount(rows, weights=weights * weights))[rows].astype(np.float32)
+        present, starts = np.unique(rows, return_index=True)
+        vectors[present] = np.add.reduceat(self.components[ids] * weights[:, None], starts)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class LocalEmbedder(Embedder):
+    """Embeddings of the LSA model trained on docs/, loaded (or trained) on first use"""
+
+    def __init__(self, docs_path: Path = DOCS_PATH, index_dir: Path = INDEX_DIR, dim: int = LOCAL_EMBEDDING_DIM,
+                 max_terms: int = LOCAL_EMBEDDING_MAX_TERMS, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 workers: int = EMBEDDING_WORKERS):
+        self.docs_path = docs_path
+        self.index_dir = index_dir
+        self.dim = dim
+        self.max_terms = max_terms
+        self.batch_size = batch_size
+        self.workers = workers
+        # The name is known without the model: it is read on the event loop (query cache keys),
+        # where loading or training the model must not happen
+        self.fingerprint = docs_fingerprint(docs_path, dim, max_terms)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> LSAModel:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = load_or_train_local_model(self.docs_path, self.index_dir, self.dim, self.max_terms)
+                    # docs/ may have changed since __init__: name the vectors of the loaded model
+                    self.fingerprint = self._model.manifest['fingerprint']
+        return self._model
+
+    @property
+    def model_name(self) -> Text:
+        return model_name(self.fingerprint, self.dim)
+
+    def embed_batch(self, texts: List[Text]) -> np.ndarray:
+        return self.model.transform(texts)
+
+    async def aembed(self, texts: List[Text]) -> np.ndarray:
+        if self._model is None:
+            # Loading (or training) the model would block the event loop
+            return await asyncio.to_thread(self.embed, texts)
+        return self.embed(texts)
+
+
+def _sparse_times(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, matrix: np.ndarray,
+                  height: int) -> np.ndarray:
+    """Sparse matrix (triplets sorted by row) times a dense matrix, SVD_CHUNK nonzero entries at a time"""
+    result = np.zeros((height, matrix.shape[1]), dtype=np.float32)
+    for low in range(0, len(rows), SVD_CHUNK):
+        high = min(low + SVD_CHUNK, len(rows))
+        present, starts = np.unique(rows[low:high], return_index=True)
+        result[present] += np.add.reduceat(matrix[cols[low:high]] * values[low:high, None], starts)
+    return result
+
+
+def _truncated_svd(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape: Tuple[int, int],
+                   k: int, seed: int = 0) -> np.ndarray:
+    """Top-k right singular vectors (columns) of a sparse matrix, by randomized SVD (Halko et al.)"""
+    width = min(k + SVD_OVERSAMPLING, *shape)
+    by_column = np.argsort(cols, kind='stable')
+
+    def times(matrix):  # X @ matrix
+        return _sparse_times(rows, cols, values, matrix, shape[0])
+
+    def transposed_times(matrix):  # X.T @ matrix
+        return _sparse_times(cols[by_column], rows[by_column], values[by_column], matrix, shape[1])
+
+    random = np.random.default_rng(seed).standard_normal((shape[1], width)).astype(np.float32)
+    basis, _ = np.linalg.qr(times(random))
+    for _ in range(SVD_ITERATIONS):
+        basis, _ = np.linalg.qr(transposed_times(basis))
+        basis, _ = np.linalg.qr(times(basis))
+    _, _, vt = np.linalg.svd(transposed_times(basis).T, full_matrices=False)
+    return np.ascontiguousarray(vt[:k].T, dtype=np.float32)
+
+
+def _fingerprint(files: Dict[Text, Dict[Text, Text]], dim: int, max_terms: int) -> Text:
+    digest = hashlib.sha256(json.dumps({'format': MODEL_FORMAT, 'dim': dim, 'max_terms': max_terms}).encode())
+    for filename in sorted(files):
+        digest.update(filename.encode('utf-8'))
+        digest.update(files[filename]['sha256'].encode('ascii'))
+    return digest.hexdigest()
+
+
+def docs_fingerprint(docs_path: Path = DOCS_PATH, dim: int = LOCAL_EMBEDDING_DIM,
+                     max_terms: int = LOCAL_EMBEDDING_MAX_TERMS) -> Text:
+    """Fingerprint of the model trained on docs/ as it is now, without training it"""
+    files = {f.name: {'sha256': file_sha256(f)} for f in select_doc_files(docs_path)}
+    return _fingerprint(files, dim, max_terms)
+
+
+def model_name(fingerprint: Text, dim: int) -> Text:
+    return f"lsa-{dim}-{fingerprint[:12]}"
+
+
+def train_local_model(docs_path: Path = DOCS_PATH, dim: int = LOCAL_EMBEDDING_DIM,
+                      max_terms: int = LOCAL_EMBEDDING_MAX_TERMS) -> LSAModel:
+    """Fit the TF-IDF weights and the SVD projection on the docs/ passages"""
+    documents, files = read_passages(docs_path)
+    counts = [Counter(tokenize(document['content'])) for document in documents]
+    df = Counter(term for passage in counts for term in passage)
+    # Terms of at least two passages (a term seen once relates nothing), the most frequent first
+    kept = [term for term, count in df.most_common(max_terms) if count > 1] or list(df)
+    terms = sorted(kept)
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    n = len(documents)
+    idf = np.array([math.log((1 + n) / (1 + df[term])) + 1 for term in terms], dtype=np.float32)
+    rows, cols, tf = [], [], []
+    for row, passage in enumerate(counts):
+        for term, count in passage.items():
+            if term in term_ids:
+                rows.append(row)
+                cols.append(term_ids[term])
+                tf.append(count)
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    values = (1 + np.log(np.asarray(tf, dtype=np.float32))) * idf[cols]
+    values /= np.sqrt(np.bincount(rows, weights=values * values, minlength=n))[rows].astype(np.float32)
+
+    k = min(dim, n, len(terms))
+    components = _truncated_svd(rows, cols, values, (n, len(terms)), k) if k else np.zeros((len(terms), 0))
+    manifest = {
+        'format': MODEL_FORMAT,
+        'dim': dim,
+        'max_terms': max_terms,
+        'fingerprint': _fingerprint(files, dim, max_terms),
+        'documents': n,
+        'terms': len(terms),
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': files,
+    }
+    return LSAModel(manifest, terms, idf, components.astype(np.float32))
+
+
+def save_local_model(model: LSAModel, index_dir: Path = INDEX_DIR) -> None:
+    """Persist the arrays and terms, then the manifest"""
+    directory = index_dir / MODEL_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    save_arrays(directory, {IDF_FILE: model.idf, COMPONENTS_FILE: model.components})
+    write_json(directory / TERMS_FILE, model.terms)
+    write_json(directory / MANIFEST_FILE, model.manifest)
+
+
+def load_local_model(index_dir: Path = INDEX_DIR, dim: int = LOCAL_EMBEDDING_DIM,
+                     max_terms: int = LOCAL_EMBEDDING_MAX_TERMS) -> Optional[LSAModel]:
+    """Load a persisted model (projection memory-mapped). Returns None if missing or trained with other parameters."""
+    directory = index_dir / MODEL_DIR
+    manifest_path = directory / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    manifest = read_json(manifest_path)
+    if manifest.get('format') != MODEL_FORMAT or manifest.get('dim') != dim or manifest.get('max_terms') != max_terms:
+        return None
+    terms = read_json(directory / TERMS_FILE)
+    idf = np.load(directory / IDF_FILE)
+    components = np.load(directory / COMPONENTS_FILE, mmap_mode='r')
+    if len(idf) != len(terms) or components.shape[0] != len(terms):
+        LOG.warning('local_model_corrupted', directory=str(directory))
+        return None
+    return LSAModel(manifest, terms, idf, components)
+
+
+def load_or_train_local_model(docs_path: Path = DOCS_PATH, index_dir: Path = INDEX_DIR,
+                              dim: int = LOCAL_EMBEDDING_DIM, max_terms: int = LOCAL_EMBEDDING_MAX_TERMS) -> LSAModel:
+    """Load the persisted model, retraining it if it is missing or docs/ changed"""
+    start = time.perf_counter()
+    model = load_local_model(index_dir, dim, max_terms)
+    if model is not None and not is_stale(model, docs_path):
+        LOG.info('local_model_loaded', model=model.name, terms=len(model.terms),
+                 duration_ms=round((time.perf_counter() - start) * 1000, 1))
+        return model
+
+    LOG.warning('local_model_training', directory=str(index_dir / MODEL_DIR), reason='missing or stale')
+    model = train_local_model(docs_path, dim, max_terms)
+    try:
+        save_local_model(model, index_dir)
+    except OSError as e:
+        # Read-only filesystem: keep the freshly trained model in memory only
+        LOG.warning('local_model_not_persisted', error=str(e))
+    LOG.info('local_model_trained', model=model.name, passages=model.manifest['documents'], terms=len(model.terms),
+             duration_s=round(time.perf_counter() - start, 1))
+    return model
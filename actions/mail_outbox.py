@@ -0,0 +1,242 @@
+# actions/mail_outbox.py
+# Durable outbox for the notification emails of the action server
+#
+# Actions used to open an SMTP connection (STARTTLS + login) inline for every
+# email, so goodbye and end-of-conversation turns waited on the mail server.
+# They now only write the message to a spool directory (MAIL_OUTBOX_DIR, one
+# file per message, written atomically) and return. A background worker
+# drains the spool over one reused, authenticated SMTP connection, retries
+# failed messages with exponential backoff and moves the ones that keep
+# failing to failed/. Queued mail survives restarts, and the outbox is
+# drained (for at most MAIL_FLUSH_TIMEOUT seconds) when the process exits.
+
+import atexit
+import json
+import os
+import smtplib
+import threading
+import time
+import uuid
+from email.message import Message
+from email.parser import Parser
+from email.policy import default as default_policy
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text
+
+from actions.metrics import EMAILS, STAGE_SECONDS
+from actions.structured_logging import get_logger
+
+MAIL_OUTBOX_DIR = os.getenv('MAIL_OUTBOX_DIR', str(Path(__file__).parent.parent / 'outbox'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '8'))
+MAIL_RETRY_BASE = float(os.getenv('MAIL_RETRY_BASE', '5'))  # seconds, doubled after each failure
+MAIL_RETRY_MAX = float(os.getenv('MAIL_RETRY_MAX', '900'))  # seconds
+MAIL_SMTP_TIMEOUT = float(os.getenv('MAIL_SMTP_TIMEOUT', '30'))  # seconds, per SMTP command
+MAIL_IDLE_TIMEOUT = float(os.getenv('MAIL_IDLE_TIMEOUT', '60'))  # seconds before closing an unused connection
+MAIL_FLUSH_TIMEOUT = float(os.getenv('MAIL_FLUSH_TIMEOUT', '10'))  # seconds spent draining at exit
+
+
+def is_transient(error: Exception) -> bool:
+    """True if the message should be retried later: connection errors and 4xx replies
+
+    5xx replies (wrong password, unknown recipient, message refused) fail the
+    same way on every attempt, so the message goes to failed/ at once.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Network errors and timeouts (SMTPException is an OSError too, handled above)
+    return isinstance(error, OSError)
+
+
+LOG = get_logger('outbox')
+
+
+class MailOutbox:
+    """On-disk queue of emails drained by a background SMTP worker"""
+
+    def __init__(self, host: Text, port: int, username: Text = '', password: Text = '',
+                 directory: Text = MAIL_OUTBOX_DIR, max_attempts: int = MAIL_MAX_ATTEMPTS,
+                 retry_base: float = MAIL_RETRY_BASE, retry_max: float = MAIL_RETRY_MAX,
+                 smtp_timeout: float = MAIL_SMTP_TIMEOUT, idle_timeout: float = MAIL_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.directory = Path(directory)
+        self.failed_directory = self.directory / 'failed'
+        self.failed_directory.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.smtp_timeout = smtp_timeout
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self._connection = None  # smtplib.SMTP, only used by the worker
+        self._last_used = 0.0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()  # one drain at a time (worker or flush)
+        self._worker = None
+        self._stopping = False
+
+    def enqueue(self, message: Message, description: Text = '') -> Text:
+        """Persist the message and wake the worker up; returns the outbox entry id"""
+        entry_id = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}"
+        entry = {'id': entry_id, 'description': description, 'attempts': 0,
+                 'next_attempt': 0.0, 'last_error': None, 'message': message.as_string()}
+        self._write(self.directory / f"{entry_id}.json", entry)
+        self._wakeup.set()
+        return entry_id
+
+    def pending(self) -> List[Path]:
+        return sorted(self.directory.glob('*.json'))
+
+    def __len__(self) -> int:
+        return len(self.pending())
+
+    @staticmethod
+    def _write(path: Path, entry: Dict[Text, Any]) -> None:
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._connection is not None:
+            if time.monotonic() - self._last_used < self.idle_timeout:
+                return self._connection
+            # The server may have dropped an idle connection
+            try:
+                if self._connection.noop()[0] == 250:
+                    return self._connection
+            except smtplib.SMTPException:
+                pass
+            self._disconnect()
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.smtp_timeout)
+        try:
+            connection.ehlo()
+            if connection.has_extn('starttls'):
+                connection.starttls()
+                connection.ehlo()
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except Exception:
+            connection.close()
+            raise
+        self._connection = connection
+        self.connections += 1
+        return connection
+
+    def _disconnect(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    def _send(self, entry: Dict[Text, Any]) -> None:
+        message = Parser(policy=default_policy).parsestr(entry['message'])
+        try:
+            with STAGE_SECONDS.time(stage='smtp'):
+                self._connect().send_message(message)
+        except (smtplib.SMTPException, OSError):
+            self._disconnect()
+            raise
+        self._last_used = time.monotonic()
+
+    def drain(self) -> Optional[float]:
+        """Send every due message; returns the delay until the next retry (None if nothing is left)"""
+        next_due = None
+        with self._lock:
+            for path in self.pending():
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    continue  # sent by a concurrent drain, or partially written by a crash
+                now = time.time()
+                if entry['next_attempt'] > now:
+                    delay = entry['next_attempt'] - now
+                    next_due = delay if next_due is None else min(next_due, delay)
+                    continue
+                try:
+                    self._send(entry)
+                except Exception as e:
+                    entry['attempts'] += 1
+                    entry['last_error'] = f"{type(e).__name__}: {e}"
+                    if entry['attempts'] >= self.max_attempts or not is_transient(e):
+                        self._write(self.failed_directory / path.name, entry)
+                        path.unlink(missing_ok=True)
+                        self.failed += 1
+                        EMAILS.inc(result='failed')
+                        LOG.error('email_failed', email=entry['description'] or entry['id'],
+                                  attempts=entry['attempts'], error=entry['last_error'])
+                        continue
+                    delay = min(self.retry_base * 2 ** (entry['attempts'] - 1), self.retry_max)
+                    entry['next_attempt'] = now + delay
+                    self._write(path, entry)
+                    next_due = delay if next_due is None else min(next_due, delay)
+                    EMAILS.inc(result='retry')
+                    LOG.warning('email_retry', email=entry['description'] or entry['id'],
+                                error=entry['last_error'], retry_in=round(delay))
+                    continue
+                path.unlink(missing_ok=True)
+                self.sent += 1
+                EMAILS.inc(result='sent')
+                LOG.info('email_sent', email=entry['description'] or entry['id'])
+        return next_due
+
+    def start(self) -> None:
+        """Start the background worker (once), drain at interpreter exit"""
+        if self._worker is not None:
+            return
+
+        def run():
+            while not self._stopping:
+                try:
+                    next_due = self.drain()
+                except Exception:
+                    LOG.exception('outbox_drain_failed')
+                    next_due = self.retry_base
+                woke_up = self._wakeup.wait(next_due if next_due is not None else self.idle_timeout)
+                self._wakeup.clear()
+                if not woke_up and self._connection is not None \
+                        and time.monotonic() - self._last_used >= self.idle_timeout:
+                    with self._lock:
+                        self._disconnect()
+
+        self._worker = threading.Thread(target=run, name='mail-outbox', daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+        if self.pending():
+            LOG.info('outbox_pending_from_previous_run', emails=len(self))
+
+    def flush(self, timeout: float = MAIL_FLUSH_TIMEOUT) -> int:
+        """Send what is due until the outbox is empty or `timeout` expires; returns the messages left"""
+        deadline = time.monotonic() + timeout
+        while self.pending() and time.monotonic() < deadline:
+            next_due = self.drain()
+            if next_due is None:
+                break
+            time.sleep(min(next_due, max(deadline - time.monotonic(), 0)))
+        self._stopping = True
+        self._wakeup.set()
+        with self._lock:
+            self._disconnect()
+        left = len(self)
+        if left:
+            LOG.warning('outbox_not_empty_at_exit', emails=left, directory=str(self.directory))
+        return left
+
+    def stats(self) -> Dict[Text, Any]:
+        return {'pending': len(self), 'sent': self.sent, 'failed': self.failed, 'connections': self.connections}
@@ -0,0 +1,254 @@
+# actions/metrics.py
+# Latency histograms and counters in the Prometheus text format
+#
+# A dependency-free subset of prometheus_client (not in the requirements):
+# counters, gauges and histograms with labels, plus callback metrics read at
+# scrape time (cache hit counters, queue sizes), so nothing is counted twice.
+# Timing a stage is one perf_counter() pair and a locked bucket increment:
+#
+#   with STAGE_SECONDS.time(stage='vector_search'):
+#       ...
+#
+# The action server exposes REGISTRY on GET /metrics from a small HTTP thread
+# (ACTION_METRICS_PORT), flask_app.py on its own /metrics route.
+
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Text, Tuple
+
+from actions.structured_logging import get_logger
+
+ACTION_METRICS_PORT = int(os.getenv('ACTION_METRICS_PORT', '5057'))  # 0 = disabled
+
+# Seconds, from a cached answer (~1 ms) to a slow GPT-4o generation
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LOG = get_logger('metrics')
+
+
+def _escape(value: Text) -> Text:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[Text], values: Sequence[Text], extra: Text = '') -> Text:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> Text:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> Text:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: Text, documentation: Text, labelnames: Sequence[Text] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values tuple -> value (or histogram state)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[Text, Text]) -> Tuple[Text, ...]:
+        return tuple([str(labels[name]) for name in self.labelnames])
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. expobeton_turns_total{outcome="fallback"}"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Text]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. turns in flight"""
+
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative buckets, sum and count per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: Text, documentation: Text, labelnames: Sequence[Text] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels) -> '_Timer':
+        """Context manager observing the duration of the block (also when it raises)"""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> List[Text]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class _Timer:
+    """Histogram.time() span; a plain class costs half of a @contextmanager generator"""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: Histogram, labels: Dict[Text, Text]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class CallbackMetric(_Metric):
+    """Counter or gauge read at scrape time from existing state (cache stats, queue sizes)
+
+    `callback` returns a number, or a dict of label value (tuple) -> number.
+    """
+
+    def __init__(self, name: Text, documentation: Text, callback: Callable[[], object], kind: Text = 'gauge',
+                 labelnames: Sequence[Text] = (), registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> List[Text]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            return [f'# {self.name} unavailable: {_escape(e)}']
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f'{self.name}{_format_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} '
+                f'{_format_value(value)}' for key, value in sorted(values.items())]
+
+
+# Metrics of a conversation turn in the action server (actions/actions.py)
+STAGE_SECONDS = Histogram('expobeton_stage_seconds', 'Latency of the stages of a conversation turn', ['stage'])
+TURNS = Counter('expobeton_turns_total', 'Answered turns by outcome', ['outcome'])
+TIMEOUTS = Counter('expobeton_timeouts_total', 'Expired deadlines by stage', ['stage'])
+ERRORS = Counter('expobeton_errors_total', 'Errors by stage', ['stage'])
+TTFT_SECONDS = Histogram('expobeton_generation_ttft_seconds', 'Time to the first GPT-4o token')
+EMAILS = Counter('expobeton_emails_total', 'Outbox delivery attempts by result', ['result'])
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics: REGISTRY in the Prometheus text format"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port: int = ACTION_METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a daemon thread (once per process)"""
+    global _server
+    if _server is not None or not port:
+        return _server
+    try:
+        _server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    except OSError as e:
+        LOG.warning('metrics_server_not_started', port=port, error=str(e))
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    LOG.info('metrics_server_started', port=port)
+    return _server
@@ -0,0 +1,178 @@
+# actions/model_reload.py
+# Zero-downtime reload of the Rasa model served by flask_app.py
+#
+# POST /reload used to call Agent.load() on the request thread and overwrite
+# the global agent: while the tarball was unpacked and the graph loaded,
+# messages waited or failed. ModelReloader loads the new model in a
+# background thread instead, warms it up with a few synthetic messages (the
+# first inference of each component is much slower than the next ones), then
+# swaps it in with a single assignment:
+#
+#   RELOADER = ModelReloader(load_agent, warm_up_agent)
+#   RELOADER.start()               # False when a reload is already running
+#   agent = RELOADER.current       # read once per message
+#
+# The first load goes through the same path in the background, so the server
+# listens (and answers 503 "starting") while the model loads.
+# A message reads `current` once when it starts, so in-flight messages finish
+# on the old model, which is freed when the last of them returns. If loading
+# or warming up fails, the old model keeps serving. Each reload reports the
+# duration of its phases and the process memory (RSS) before, once loaded,
+# at its peak (both models in memory) and after the swap, in status() and in
+# the logs.
+
+import gc
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Text
+
+from actions.metrics import Counter, Histogram
+from actions.structured_logging import get_logger
+
+LOG = get_logger('reload')
+
+RELOADS = Counter('expobeton_model_reloads_total', 'Model loads and reloads by result', ['result'])
+RELOAD_SECONDS = Histogram('expobeton_model_reload_seconds', 'Duration of the model reload phases', ['phase'],
+                           buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of the process in MB (None where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _PeakRSS:
+    """Samples the RSS every `interval` seconds in a thread while the block runs"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._update()
+
+    def _update(self) -> None:
+        value = rss_mb()
+        if value is not None and (self.peak is None or value > self.peak):
+            self.peak = value
+
+    def __enter__(self) -> '_PeakRSS':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._update()
+
+
+class ModelReloader:
+    """Holds the served model and replaces it by a freshly loaded one without downtime"""
+
+    def __init__(self, load: Callable[[], Any], warm_up: Optional[Callable[[Any], None]] = None,
+                 on_swap: Optional[Callable[[Any], None]] = None):
+        self.load = load
+        self.warm_up = warm_up
+        self.on_swap = on_swap  # called with the new model once it serves
+        self.current = None
+        self.generation = 0  # number of models swapped in
+        self.loaded_at = None
+        self.state = 'idle'  # 'loading', 'warming_up'
+        self.last = None  # report of the last load or reload
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+
+    @property
+    def reloading(self) -> bool:
+        return not self._done.is_set()
+
+    def start(self) -> bool:
+        """Load, warm up and swap in a new model in a background thread"""
+        with self._lock:
+            if self.reloading:
+                return False
+            self._done.clear()
+            self.state = 'loading'
+        threading.Thread(target=self._reload, name='model-reload', daemon=True).start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the running reload; False on timeout"""
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[Text, Any]:
+        return {'state': self.state, 'generation': self.generation, 'loaded_at': self.loaded_at, 'last': self.last}
+
+    def _reload(self) -> None:
+        generation = self.generation + 1
+        report = {'generation': generation, 'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                  'result': None, 'rss_mb': {'before': rss_mb()}}
+        LOG.info('model_reload_started', generation=generation, rss_mb=report['rss_mb']['before'])
+        start = time.perf_counter()
+        old = None
+        try:
+            with _PeakRSS() as peak:
+                with RELOAD_SECONDS.time(phase='load'):
+                    model = self.load()
+                report['load_s'] = round(time.perf_counter() - start, 3)
+                report['rss_mb']['loaded'] = rss_mb()
+                if self.warm_up is not None:
+                    self.state = 'warming_up'
+                    warm_up_start = time.perf_counter()
+                    with RELOAD_SECONDS.time(phase='warm_up'):
+                        self.warm_up(model)
+                    report['warm_up_s'] = round(time.perf_counter() - warm_up_start, 3)
+                old, self.current = self.current, model
+                self.generation = generation
+                self.loaded_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+                del model
+            report['result'] = 'success'
+        except Exception as e:
+            report['result'] = 'failed'
+            report['error'] = str(e)
+            LOG.exception('model_reload_failed', generation=generation)
+        report['rss_mb']['peak'] = peak.peak
+        RELOADS.inc(result=report['result'])
+        if report['result'] == 'success' and self.on_swap is not None:
+            try:
+                self.on_swap(self.current)
+            except Exception:
+                LOG.exception('model_swap_hook_failed', generation=generation)
+
+        if old is not None:
+            # Freed now, or when the last in-flight message on it returns
+            released = threading.Event()
+            try:
+                weakref.finalize(old, self._released, report, released)
+            except TypeError:
+                pass
+            del old
+            gc.collect()
+            report['old_released'] = released.is_set()
+        report['rss_mb']['after_swap'] = rss_mb()
+        report['total_s'] = round(time.perf_counter() - start, 3)
+        RELOAD_SECONDS.observe(report['total_s'], phase='total')
+        self.last = report
+        self.state = 'idle'
+        LOG.info('model_reload_done', **{key: value for key, value in report.items() if key != 'started_at'})
+        self._done.set()
+
+    def _released(self, report: Dict[Text, Any], released: threading.Event) -> None:
+        released.set()
+        if 'old_released' in report:
+            # Released after the swap: the last in-flight message on it has finished
+            report['old_released'] = True
+            LOG.info('previous_model_released', generation=report['generation'] - 1)
@@ -0,0 +1,604 @@
+# actions/session_store.py
+# Bounded, optionally persistent store of the conversations of the action server
+#
+# SessionStore batches the appended messages and writes them to a backend:
+#   - MemoryBackend: sessions of this process only (default)
+#   - SQLiteBackend: one SQLite file in WAL mode, survives restarts and can be
+#     shared by the processes of one host/volume
+#   - RedisBackend: any Redis-compatible server with Lua scripting (EVAL), shared by every replica
+# Sessions idle for more than `idle_timeout` seconds, or the least recently
+# active ones beyond `max_sessions`, are removed by a background sweeper and
+# handed to `on_evict` (the transcript sink) instead of being dropped, since
+# most visitors close the tab without ending the conversation. Removal is
+# atomic in every backend, so only one replica flushes a given session.
+# Every backend numbers the messages of a session in the order it stores them
+# (a sequence number that never goes back, not a client or replica clock) and
+# keeps the transcript emission ledger: the sequence number of the last
+# message emailed per session, advanced with a compare-and-set keyed by
+# (session, previous watermark), so each message is emailed exactly once
+# whichever path (goodbye, fallback, end of conversation, eviction) or
+# replica emits it, and later emissions only carry the new messages.
+# The a*-methods and offload() are for the event loop of the action server:
+# SQLite and Redis calls run in a worker thread there, never on the loop.
+
+import asyncio
+import atexit
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
+
+from actions.structured_logging import get_logger
+
+CONVERSATION_STORE = os.getenv('CONVERSATION_STORE', 'memory')  # 'memory', 'sqlite' or 'redis'
+CONVERSATION_DB = os.getenv('CONVERSATION_DB', str(Path(__file__).parent.parent / 'conversations.db'))
+CONVERSATION_REDIS_URL = os.getenv('CONVERSATION_REDIS_URL', os.getenv('CACHE_REDIS_URL', ''))
+CONVERSATION_TTL = int(os.getenv('CONVERSATION_TTL', str(7 * 86400)))  # seconds, Redis keys safety net
+CONVERSATION_BATCH_SIZE = int(os.getenv('CONVERSATION_BATCH_SIZE', '20'))
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv('CONVERSATION_FLUSH_INTERVAL', '0.2'))  # seconds
+SESSION_IDLE_TIMEOUT = float(os.getenv('SESSION_IDLE_TIMEOUT', '1800'))  # seconds
+SESSION_MAX = int(os.getenv('SESSION_MAX', '5000'))
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))  # seconds
+
+LOG = get_logger('sessions')
+
+# (session_id, sender, text, timestamp, user_info or None)
+Record = Tuple[Text, Text, Text, float, Optional[Dict[Text, Any]]]
+
+
+class Message:
+    """One conversation message (compact: no per-instance __dict__)"""
+
+    __slots__ = ('sender', 'text', 'timestamp', 'seq')
+
+    def __init__(self, sender: Text, text: Text, timestamp: float, seq: int = 0):
+        self.sender = sender
+        self.text = text
+        self.timestamp = timestamp  # epoch seconds
+        self.seq = seq  # assigned by the backend, increasing within a session
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return {'sender': self.sender, 'text': self.text,
+                'timestamp': datetime.fromtimestamp(self.timestamp), 'seq': self.seq}
+
+
+class Session:
+    """Messages, user info and detected language of one conversation"""
+
+    __slots__ = ('session_id', 'user_info', 'messages', 'started_at', 'last_activity', 'language')
+
+    def __init__(self, session_id: Text, user_info: Optional[Dict[Text, Any]], now: float):
+        self.session_id = session_id
+        self.user_info = user_info or {}
+        self.messages = []
+        self.started_at = now
+        self.last_activity = now
+        self.language = None
+
+    def transcript(self) -> List[Dict[Text, Any]]:
+        """Messages in the format of send_conversation_email()"""
+        return [message.to_dict() for message in self.messages]
+
+
+class MemoryBackend:
+    """Sessions of this process, least recently active first"""
+
+    persistent = False
+
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._emitted = {}  # session_id -> (watermark, updated_at)
+        self._seq = itertools.count(1)  # never reused, even by a session id that comes back
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id: Text, user_info: Optional[Dict[Text, Any]], now: float) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id, user_info, now)
+        else:
+            self._sessions.move_to_end(session_id)
+            session.last_activity = now
+            if user_info:
+                session.user_info = user_info
+        return session
+
+    def append(self, records: List[Record]) -> None:
+        with self._lock:
+            for session_id, sender, text, timestamp, user_info in records:
+                self._touch(session_id, user_info, timestamp).messages.append(
+                    Message(sender, text, timestamp, next(self._seq)))
+
+    def set_language(self, session_id: Text, language: Text, now: float) -> None:
+        with self._lock:
+            self._touch(session_id, None, now).language = language
+
+    def load(self, session_id: Text) -> Optional[Session]:
+        return self._sessions.get(session_id)
+
+    def remove(self, session_id: Text) -> Optional[Session]:
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def least_recent(self, limit: int, before: Optional[float] = None) -> List[Text]:
+        """Ids of the least recently active sessions (only those idle since `before` if given)"""
+        with self._lock:
+            ids = []
+            for session_id, session in self._sessions.items():
+                if len(ids) >= limit or (before is not None and session.last_activity > before):
+                    break
+                ids.append(session_id)
+            return ids
+
+    def session_ids(self) -> List[Text]:
+        with self._lock:
+            return list(self._sessions)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def emitted(self, session_id: Text) -> int:
+        """Sequence number of the last emailed message of the session (0 if none)"""
+        entry = self._emitted.get(session_id)
+        return entry[0] if entry else 0
+
+    def claim_emission(self, session_id: Text, previous: int, upto: int, now: float) -> bool:
+        """Advance the watermark from `previous` to `upto`, False if someone else already moved it"""
+        with self._lock:
+            if self.emitted(session_id) != previous:
+                return False
+            self._emitted[session_id] = (upto, now)
+            return True
+
+    def prune_emissions(self, before: float) -> None:
+        with self._lock:
+            for session_id in [k for k, (_, updated_at) in self._emitted.items() if updated_at < before]:
+                del self._emitted[session_id]
+
+
+class SQLiteBackend:
+    """Sessions in a SQLite database (WAL mode: readers never block the writer)"""
+
+    persistent = True
+
+    def __init__(self, path: Text = CONVERSATION_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_info TEXT NOT NULL DEFAULT '{}',
+                    started_at REAL NOT NULL,
+                    last_activity REAL NOT NULL,
+                    language TEXT
+                );
+                CREATE INDEX IF NOT EXISTS sessions_last_activity ON sessions (last_activity);
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    timestamp REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+                CREATE TABLE IF NOT EXISTS emissions (
+                    session_id TEXT PRIMARY KEY,
+                    emitted INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            ''')
+
+    _UPSERT = '''
+        INSERT INTO sessions (session_id, user_info, started_at, last_activity) VALUES (?, ?, ?, ?)
+        ON CONFLICT (session_id) DO UPDATE SET
+            last_activity = MAX(last_activity, excluded.last_activity),
+            user_info = CASE WHEN excluded.user_info = '{}' THEN user_info ELSE excluded.user_info END
+    '''
+
+    def append(self, records: List[Record]) -> None:
+        sessions = [(session_id, json.dumps(user_info or {}, ensure_ascii=False), timestamp, timestamp)
+                    for session_id, _, _, timestamp, user_info in records]
+        messages = [(session_id, sender, text, timestamp) for session_id, sender, text, timestamp, _ in records]
+        with self._lock:
+            # One transaction for the whole batch
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(self._UPSERT, sessions)
+                self._conn.executemany(
+                    'INSERT INTO messages (session_id, sender, text, timestamp) VALUES (?, ?, ?, ?)', messages)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def set_language(self, session_id: Text, language: Text, now: float) -> None:
+        with self._lock:
+            self._conn.execute(self._UPSERT, (session_id, '{}', now, now))
+            self._conn.execute('UPDATE sessions SET language = ? WHERE session_id = ?', (language, session_id))
+
+    def _load(self, session_id: Text) -> Optional[Session]:
+        row = self._conn.execute(
+            'SELECT user_info, started_at, last_activity, language FROM sessions WHERE session_id = ?',
+            (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = Session(session_id, json.loads(row[0]), row[1])
+        session.last_activity = row[2]
+        session.language = row[3]
+        # The AUTOINCREMENT id is the sequence number: never reused, even after a delete
+        session.messages = [Message(*message) for message in self._conn.execute(
+            'SELECT sender, text, timestamp, id FROM messages WHERE session_id = ? ORDER BY timestamp, id',
+            (session_id,))]
+        return session
+
+    def load(self, session_id: Text) -> Optional[Session]:
+        with self._lock:
+            return self._load(session_id)
+
+    def remove(self, session_id: Text) -> Optional[Session]:
+        with self._lock:
+            # The write lock makes load + delete atomic across processes
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                session = self._load(session_id)
+                self._conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+                self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            return session
+
+    def least_recent(self, limit: int, before: Optional[float] = None) -> List[Text]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT session_id FROM sessions WHERE last_activity <= ? ORDER BY last_activity LIMIT ?',
+                (before if before is not None else float('inf'), limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def session_ids(self) -> List[Text]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT session_id FROM sessions')]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def emitted(self, session_id: Text) -> int:
+        with self._lock:
+            row = self._conn.execute('SELECT emitted FROM emissions WHERE session_id = ?', (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def claim_emission(self, session_id: Text, previous: int, upto: int, now: float) -> bool:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('INSERT OR IGNORE INTO emissions (session_id, emitted, updated_at) VALUES (?, 0, ?)',
+                                   (session_id, now))
+                claimed = self._conn.execute(
+                    'UPDATE emissions SET emitted = ?, updated_at = ? WHERE session_id = ? AND emitted = ?',
+                    (upto, now, session_id, previous)).rowcount == 1
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return claimed
+
+    def prune_emissions(self, before: float) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM emissions WHERE updated_at < ?', (before,))
+
+
+class RedisBackend:
+    """Sessions in a Redis-compatible server, shared by every action-server replica
+
+    conv:m:{id}   list of JSON [sender, text, timestamp, seq]
+    conv:s:{id}   hash user_info / started_at / language
+    conv:n:{id}   last sequence number of the session (outlives the session, like the ledger)
+    conv:active   sorted set of session ids scored by last activity
+    conv:w:{id}   emission watermark (hint, see emitted())
+    conv:e:{id}:{watermark}   idempotency key of the emission starting after
+                  that watermark, holds the watermark it advanced to
+    """
+
+    persistent = True
+
+    # Numbers and stores one message atomically (Redis runs a script as a single command): a message
+    # is never visible before the lower numbers of its session, so an emission up to n skips nothing.
+    # ARGV[1] is the JSON list without its closing bracket, the sequence number completes it.
+    APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('RPUSH', KEYS[2], ARGV[1] .. ',' .. seq .. ']')
+return seq
+"""
+
+    def __init__(self, client, prefix: Text = 'conv', ttl: int = CONVERSATION_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.active_key = f'{prefix}:active'
+
+    def _keys(self, session_id: Text) -> Tuple[Text, Text]:
+        return f'{self.prefix}:s:{session_id}', f'{self.prefix}:m:{session_id}'
+
+    def append(self, records: List[Record]) -> None:
+        # One round trip: each message numbered and pushed by APPEND_SCRIPT, then the session metadata
+        pipe = self.client.pipeline(transaction=False)
+        for session_id, sender, text, timestamp, user_info in records:
+            info_key, messages_key = self._keys(session_id)
+            head = json.dumps([sender, text, timestamp], ensure_ascii=False)[:-1]
+            pipe.eval(self.APPEND_SCRIPT, 2, f'{self.prefix}:n:{session_id}', messages_key, head, self.ttl)
+            pipe.hsetnx(info_key, 'started_at', timestamp)
+            if user_info:
+                pipe.hset(info_key, 'user_info', json.dumps(user_info, ensure_ascii=False))
+            pipe.zadd(self.active_key, {session_id: timestamp})
+            pipe.expire(info_key, self.ttl)
+            pipe.expire(messages_key, self.ttl)
+        pipe.execute()
+
+    def set_language(self, session_id: Text, language: Text, now: float) -> None:
+        info_key, _ = self._keys(session_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hsetnx(info_key, 'started_at', now)
+        pipe.hset(info_key, 'language', language)
+        pipe.zadd(self.active_key, {session_id: now})
+        pipe.expire(info_key, self.ttl)
+        pipe.execute()
+
+    @staticmethod
+    def _text(value) -> Optional[Text]:
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def load(self, session_id: Text) -> Optional[Session]:
+        info_key, messages_key = self._keys(session_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(info_key)
+        pipe.lrange(messages_key, 0, -1)
+        pipe.zscore(self.active_key, session_id)
+        info, messages, last_activity = pipe.execute()
+        if not info and not messages:
+            return None
+        info = {self._text(k): self._text(v) for k, v in info.items()}
+        session = Session(session_id, json.loads(info.get('user_info') or '{}'),
+                          float(info.get('started_at') or last_activity or 0))
+        session.last_activity = float(last_activity or session.started_at)
+        session.language = info.get('language')
+        # Batches of different replicas may land out of order
+        session.messages = sorted((Message(*json.loads(message)) for message in messages),
+                                  key=lambda message: message.timestamp)
+        return session
+
+    def remove(self, session_id: Text) -> Optional[Session]:
+        # Whoever removes the id from the active set owns the session
+        if not self.client.zrem(self.active_key, session_id):
+            return None
+        session = self.load(session_id)
+        self.client.delete(*self._keys(session_id))
+        return session
+
+    def least_recent(self, limit: int, before: Optional[float] = None) -> List[Text]:
+        if before is None:
+            ids = self.client.zrange(self.active_key, 0, limit - 1)
+        else:
+            ids = self.client.zrangebyscore(self.active_key, '-inf', before, start=0, num=limit)
+        return [self._text(session_id) for session_id in ids]
+
+    def session_ids(self) -> List[Text]:
+        return [self._text(session_id) for session_id in self.client.zrange(self.active_key, 0, -1)]
+
+    def count(self) -> int:
+        return self.client.zcard(self.active_key)
+
+    def _emission_key(self, session_id: Text, watermark: int) -> Text:
+        return f'{self.prefix}:e:{session_id}:{watermark}'
+
+    def emitted(self, session_id: Text) -> int:
+        watermark = int(self._text(self.client.get(f'{self.prefix}:w:{session_id}')) or 0)
+        # The hint may lag behind a claim (replica died in between): follow the claims
+        while (upto := self.client.get(self._emission_key(session_id, watermark))) is not None:
+            watermark = int(self._text(upto))
+        return watermark
+
+    def claim_emission(self, session_id: Text, previous: int, upto: int, now: float) -> bool:
+        # SET NX on the idempotency key: one replica wins the emission after `previous`
+        if not self.client.set(self._emission_key(session_id, previous), upto, nx=True, ex=self.ttl):
+            return False
+        self.client.set(f'{self.prefix}:w:{session_id}', upto, ex=self.ttl)
+        return True
+
+    def prune_emissions(self, before: float) -> None:
+        pass  # ledger keys expire with CONVERSATION_TTL
+
+
+def get_conversation_backend(kind: Text = None):
+    """Backend configured by CONVERSATION_STORE (falls back to memory if unavailable)"""
+    kind = kind or CONVERSATION_STORE
+    if kind == 'sqlite':
+        return SQLiteBackend(CONVERSATION_DB)
+    if kind == 'redis':
+        if not CONVERSATION_REDIS_URL:
+            LOG.warning('conversation_store_fallback', store='redis', reason='no CONVERSATION_REDIS_URL/CACHE_REDIS_URL')
+            return MemoryBackend()
+        try:
+            import redis
+        except ImportError:
+            LOG.warning('conversation_store_fallback', store='redis', reason='redis package not installed')
+            return MemoryBackend()
+        return RedisBackend(redis.Redis.from_url(CONVERSATION_REDIS_URL, socket_timeout=2))
+    return MemoryBackend()
+
+
+class SessionStore:
+    """Batches appends to a backend and evicts idle / excess sessions to a transcript sink"""
+
+    def __init__(self, backend=None, idle_timeout: float = SESSION_IDLE_TIMEOUT, max_sessions: int = SESSION_MAX,
+                 on_evict: Optional[Callable[[Session], None]] = None, clock=time.time,
+                 batch_size: int = CONVERSATION_BATCH_SIZE):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self.clock = clock
+        # Nothing to gain from batching writes to a dict
+        self.batch_size = batch_size if self.backend.persistent else 1
+        self.evictions = 0
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._sweeper = None
+
+    def __contains__(self, session_id: Text) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        self.flush()
+        return self.backend.count()
+
+    def keys(self) -> List[Text]:
+        self.flush()
+        return self.backend.session_ids()
+
+    def get(self, session_id: Text) -> Optional[Session]:
+        """Current state of a session, including the appends of every replica"""
+        self.flush()
+        return self.backend.load(session_id)
+
+    def append(self, session_id: Text, sender: Text, text: Text,
+               user_info: Optional[Dict[Text, Any]] = None) -> None:
+        """Add a message to a session (created if needed); written in batches"""
+        with self._pending_lock:
+            self._pending.append((session_id, sender, text, self.clock(), user_info))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        if not self.backend.persistent and self.backend.count() > self.max_sessions:
+            self._evict(self.backend.least_recent(self.backend.count() - self.max_sessions))
+
+    def flush(self) -> None:
+        """Write the pending appends to the backend"""
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+            if batch:
+                # Under the lock so batches reach the backend in order
+                try:
+                    self.backend.append(batch)
+                except Exception as e:
+                    LOG.error('session_write_failed', messages=len(batch), error=str(e))
+                    self._pending = batch + self._pending
+
+    def set_language(self, session_id: Text, language: Text) -> None:
+        self.backend.set_language(session_id, language, self.clock())
+
+    def get_language(self, session_id: Text) -> Optional[Text]:
+        session = self.backend.load(session_id)
+        return session.language if session else None
+
+    def emitted(self, session_id: Text) -> int:
+        """Sequence number of the last emailed message of the session (0 if nothing was emailed)"""
+        return self.backend.emitted(session_id)
+
+    def claim_transcript(self, session_id: Text, messages: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+        """Transcript messages not emailed yet, claimed for the caller (empty if none or already claimed)
+
+        `messages` come from Session.transcript(): the ledger compares their
+        sequence numbers, never timestamps, which may come from other clocks.
+        One ledger read and one compare-and-set, whatever the length of the conversation.
+        """
+        previous = self.backend.emitted(session_id)
+        delta = [message for message in messages if message['seq'] > previous]
+        if not delta:
+            return []
+        upto = max(message['seq'] for message in delta)
+        if not self.backend.claim_emission(session_id, previous, upto, self.clock()):
+            return []
+        return delta
+
+    def pop(self, session_id: Text) -> Optional[Session]:
+        """Remove a session without flushing it (the caller handles its transcript)"""
+        self.flush()
+        return self.backend.remove(session_id)
+
+    async def offload(self, function: Callable, *args) -> Any:
+        """Await function(*args) from the event loop, in a worker thread when the backend does I/O"""
+        if not self.backend.persistent:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    async def aappend(self, session_id: Text, sender: Text, text: Text,
+                      user_info: Optional[Dict[Text, Any]] = None) -> None:
+        await self.offload(self.append, session_id, sender, text, user_info)
+
+    async def aget(self, session_id: Text) -> Optional[Session]:
+        return await self.offload(self.get, session_id)
+
+    async def apop(self, session_id: Text) -> Optional[Session]:
+        return await self.offload(self.pop, session_id)
+
+    async def aemitted(self, session_id: Text) -> int:
+        return await self.offload(self.emitted, session_id)
+
+    def sweep(self) -> int:
+        """Evict idle sessions and sessions beyond max_sessions, returns how many"""
+        self.flush()
+        self.backend.prune_emissions(self.clock() - CONVERSATION_TTL)
+        evicted = self._evict(self.backend.least_recent(10000, before=self.clock() - self.idle_timeout))
+        excess = self.backend.count() - self.max_sessions
+        if excess > 0:
+            evicted += self._evict(self.backend.least_recent(excess))
+        return evicted
+
+    def flush_all(self) -> None:
+        """Process shutdown: write pending appends, evict everything a memory backend would lose"""
+        self.flush()
+        if not self.backend.persistent:
+            self._evict(self.backend.session_ids())
+
+    def _evict(self, session_ids: List[Text]) -> int:
+        evicted = 0
+        for session_id in session_ids:
+            # Another replica may have evicted it first
+            session = self.backend.remove(session_id)
+            if session is None:
+                continue
+            evicted += 1
+            self.evictions += 1
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(session)
+                except Exception:
+                    LOG.exception('session_flush_failed', session=session_id)
+        return evicted
+
+    def start_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL,
+                      flush_interval: float = CONVERSATION_FLUSH_INTERVAL) -> None:
+        """Background thread writing pending appends and sweeping idle sessions, flush at exit"""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            next_sweep = time.monotonic() + interval
+            while True:
+                time.sleep(flush_interval)
+                try:
+                    self.flush()
+                    if time.monotonic() >= next_sweep:
+                        next_sweep = time.monotonic() + interval
+                        self.sweep()
+                except Exception:
+                    LOG.exception('session_sweep_failed')
+
+        self._sweeper = threading.Thread(target=run, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+        atexit.register(self.flush_all)
+
+    def stats(self) -> Dict[Text, Any]:
+        return {'sessions': len(self), 'evictions': self.evictions, 'pending': len(self._pending)}
@@ -0,0 +1,112 @@
+# actions/startup.py
+# Startup timeline of the servers, logged phase by phase
+#
+# Slow starts get dynos killed by the platform health checks (Render, Heroku),
+# so both servers log where their startup time goes:
+#
+#   TIMELINE = StartupTimeline('flask')
+#   TIMELINE.mark('imports')                # end of a phase of the main thread
+#   with TIMELINE.phase('model_load') as phase:  # a phase run on its own (background thread)
+#       if not load():
+#           phase.fail('no model')          # ok=False without raising (also when it raises)
+#   TIMELINE.ready()                        # serving: logs the whole timeline
+#
+# Offsets are counted from the process start (read from /proc, else from the
+# import of this module), so the interpreter startup and the imports before
+# the first mark show up as well. Phases ending after ready() (a later model
+# reload) are not part of the timeline.
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Text
+
+from actions.structured_logging import get_logger
+
+LOG = get_logger('startup')
+
+_IMPORTED_AT = time.time()
+
+
+def process_start_time() -> float:
+    """Epoch time the process started (this module's import time where /proc is not available)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, which may contain spaces; starttime is field 22
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration, AttributeError):
+        return _IMPORTED_AT
+
+
+class _Phase:
+    def __init__(self, timeline: 'StartupTimeline', name: Text):
+        self.timeline = timeline
+        self.name = name
+        self.error = None
+
+    def __enter__(self) -> '_Phase':
+        self.start = time.time()
+        return self
+
+    def fail(self, error: Text) -> None:
+        """Record the phase as failed (ok=False) when it ends, for steps that report failure without raising"""
+        self.error = error
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        error = self.error if exc_type is None else f'{exc_type.__name__}: {exc}'
+        self.timeline.record(self.name, self.start, time.time(), ok=error is None, error=error)
+
+
+class StartupTimeline:
+    def __init__(self, server: Text, origin: Optional[float] = None):
+        self.server = server
+        self.origin = origin if origin is not None else process_start_time()
+        self.phases: List[Dict[Text, Any]] = []
+        self.ready_at = None  # seconds from the process start
+        self._last_mark = self.origin
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.time() - self.origin
+
+    def record(self, name: Text, start: float, end: float, ok: bool = True, error: Optional[Text] = None) -> None:
+        with self._lock:
+            if self.ready_at is not None:
+                return
+            phase = {'phase': name, 'start_s': round(start - self.origin, 3), 'duration_s': round(end - start, 3),
+                     'ok': ok}
+            if error is not None:
+                phase['error'] = error
+            self.phases.append(phase)
+        (LOG.info if ok else LOG.warning)('startup_phase', server=self.server, **phase)
+
+    def mark(self, name: Text) -> None:
+        """End of the phase `name` of the main thread, which began at the previous mark (or the process start)"""
+        now = time.time()
+        self.record(name, self._last_mark, now)
+        self._last_mark = now
+
+    def phase(self, name: Text) -> _Phase:
+        """Context manager timing the phase `name` (ok=False when it raises or calls fail())"""
+        return _Phase(self, name)
+
+    def ready(self) -> None:
+        with self._lock:
+            if self.ready_at is not None:
+                return
+            self.ready_at = round(self.elapsed(), 3)
+        # Serving, but without what the failed phases should have loaded
+        failed = self.failed()
+        (LOG.warning if failed else LOG.info)('startup_ready', server=self.server, ready_s=self.ready_at,
+                                              phases={phase['phase']: phase['duration_s'] for phase in self.phases},
+                                              **({'failed': failed} if failed else {}))
+
+    def failed(self) -> List[Text]:
+        return [phase['phase'] for phase in self.phases if not phase['ok']]
+
+    def status(self) -> Dict[Text, Any]:
+        return {'since_start_s': round(self.elapsed(), 1), 'ready_s': self.ready_at, 'phases': list(self.phases),
+                'failed': self.failed()}
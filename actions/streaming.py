@@ -0,0 +1,139 @@
+# actions/streaming.py
+# Token streaming from the action server to the webhook layer
+#
+# Rasa only gets an action's messages once the action returns, so streamed
+# GPT-4o tokens take a side channel: the action publishes them to STREAMS,
+# and a small SSE server thread of the action server (ACTION_STREAM_PORT)
+# forwards them to whoever subscribed to the sender with
+# GET /stream/<sender_id> (the /webhooks/rest/stream endpoint of flask_app.py).
+# A subscription ends on the 'end' event of the turn, when the subscriber
+# disconnects, or after STREAM_IDLE_TIMEOUT without any event.
+
+import json
+import os
+import queue
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Text
+from urllib.parse import unquote
+
+from actions.structured_logging import get_logger
+
+ACTION_STREAM_PORT = int(os.getenv('ACTION_STREAM_PORT', '5056'))  # 0 = disabled
+# No authentication: anyone reaching the port could read a sender's answers, so loopback only
+# by default (flask_app.py runs next to the action server); widen only on a private network
+ACTION_STREAM_HOST = os.getenv('ACTION_STREAM_HOST', '127.0.0.1')
+STREAM_IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', '60'))  # seconds without any event
+STREAM_POLL_INTERVAL = 0.5  # seconds between checks that the subscriber is still connected
+
+LOG = get_logger('stream')
+
+
+class StreamBroker:
+    """Fans out the events published for a sender to its current subscribers"""
+
+    def __init__(self):
+        self._subscribers = {}  # sender_id -> list of queue.Queue
+        self._lock = threading.Lock()
+
+    def subscribe(self, sender_id: Text) -> queue.Queue:
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(sender_id, []).append(events)
+        return events
+
+    def unsubscribe(self, sender_id: Text, events: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(sender_id, [])
+            if events in subscribers:
+                subscribers.remove(events)
+            if not subscribers:
+                self._subscribers.pop(sender_id, None)
+
+    def has_subscribers(self, sender_id: Text) -> bool:
+        return sender_id in self._subscribers
+
+    def publish(self, sender_id: Text, event: Dict[Text, Any]) -> None:
+        """Non-blocking, safe to call from the event loop"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(sender_id, ()))
+        for events in subscribers:
+            events.put_nowait(event)
+
+
+STREAMS = StreamBroker()
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    """GET /stream/<sender_id>: Server-Sent Events until the action publishes an 'end' event"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if not self.path.startswith('/stream/'):
+            self.send_error(404)
+            return
+        sender_id = unquote(self.path[len('/stream/'):])
+        events = STREAMS.subscribe(sender_id)
+        try:
+            # Headers are only sent once subscribed, so the caller can start the
+            # conversation turn as soon as it has them without missing tokens
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.flush()
+            deadline = time.monotonic() + STREAM_IDLE_TIMEOUT
+            while True:
+                try:
+                    event = events.get(timeout=STREAM_POLL_INTERVAL)
+                except queue.Empty:
+                    if time.monotonic() >= deadline or self.subscriber_gone():
+                        break
+                    continue
+                deadline = time.monotonic() + STREAM_IDLE_TIMEOUT
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                if event.get('type') == 'end':
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            STREAMS.unsubscribe(sender_id, events)
+            self.close_connection = True
+
+    def subscriber_gone(self) -> bool:
+        """True once the subscriber closed the connection (it sends nothing after its request)"""
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_stream_server(port: int = ACTION_STREAM_PORT, host: Text = ACTION_STREAM_HOST) -> Optional[ThreadingHTTPServer]:
+    """Start the SSE server in a daemon thread (once per process)"""
+    global _server
+    if _server is not None or not port:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), StreamHandler)
+    except OSError as e:
+        LOG.warning('stream_server_not_started', host=host, port=port, error=str(e))
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='token-stream-server', daemon=True).start()
+    LOG.info('stream_server_started', host=host, port=port)
+    return _server
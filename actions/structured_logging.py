@@ -0,0 +1,211 @@
+# actions/structured_logging.py
+# Structured, non-blocking logging for the request path of the action server
+#
+# The actions used to print() banners, metadata dumps and whole answers on
+# every turn: synchronous writes to stdout on the event loop, which stall the
+# turn whenever the log pipe is slow (container log driver, full terminal).
+# Log calls now go through the standard logging module with one JSON object
+# per line:
+#
+#   LOG = get_logger('actions')
+#   LOG.info('route_matched', route=route, text=user_question)
+#   -> {"ts": "...", "level": "info", "logger": "expobeton.actions",
+#       "event": "route_matched", "route": "history", "text": "..."}
+#
+# The request thread only checks the level and puts the record on a bounded
+# queue; a listener thread formats and writes it. When the queue is full the
+# record is dropped and counted, the turn never waits for the log output.
+# Large fields (answers, metadata, transcripts) are cut at LOG_MAX_FIELD_CHARS,
+# except in a LOG_PAYLOAD_SAMPLE_RATE fraction of the records, which keep them
+# whole for debugging ("sampled": true).
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Text
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text' (readable, for local runs)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # records, dropped beyond
+LOG_MAX_FIELD_CHARS = int(os.getenv('LOG_MAX_FIELD_CHARS', '300'))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+
+ROOT_LOGGER = 'expobeton'
+
+# Attributes of every LogRecord, the other ones come from `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _compact(value: Any, limit: int) -> Any:
+    """JSON-ready value, strings and serialized containers cut at `limit` characters"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list, tuple)) \
+            else str(value)
+    if len(value) > limit:
+        return f"{value[:limit]}… (+{len(value) - limit} chars)"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, event, then the fields"""
+
+    def __init__(self, max_field_chars: int = LOG_MAX_FIELD_CHARS, sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+        self.sample_rate = sample_rate
+
+    def fields(self, record: logging.LogRecord) -> Dict[Text, Any]:
+        fields = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        limit = sys.maxsize if sampled else self.max_field_chars
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in fields:
+                fields[key] = _compact(value, limit)
+        if sampled:
+            fields['sampled'] = True
+        if record.exc_info:
+            fields['exc'] = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+        return fields
+
+    def format(self, record: logging.LogRecord) -> Text:
+        return json.dumps(self.fields(record), ensure_ascii=False, default=str)
+
+
+class TextFormatter(JsonFormatter):
+    """`HH:MM:SS level event key=value ...` for reading logs in a terminal"""
+
+    def format(self, record: logging.LogRecord) -> Text:
+        fields = self.fields(record)
+        head = f"{fields.pop('ts')[11:19]} {fields.pop('level'):<7} {fields.pop('event')}"
+        fields.pop('logger')
+        exc = fields.pop('exc', None)
+        line = ' '.join([head] + [f"{key}={value}" for key, value in fields.items()])
+        return f"{line}\n{exc}" if exc else line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on the queue as they are: formatting happens in the listener thread
+
+    (QueueHandler.prepare() would format the message on the request thread.)
+    Beyond `maxsize` queued records, new ones are dropped instead of blocking.
+    The queue is a SimpleQueue, whose put() is a single C call.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, maxsize: int = LOG_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.maxsize = maxsize
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class _Record(logging.LogRecord):
+    """LogRecord without the source file, process and thread lookups of LogRecord.__init__
+
+    Only what the formatters above read; it costs a fraction of a full record.
+    """
+
+    def __init__(self, name: Text, level: int, msg, args, exc_info):
+        self.name = name
+        self.msg = msg
+        self.args = args
+        self.levelno = level
+        self.levelname = logging.getLevelName(level)
+        self.exc_info = exc_info
+        self.exc_text = None
+        self.stack_info = None
+        self.created = time.time()
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """LOG.info('event_name', key=value, ...): keyword arguments become JSON fields
+
+    Builds a _Record itself: Logger._log() would also walk the stack to find
+    the caller's file and line (findCaller), the most expensive part of a log
+    call, for information the JSON lines do not include.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def log(self, level: int, msg, *args, exc_info=None, stack_info=False, stacklevel=1, extra=None, **fields):
+        logger = self.logger
+        if not logger.isEnabledFor(level):
+            return
+        if exc_info:
+            if isinstance(exc_info, BaseException):
+                exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+            elif not isinstance(exc_info, tuple):
+                exc_info = sys.exc_info()
+        record = _Record(logger.name, level, msg, args, exc_info)
+        if extra:
+            fields = {**extra, **fields}
+        # Fields named like a LogRecord attribute ('name', 'filename', ...) get a trailing underscore
+        record.__dict__.update((key if key not in _RECORD_ATTRIBUTES else f'{key}_', value)
+                               for key, value in fields.items())
+        logger.handle(record)
+
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(stream=None, level: Text = LOG_LEVEL, fmt: Text = LOG_FORMAT,
+                      queue_size: int = LOG_QUEUE_SIZE) -> DroppingQueueHandler:
+    """Route the 'expobeton' loggers through the queue to `stream` (stdout), once per process
+
+    The listener is stopped (queue drained) at interpreter exit. Configure
+    logging before creating the components that still log from their own
+    atexit handlers, so that it is stopped after them.
+    """
+    global _handler, _listener
+    with _configure_lock:
+        if _handler is not None:
+            return _handler
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextFormatter() if fmt == 'text' else JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        _handler = DroppingQueueHandler(log_queue, queue_size)
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(level)
+        logger.addHandler(_handler)
+        # Rasa SDK configures the root logger: keep our records out of its handlers
+        logger.propagate = False
+        return _handler
+
+
+def get_logger(name: Text) -> StructuredLogger:
+    """Structured logger 'expobeton.<name>'"""
+    return StructuredLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'))
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
@@ -0,0 +1,188 @@
+# actions/unanswered_digest.py
+# Aggregation of the questions the bot could not answer
+#
+# Every RAG miss used to send its own email, hundreds of them during an
+# event-day spike. UnansweredDigest collects the misses of a window
+# (UNANSWERED_DIGEST_WINDOW seconds) instead: questions are normalized
+# (case, accents, punctuation), merged with an earlier one when identical or
+# similar enough (UNANSWERED_SIMILARITY), counted, and handed to `on_digest`
+# once per window ranked by frequency. The current window and the last digest
+# are kept in a JSON file (UNANSWERED_DIGEST_FILE) for tooling, which also
+# lets the window survive a restart.
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Text
+
+from actions.structured_logging import get_logger
+
+UNANSWERED_DIGEST_WINDOW = float(os.getenv('UNANSWERED_DIGEST_WINDOW', '3600'))  # seconds
+UNANSWERED_SIMILARITY = float(os.getenv('UNANSWERED_SIMILARITY', '0.85'))  # 0-1, similar questions are merged
+UNANSWERED_DIGEST_FILE = os.getenv('UNANSWERED_DIGEST_FILE',
+                                   str(Path(__file__).parent.parent / 'unanswered_digest.json'))
+UNANSWERED_MAX_VARIANTS = 5  # original wordings kept per question
+
+LOG = get_logger('unanswered')
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: Text) -> Text:
+    """Lowercase, accent-free, punctuation-free form used to compare questions"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _SPACES.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+class UnansweredDigest:
+    """Deduplicated, counted unanswered questions, emitted as one digest per window"""
+
+    def __init__(self, on_digest: Optional[Callable[[Dict[Text, Any]], None]] = None,
+                 window: float = UNANSWERED_DIGEST_WINDOW, similarity: float = UNANSWERED_SIMILARITY,
+                 path: Optional[Text] = UNANSWERED_DIGEST_FILE, clock: Callable[[], float] = time.time):
+        self.on_digest = on_digest
+        self.window = window
+        self.similarity = similarity
+        self.path = Path(path) if path else None
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = []  # in order of first occurrence
+        self._by_key = {}  # normalized question -> entry
+        self._window_started = clock()
+        self._last_digest = None
+        self._dirty = False
+        self._worker = None
+        self._load()
+
+    def add(self, question: Text, session_id: Optional[Text] = None) -> Dict[Text, Any]:
+        """Count one miss; returns the (possibly merged) entry"""
+        key = normalize_question(question)
+        now = self.clock()
+        with self._lock:
+            # Exact match on the normalized form first, similarity only for new wordings
+            entry = self._by_key.get(key) or self._find_similar(key)
+            if entry is None:
+                entry = {'question': question.strip(), 'normalized': key, 'count': 0, 'variants': [],
+                         'sessions': [], 'first_seen': now, 'last_seen': now}
+                self._entries.append(entry)
+            self._by_key[key] = entry
+            entry['count'] += 1
+            entry['last_seen'] = now
+            if question.strip() not in entry['variants'] and len(entry['variants']) < UNANSWERED_MAX_VARIANTS:
+                entry['variants'].append(question.strip())
+            if session_id and session_id not in entry['sessions']:
+                entry['sessions'].append(session_id)
+            self._dirty = True
+            return entry
+
+    def _find_similar(self, key: Text) -> Optional[Dict[Text, Any]]:
+        best, best_ratio = None, self.similarity
+        for entry in self._entries:
+            matcher = SequenceMatcher(None, key, entry['normalized'], autojunk=False)
+            # Cheap upper bounds before the full comparison
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = entry, ratio
+        return best
+
+    def ranked(self) -> List[Dict[Text, Any]]:
+        """Questions of the current window, most frequent first"""
+        with self._lock:
+            return self._ranked()
+
+    def _ranked(self) -> List[Dict[Text, Any]]:
+        # Caller holds the lock
+        entries = sorted(self._entries, key=lambda e: (-e['count'], -e['last_seen']))
+        return [self._public(entry) for entry in entries]
+
+    @staticmethod
+    def _public(entry: Dict[Text, Any]) -> Dict[Text, Any]:
+        return {'question': entry['question'], 'count': entry['count'], 'sessions': len(entry['sessions']),
+                'variants': list(entry['variants']),
+                'first_seen': datetime.fromtimestamp(entry['first_seen']).isoformat(timespec='seconds'),
+                'last_seen': datetime.fromtimestamp(entry['last_seen']).isoformat(timespec='seconds')}
+
+    def flush(self, force: bool = False) -> Optional[Dict[Text, Any]]:
+        """Emit the digest if the window is over (or `force`); returns it, None if nothing was emitted"""
+        now = self.clock()
+        if not force and now - self._window_started < self.window:
+            self._save_if_dirty()
+            return None
+        with self._lock:
+            # Ranked and reset at once: a question added in between would be in neither window
+            questions = self._ranked()
+            digest = {'window_start': datetime.fromtimestamp(self._window_started).isoformat(timespec='seconds'),
+                      'window_end': datetime.fromtimestamp(now).isoformat(timespec='seconds'),
+                      'total': sum(q['count'] for q in questions),
+                      'unique': len(questions), 'questions': questions}
+            self._entries, self._by_key = [], {}
+            self._window_started = now
+            if questions:
+                self._last_digest = digest
+            self._dirty = True
+        self._save_if_dirty()
+        if not questions:
+            return None
+        if self.on_digest is not None:
+            try:
+                self.on_digest(digest)
+            except Exception:
+                LOG.exception('unanswered_digest_send_failed')
+        return digest
+
+    def _save_if_dirty(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            # 'current' is the ranked view for tooling, 'entries' what a restart reloads
+            state = {'window_started': self._window_started, 'window_seconds': self.window,
+                     'current': self._ranked(),
+                     'last_digest': self._last_digest,
+                     'entries': [dict(entry, sessions=list(entry['sessions'])) for entry in self._entries]}
+            self._dirty = False
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            LOG.warning('unanswered_digest_file_unreadable', path=str(self.path), error=str(e))
+            return
+        self._window_started = state.get('window_started', self._window_started)
+        self._entries = state.get('entries', [])
+        self._by_key = {entry['normalized']: entry for entry in self._entries}
+        self._last_digest = state.get('last_digest')
+
+    def start(self, interval: float = 5.0) -> None:
+        """Background thread saving the JSON file and emitting due digests; the window is saved at exit"""
+        if self._worker is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception:
+                    LOG.exception('unanswered_digest_flush_failed')
+
+        self._worker = threading.Thread(target=run, name='unanswered-digest', daemon=True)
+        self._worker.start()
+        atexit.register(self._save_if_dirty)
@@ -0,0 +1,108 @@
+# actions/vector_index.py
+# In-memory vector search over the docs index passages
+#
+# Vectors are L2-normalized to float32 once (at build time for the docs index,
+# whose memory map is then searched in place), so a query costs one
+# matrix-vector product plus an argpartition. The optional IVF mode clusters the vectors
+# (spherical k-means) and only scans the `nprobe` closest clusters:
+# higher nprobe = better recall, lower nprobe = lower latency.
+
+import os
+from typing import Optional, Text, Tuple
+
+import numpy as np
+
+VECTOR_INDEX_MODE = os.getenv('VECTOR_INDEX_MODE', 'exact')  # 'exact' or 'ivf'
+IVF_NLIST = int(os.getenv('IVF_NLIST', '0'))  # 0 = about sqrt(n) clusters
+IVF_NPROBE = int(os.getenv('IVF_NPROBE', '8'))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 rows scaled to unit L2 norm (zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first, without a full sort"""
+    if top_k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, top_k)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class VectorIndex:
+    """Cosine-similarity index over pre-normalized float32 vectors
+
+    With normalized=True the float32 rows are already unit-norm and are used as
+    they are (a memory map stays a memory map); otherwise a normalized copy is made.
+    """
+
+    def __init__(self, embeddings: np.ndarray, mode: Text = VECTOR_INDEX_MODE,
+                 nlist: int = IVF_NLIST, nprobe: int = IVF_NPROBE, seed: int = 0, normalized: bool = False):
+        if normalized and embeddings.dtype == np.float32:
+            self.vectors = embeddings
+        else:
+            self.vectors = normalize_rows(embeddings)
+        self.mode = mode
+        self.nprobe = nprobe
+        self.seed = seed
+        self.nlist = nlist or max(1, int(np.sqrt(len(self.vectors))))
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+        if mode == 'ivf':
+            self.train_ivf()
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def train_ivf(self, iterations: int = 10) -> None:
+        """Cluster the vectors with spherical k-means and build the inverted lists"""
+        n = len(self.vectors)
+        nlist = min(self.nlist, n)
+        if nlist == 0:
+            return
+        rng = np.random.default_rng(self.seed)
+        centroids = self.vectors[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind='stable')
+            counts = np.bincount(assignments, minlength=nlist)
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums[~empty] = np.add.reduceat(self.vectors[order], starts[~empty], axis=0)
+            # Re-seed empty clusters on random vectors
+            sums[empty] = self.vectors[rng.choice(n, int(empty.sum()), replace=False)]
+            centroids = normalize_rows(sums)
+        assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+
+        # Store the inverted lists as one array of ids sorted by cluster
+        self.list_ids = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=nlist)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.centroids = centroids
+        self.nlist = nlist
+
+    def search(self, query: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, cosine similarities) of the top_k closest vectors, best first"""
+        if len(self.vectors) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        query = normalize_rows(query)
+        if self.mode == 'ivf' and self.centroids is not None:
+            return self._search_ivf(query, top_k, nprobe or self.nprobe)
+        scores = self.vectors @ query
+        indices = top_k_indices(scores, top_k)
+        return indices, scores[indices]
+
+    def _search_ivf(self, query: np.ndarray, top_k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        probes = top_k_indices(self.centroids @ query, min(nprobe, self.nlist))
+        candidates = np.concatenate([
+            self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes
+        ])
+        scores = self.vectors[candidates] @ query
+        best = top_k_indices(scores, top_k)
+        return candidates[best], scores[best]
@@ -0,0 +1,204 @@
+"""
+Benchmark: flask_app.py webhook, new event loop per message vs one AgentLoop
+
+Serves the webhook with Flask's threaded server in two ways:
+
+- "loop per request": the handler before actions/agent_loop.py, a new event
+  loop per message (set as the thread's loop, never closed) running
+  agent.handle_message;
+- "AgentLoop": the current handler, every message run on one long-lived loop
+  thread, in order per sender, at most --max-in-flight at once.
+
+The agent is a stand-in for Rasa: --cpu-ms of synchronous work (NLU, policies)
+then a call to a local action server that answers after --action-ms, over
+keep-alive connections pooled per event loop like an HTTP client session.
+A loop per request therefore also means a new TCP connection per message.
+--clients threads send messages (one sender each) for --duration seconds.
+
+Usage:
+    python benchmarks/bench_agent_loop.py
+    python benchmarks/bench_agent_loop.py --clients 32 --action-ms 50 --duration 10
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.agent_loop import AgentLoop, AgentOverloaded  # noqa: E402
+
+
+class ActionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay):
+        super().__init__(('127.0.0.1', 0), ActionHandler)
+        self.delay = delay
+
+
+class ActionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.delay)
+        body = b'{"events": [], "responses": [{"text": "ok"}]}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeAgent:
+    """handle_message(): CPU work, then one action server call over a per-loop connection pool"""
+
+    def __init__(self, action_port, cpu_ms):
+        self.action_port = action_port
+        self.cpu_seconds = cpu_ms / 1000
+        self.pools = {}  # event loop -> idle (reader, writer) connections
+        self.connections_opened = 0
+
+    async def handle_message(self, sender_id, text):
+        deadline = time.perf_counter() + self.cpu_seconds
+        while time.perf_counter() < deadline:
+            pass
+        pool = self.pools.setdefault(asyncio.get_running_loop(), [])
+        if pool:
+            reader, writer = pool.pop()
+        else:
+            reader, writer = await asyncio.open_connection('127.0.0.1', self.action_port)
+            self.connections_opened += 1
+        body = json.dumps({'sender_id': sender_id, 'text': text}).encode()
+        writer.write(b'POST /webhook HTTP/1.1\r\nHost: actions\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+        length = 0
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        reply = json.loads(await reader.readexactly(length))
+        pool.append((reader, writer))
+        return [{'recipient_id': sender_id, 'text': reply['responses'][0]['text']}]
+
+
+def legacy_app(agent):
+    app = Flask('legacy')
+
+    @app.route('/webhooks/rest/webhook', methods=['POST'])
+    def webhook():
+        data = request.json
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        responses = loop.run_until_complete(agent.handle_message(data['sender'], data['message']))
+        agent.pools.pop(loop)  # never used again: left to the garbage collector, like the loop
+        return jsonify(responses)
+
+    return app
+
+
+def agent_loop_app(agent, runner):
+    app = Flask('agent_loop')
+
+    @app.route('/webhooks/rest/webhook', methods=['POST'])
+    def webhook():
+        data = request.json
+        try:
+            return jsonify(runner.run(agent.handle_message(data['sender'], data['message']), sender=data['sender']))
+        except AgentOverloaded as e:
+            return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+
+    return app
+
+
+def drive(port, clients, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        body = json.dumps({'sender': f'user-{index}', 'message': 'Quand a lieu ExpoBeton ?'})
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/webhooks/rest/webhook', body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0]
+
+
+def open_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def run(label, app, agent, args):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fds_before, opened_before = open_fds(), agent.connections_opened
+    latencies, errors = drive(server.server_port, args.clients, args.duration)
+    server.shutdown()
+    count = len(latencies)
+    p50 = latencies[count // 2] * 1000 if count else 0
+    p99 = latencies[max(int(count * 0.99) - 1, 0)] * 1000 if count else 0
+    fds = open_fds()
+    print(f"  {label:<17} {count / args.duration:8.1f} msg/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   "
+          f"errors {errors}   action connections {agent.connections_opened - opened_before}   "
+          f"fds {fds_before} -> {fds}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--cpu-ms', type=float, default=2, help='synchronous work per message')
+    parser.add_argument('--action-ms', type=float, default=20, help='action server latency')
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    action_server = ActionServer(args.action_ms / 1000)
+    threading.Thread(target=action_server.serve_forever, daemon=True).start()
+    print(f"{args.clients} clients, {args.cpu_ms} ms CPU + {args.action_ms} ms action call per message, "
+          f"{args.duration:.0f}s each:")
+    agent = FakeAgent(action_server.server_address[1], args.cpu_ms)
+    run('loop per request', legacy_app(agent), agent, args)
+    agent = FakeAgent(action_server.server_address[1], args.cpu_ms)
+    runner = AgentLoop(max_in_flight=args.max_in_flight, max_pending=args.clients * 4)
+    run('AgentLoop', agent_loop_app(agent, runner), agent, args)
+    runner.stop()
+
+
+if __name__ == '__main__':
+    main()
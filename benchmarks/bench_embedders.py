@@ -0,0 +1,143 @@
+"""
+Benchmark: embedding backends (local TF-IDF + SVD, hash stub, OpenAI) on docs/
+
+For every backend of --backends, on the docs/ passages:
+
+- index build throughput: passages/s embedding the whole corpus with one
+  worker, then with --workers batches of --batch-size at once;
+- query latency: embedding one query, p50/p99 (a network round trip with
+  OpenAI, a few dot products locally);
+- retrieval quality: --queries known-item queries (a random --query-words
+  window of a sampled passage, hit = the passage in the top --top-k) over the
+  vector search alone and fused with BM25 (reciprocal rank, as
+  RETRIEVAL_MODE=hybrid).
+
+The local model is trained in a temporary directory first (time reported).
+`openai` runs against the stand-in of benchmarks/fake_services.py
+(--embedding-latency per request, random vectors: throughput only, quality is
+not measured) unless --real-openai is given (OPENAI_API_KEY, billed).
+
+Usage:
+    python benchmarks/bench_embedders.py
+    python benchmarks/bench_embedders.py --backends local,openai --workers 8 --embedding-latency 0.3
+    python benchmarks/bench_embedders.py --backends openai --real-openai --queries 100
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.embeddings import HashEmbedder, OpenAIEmbedder  # noqa: E402
+from actions.lexical_index import build_lexical_index, reciprocal_rank_fusion  # noqa: E402
+from actions.local_embedder import LocalEmbedder  # noqa: E402
+from actions.vector_index import VectorIndex  # noqa: E402
+from benchmarks.fake_services import FakeOpenAI  # noqa: E402
+
+
+def sample_queries(documents, count, words, seed):
+    rng = random.Random(seed)
+    queries = []
+    for position in rng.sample(range(len(documents)), min(count, len(documents))):
+        tokens = documents[position]['content'].split()
+        start = rng.randrange(max(len(tokens) - words, 0) + 1)
+        queries.append((position, ' '.join(tokens[start:start + words])))
+    return queries
+
+
+def throughput(embedder, texts, workers):
+    embedder.workers = workers
+    start = time.perf_counter()
+    vectors = embedder.embed(texts)
+    return vectors, len(texts) / (time.perf_counter() - start)
+
+
+def hit_rates(embedder, vectors, lexical, queries, top_k):
+    index = VectorIndex(vectors)
+    query_vectors = embedder.embed([query for _, query in queries])
+    vector_hits = hybrid_hits = 0
+    for (target, query), query_vector in zip(queries, query_vectors):
+        vector_ranking = list(index.search(query_vector, top_k * 4)[0])
+        lexical_ranking = list(lexical.search(query, top_k * 4)[0])
+        vector_hits += target in vector_ranking[:top_k]
+        hybrid_hits += target in reciprocal_rank_fusion([lexical_ranking, vector_ranking])[:top_k]
+    return vector_hits / len(queries), hybrid_hits / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='local,hash,openai', help='comma-separated: local, hash, openai')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--query-words', type=int, default=6)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--latency-queries', type=int, default=50)
+    parser.add_argument('--embedding-latency', type=float, default=0.25, help='fake OpenAI latency per request (s)')
+    parser.add_argument('--real-openai', action='store_true', help='call the real embeddings API')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    lexical = build_lexical_index()
+    documents = lexical.documents
+    texts = [document['content'] for document in documents]
+    queries = sample_queries(documents, args.queries, args.query_words, args.seed)
+    print(f"{len(texts)} passages, {len(queries)} known-item queries of {args.query_words} words, "
+          f"hit = passage in the top {args.top_k}, batches of {args.batch_size}:")
+
+    directory = Path(tempfile.mkdtemp())
+    fake_openai = None
+    try:
+        for backend in args.backends.split(','):
+            measure_quality = True
+            if backend == 'local':
+                embedder = LocalEmbedder(index_dir=directory, batch_size=args.batch_size)
+                start = time.perf_counter()
+                embedder.model
+                print(f"  local model {embedder.model_name} trained in {time.perf_counter() - start:.1f}s")
+            elif backend == 'hash':
+                embedder = HashEmbedder()
+                embedder.batch_size = args.batch_size
+            elif backend == 'openai':
+                if not args.real_openai:
+                    # Small vectors: encoding 1536 floats per passage would make the stand-in CPU-bound
+                    fake_openai = fake_openai or FakeOpenAI(embedding_latency=args.embedding_latency,
+                                                            embedding_dim=64).start()
+                    os.environ['OPENAI_BASE_URL'] = fake_openai.base_url
+                    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+                    measure_quality = False
+                embedder = OpenAIEmbedder(batch_size=args.batch_size)
+            else:
+                parser.error(f"unknown backend {backend!r}")
+
+            _, sequential = throughput(embedder, texts, 1)
+            vectors, parallel = throughput(embedder, texts, args.workers)
+            timings = []
+            for _, query in queries[:args.latency_queries]:
+                start = time.perf_counter()
+                embedder.embed([query])
+                timings.append((time.perf_counter() - start) * 1000)
+            quality = '(random stand-in vectors, quality not measured)'
+            if measure_quality:
+                vector_rate, hybrid_rate = hit_rates(embedder, vectors, lexical, queries, args.top_k)
+                quality = f"hit@{args.top_k} vector {vector_rate:6.1%}   hybrid {hybrid_rate:6.1%}"
+            label = 'openai (stand-in)' if backend == 'openai' and not args.real_openai else backend
+            print(f"  {label:<17} index {sequential:8.0f} passages/s (1 worker) {parallel:8.0f} passages/s "
+                  f"({args.workers} workers)   query p50 {np.percentile(timings, 50):7.3f} ms "
+                  f"p99 {np.percentile(timings, 99):7.3f} ms   {quality}")
+    finally:
+        if fake_openai is not None:
+            fake_openai.shutdown()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark: legacy keyword detect_language() vs the character n-gram LanguageIdentifier
+
+Hand-labelled chatbot messages (not part of actions/language_corpus/) are
+classified by both implementations; the script prints the accuracy per
+language, the remaining mistakes, and the per-message cost (cold caches,
+new message made of known words, repeated message).
+
+Usage:
+    python benchmarks/bench_language_id.py
+    python benchmarks/bench_language_id.py --repeat 200
+"""
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.language_id import LanguageIdentifier  # noqa: E402
+
+LABELLED_MESSAGES = [
+    # French
+    ("Bonjour", 'fr'),
+    ("Quelle est l'histoire d'ExpoBeton ?", 'fr'),
+    ("histoire", 'fr'),
+    ("Il est où le salon ?", 'fr'),
+    ("C'est quand la prochaine édition ?", 'fr'),
+    ("Je veux réserver un stand", 'fr'),
+    ("Combien de visiteurs sont attendus ?", 'fr'),
+    ("Qui sont les organisateurs", 'fr'),
+    ("merci beaucoup", 'fr'),
+    ("Est-ce que je peux venir avec ma famille ?", 'fr'),
+    ("Parlez-moi du béton armé", 'fr'),
+    ("Comment devenir ambassadeur ?", 'fr'),
+    ("Je voudrais les contacts de l'équipe", 'fr'),
+    ("Quelles villes du Katanga sont concernées ?", 'fr'),
+    ("Le discours du président en 2024", 'fr'),
+    ("Y aura-t-il des conférences sur l'énergie ?", 'fr'),
+    ("Bonsoir, je suis architecte à Kinshasa", 'fr'),
+    ("D'accord merci, à bientôt", 'fr'),
+    ("Est-ce payant ?", 'fr'),
+    # English
+    ("Hello", 'en'),
+    ("What is the history of ExpoBeton?", 'en'),
+    ("Where is the fair held?", 'en'),
+    ("When is the next edition?", 'en'),
+    ("I want to book a booth", 'en'),
+    ("How many visitors are expected?", 'en'),
+    ("Who are the organizers", 'en'),
+    ("thanks a lot", 'en'),
+    ("Can I come with my family?", 'en'),
+    ("Tell me about reinforced concrete", 'en'),
+    ("How do I become an ambassador?", 'en'),
+    ("I would like the contact details of the team", 'en'),
+    ("Which cities of Katanga are involved?", 'en'),
+    ("Is it free?", 'en'),
+    ("Will there be talks about energy?", 'en'),
+    ("Good evening, I am an architect in Kinshasa", 'en'),
+    # Spanish
+    ("Hola", 'es'),
+    ("¿Cuál es la historia de ExpoBeton?", 'es'),
+    ("¿Dónde se celebra la feria?", 'es'),
+    ("¿Cuándo es la próxima edición?", 'es'),
+    ("Quiero reservar un stand", 'es'),
+    ("¿Cuántos visitantes se esperan?", 'es'),
+    ("¿Quiénes son los organizadores?", 'es'),
+    ("muchas gracias", 'es'),
+    ("¿Puedo ir con mi familia?", 'es'),
+    ("¿Cómo puedo ser embajador?", 'es'),
+    ("¿Es gratis la entrada?", 'es'),
+    ("Buenas tardes, soy arquitecto en Kinshasa", 'es'),
+    # Lingala
+    ("Mbote", 'ln'),
+    ("Nalingi koyeba ntalo ya stand", 'ln'),
+    ("Expo ekozala wapi?", 'ln'),
+    ("Ekobanda mokolo nini?", 'ln'),
+    ("Matondo mingi", 'ln'),
+    ("Nakoki koya na libota na ngai?", 'ln'),
+    ("Nani azali mokambi ya expo?", 'ln'),
+    ("Bato boni bakoya?", 'ln'),
+    # Swahili
+    ("Habari yako", 'sw'),
+    ("Ningependa kujua bei ya banda", 'sw'),
+    ("Maonyesho yatafanyika wapi?", 'sw'),
+    ("Yataanza lini?", 'sw'),
+    ("Asante sana", 'sw'),
+    ("Naweza kuja na familia yangu?", 'sw'),
+    ("Nani ni kiongozi wa maonyesho?", 'sw'),
+    ("Wageni wangapi watakuja?", 'sw'),
+    # Russian, Chinese, Arabic
+    ("Привет", 'ru'),
+    ("Что такое ExpoBeton?", 'ru'),
+    ("Где проходит выставка?", 'ru'),
+    ("Сколько стоит стенд?", 'ru'),
+    ("你好", 'zh'),
+    ("ExpoBeton是什么？", 'zh'),
+    ("展会在哪里举行？", 'zh'),
+    ("展位多少钱？", 'zh'),
+    ("مرحبا", 'ar'),
+    ("ما هو ExpoBeton؟", 'ar'),
+    ("أين يقام المعرض؟", 'ar'),
+    ("كم سعر الجناح؟", 'ar'),
+]
+
+
+def legacy_detect_language(text: str) -> str:
+    """detect_language() of actions/actions.py before the n-gram identifier, verbatim"""
+    text_lower = text.lower()
+    french_keywords = ['bonjour', 'salut', 'merci', 'quoi', 'comment', 'pourquoi', 'quand', 'où', 'est-ce', 'c\'est', 'quelles', 'quel', 'quelle']
+    english_keywords = ['hello', 'hi', 'thank', 'what', 'how', 'why', 'when', 'where', 'is', 'are', 'can', 'could', 'would']
+    spanish_keywords = ['hola', 'gracias', 'qué', 'cómo', 'cuándo', 'dónde', 'por qué', 'buenos', 'días']
+    russian_keywords = ['привет', 'спасибо', 'что', 'как', 'когда', 'где', 'почему', 'здравствуй']
+    has_chinese = any('\u4e00' <= char <= '\u9fff' for char in text)
+    has_arabic = any('\u0600' <= char <= '\u06ff' for char in text)
+    french_score = sum(1 for keyword in french_keywords if keyword in text_lower)
+    english_score = sum(1 for keyword in english_keywords if keyword in text_lower)
+    spanish_score = sum(1 for keyword in spanish_keywords if keyword in text_lower)
+    russian_score = sum(1 for keyword in russian_keywords if keyword in text_lower)
+    if has_chinese:
+        return 'zh'
+    if has_arabic:
+        return 'ar'
+    if russian_score > 0:
+        return 'ru'
+    if spanish_score > english_score and spanish_score > french_score:
+        return 'es'
+    if english_score > french_score:
+        return 'en'
+    if french_score > 0:
+        return 'fr'
+    return 'fr'
+
+
+def accuracy(detect):
+    per_language = defaultdict(lambda: [0, 0])
+    mistakes = []
+    for text, expected in LABELLED_MESSAGES:
+        actual = detect(text)
+        per_language[expected][1] += 1
+        if actual == expected:
+            per_language[expected][0] += 1
+        else:
+            mistakes.append((text, expected, actual))
+    return per_language, mistakes
+
+
+def time_per_message(detect, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, _ in LABELLED_MESSAGES:
+            detect(text)
+    return (time.perf_counter() - start) / (repeat * len(LABELLED_MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    identifier = LanguageIdentifier.load()
+    cold = LanguageIdentifier.load()
+    cold_start = time.perf_counter()
+    for text, _ in LABELLED_MESSAGES:
+        cold._identify(text)
+    cold_us = (time.perf_counter() - cold_start) / len(LABELLED_MESSAGES) * 1e6
+    uncached = lambda text: identifier._identify(text)[0] or 'fr'  # noqa: E731
+    legacy_scores, legacy_mistakes = accuracy(legacy_detect_language)
+    ngram_scores, ngram_mistakes = accuracy(identifier.detect)
+
+    print(f"{'language':<10}{'legacy':>10}{'n-gram':>10}")
+    for language in legacy_scores:
+        old, new = legacy_scores[language], ngram_scores[language]
+        print(f"{language:<10}{old[0]:>6}/{old[1]:<3}{new[0]:>6}/{new[1]:<3}")
+    total = len(LABELLED_MESSAGES)
+    print(f"{'total':<10}{total - len(legacy_mistakes):>6}/{total:<3}{total - len(ngram_mistakes):>6}/{total:<3}")
+
+    print("\nn-gram mistakes:")
+    for text, expected, actual in ngram_mistakes:
+        print(f"  {text!r}: expected {expected}, got {actual}")
+    print(f"legacy mistakes: {len(legacy_mistakes)} "
+          f"(e.g. {', '.join(f'{t!r} -> {a}' for t, _, a in legacy_mistakes[:4])})")
+
+    print(f"\nlegacy detect_language: {time_per_message(legacy_detect_language, args.repeat):8.2f} µs/message")
+    print(f"n-gram (cold caches):   {cold_us:8.2f} µs/message")
+    print(f"n-gram (new message):   {time_per_message(uncached, args.repeat):8.2f} µs/message  (known words)")
+    print(f"n-gram (cached):        {time_per_message(identifier.detect, args.repeat):8.2f} µs/message")
+
+
+if __name__ == '__main__':
+    main()
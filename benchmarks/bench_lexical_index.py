@@ -0,0 +1,112 @@
+"""
+Benchmark: BM25 index vs embedding search vs both fused (reciprocal rank) on docs/
+
+Measures the BM25 index build and (memory-mapped) load times, then the
+search latency and a known-item quality score of each retrieval mode:
+--queries passages are sampled from the corpus, a query is a random
+--query-words-word window of the passage, and a hit is the passage in the
+top --top-k. Query embeddings are computed before timing the vector search
+(they are a network call with the openai backend).
+
+The default `hash` embedder needs no network but is only a stand-in for
+real embeddings: use --backend openai (with OPENAI_API_KEY and a docs index
+built for it) to compare with the production embeddings.
+
+Usage:
+    python benchmarks/bench_lexical_index.py
+    python benchmarks/bench_lexical_index.py --backend openai --index docs_index --queries 100
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.docs_index import build_index, load_index  # noqa: E402
+from actions.embeddings import get_embedder  # noqa: E402
+from actions.lexical_index import (build_lexical_index, load_lexical_index, passage_key,  # noqa: E402
+                                   reciprocal_rank_fusion, save_lexical_index)
+from actions.vector_index import VectorIndex  # noqa: E402
+
+
+def sample_queries(documents, count, words, seed):
+    rng = random.Random(seed)
+    queries = []
+    for position in rng.sample(range(len(documents)), min(count, len(documents))):
+        tokens = documents[position]['content'].split()
+        start = rng.randrange(max(len(tokens) - words, 0) + 1)
+        queries.append((position, ' '.join(tokens[start:start + words])))
+    return queries
+
+
+def measure(search, queries, top_k):
+    timings, hits = [], 0
+    for target, query in queries:
+        start = time.perf_counter()
+        keys = search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += target in keys[:top_k]
+    return np.percentile(timings, 50), np.percentile(timings, 99), hits / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['openai', 'local', 'hash'], default='hash')
+    parser.add_argument('--index', type=Path, help='Built docs index directory (default: build one in a temp dir)')
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--query-words', type=int, default=6)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp())
+    try:
+        start = time.perf_counter()
+        lexical = build_lexical_index()
+        build_s = time.perf_counter() - start
+        save_lexical_index(lexical, directory)
+        start = time.perf_counter()
+        lexical = load_lexical_index(directory)
+        load_ms = (time.perf_counter() - start) * 1000
+        print(f"BM25 index: {len(lexical)} passages, {len(lexical.terms)} terms, {len(lexical.postings)} postings, "
+              f"built in {build_s:.1f}s, loaded (memory-mapped) in {load_ms:.0f} ms")
+
+        embedder = get_embedder(args.backend)
+        docs_index = load_index(args.index, embedder.model_name) if args.index else None
+        docs_index = docs_index or build_index(embedder, index_dir=directory / 'vectors')
+        vectors = VectorIndex(docs_index.embeddings, normalized=docs_index.normalized)
+        vector_keys = [passage_key(document) for document in docs_index.documents]
+        lexical_keys = [passage_key(document) for document in lexical.documents]
+
+        queries = sample_queries(lexical.documents, args.queries, args.query_words, args.seed)
+        queries = [(lexical_keys[position], query) for position, query in queries]
+        query_vectors = dict(zip((query for _, query in queries), embedder.embed([query for _, query in queries])))
+        depth = args.top_k * 4
+
+        def lexical_search(query, top_k=args.top_k):
+            return [lexical_keys[i] for i in lexical.search(query, top_k)[0]]
+
+        def vector_search(query, top_k=args.top_k):
+            return [vector_keys[i] for i in vectors.search(query_vectors[query], top_k)[0]]
+
+        def hybrid_search(query):
+            return reciprocal_rank_fusion([lexical_search(query, depth), vector_search(query, depth)])
+
+        print(f"{len(queries)} known-item queries of {args.query_words} words, hit = passage in the top "
+              f"{args.top_k} ({embedder.model_name} embeddings, query embedding not timed):")
+        for label, search in (('bm25', lexical_search), ('vector', vector_search), ('hybrid (RRF)', hybrid_search)):
+            p50, p99, hit_rate = measure(search, queries, args.top_k)
+            print(f"  {label:<13} p50 {p50:6.3f} ms   p99 {p99:6.3f} ms   hit@{args.top_k} {hit_rate:6.1%}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark: per-turn logging cost, print() banners vs structured queue-backed logging
+
+Replays the log output of three kinds of turns on the caller thread: a keyword
+routed answer, a RAG answer (5 passages, GPT-4o answer) and an end of
+conversation carrying a 20-message transcript in its metadata. "print" is the
+sequence of print() calls the actions made before actions/structured_logging.py
+(banners, metadata dump, SMTP debug lines), "structured" the LOG calls that
+replaced them, through DroppingQueueHandler and a QueueListener thread.
+
+Both write to the same sink: a file, then a pipe that takes --slow-ms per
+write (a container log driver under pressure, a paused terminal). The time
+reported is what the turn waits for; the listener drain time is printed apart.
+
+Usage:
+    python benchmarks/bench_logging.py
+    python benchmarks/bench_logging.py --turns 3000 --slow-ms 1
+"""
+
+import argparse
+import contextlib
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.structured_logging import DroppingQueueHandler, JsonFormatter, StructuredLogger  # noqa: E402
+
+SESSION = 'a3f9c2e1-5b7d-4e8a-9c1f-2d6b8e4a7c3f'
+QUESTION = "Quelles sont les opportunités d'investissement dans les infrastructures au Grand Katanga ?"
+ANSWER = ("🏗️ **Opportunités au Grand Katanga**\n\n• Corridors routiers et ferroviaires vers la Zambie et l'Angola\n"
+          "• Transformation locale du cuivre et du cobalt\n• Logement et aménagement urbain à Lubumbashi\n") * 3
+PASSAGES = [(f"docs/expobeton_{year}_rapport.txt", 1200 * i, 1200 * (i + 1), 0.81 - i * 0.02)
+            for i, year in enumerate((2023, 2024, 2024, 2025, 2026))]
+METADATA = {
+    'user_info': {'name': 'Marie Kabongo', 'phone': '+243 81 234 5678', 'email': 'marie@example.cd'},
+    'messages': [{'sender': 'user' if i % 2 == 0 else 'bot', 'text': QUESTION if i % 2 == 0 else ANSWER[:240],
+                  'timestamp': datetime(2026, 4, 30, 10, i).isoformat() + 'Z'} for i in range(20)],
+}
+
+
+def print_keyword_turn():
+    print(f"🚨🚨🚨 [ACTION_ANSWER_EXPOBETON] CALLED! user_message={QUESTION}, intent=ask_history")
+    print(f"[MULTILINGUAL] Detected language: fr for message: {QUESTION[:50]}")
+    print(f"🎯 [ROUTER] Matched route 'history' for: {QUESTION.lower()[:50]}")
+
+
+def print_rag_turn():
+    print(f"🚨🚨🚨 [ACTION_ANSWER_EXPOBETON] CALLED! user_message={QUESTION}, intent=ask_investment")
+    print(f"[MULTILINGUAL] Detected language: fr for message: {QUESTION[:50]}")
+    print(f"🔍 Found {len(PASSAGES)} relevant passages for query: {QUESTION[:50]}...")
+    for i, (filename, start, end, similarity) in enumerate(PASSAGES):
+        print(f"  {i+1}. {filename} [{start}:{end}] (similarity: {similarity:.3f})")
+    print(f"⏱️ [GENERATION] time to first token {412:.0f} ms, total {2874:.0f} ms")
+    print(f"✅ OpenAI GPT-4o generated answer: {ANSWER[:100]}...")
+
+
+def print_end_turn():
+    print(f"\n{'='*60}")
+    print(f"[ACTION END CONVERSATION] Called for session: {SESSION}")
+    print(f"[ACTION END CONVERSATION] Metadata received: {METADATA}")
+    print(f"[ACTION END CONVERSATION] Has 'messages' in metadata: {'messages' in METADATA}")
+    print(f"[ACTION END CONVERSATION] Has 'user_info' in metadata: {'user_info' in METADATA}")
+    print(f"{'='*60}\n")
+    print(f"[ACTION END CONVERSATION] Using metadata from frontend")
+    print(f"[ACTION END CONVERSATION] Messages count: {len(METADATA['messages'])}")
+    print(f"[ACTION END CONVERSATION] User info: {METADATA['user_info']}")
+    print(f"[ACTION END CONVERSATION] Sending email...")
+    print(f"[EMAIL DEBUG] SMTP_SERVER: smtp.gmail.com")
+    print(f"[EMAIL DEBUG] SMTP_PORT: 587")
+    print(f"[EMAIL DEBUG] SMTP_USERNAME: bot@expobetonrdc.com")
+    print(f"[EMAIL DEBUG] SMTP_PASSWORD: ***")
+    print(f"[EMAIL DEBUG] NOTIFICATION_EMAIL: bot@expobetonrdc.com")
+    print(f"📬 [EMAIL] Conversation email queued for session: {SESSION}")
+    print(f"✅ [ACTION END CONVERSATION] Conversation ended and email sent for session: {SESSION}")
+
+
+def structured_turns(log):
+    def keyword_turn():
+        log.info('action_called', action='action_answer_expobeton', session=SESSION, text=QUESTION, intent='ask_history')
+        log.debug('language_detected', session=SESSION, language='fr')
+        log.info('route_matched', session=SESSION, route='history', stage='before_rag')
+
+    def rag_turn():
+        log.info('action_called', action='action_answer_expobeton', session=SESSION, text=QUESTION,
+                 intent='ask_investment')
+        log.debug('language_detected', session=SESSION, language='fr')
+        log.info('passages_found', query=QUESTION, count=len(PASSAGES), top_similarity=PASSAGES[0][3])
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('passages', query=QUESTION, passages=[f"{f} [{s}:{e}] {sim:.3f}" for f, s, e, sim in PASSAGES])
+        log.info('generation_done', session=SESSION, ttft_ms=412, total_ms=2874)
+        log.info('rag_answer', session=SESSION, answer=ANSWER)
+
+    def end_turn():
+        log.info('action_called', action='action_end_conversation', session=SESSION,
+                 has_messages='messages' in METADATA, has_user_info='user_info' in METADATA)
+        log.debug('end_conversation_metadata', session=SESSION, metadata=METADATA)
+        log.info('end_conversation_transcript', session=SESSION, source='frontend', messages=len(METADATA['messages']))
+        log.debug('smtp_config', server='smtp.gmail.com', port=587, username='bot@expobetonrdc.com',
+                  password_set=True, to='bot@expobetonrdc.com')
+        log.info('conversation_email_queued', session=SESSION, messages=len(METADATA['messages']), continued=False)
+        log.info('conversation_ended', session=SESSION)
+
+    return keyword_turn, rag_turn, end_turn
+
+
+class SlowSink:
+    """File-like object taking `delay` seconds per write, like a pipe nobody reads fast enough"""
+
+    def __init__(self, target, delay):
+        self.target = target
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+def run_prints(sink, turns):
+    functions = (print_keyword_turn, print_rag_turn, print_end_turn)
+    timings = []
+    with contextlib.redirect_stdout(sink):
+        for i in range(turns):
+            start = time.perf_counter()
+            functions[i % 3]()
+            sink.flush()  # PYTHONUNBUFFERED / line-buffered stdout, as in the containers
+            timings.append(time.perf_counter() - start)
+    return timings, 0.0
+
+
+def run_structured(sink, turns):
+    log_queue = queue.SimpleQueue()
+    handler = DroppingQueueHandler(log_queue, maxsize=10000)
+    output = logging.StreamHandler(sink)
+    output.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, output)
+    logger = logging.getLogger('bench.structured')
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    functions = structured_turns(StructuredLogger(logger))
+    listener.start()
+    timings = []
+    for i in range(turns):
+        start = time.perf_counter()
+        functions[i % 3]()
+        timings.append(time.perf_counter() - start)
+    drain_start = time.perf_counter()
+    listener.stop()
+    return timings, time.perf_counter() - drain_start, handler.dropped
+
+
+def report(label, timings, drain, dropped=0):
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings) * 1e6
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1e6
+    extra = f"  (listener drain {drain * 1000:.0f} ms, {dropped} dropped)" if drain else ''
+    print(f"  {label:<12} mean {mean:9.1f} µs/turn   p99 {p99:9.1f} µs{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=3000)
+    parser.add_argument('--slow-ms', type=float, default=0.5, help='delay per write of the slow sink')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for title, slow in (('file sink', 0.0), (f'slow pipe ({args.slow_ms} ms per write)', args.slow_ms / 1000)):
+            turns = args.turns if not slow else max(args.turns // 10, 30)
+            print(f"{title}, {turns} turns (keyword / RAG / end of conversation):")
+            sizes = {}
+            for label, run in (('print', run_prints), ('structured', run_structured)):
+                path = os.path.join(tmp, f'{label}.log')
+                with open(path, 'w', encoding='utf-8') as f:
+                    sink = SlowSink(f, slow) if slow else f
+                    timings, drain, *dropped = run(sink, turns)
+                report(label, timings, drain, *dropped)
+                sizes[label] = os.path.getsize(path) / turns
+            print(f"  log volume: {sizes['print']:.0f} -> {sizes['structured']:.0f} bytes/turn\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: cost of the latency spans and counters of actions/metrics.py
+
+Prints the cost of each metric operation, the cost of rendering /metrics,
+then runs keyword-routed turns of ActionAnswerExpoBeton with the metrics
+recorded and with them replaced by no-ops, to show the overhead per turn.
+
+Usage:
+    EMBEDDING_BACKEND=hash ACTION_STREAM_PORT=0 ACTION_METRICS_PORT=0 python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --repeat 2000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions import metrics  # noqa: E402
+
+MESSAGES = [
+    "Bonjour",
+    "Quelle est l'histoire d'ExpoBeton ?",
+    "Combien d'éditions ont eu lieu ?",
+    "Comment devenir ambassadeur ?",
+    "Comment ça va ?",
+]
+
+
+def per_call_us(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def micro(repeat):
+    registry = metrics.Registry()
+    counter = metrics.Counter('bench_total', 'Bench', ['outcome'], registry=registry)
+    histogram = metrics.Histogram('bench_seconds', 'Bench', ['stage'], registry=registry)
+
+    def span():
+        with histogram.time(stage='routing'):
+            pass
+
+    print(f"Counter.inc:             {per_call_us(lambda: counter.inc(outcome='rag'), repeat):6.2f} µs")
+    print(f"Histogram.observe:       {per_call_us(lambda: histogram.observe(0.042, stage='routing'), repeat):6.2f} µs")
+    print(f"Histogram.time() span:   {per_call_us(span, repeat):6.2f} µs")
+    for stage in ('language', 'routing', 'retrieval', 'query_embedding', 'vector_search', 'generation',
+                  'transcript_log', 'smtp', 'turn'):
+        histogram.observe(0.1, stage=stage)
+    for outcome in ('keyword', 'rag', 'keyword_after_rag', 'fallback'):
+        counter.inc(outcome=outcome)
+    print(f"render (13 series):      {per_call_us(registry.render, max(repeat // 100, 10)):6.1f} µs")
+
+
+class Tracker:
+    def __init__(self, sender_id, text):
+        self.sender_id = sender_id
+        self.latest_message = {'text': text, 'metadata': {}, 'intent': {'name': 'bench'}}
+
+
+class Dispatcher:
+    def utter_message(self, **kwargs):
+        pass
+
+
+def turns_per_second(action, repeat):
+    loop = asyncio.new_event_loop()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(repeat):
+            text = MESSAGES[i % len(MESSAGES)]
+            loop.run_until_complete(action.run(Dispatcher(), Tracker(f'bench-{i % 50}', text), {}))
+    loop.close()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100000, help='operations per micro-benchmark')
+    parser.add_argument('--turns', type=int, default=3000)
+    args = parser.parse_args()
+
+    micro(args.repeat)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from actions.actions import ActionAnswerExpoBeton
+    action = ActionAnswerExpoBeton()
+    turns_per_second(action, 200)  # warm-up (caches, language profiles)
+    with_metrics = turns_per_second(action, args.turns)
+    observe, inc = metrics.Histogram.observe, metrics.Counter.inc
+    metrics.Histogram.observe = lambda self, value, **labels: None
+    metrics.Counter.inc = lambda self, amount=1, **labels: None
+    try:
+        without_metrics = turns_per_second(action, args.turns)
+    finally:
+        metrics.Histogram.observe, metrics.Counter.inc = observe, inc
+    overhead = with_metrics - without_metrics
+    print(f"\nkeyword turn, metrics on:  {with_metrics:8.1f} µs")
+    print(f"keyword turn, metrics off: {without_metrics:8.1f} µs")
+    print(f"overhead per turn:         {overhead:8.1f} µs ({overhead / without_metrics * 100:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark: legacy keyword cascade of ActionAnswerExpoBeton vs the compiled KeywordRouter
+
+Every message of data/nlu.yml (plus a few hand-written ones) is routed with both
+implementations for both stages; the script fails if any routing differs, then
+prints the per-message routing cost.
+
+Usage:
+    python benchmarks/bench_router.py
+    python benchmarks/bench_router.py --repeat 50
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.intent_router import AFTER_RAG, BEFORE_RAG, KeywordRouter  # noqa: E402
+
+NLU_FILE = Path(__file__).resolve().parent.parent / 'data' / 'nlu.yml'
+
+EXTRA_MESSAGES = [
+    "Quelle est l'histoire d'ExpoBeton ?",
+    "Combien d'éditions ont eu lieu ?",
+    "Combien de jours dure l'événement ?",
+    "Bonjour, je m'appelle Marie",
+    "Oui au revoir",
+    "Au revoir et merci",
+    "Qui est le fondateur ?",
+    "Qui est le vice-président ?",
+    "C'est quoi le Grand Katanga ?",
+    "What is ExpoBeton?",
+    "Qu'a dit le président en 2024 ?",
+    "Rapport final 2024",
+    "Que s'est-il passé en 2023 ?",
+    "Quels sont les meilleurs stands ?",
+    "Quels types de stands ?",
+    "Les corridors africains",
+    "Zones économiques spéciales",
+    "Le rôle de Kinshasa",
+    "Qui a parlé à Kolwezi ?",
+    "Le ministre de l'industrie",
+    "Le gouverneur de Kinshasa",
+    "Tenke Fungurume",
+    "Le cadastre minier",
+    "La banque centrale",
+    "Quel est le thème ?",
+    "Parlez-moi du béton armé",
+]
+
+
+def legacy_route(user_question, stage):
+    """Answer key the if-cascade of ActionAnswerExpoBeton.run returned, check for check"""
+    if stage == BEFORE_RAG:
+        user_question_clean = user_question.replace('?', '').replace('!', '').strip()
+        if any(phrase in user_question_clean for phrase in ['how are you', 'comment allez-vous', 'comment vas-tu', 'comment allez vous', 'comment vas tu', 'ça va', 'ca va', 'cómo estás', '如何', 'как дела', 'كيف حالك']):
+            return 'how_are_you'
+        if any(word in user_question for word in ['histoire', 'history', 'historique']):
+            return 'history'
+        if any(word in user_question for word in ['combien', 'how many']) and any(word in user_question for word in ['édition', 'edition']):
+            return 'editions_count'
+        if any(word in user_question for word in ['bonjour', 'salut', 'hello', 'hi', 'bonsoir', 'hola', 'привет', '你好', 'مرحبا']):
+            return 'greeting'
+        if any(word in user_question for word in ['merci', 'thanks', 'thank you', 'thank', 'danke', 'gracias', 'спасибо', 'شكرا']):
+            return 'thank_you'
+        if any(word in user_question for word in ['inscription', 'register', 'participer', 'participate', 'subscribe', 'join', 'enroll', 'comment participer']):
+            return 'registration'
+        is_goodbye = any(word in user_question for word in ['au revoir', 'bye', 'goodbye', 'à bientôt', 'adieu', 'ciao', 'adiós', 'пока', '再见', 'مع السلامة'])
+        is_question = any(word in user_question for word in ['oui', 'comment', 'qui', 'quoi', 'où', 'quand', 'pourquoi'])
+        if is_goodbye and not is_question:
+            return 'goodbye'
+        if any(word in user_question for word in ['histoire', 'history', 'historique']):
+            return 'history'
+        if any(word in user_question for word in ['combien', 'how many']) and any(word in user_question for word in ['édition', 'edition']):
+            return 'editions_count'
+        for variant in ['lubumbashi', 'lubumabshi', 'lubumbachi', 'loubumbashi', 'lubumbash', 'lumumbashi']:
+            if variant in user_question:
+                return 'lubumbashi'
+        if any(word in user_question for word in ['ambassadeur', 'ambassador', 'devenir', 'rejoindre', 'become']):
+            return 'ambassador'
+        return None
+
+    if any(word in user_question for word in ['fondateur', 'créateur', 'président', 'qui est', 'qui sont']):
+        if 'jean' in user_question or 'bamanisa' in user_question or 'fondateur' in user_question or 'créateur' in user_question:
+            return 'founder'
+        if 'momo' in user_question or 'sungunza' in user_question or 'vice' in user_question:
+            return 'vice_president'
+    if any(word in user_question for word in ['quoi', 'what', 'est-ce', 'c\'est', 'qué', '什么', 'что', 'ما']):
+        if 'grand katanga' in user_question or 'katanga' in user_question:
+            return 'grand_katanga'
+        if 'expobeton' in user_question or 'expbeton' in user_question or 'expo beton' in user_question or 'expo béton' in user_question:
+            return 'what_is_expobeton'
+    if any(word in user_question for word in ['date', 'when', 'quand', 'cuándo', 'когда', '什么时候', 'متى']):
+        return 'dates'
+    if any(word in user_question for word in ['lieu', 'where', 'où', 'dónde', 'где', '哪里', 'أين']):
+        return 'location'
+    if any(word in user_question for word in ['combien de jours', 'durée', 'how many days', 'duration']):
+        return 'duration'
+    if any(word in user_question for word in ['villes', 'quelles villes', 'cities', 'which cities']) and 'katanga' in user_question:
+        return 'katanga_cities'
+    if 'kolwezi' in user_question:
+        return 'kolwezi'
+    if 'kalemie' in user_question:
+        return 'kalemie'
+    if 'kamoa' in user_question:
+        return 'kamoa'
+    if any(word in user_question for word in ['président', 'president', 'discours', 'speech']) and ('2024' in user_question or 'dit' in user_question or 'said' in user_question or 'ouverture' in user_question or 'opening' in user_question):
+        return 'presidential_speech_2024'
+    if any(word in user_question for word in ['rapport', 'report']) and '2024' in user_question:
+        return 'final_report_2024'
+    if ('2023' in user_question or 'sept' in user_question) and any(word in user_question for word in ['passé', 'happened', 'edition', 'édition']):
+        return 'edition_2023'
+    if any(word in user_question for word in ['stand', 'stands', 'types']) and not any(word in user_question for word in ['meilleur', 'best']):
+        return 'stands'
+    if any(word in user_question for word in ['inscrire', 'inscription', 's\'inscrire', 'register', 'registration']):
+        return 'how_to_register'
+    if any(word in user_question for word in ['corridor', 'corridors']) and 'africain' in user_question:
+        return 'african_corridors'
+    if any(word in user_question for word in ['zes', 'zone', 'zones', 'zés']) and any(word in user_question for word in ['économique', 'economic', 'spéciale', 'special']):
+        return 'special_economic_zones'
+    if any(word in user_question for word in ['corridor ouest', 'ouest', 'west corridor']):
+        return 'west_corridor'
+    if any(word in user_question for word in ['kinshasa', 'rôle', 'role']) and 'kinshasa' in user_question:
+        return 'kinshasa_role'
+    if ('2023' in user_question or 'kolwezi' in user_question) and any(word in user_question for word in ['parlé', 'spoke', 'intervenant', 'speaker']):
+        return 'speakers_2023'
+    if any(word in user_question for word in ['ministre', 'minister']) and any(word in user_question for word in ['industrie', 'industry']):
+        return 'minister_industry'
+    if any(word in user_question for word in ['gouverneur', 'governor']) and 'kinshasa' in user_question:
+        return 'governor_kinshasa'
+    if 'tfm' in user_question or 'tenke' in user_question or 'fungurume' in user_question:
+        return 'tfm'
+    if 'foner' in user_question:
+        return 'foner'
+    if 'cami' in user_question or 'cadastre minier' in user_question:
+        return 'cami'
+    if 'bcc' in user_question or 'banque centrale' in user_question:
+        return 'bcc'
+    if any(word in user_question for word in ['thème', 'theme', 'sujet']):
+        return 'theme'
+    return None
+
+
+def load_messages():
+    """Lowercased NLU examples (entity annotations removed) plus EXTRA_MESSAGES"""
+    with open(NLU_FILE, 'r', encoding='utf-8') as f:
+        nlu = yaml.safe_load(f)['nlu']
+    messages = []
+    for item in nlu:
+        for line in item.get('examples', '').splitlines():
+            line = line.strip()
+            if line.startswith('- '):
+                messages.append(re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', line[2:]))
+    return [m.lower() for m in messages + EXTRA_MESSAGES]
+
+
+def measure(route, messages, repeat):
+    timings = []
+    for message in messages:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            route(message)
+        timings.append((time.perf_counter() - start) / repeat * 1e6)
+    timings = np.array(timings)
+    return np.percentile(timings, 50), np.percentile(timings, 95), timings.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='Routing calls per message and timing')
+    args = parser.parse_args()
+
+    router = KeywordRouter.from_yaml()
+    messages = load_messages()
+    print(f"{len(messages)} messages, {len(router.routes)} routes, {len(router.keywords)} keywords")
+
+    mismatches = []
+    for message in messages:
+        for stage in (BEFORE_RAG, AFTER_RAG):
+            expected = legacy_route(message, stage)
+            actual = router.route(message, stage)
+            if expected != actual:
+                mismatches.append((stage, message, expected, actual))
+    for stage, message, expected, actual in mismatches:
+        print(f"MISMATCH [{stage}] {message!r}: legacy={expected} router={actual}")
+    if mismatches:
+        sys.exit(1)
+    print("Routing identical to the legacy cascade for every message and stage")
+
+    def legacy(message):
+        return legacy_route(message, BEFORE_RAG) or legacy_route(message, AFTER_RAG)
+
+    def compiled(message):
+        mask = router.match(message)
+        return router.route(message, BEFORE_RAG, mask) or router.route(message, AFTER_RAG, mask)
+
+    for label, route in (('legacy cascade', legacy), ('KeywordRouter', compiled)):
+        p50, p95, mean = measure(route, messages, args.repeat)
+        print(f"{label:<16} p50 {p50:7.2f} µs  p95 {p95:7.2f} µs  mean {mean:7.2f} µs per message")
+
+
+if __name__ == '__main__':
+    main()
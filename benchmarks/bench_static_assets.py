@@ -0,0 +1,152 @@
+"""
+Benchmark: chat page load from disk vs from the in-memory precompressed assets
+
+Loads the chat page (/, then the stylesheet and script it links to) from
+static_server.StaticServer in two ways:
+
+- "disk": the files read from disk at each request, uncompressed; a repeat
+  visit revalidates each file with If-Modified-Since (Last-Modified of
+  SimpleHTTPRequestHandler);
+- "memory": the AssetCache, gzip (or brotli when installed) chosen from
+  Accept-Encoding; a repeat visit revalidates the page with If-None-Match and
+  keeps the content-hashed assets without asking (immutable).
+
+--clients threads load the page for --duration seconds, as first visits
+then as repeat visits. Bytes on the wire count the status line, headers and
+body of every response.
+
+Usage:
+    python benchmarks/bench_static_assets.py
+    python benchmarks/bench_static_assets.py --clients 16 --duration 10
+"""
+
+import argparse
+import functools
+import gzip
+import http.client
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from static_server import StaticFileHandler, StaticServer  # noqa: E402
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+LINKED = re.compile(rb'(?:src|href)="(/web/[^"]+)"')
+
+
+class MemoryHandler(StaticFileHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class DiskHandler(MemoryHandler):
+    def cached_asset(self):
+        return None
+
+
+def fetch(connection, path, headers):
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    wire = len(f'HTTP/1.1 {response.status} {response.reason}\r\n\r\n') + len(body)
+    wire += sum(len(name) + len(value) + 4 for name, value in response.getheaders())
+    return response, body, wire
+
+
+def load_page(connection, cache):
+    """One page load; `cache` holds the validators and bodies kept by the browser (empty on a first visit)"""
+    wire = requests = 0
+    headers = {'Accept-Encoding': ACCEPT_ENCODING}
+    page_validators = cache.get('/', {})
+    response, body, size = fetch(connection, '/', {**headers, **page_validators})
+    wire, requests = wire + size, requests + 1
+    if response.status == 200:
+        cache['/'] = validators(response)
+        cache['page'] = decoded(response, body)
+    for url in LINKED.findall(cache['page']):
+        url = url.decode()
+        if url in cache.get('immutable', ()):
+            continue
+        response, _, size = fetch(connection, url, {**headers, **cache.get(url, {})})
+        wire, requests = wire + size, requests + 1
+        if 'immutable' in (response.getheader('Cache-Control') or ''):
+            cache.setdefault('immutable', set()).add(url)
+        elif response.status == 200:
+            cache[url] = validators(response)
+    return wire, requests
+
+
+def decoded(response, body):
+    encoding = response.getheader('Content-Encoding')
+    if encoding == 'br':
+        import brotli
+        return brotli.decompress(body)
+    return gzip.decompress(body) if encoding == 'gzip' else body
+
+
+def validators(response):
+    if response.getheader('ETag'):
+        return {'If-None-Match': response.getheader('ETag')}
+    if response.getheader('Last-Modified'):
+        return {'If-Modified-Since': response.getheader('Last-Modified')}
+    return {}
+
+
+def drive(port, clients, duration, repeat):
+    latencies, wire, requests = [], [0], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        cache = {}
+        if repeat:
+            load_page(connection, cache)
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            size, count = load_page(connection, cache if repeat else {})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                wire[0] += size
+                requests[0] += count
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), wire[0], requests[0]
+
+
+def run(label, handler, args):
+    server = StaticServer(('127.0.0.1', 0))
+    server.RequestHandlerClass = functools.partial(handler, directory=str(ROOT))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for visit, repeat in (('first visit', False), ('repeat visit', True)):
+        latencies, wire, requests = drive(server.server_address[1], args.clients, args.duration, repeat)
+        count = len(latencies)
+        p50 = latencies[count // 2] * 1000
+        p99 = latencies[max(int(count * 0.99) - 1, 0)] * 1000
+        print(f"  {label:<7} {visit:<13} {count / args.duration:8.1f} pages/s   p50 {p50:6.2f} ms   "
+              f"p99 {p99:6.2f} ms   {wire / count / 1024:6.1f} KB/page   {requests / count:.1f} requests/page")
+    server.shutdown()
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=3)
+    args = parser.parse_args()
+    print(f"{args.clients} clients loading the chat page, {args.duration:.0f}s per scenario:")
+    run('disk', DiskHandler, args)
+    run('memory', MemoryHandler, args)
+
+
+if __name__ == '__main__':
+    main()
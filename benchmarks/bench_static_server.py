@@ -0,0 +1,191 @@
+"""
+Benchmark: static_server.py, single-threaded with urllib vs threaded with pooled upstream
+
+Serves the chat page and proxies webhooks to a stand-in Rasa server in two ways:
+
+- "single-threaded": the server before this change, an HTTPServer handling
+  one request at a time (HTTP/1.0, os.chdir() around each file) opening a new
+  urllib connection to Rasa per webhook;
+- "threaded + pool": the current static_server.StaticServer, a thread per
+  request (HTTP/1.1 keep-alive) and keep-alive connections to Rasa reused
+  from static_server.UpstreamPool.
+
+The stand-in Rasa answers each webhook after --rasa-ms. --chat-clients
+threads send messages while --static-clients threads load web/chat-widget.js,
+for --duration seconds: with one thread, every file waits behind the chatbot
+turns in progress.
+
+Usage:
+    python benchmarks/bench_static_server.py
+    python benchmarks/bench_static_server.py --chat-clients 16 --static-clients 8 --rasa-ms 200
+"""
+
+import argparse
+import functools
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from static_server import StaticFileHandler, StaticServer  # noqa: E402
+
+
+class RasaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay):
+        super().__init__(('127.0.0.1', 0), RasaHandler)
+        self.delay = delay
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class RasaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Sanic writes a response at once
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.delay)
+        body = json.dumps([{'recipient_id': data['sender'], 'text': 'ExpoBeton a lieu en mai.'}]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LegacyHandler(SimpleHTTPRequestHandler):
+    """The handler before the threaded server (routing left out: the benchmark asks for /web/ paths)"""
+
+    rasa_url = None
+
+    def do_GET(self):
+        original_cwd = os.getcwd()
+        os.chdir(ROOT)
+        try:
+            return SimpleHTTPRequestHandler.do_GET(self)
+        finally:
+            os.chdir(original_cwd)
+
+    def do_POST(self):
+        content_length = int(self.headers.get('Content-Length', 0))
+        post_data = self.rfile.read(content_length)
+        req = urllib.request.Request(f"{self.rasa_url}{self.path}", data=post_data,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req) as response:
+                response_data = response.read()
+                self.send_response(response.status)
+                for header, value in response.headers.items():
+                    self.send_header(header, value)
+                self.end_headers()
+                self.wfile.write(response_data)
+        except urllib.error.URLError:
+            self.send_response(503)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietHandler(StaticFileHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def drive(port, args):
+    results = {'chat': [], 'static': []}
+    errors = {'chat': 0, 'static': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.duration
+
+    def client(kind, index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        body = json.dumps({'sender': f'user-{index}', 'message': 'Quand a lieu ExpoBeton ?'})
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                if kind == 'chat':
+                    connection.request('POST', '/webhooks/rest/webhook', body, {'Content-Type': 'application/json'})
+                else:
+                    connection.request('GET', '/web/chat-widget.js')
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            with lock:
+                if ok:
+                    results[kind].append(time.perf_counter() - start)
+                else:
+                    errors[kind] += 1
+
+    threads = [threading.Thread(target=client, args=('chat', i)) for i in range(args.chat_clients)]
+    threads += [threading.Thread(target=client, args=('static', i)) for i in range(args.static_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def run(label, server, rasa, args):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connections_before = rasa.connections
+    results, errors = drive(server.server_address[1], args)
+    server.shutdown()
+    server.server_close()
+    line = f"  {label:<17}"
+    for kind in ('static', 'chat'):
+        latencies = sorted(results[kind])
+        count = len(latencies)
+        p50 = latencies[count // 2] * 1000 if count else 0
+        p99 = latencies[max(int(count * 0.99) - 1, 0)] * 1000 if count else 0
+        line += (f" {kind} {count / args.duration:7.1f} req/s p50 {p50:6.1f} ms p99 {p99:6.1f} ms"
+                 f" (errors {errors[kind]}) |")
+    print(f"{line} Rasa connections {rasa.connections - connections_before}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chat-clients', type=int, default=8)
+    parser.add_argument('--static-clients', type=int, default=4)
+    parser.add_argument('--rasa-ms', type=float, default=50, help='stand-in Rasa latency per message')
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    rasa = RasaServer(args.rasa_ms / 1000)
+    threading.Thread(target=rasa.serve_forever, daemon=True).start()
+    rasa_url = f'http://127.0.0.1:{rasa.server_address[1]}'
+    print(f"{args.chat_clients} chat clients ({args.rasa_ms} ms per Rasa turn) + {args.static_clients} static "
+          f"clients, {args.duration:.0f}s each:")
+
+    LegacyHandler.rasa_url = rasa_url
+    legacy = HTTPServer(('127.0.0.1', 0), LegacyHandler)
+    run('single-threaded', legacy, rasa, args)
+
+    server = StaticServer(('127.0.0.1', 0), upstream_urls=[rasa_url])
+    server.RequestHandlerClass = functools.partial(QuietHandler, directory=str(ROOT))
+    run('threaded + pool', server, rasa, args)
+    print(f"  upstream pool: {server.upstream.backends[0].pool.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark: static_server.py webhooks over 1, 2 and 4 Rasa servers
+
+Each stand-in Rasa server handles --rasa-concurrency messages at a time,
+--rasa-ms each (a Rasa process is mostly bound by its CPU), so adding servers
+behind the same static_server.StaticServer should add throughput.
+--clients threads hold conversations of --turns messages, then start a new
+one (new sender). Reported per run: messages/s, latency, the share of each
+server and the conversations whose turns did not all reach the same server.
+The last run adds an unreachable server to the pool: it must cost no error.
+
+Usage:
+    python benchmarks/bench_upstreams.py
+    python benchmarks/bench_upstreams.py --clients 32 --rasa-concurrency 4 --rasa-ms 20
+"""
+
+import argparse
+import functools
+import http.client
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from static_server import StaticFileHandler, StaticServer  # noqa: E402
+
+
+class RasaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay, concurrency):
+        super().__init__(('127.0.0.1', 0), RasaHandler)
+        self.delay = delay
+        self.slots = threading.Semaphore(concurrency)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class RasaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Sanic writes a response at once
+
+    def do_GET(self):
+        self.reply(b'Hello from Rasa')
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.slots:
+            time.sleep(self.server.delay)
+        self.reply(json.dumps([{'recipient_id': data['sender'], 'text': 'ok',
+                                'server': self.server.url}]).encode())
+
+    def reply(self, body):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietHandler(StaticFileHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def drive(port, args):
+    latencies, errors, shares = [], [0], Counter()
+    conversations = {}  # sender -> servers reached
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.duration
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conversation = 0
+        while time.perf_counter() < stop:
+            sender = f'user-{index}-{conversation}'
+            conversation += 1
+            for _ in range(args.turns):
+                body = json.dumps({'sender': sender, 'message': 'Quand a lieu ExpoBeton ?'})
+                start = time.perf_counter()
+                try:
+                    connection.request('POST', '/webhooks/rest/webhook', body, {'Content-Type': 'application/json'})
+                    response = connection.getresponse()
+                    reply = response.read()
+                    server = json.loads(reply)[0]['server'] if response.status == 200 else None
+                except (OSError, http.client.HTTPException, ValueError):
+                    connection.close()
+                    server = None
+                with lock:
+                    if server is None:
+                        errors[0] += 1
+                        continue
+                    latencies.append(time.perf_counter() - start)
+                    shares[server] += 1
+                    conversations.setdefault(sender, set()).add(server)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    split = sum(1 for servers in conversations.values() if len(servers) > 1)
+    return sorted(latencies), errors[0], shares, split, len(conversations)
+
+
+def run(label, urls, args):
+    server = StaticServer(('127.0.0.1', 0), upstream_urls=urls)
+    server.RequestHandlerClass = functools.partial(QuietHandler, directory=str(ROOT))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies, errors, shares, split, conversations = drive(server.server_address[1], args)
+    server.shutdown()
+    server.server_close()
+    count = len(latencies)
+    p50 = latencies[count // 2] * 1000 if count else 0
+    p99 = latencies[max(int(count * 0.99) - 1, 0)] * 1000 if count else 0
+    share = ' '.join(f'{shares[url] * 100 / max(count, 1):.0f}%' for url in urls)
+    print(f"  {label:<22} {count / args.duration:7.1f} msg/s   p50 {p50:6.1f} ms   p99 {p99:6.1f} ms   "
+          f"errors {errors}   share {share}   split conversations {split}/{conversations}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--turns', type=int, default=4, help='messages per conversation')
+    parser.add_argument('--rasa-ms', type=float, default=20, help='time per message on a Rasa server')
+    parser.add_argument('--rasa-concurrency', type=int, default=2, help='messages handled at once per server')
+    parser.add_argument('--duration', type=float, default=4)
+    args = parser.parse_args()
+
+    servers = [RasaServer(args.rasa_ms / 1000, args.rasa_concurrency) for _ in range(4)]
+    for rasa in servers:
+        threading.Thread(target=rasa.serve_forever, daemon=True).start()
+    print(f"{args.clients} clients, {args.turns} turns per conversation, {args.rasa_ms} ms per message, "
+          f"{args.rasa_concurrency} at once per Rasa server, {args.duration:.0f}s each:")
+    for count in (1, 2, 4):
+        run(f'{count} server(s)', [rasa.url for rasa in servers[:count]], args)
+    run('2 servers + 1 down', [servers[0].url, 'http://127.0.0.1:1', servers[1].url], args)
+
+
+if __name__ == '__main__':
+    main()
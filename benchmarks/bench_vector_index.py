@@ -0,0 +1,93 @@
+"""
+Benchmark: brute-force cosine search (old find_relevant_docs) vs VectorIndex exact and IVF modes
+
+Usage:
+    python benchmarks/bench_vector_index.py                      # synthetic 30k x 1536 corpus
+    python benchmarks/bench_vector_index.py --index docs_index   # real docs index
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from actions.vector_index import VectorIndex  # noqa: E402
+
+
+def brute_force(doc_embeddings, query_embedding, top_k):
+    """The search as find_relevant_docs() used to do it, on every query"""
+    doc_embeddings_array = np.array(doc_embeddings)
+    similarities = np.dot(doc_embeddings_array, query_embedding) / (
+        np.linalg.norm(doc_embeddings_array, axis=1) * np.linalg.norm(query_embedding)
+    )
+    return np.argsort(similarities)[-top_k:][::-1]
+
+
+def synthetic_corpus(n, dim, clusters, seed=0):
+    """Clustered random vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def measure(search, queries):
+    timings = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    return results, np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def recall(results, reference):
+    hits = sum(len(set(r.tolist()) & set(ref.tolist())) for r, ref in zip(results, reference))
+    return hits / sum(len(ref) for ref in reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', type=Path, help='Use the embeddings of a built docs index directory')
+    parser.add_argument('-n', type=int, default=30000, help='Synthetic corpus size')
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    if args.index:
+        embeddings = np.load(args.index / 'embeddings.npy', mmap_mode='r')
+        picks = rng.choice(len(embeddings), args.queries)
+        queries = np.asarray(embeddings[picks]) + 0.1 * rng.normal(size=(args.queries, embeddings.shape[1])).astype(np.float32)
+    else:
+        embeddings = synthetic_corpus(args.n, args.dim, clusters=200)
+        queries = synthetic_corpus(args.queries, args.dim, clusters=200, seed=2)
+    print(f"Corpus: {embeddings.shape[0]} x {embeddings.shape[1]}, {args.queries} queries, top_k={args.top_k}")
+
+    # Exact search is the recall reference (the old path ranks NaN similarities
+    # of all-zero rows first, so it cannot serve as ground truth)
+    exact = VectorIndex(embeddings, mode='exact')
+    reference, p50, p95 = measure(lambda q: exact.search(q, args.top_k)[0], queries)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        results, old_p50, old_p95 = measure(lambda q: brute_force(embeddings, q, args.top_k), queries)
+    print(f"{'brute force (old)':<24} p50 {old_p50:8.3f} ms  p95 {old_p95:8.3f} ms  recall {recall(results, reference):.3f}")
+    print(f"{'exact (argpartition)':<24} p50 {p50:8.3f} ms  p95 {p95:8.3f} ms  recall 1.000")
+
+    start = time.perf_counter()
+    ivf = VectorIndex(embeddings, mode='ivf')
+    print(f"IVF training: {ivf.nlist} lists in {time.perf_counter() - start:.2f}s")
+    for nprobe in args.nprobe:
+        results, p50, p95 = measure(lambda q: ivf.search(q, args.top_k, nprobe=nprobe)[0], queries)
+        print(f"{'ivf nprobe=' + str(nprobe):<24} p50 {p50:8.3f} ms  p95 {p95:8.3f} ms  recall {recall(results, reference):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Local, deterministic stand-ins for OpenAI and the SMTP server, for load tests
+
+FakeOpenAI answers the endpoints the bot uses (POST /v1/chat/completions,
+streamed or not, and POST /v1/embeddings) with content derived from the
+request, so the same question always gets the same answer and vector. The
+latency is injectable: time to first token, delay per streamed token, the
+embedding latency, a +/- jitter fraction drawn from a seeded generator, and an
+error rate (HTTP 500). FakeSMTP accepts EHLO, AUTH, MAIL/RCPT/DATA with a delay
+per reply and only counts the messages.
+
+Point the servers at them with (values printed at start):
+    OPENAI_BASE_URL=http://127.0.0.1:8999/v1 OPENAI_API_KEY=sk-fake
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 SMTP_USERNAME=bot SMTP_PASSWORD=fake
+
+Usage:
+    python benchmarks/fake_services.py --ttft 0.4 --token-delay 0.02 --smtp-delay 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Text
+
+import numpy as np
+
+ANSWER_TEMPLATE = ("📋 D'après les documents ExpoBeton RDC, voici les éléments de réponse concernant « {topic} » : "
+                   "l'édition 2026 se tient à Lubumbashi, avec des conférences, des espaces B2B et B2G et des "
+                   "visites de chantiers. Contactez l'équipe d'organisation pour les détails pratiques.")
+
+
+class LatencyModel:
+    """Delays with a +/- `jitter` fraction, from a generator seeded once for the whole run"""
+
+    def __init__(self, jitter: float = 0.2, seed: int = 42):
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, seconds: float) -> float:
+        if seconds <= 0:
+            return 0.0
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        return seconds * factor
+
+    def fail(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+
+def fake_embedding(text: Text, dim: int) -> List[float]:
+    """Unit vector seeded by the text: identical inputs always get identical embeddings"""
+    seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0, ttft: float = 0.4, token_delay: float = 0.02, embedding_latency: float = 0.05,
+                 embedding_dim: int = 1536, error_rate: float = 0.0, jitter: float = 0.2, seed: int = 42):
+        super().__init__(('127.0.0.1', port), OpenAIHandler)
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.embedding_latency = embedding_latency
+        self.embedding_dim = embedding_dim
+        self.error_rate = error_rate
+        self.latency = LatencyModel(jitter, seed)
+        self.stats = {'chat_completions': 0, 'embeddings': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> Text:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def count(self, key: Text) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def start(self) -> 'FakeOpenAI':
+        threading.Thread(target=self.serve_forever, name='fake-openai', daemon=True).start()
+        return self
+
+
+class OpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def send_json(self, status: int, payload: Dict[Text, Any]) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if server.latency.fail(server.error_rate):
+            server.count('errors')
+            self.send_json(500, {'error': {'message': 'Injected failure', 'type': 'server_error'}})
+        elif self.path.endswith('/chat/completions'):
+            server.count('chat_completions')
+            self.chat_completion(request)
+        elif self.path.endswith('/embeddings'):
+            server.count('embeddings')
+            self.embeddings(request)
+        else:
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+    def chat_completion(self, request: Dict[Text, Any]) -> None:
+        server = self.server
+        question = request['messages'][-1]['content']
+        topic = re.sub(r'\s+', ' ', question.split('\n')[0].replace('Question:', '')).strip()[:80]
+        tokens = re.findall(r'\S+\s*', ANSWER_TEMPLATE.format(topic=topic))
+        time.sleep(server.latency(server.ttft))
+        if not request.get('stream'):
+            time.sleep(server.latency(server.token_delay * len(tokens)))
+            self.send_json(200, {
+                'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': request.get('model', 'gpt-4o'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+                'usage': {'prompt_tokens': len(question) // 4, 'completion_tokens': len(tokens),
+                          'total_tokens': len(question) // 4 + len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send_chunk(data: bytes) -> None:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(server.latency(server.token_delay))
+            chunk = {'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': request.get('model', 'gpt-4o'),
+                     'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+            send_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        send_chunk(b"data: [DONE]\n\n")
+        send_chunk(b'')
+
+    def embeddings(self, request: Dict[Text, Any]) -> None:
+        server = self.server
+        inputs = request['input'] if isinstance(request['input'], list) else [request['input']]
+        dim = request.get('dimensions') or server.embedding_dim
+        time.sleep(server.latency(server.embedding_latency))
+        self.send_json(200, {
+            'object': 'list', 'model': request.get('model', 'text-embedding-3-small'),
+            'data': [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(str(text), dim)}
+                     for i, text in enumerate(inputs)],
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0},
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0, delay: float = 0.05, jitter: float = 0.2, seed: int = 42):
+        super().__init__(('127.0.0.1', port), SMTPHandler)
+        self.delay = delay  # seconds per reply
+        self.latency = LatencyModel(jitter, seed)
+        self.stats = {'connections': 0, 'messages': 0, 'bytes': 0}
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> 'FakeSMTP':
+        threading.Thread(target=self.serve_forever, name='fake-smtp', daemon=True).start()
+        return self
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: Text) -> None:
+        time.sleep(self.server.latency(self.server.delay))
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.stats['connections'] += 1
+        self.reply("220 localhost ESMTP fake")
+        while True:
+            line = self.rfile.readline().decode(errors='replace').rstrip('\r\n')
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.wfile.write(b"250-localhost\r\n")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == 'AUTH':
+                self.reply("235 Authentication successful")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while (data := self.rfile.readline()) not in (b".\r\n", b''):
+                    size += len(data)
+                self.server.stats['messages'] += 1
+                self.server.stats['bytes'] += size
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+
+def service_env(openai_server: FakeOpenAI, smtp_server: FakeSMTP) -> Dict[Text, Text]:
+    """Environment variables pointing the action server and flask_app.py at the stand-ins"""
+    return {
+        'OPENAI_BASE_URL': openai_server.base_url,
+        'OPENAI_API_KEY': 'sk-fake',
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(smtp_server.port),
+        'SMTP_USERNAME': 'bot',
+        'SMTP_PASSWORD': 'fake',
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group('stand-ins')
+    group.add_argument('--ttft', type=float, default=0.4, help='fake GPT-4o time to first token (s)')
+    group.add_argument('--token-delay', type=float, default=0.02, help='fake GPT-4o delay per token (s)')
+    group.add_argument('--embedding-latency', type=float, default=0.05, help='fake embeddings latency (s)')
+    group.add_argument('--embedding-dim', type=int, default=1536, help='must match the docs index')
+    group.add_argument('--llm-error-rate', type=float, default=0.0, help='fraction of OpenAI calls failing')
+    group.add_argument('--smtp-delay', type=float, default=0.05, help='fake SMTP delay per reply (s)')
+    group.add_argument('--jitter', type=float, default=0.2, help='+/- fraction applied to every delay')
+    group.add_argument('--seed', type=int, default=42)
+
+
+def start_services(args, openai_port: int = 0, smtp_port: int = 0):
+    openai_server = FakeOpenAI(openai_port, args.ttft, args.token_delay, args.embedding_latency, args.embedding_dim,
+                               args.llm_error_rate, args.jitter, args.seed).start()
+    smtp_server = FakeSMTP(smtp_port, args.smtp_delay, args.jitter, args.seed).start()
+    return openai_server, smtp_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--openai-port', type=int, default=8999)
+    parser.add_argument('--smtp-port', type=int, default=2525)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    openai_server, smtp_server = start_services(args, args.openai_port, args.smtp_port)
+    print(' '.join(f"{key}={value}" for key, value in service_env(openai_server, smtp_server).items()))
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps({'openai': openai_server.stats, 'smtp': smtp_server.stats}))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+"""
+Load test: replays realistic conversations against /webhooks/rest/webhook
+
+Drives flask_app.py (port 5000) or the Rasa REST channel (port 5005) with
+conversations of --session-length messages per sender, in one of two modes:
+
+- closed loop (--concurrency N): N virtual users, each starting a new
+  conversation as soon as the previous one ends (+ --think-time);
+- open loop (--rate R): conversations arrive as a Poisson process so that R
+  messages per second are offered whatever the response times. Latency is
+  measured from the scheduled send time, so queueing behind --max-sessions
+  counts (no coordinated omission).
+
+The messages are drawn (--mix) from the intent examples of data/nlu.yml, the
+user steps of tests/e2e_test_cases and the user lines of past transcript logs
+(conversations.log, --logs). --launch starts the servers for the run with
+OPENAI_BASE_URL and SMTP_* pointing at the local stand-ins of
+benchmarks/fake_services.py (deterministic answers, injectable latency); without
+--launch, start them yourself with `python benchmarks/fake_services.py`.
+
+The report (JSON, --output) has p50/p95/p99 latency, throughput and error rate,
+overall and per source, with the commit it was measured on; --compare prints the
+changes against an earlier report.
+
+Usage:
+    python benchmarks/loadtest.py --target flask --concurrency 20 --duration 60
+    python benchmarks/loadtest.py --target rasa --rate 5 --duration 120 --output after.json --compare before.json
+    python benchmarks/loadtest.py --target flask --concurrency 10 \\
+        --launch "rasa run actions" --launch "python flask_app.py" --wait-url http://127.0.0.1:5000/health
+"""
+
+import argparse
+import glob
+import http.client
+import json
+import os
+import random
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Text, Tuple
+from urllib.parse import urlparse
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_services import add_arguments, service_env, start_services  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+TARGETS = {
+    'flask': 'http://127.0.0.1:5000/webhooks/rest/webhook',
+    'rasa': 'http://127.0.0.1:5005/webhooks/rest/webhook',
+}
+DEFAULT_MIX = 'nlu=0.5,e2e=0.1,logs=0.4'
+
+_ANNOTATION = re.compile(r'\[([^\]]+)\](?:\([^)]*\)|\{[^}]*\})')
+_TRANSCRIPT_LINE = re.compile(r'^\[\d{2}:\d{2}:\d{2}\] Utilisateur: (.+)$')
+
+
+def nlu_questions(path: Path = PROJECT_ROOT / 'data' / 'nlu.yml') -> List[Text]:
+    """Intent examples, entity annotations replaced by their text"""
+    with open(path, encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    questions = []
+    for item in data.get('nlu', []):
+        if 'intent' not in item:
+            continue
+        for line in str(item.get('examples', '')).splitlines():
+            text = _ANNOTATION.sub(r'\1', line.strip().lstrip('-').strip())
+            if text:
+                questions.append(text)
+    return questions
+
+
+def e2e_questions(directory: Path = PROJECT_ROOT / 'tests' / 'e2e_test_cases') -> List[Text]:
+    """`user:` steps of the end-to-end test cases (slash commands left out)"""
+    questions = []
+
+    def collect(node):
+        if isinstance(node, dict):
+            text = node.get('user')
+            if isinstance(text, str) and text.strip() and not text.startswith('/'):
+                questions.append(text.strip())
+            for value in node.values():
+                collect(value)
+        elif isinstance(node, list):
+            for value in node:
+                collect(value)
+
+    for path in sorted(directory.rglob('*.yml')):
+        with open(path, encoding='utf-8') as f:
+            collect(yaml.safe_load(f))
+    return questions
+
+
+def log_questions(patterns: List[Text]) -> List[Text]:
+    """User lines of transcript logs written by send_conversation_email() (conversations.log)"""
+    questions = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    match = _TRANSCRIPT_LINE.match(line.rstrip('\n'))
+                    if match:
+                        questions.append(match.group(1).strip())
+    return questions
+
+
+class QuestionMix:
+    """Draws (source, question) pairs with the configured share per source"""
+
+    def __init__(self, sources: Dict[Text, List[Text]], weights: Dict[Text, float], seed: int):
+        self.sources = {name: questions for name, questions in sources.items() if questions and weights.get(name)}
+        if not self.sources:
+            raise SystemExit("No questions: every source of --mix is empty")
+        total = sum(weights[name] for name in self.sources)
+        self.weights = {name: weights[name] / total for name in self.sources}
+        self._names = list(self.sources)
+        self._cumulative = [sum(self.weights[n] for n in self._names[:i + 1]) for i in range(len(self._names))]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Tuple[Text, Text]:
+        with self._lock:
+            point = self._random.random()
+            name = next((n for n, c in zip(self._names, self._cumulative) if point < c), self._names[-1])
+            return name, self._random.choice(self.sources[name])
+
+
+def parse_mix(text: Text) -> Dict[Text, float]:
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Per-message results (source, scheduled time, latency, error kind) of the measured window"""
+
+    def __init__(self):
+        self.results = []
+        self._lock = threading.Lock()
+        self.measure_from = None
+
+    def record(self, source: Text, scheduled: float, latency: float, error: Optional[Text], empty: bool) -> None:
+        if self.measure_from is None or scheduled < self.measure_from:
+            return  # warm-up
+        with self._lock:
+            self.results.append((source, scheduled, latency, error, empty))
+
+
+class WebhookClient:
+    """One keep-alive connection per worker thread"""
+
+    def __init__(self, url: Text, timeout: float):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self.path = parsed.path or '/'
+        self.https = parsed.scheme == 'https'
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            connection = self._local.connection = cls(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def _reset(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
+
+    def send(self, sender: Text, message: Text) -> Tuple[Optional[Text], bool]:
+        """POST one message; returns (error kind or None, empty response)"""
+        body = json.dumps({'sender': sender, 'message': message, 'metadata': {}}).encode('utf-8')
+        try:
+            connection = self._connection()
+            connection.request('POST', self.path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            payload = response.read()
+        except TimeoutError:
+            self._reset()
+            return 'timeout', False
+        except (OSError, http.client.HTTPException):
+            self._reset()
+            return 'connection', False
+        if response.status >= 400:
+            return f'http_{response.status}', False
+        try:
+            messages = json.loads(payload)
+        except ValueError:
+            return 'invalid_json', False
+        return None, not messages
+
+
+def run_session(client: WebhookClient, mix: QuestionMix, recorder: Recorder, length: int, think_time: float,
+                scheduled: float, stop: threading.Event) -> None:
+    """One conversation: `length` messages from a new sender, each sent after the previous reply"""
+    sender = f'loadtest-{uuid.uuid4().hex[:12]}'
+    for i in range(length):
+        if i and stop.is_set():
+            return
+        source, question = mix.draw()
+        error, empty = client.send(sender, question)
+        now = time.perf_counter()
+        recorder.record(source, scheduled, now - scheduled, error, empty)
+        scheduled = now + think_time
+        if think_time and i < length - 1:
+            time.sleep(think_time)
+
+
+def closed_loop(args, client, mix, recorder, stop) -> None:
+    def user():
+        while not stop.is_set():
+            run_session(client, mix, recorder, args.session_length, args.think_time, time.perf_counter(), stop)
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    stop.wait()
+    for thread in threads:
+        thread.join(args.timeout)
+
+
+def open_loop(args, client, mix, recorder, stop) -> None:
+    session_rate = args.rate / args.session_length
+    arrivals = random.Random(args.seed)
+    with ThreadPoolExecutor(max_workers=args.max_sessions) as pool:
+        next_arrival = time.perf_counter()
+        while not stop.is_set():
+            delay = next_arrival - time.perf_counter()
+            if delay > 0 and stop.wait(delay):
+                break
+            # Queued sessions keep their scheduled time: waiting for a worker is part of the latency
+            pool.submit(run_session, client, mix, recorder, args.session_length, args.think_time,
+                        next_arrival, stop)
+            next_arrival += arrivals.expovariate(session_rate)
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def summarize(results, seconds: float) -> Dict:
+    latencies = sorted(latency for _, _, latency, error, _ in results if error is None)
+    errors = Counter(error for _, _, _, error, _ in results if error is not None)
+    total = len(results)
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'requests': total,
+        'ok': len(latencies),
+        'errors': sum(errors.values()),
+        'error_rate': round(sum(errors.values()) / total, 4) if total else 0.0,
+        'errors_by_kind': dict(errors),
+        'empty_responses': sum(1 for result in results if result[4]),
+        'throughput_rps': round(len(latencies) / seconds, 2) if seconds else None,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 0.50)),
+            'p90': ms(percentile(latencies, 0.90)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def git_commit() -> Dict[Text, object]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT,
+                                    capture_output=True, text=True, timeout=30).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit or None, 'dirty': dirty}
+
+
+def compare(report: Dict, baseline_path: Text) -> None:
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')}):")
+    rows = [(f'latency {key}', ('latency_ms', key), 'ms') for key in ('p50', 'p95', 'p99')]
+    rows += [('throughput', ('throughput_rps',), 'req/s'), ('error rate', ('error_rate',), '')]
+    for label, keys, unit in rows:
+        old, new = baseline, report
+        for key in keys:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+        print(f"  {label:<12} {old:>10} -> {new:<10} {unit:<6} {change}")
+
+
+def wait_for(url: Text, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(1)
+    raise SystemExit(f"{url} not ready after {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='flask', help="'flask', 'rasa' or a webhook URL")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--concurrency', type=int, help='closed loop: virtual users (default 10)')
+    mode.add_argument('--rate', type=float, help='open loop: messages per second offered')
+    parser.add_argument('--max-sessions', type=int, default=200, help='open loop: conversations in flight')
+    parser.add_argument('--duration', type=float, default=60, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=10, help='seconds of traffic left out of the report')
+    parser.add_argument('--session-length', type=int, default=4, help='messages per conversation')
+    parser.add_argument('--think-time', type=float, default=0.0, help='seconds between a reply and the next message')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds per request')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'share of each question source (default {DEFAULT_MIX})')
+    parser.add_argument('--logs', action='append', help='transcript logs (glob), default conversations.log')
+    parser.add_argument('--output', help='write the JSON report there (default: stdout)')
+    parser.add_argument('--compare', help='earlier JSON report to compare with')
+    parser.add_argument('--launch', action='append', default=[], help='server command to start for the run')
+    parser.add_argument('--wait-url', help='URL answering 200 once the launched servers are ready')
+    parser.add_argument('--wait-timeout', type=float, default=300)
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.rate is None and args.concurrency is None:
+        args.concurrency = 10
+
+    url = TARGETS.get(args.target, args.target)
+    sources = {
+        'nlu': nlu_questions(),
+        'e2e': e2e_questions(),
+        'logs': log_questions(args.logs or [str(PROJECT_ROOT / 'conversations.log')]),
+    }
+    mix = QuestionMix(sources, parse_mix(args.mix), args.seed)
+    print(f"Questions: {', '.join(f'{name}={len(q)} ({mix.weights.get(name, 0):.0%})' for name, q in sources.items())}",
+          file=sys.stderr)
+
+    stand_ins, processes = None, []
+    try:
+        if args.launch:
+            stand_ins = start_services(args)
+            env = {**os.environ, **service_env(*stand_ins)}
+            for command in args.launch:
+                print(f"Starting: {command}", file=sys.stderr)
+                processes.append(subprocess.Popen(shlex.split(command), cwd=PROJECT_ROOT, env=env,
+                                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            if args.wait_url:
+                wait_for(args.wait_url, args.wait_timeout)
+
+        client = WebhookClient(url, args.timeout)
+        recorder = Recorder()
+        stop = threading.Event()
+        started = time.perf_counter()
+        recorder.measure_from = started + args.warmup
+        timer = threading.Timer(args.warmup + args.duration, stop.set)
+        timer.start()
+        mode_description = f"{args.concurrency} users" if args.rate is None else f"{args.rate} msg/s"
+        print(f"Load test of {url}: {mode_description}, {args.warmup:.0f}s warm-up + {args.duration:.0f}s",
+              file=sys.stderr)
+        (closed_loop if args.rate is None else open_loop)(args, client, mix, recorder, stop)
+        # Messages scheduled in the window but answered after it still count, the window is what was offered
+        results = [result for result in recorder.results if result[1] < recorder.measure_from + args.duration]
+
+        report = {
+            'meta': {
+                'target': url,
+                **git_commit(),
+                'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'mode': 'closed' if args.rate is None else 'open',
+                'concurrency': args.concurrency,
+                'rate_rps': args.rate,
+                'duration_s': args.duration,
+                'warmup_s': args.warmup,
+                'session_length': args.session_length,
+                'think_time_s': args.think_time,
+                'seed': args.seed,
+                'mix': {name: round(weight, 3) for name, weight in mix.weights.items()},
+                'questions': {name: len(questions) for name, questions in sources.items()},
+                'stand_ins': {key: getattr(args, key) for key in ('ttft', 'token_delay', 'embedding_latency',
+                                                                  'llm_error_rate', 'smtp_delay', 'jitter')}
+                if stand_ins else None,
+            },
+            **summarize(results, args.duration),
+            'by_source': {},
+        }
+        by_source = defaultdict(list)
+        for result in results:
+            by_source[result[0]].append(result)
+        for name, source_results in sorted(by_source.items()):
+            summary = summarize(source_results, args.duration)
+            report['by_source'][name] = {key: summary[key] for key in ('requests', 'error_rate', 'latency_ms')}
+        if stand_ins:
+            report['stand_ins'] = {'openai': stand_ins[0].stats, 'smtp': stand_ins[1].stats}
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        latency = report['latency_ms']
+        print(f"{report['requests']} requests, {report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}, "
+              f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms -> {args.output}")
+    else:
+        print(text)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,15 @@ Ce fichier permet d'héberger le backend Rasa sur un hébergement gratuit
 
 import os
 import sys
+import json
+import time
+import queue
 import asyncio
-from flask import Flask, request, jsonify
+import socket
+import threading
+import http.client
+from urllib.parse import quote, urlparse
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 
 # Ajouter le projet au path
@@ -18,61 +25,169 @@ if project_home not in sys.path:
 from dotenv import load_dotenv
 load_dotenv(os.path.join(project_home, '.env'))
 
-# Import Rasa
-from rasa.core.agent import Agent
-from rasa.core.channels.channel import UserMessage, OutputChannel
-from rasa.core.tracker_store import InMemoryTrackerStore
+# Métriques Prometheus (voir actions/metrics.py)
+from actions.metrics import CONTENT_TYPE, REGISTRY, CallbackMetric, Gauge, Histogram
+# Boucle asyncio unique de l'agent (voir actions/agent_loop.py)
+from actions.agent_loop import AGENT_TIMEOUT, AgentLoop, AgentOverloaded
+# Rechargement du modèle sans interruption (voir actions/model_reload.py)
+from actions.model_reload import ModelReloader
+# Logs JSON écrits par un thread en arrière-plan (voir actions/structured_logging.py)
+from actions.structured_logging import configure_logging, get_logger
+# Chronologie du démarrage (voir actions/startup.py)
+from actions.startup import StartupTimeline
+
+configure_logging()
+LOG = get_logger('flask')
+TIMELINE = StartupTimeline('flask')
 
 app = Flask(__name__)
 CORS(app)  # Permettre les requêtes cross-origin
 
+# Serveur de streaming des tokens du serveur d'actions (voir actions/streaming.py)
+ACTION_STREAM_URL = os.getenv('ACTION_STREAM_URL', 'http://localhost:5056')
+
+REQUEST_SECONDS = Histogram('expobeton_http_request_seconds', 'Latence des requêtes HTTP par endpoint et statut',
+                            ['endpoint', 'status'])
+REQUESTS_IN_FLIGHT = Gauge('expobeton_http_requests_in_flight', 'Requêtes HTTP en cours par endpoint', ['endpoint'])
+RASA_SECONDS = Histogram('expobeton_rasa_handle_message_seconds', 'Durée de agent.handle_message (NLU, politiques, actions)')
+STREAM_TTFT_SECONDS = Histogram('expobeton_stream_ttft_seconds', 'Temps jusqu\'au premier token envoyé au client SSE')
+
+# Tous les messages passent par la même boucle asyncio, dans l'ordre d'arrivée pour un même sender
+AGENT_LOOP = AgentLoop()
+CallbackMetric('expobeton_agent_messages', 'Messages confiés à l\'agent, en cours ou en attente', lambda: {
+    state: AGENT_LOOP.stats()[state] for state in ('in_flight', 'waiting')}, labelnames=['state'])
+CallbackMetric('expobeton_agent_rejected_total', 'Messages refusés (503) car trop de messages en attente',
+               lambda: AGENT_LOOP.rejected, kind='counter')
+
 # Charger l'agent Rasa
 model_path = os.path.join(project_home, "models", "expobeton-french.tar.gz")
-agent = None
 
-def load_rasa_agent():
-    """Charger l'agent Rasa au démarrage"""
-    global agent
-    print(f"Loading Rasa model from: {model_path}")
-    
-    # Utiliser asyncio pour charger l'agent
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    agent = loop.run_until_complete(Agent.load(model_path))
-    print("Rasa agent loaded successfully!")
+# Tant qu'aucun modèle n'est chargé, le webhook répond 503 avec ce Retry-After (secondes)
+MODEL_RETRY_AFTER = int(os.getenv('MODEL_RETRY_AFTER', '5'))
 
-# Charger l'agent au démarrage
-try:
-    load_rasa_agent()
-except Exception as e:
-    print(f"Error loading Rasa agent: {e}")
-    agent = None
+# Classes Rasa, importées par le thread de chargement (voir import_rasa())
+Agent = UserMessage = SimpleOutputChannel = None
 
 
-class SimpleOutputChannel(OutputChannel):
-    """Canal de sortie simple pour collecter les réponses"""
+def import_rasa():
+    """Importer Rasa (plusieurs secondes) hors du thread principal, qui doit écouter au plus vite"""
+    global Agent, UserMessage, SimpleOutputChannel
+    if Agent is not None:
+        return
+    from rasa.core.agent import Agent as RasaAgent
+    from rasa.core.channels.channel import UserMessage as RasaUserMessage, OutputChannel
     
-    def __init__(self):
-        self.messages = []
-    
-    async def send_text_message(self, recipient_id, text, **kwargs):
-        self.messages.append({"recipient_id": recipient_id, "text": text})
-    
-    async def send_image_url(self, recipient_id, image, **kwargs):
-        self.messages.append({"recipient_id": recipient_id, "image": image})
-    
-    async def send_attachment(self, recipient_id, attachment, **kwargs):
-        self.messages.append({"recipient_id": recipient_id, "attachment": attachment})
+    # Définie ici: sa classe de base vient de l'import différé
+    class SimpleOutputChannel(OutputChannel):
+        """Canal de sortie simple pour collecter les réponses"""
+        
+        def __init__(self):
+            self.messages = []
+        
+        async def send_text_message(self, recipient_id, text, **kwargs):
+            self.messages.append({"recipient_id": recipient_id, "text": text})
+        
+        async def send_image_url(self, recipient_id, image, **kwargs):
+            self.messages.append({"recipient_id": recipient_id, "image": image})
+        
+        async def send_attachment(self, recipient_id, attachment, **kwargs):
+            self.messages.append({"recipient_id": recipient_id, "attachment": attachment})
+        
+        async def send_text_with_buttons(self, recipient_id, text, buttons, **kwargs):
+            self.messages.append({
+                "recipient_id": recipient_id,
+                "text": text,
+                "buttons": buttons
+            })
+        
+        async def send_custom_json(self, recipient_id, json_message, **kwargs):
+            self.messages.append({"recipient_id": recipient_id, "custom": json_message})
     
-    async def send_text_with_buttons(self, recipient_id, text, buttons, **kwargs):
-        self.messages.append({
-            "recipient_id": recipient_id,
-            "text": text,
-            "buttons": buttons
-        })
+    UserMessage = RasaUserMessage
+    Agent = RasaAgent
+
+# Messages synthétiques de préchauffage (NLU seulement: pas d'action, pas d'appel OpenAI ni d'email)
+WARMUP_MESSAGES = [
+    "bonjour",
+    "Quand a lieu ExpoBeton RDC ?",
+    "Quelles sont les opportunités d'investissement au Grand Katanga ?",
+    "hello, where does the event take place?",
+]
+
+
+def run_private(coroutine):
+    """Exécuter une coroutine sur une boucle jetable du thread courant
     
-    async def send_custom_json(self, recipient_id, json_message, **kwargs):
-        self.messages.append({"recipient_id": recipient_id, "custom": json_message})
+    Agent.load() décompresse et charge le graphe de façon synchrone: sur
+    AGENT_LOOP, il bloquerait tous les messages en cours.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def load_rasa_agent():
+    """Charger le modèle (thread de rechargement), en gardant les conversations de l'agent courant"""
+    with TIMELINE.phase('rasa_import'):
+        import_rasa()
+    LOG.info('rasa_model_loading', path=model_path)
+    current = RELOADER.current
+    stores = {
+        "tracker_store": current.tracker_store,
+        "lock_store": current.lock_store,
+        "action_endpoint": current.action_endpoint
+    } if current else {}
+    with TIMELINE.phase('model_load'):
+        return run_private(Agent.load(model_path, **stores))
+
+
+def warm_up_agent(new_agent):
+    """Première inférence de chaque composant avant de servir des messages"""
+    async def warm_up():
+        for text in WARMUP_MESSAGES:
+            await new_agent.parse_message(text)
+    with TIMELINE.phase('warm_up'):
+        run_private(warm_up())
+
+
+RELOADER = ModelReloader(load_rasa_agent, warm_up_agent, on_swap=lambda new_agent: TIMELINE.ready())
+
+# Charger l'agent en arrière-plan: le serveur écoute tout de suite et répond 503 en attendant
+RELOADER.start()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.endpoint)
+
+
+@app.after_request
+def observe_request(response):
+    # Pour le streaming SSE, mesure le temps jusqu'aux en-têtes (le TTFT a son histogramme)
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=g.endpoint, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def end_request(exception=None):
+    if 'endpoint' in g:
+        REQUESTS_IN_FLIGHT.dec(endpoint=g.endpoint)
+
+
+def not_ready_response():
+    """503 avec Retry-After pendant le chargement du modèle, 500 si le chargement a échoué"""
+    if RELOADER.reloading:
+        response = jsonify({"error": "Rasa agent is starting, please retry.", "status": "starting"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(MODEL_RETRY_AFTER)
+        return response
+    return jsonify({
+        "error": "Rasa agent not loaded. Please check server logs."
+    }), 500
 
 
 @app.route('/', methods=['GET'])
@@ -82,23 +197,66 @@ def index():
         "status": "online",
         "service": "ExpoBeton RDC Chatbot API",
         "version": "1.0.0",
-        "agent_loaded": agent is not None,
+        "agent_loaded": RELOADER.current is not None,
         "endpoints": {
             "webhook": "/webhooks/rest/webhook",
-            "health": "/health"
+            "stream": "/webhooks/rest/stream",
+            "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "reload": "/reload",
+            "metrics": "/metrics"
         }
     })
 
 
+def health_state():
+    """Vivant: la boucle de l'agent répond. Prêt: vivant et un modèle chargé (un rechargement ne change rien)"""
+    live = AGENT_LOOP.ping()
+    ready = live and RELOADER.current is not None
+    return live, ready
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Endpoint de santé"""
+    live, ready = health_state()
+    if ready:
+        status = "healthy"
+    elif live and RELOADER.current is None and RELOADER.reloading:
+        status = "starting"
+    else:
+        status = "unhealthy"
     return jsonify({
-        "status": "healthy" if agent else "unhealthy",
-        "agent_loaded": agent is not None
+        "status": status,
+        "live": live,
+        "ready": ready,
+        "agent_loaded": RELOADER.current is not None,
+        "model": RELOADER.status(),
+        "startup": TIMELINE.status()
     })
 
 
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Sonde de vivacité: 503 si le processus doit être redémarré"""
+    live, _ = health_state()
+    return jsonify({"live": live}), 200 if live else 503
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Sonde de disponibilité: 503 tant qu'aucun modèle ne peut répondre"""
+    _, ready = health_state()
+    return jsonify({"ready": ready}), 200 if ready else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/webhooks/rest/webhook', methods=['POST', 'OPTIONS'])
 def webhook():
     """Endpoint principal pour recevoir les messages du chatbot"""
@@ -108,10 +266,8 @@ def webhook():
         return '', 204
     
     # Vérifier que l'agent est chargé
-    if not agent:
-        return jsonify({
-            "error": "Rasa agent not loaded. Please check server logs."
-        }), 500
+    if not RELOADER.current:
+        return not_ready_response()
     
     try:
         # Récupérer les données de la requête
@@ -120,61 +276,233 @@ def webhook():
         message_text = data.get('message', '')
         metadata = data.get('metadata', {})
         
-        print(f"Received message from {sender_id}: {message_text}")
-        
-        # Créer un canal de sortie pour collecter les réponses
-        output_channel = SimpleOutputChannel()
+        LOG.info('message_received', session=sender_id, text=message_text)
         
-        # Créer le message utilisateur
-        user_message = UserMessage(
-            text=message_text,
-            output_channel=output_channel,
-            sender_id=sender_id,
-            metadata=metadata
-        )
+        responses = AGENT_LOOP.run(handle_message(sender_id, message_text, metadata), sender=sender_id)
         
-        # Traiter le message avec Rasa (asynchrone)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(agent.handle_message(user_message))
-        
-        # Formater les réponses pour le format attendu par le frontend
-        responses = []
-        for msg in output_channel.messages:
-            response = {"recipient_id": msg.get("recipient_id", sender_id)}
-            
-            if "text" in msg:
-                response["text"] = msg["text"]
-            if "image" in msg:
-                response["image"] = msg["image"]
-            if "buttons" in msg:
-                response["buttons"] = msg["buttons"]
-            if "custom" in msg:
-                response["custom"] = msg["custom"]
-            
-            responses.append(response)
-        
-        print(f"Sending {len(responses)} responses")
+        LOG.info('responses_sent', session=sender_id, responses=len(responses))
         return jsonify(responses)
     
+    except AgentOverloaded as e:
+        return overloaded_response(e)
+    
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
+    
     except Exception as e:
-        print(f"Error processing message: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        LOG.exception('message_failed')
         
         return jsonify({
             "error": f"Error processing message: {str(e)}"
         }), 500
 
 
-@app.route('/reload', methods=['POST'])
-def reload_agent():
-    """Endpoint pour recharger l'agent (utile pour les mises à jour)"""
+def overloaded_response(error):
+    """503 immédiat quand trop de messages attendent déjà l'agent"""
+    LOG.warning('agent_overloaded', error=str(error))
+    response = jsonify({"error": "Server busy, please retry."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+async def handle_message(sender_id, message_text, metadata):
+    """Traiter un message avec Rasa (sur AGENT_LOOP) et retourner les réponses au format du frontend"""
+    # Créer un canal de sortie pour collecter les réponses
+    output_channel = SimpleOutputChannel()
+    
+    # Créer le message utilisateur
+    user_message = UserMessage(
+        text=message_text,
+        output_channel=output_channel,
+        sender_id=sender_id,
+        metadata=metadata
+    )
+    
+    # Traiter le message avec Rasa, jusqu'au bout sur ce modèle même s'il est remplacé entre-temps
+    agent = RELOADER.current
+    with RASA_SECONDS.time():
+        await agent.handle_message(user_message)
+    
+    # Formater les réponses pour le format attendu par le frontend
+    responses = []
+    for msg in output_channel.messages:
+        response = {"recipient_id": msg.get("recipient_id", sender_id)}
+        
+        if "text" in msg:
+            response["text"] = msg["text"]
+        if "image" in msg:
+            response["image"] = msg["image"]
+        if "buttons" in msg:
+            response["buttons"] = msg["buttons"]
+        if "custom" in msg:
+            response["custom"] = msg["custom"]
+        
+        responses.append(response)
+    return responses
+
+
+def sse_event(event, data):
+    """Formater un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def open_token_stream(sender_id):
+    """S'abonner aux tokens GPT-4o du serveur d'actions pour ce sender (None si indisponible)"""
+    url = urlparse(ACTION_STREAM_URL)
     try:
-        load_rasa_agent()
-        return jsonify({"status": "success", "message": "Agent reloaded successfully"})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        connection.request('GET', f"/stream/{quote(sender_id, safe='')}")
+        # Avec `Connection: close`, la réponse garde le socket après connection.close()
+        sock = connection.sock
+        response = connection.getresponse()
+    except OSError as e:
+        LOG.warning('token_stream_unavailable', url=ACTION_STREAM_URL, error=str(e))
+        return None
+    if response.status != 200:
+        close_token_stream((connection, response, sock))
+        response.close()
+        return None
+    return connection, response, sock
+
+
+def close_token_stream(stream):
+    """Se désabonner: couper le socket réveille read_token_stream (qui ferme la réponse) et
+    prévient le serveur d'actions"""
+    connection, response, sock = stream
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    connection.close()
+
+
+def read_token_stream(response, events):
+    """Thread: pousser les tokens reçus du serveur d'actions dans la file d'événements"""
+    try:
+        for line in response:
+            if not line.startswith(b'data: '):
+                continue
+            event = json.loads(line[len(b'data: '):])
+            if event.get('type') == 'token':
+                events.put(('token', event['text']))
+            elif event.get('type') == 'end':
+                break
+    except (OSError, ValueError):
+        # Connexion fermée à la fin du tour de conversation
+        pass
+    finally:
+        response.close()
+
+
+@app.route('/webhooks/rest/stream', methods=['POST', 'OPTIONS'])
+def webhook_stream():
+    """Comme /webhooks/rest/webhook, mais en Server-Sent Events:
+    
+    - `token`: fragment de la réponse GPT-4o, dès qu'il est généré
+    - `message`: réponses finales (identiques à celles du webhook)
+    - `done`: temps jusqu'au premier token et temps total (ms)
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    if not RELOADER.current:
+        return not_ready_response()
+    
+    data = request.json
+    sender_id = data.get('sender', 'default_user')
+    message_text = data.get('message', '')
+    metadata = data.get('metadata', {})
+    
+    start = time.perf_counter()
+    events = queue.Queue()
+    
+    # S'abonner avant de traiter le message pour ne perdre aucun token
+    stream = open_token_stream(sender_id)
+    try:
+        future = AGENT_LOOP.submit(handle_message(sender_id, message_text, metadata), sender=sender_id)
+    except AgentOverloaded as e:
+        if stream:
+            close_token_stream(stream)
+            stream[1].close()
+        return overloaded_response(e)
+    if stream:
+        threading.Thread(target=read_token_stream, args=(stream[1], events), daemon=True).start()
+    
+    def handled(future):
+        if future.cancelled():
+            return
+        try:
+            events.put(('responses', future.result()))
+        except Exception as e:
+            LOG.error('message_failed', session=sender_id, error=repr(e))
+            events.put(('error', str(e)))
+    
+    future.add_done_callback(handled)
+    
+    def generate():
+        first_token = None
+        try:
+            while True:
+                try:
+                    kind, payload = events.get(timeout=AGENT_TIMEOUT)
+                except queue.Empty:
+                    future.cancel()
+                    kind, payload = 'error', f"No answer after {AGENT_TIMEOUT}s"
+                if kind == 'token':
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                        STREAM_TTFT_SECONDS.observe(first_token)
+                    yield sse_event('token', {"text": payload})
+                elif kind == 'responses':
+                    yield sse_event('message', payload)
+                    break
+                else:
+                    yield sse_event('error', {"error": f"Error processing message: {payload}"})
+                    break
+        finally:
+            if stream:
+                close_token_stream(stream)
+        
+        total = time.perf_counter() - start
+        timings = {
+            "ttft_ms": round(first_token * 1000, 1) if first_token is not None else None,
+            "total_ms": round(total * 1000, 1)
+        }
+        LOG.info('reply_streamed', session=sender_id, **timings)
+        yield sse_event('done', timings)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/reload', methods=['GET', 'POST'])
+def reload_agent():
+    """Recharger le modèle en arrière-plan, l'ancien répond jusqu'au remplacement
+    
+    POST: 202 (rechargement lancé) ou 409 (déjà en cours); `?wait=1` attend la fin
+    et répond 200 ou 500. GET: état et rapport du dernier rechargement (durées,
+    mémoire).
+    """
+    if request.method == 'GET':
+        return jsonify(RELOADER.status())
+    
+    if not RELOADER.start():
+        return jsonify({"status": "in_progress", "message": "A reload is already running", **RELOADER.status()}), 409
+    
+    if request.args.get('wait') not in (None, '', '0', 'false'):
+        RELOADER.wait()
+        report = RELOADER.last
+        if report['result'] != 'success':
+            return jsonify({"status": "error", "message": report.get('error'), "reload": report}), 500
+        return jsonify({"status": "success", "message": "Agent reloaded successfully", "reload": report})
+    
+    return jsonify({"status": "accepted", "message": "Reload started, see GET /reload", **RELOADER.status()}), 202
+
+
+TIMELINE.mark('imports')
 
 
 if __name__ == '__main__':
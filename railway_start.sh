@@ -28,6 +28,10 @@ else
     exit 1
 fi
 
+# Build/refresh the docs embedding index (only changed files are re-embedded)
+echo "📚 Building docs embedding index..."
+python -m actions.docs_index || echo "⚠️ Docs index build failed, retrieval falls back to BM25 until python -m actions.docs_index succeeds (or set DOCS_INDEX_REBUILD=1)"
+
 # Start action server on port 5055 in background
 echo "Starting action server on port 5055..."
 echo "🔥 CRITICAL: actions.py should print TIMESTAMP 2025-11-08 17:30:00 UTC"
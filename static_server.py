@@ -1,20 +1,450 @@
 #!/usr/bin/env python3
 """
 Simple server to serve static files and forward API requests to Rasa server
+
+Each request is handled on its own thread, so a slow chatbot turn no longer
+holds the static files of the other visitors. Files are served from the
+project directory given to the handler (no os.chdir(), which is process-wide),
+and webhook requests reuse keep-alive connections to Rasa from a small pool,
+with a timeout per request.
+
+Webhooks can be balanced over several Rasa servers (RASA_URLS): a new
+conversation goes to the server with the fewest requests in progress, and
+its later turns stick to the same server (by `sender`). Servers are probed
+in the background; one failing UPSTREAM_MAX_FAILURES times in a row is
+ejected for at least UPSTREAM_EJECT_SECONDS, and a request that cannot
+connect is sent to another server.
+
+The files of web/ are served from memory, precompressed (gzip, and brotli when
+the package is installed), with strong ETags: a browser revalidating a plain
+URL gets a 304 without a body. Each asset is also served at a content-hashed
+URL (/web/chat-widget.<hash>.js, used by the HTML pages) cached for a year.
+The files are reloaded when they change on disk.
 """
 
 import os
+import re
 import sys
+import random
+import gzip
 import json
-import urllib.request
-import urllib.error
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import time
+import hashlib
+import mimetypes
+import threading
+import http.client
+from collections import OrderedDict
+from functools import partial
+from urllib.parse import urlparse, urlsplit
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+try:
+    import brotli
+except ImportError:
+    # brotli not available, assets are only precompressed with gzip
+    brotli = None
 
 # Get port from environment variable
 PORT = int(os.environ.get('PORT', 5005))
 
+# Rasa server the webhook requests are forwarded to
+RASA_URL = os.environ.get('RASA_URL', 'http://localhost:5005')
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 60))  # seconds per request (LLM turns are slow)
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5))
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 16))  # idle connections kept
+# Under the 5s keep-alive timeout of Rasa's Sanic server: never reuse a connection it is closing
+UPSTREAM_IDLE_TIMEOUT = float(os.environ.get('UPSTREAM_IDLE_TIMEOUT', 4))
+
+# Several Rasa servers behind the same entry point (comma-separated, RASA_URL by default)
+RASA_URLS = [url.strip() for url in os.environ.get('RASA_URLS', RASA_URL).split(',') if url.strip()]
+UPSTREAM_HEALTH_PATH = os.environ.get('UPSTREAM_HEALTH_PATH', '/')  # Rasa answers "Hello from Rasa"
+UPSTREAM_HEALTH_INTERVAL = float(os.environ.get('UPSTREAM_HEALTH_INTERVAL', 5))  # seconds between probes, 0 = none
+UPSTREAM_HEALTH_TIMEOUT = float(os.environ.get('UPSTREAM_HEALTH_TIMEOUT', 2))
+UPSTREAM_MAX_FAILURES = int(os.environ.get('UPSTREAM_MAX_FAILURES', 3))  # failed probes/connections in a row
+UPSTREAM_EJECT_SECONDS = float(os.environ.get('UPSTREAM_EJECT_SECONDS', 30))  # minimum time out of the pool
+STICKY_MAX_SENDERS = int(os.environ.get('STICKY_MAX_SENDERS', 10000))  # sender -> server entries (LRU)
+
+# Files are served from the project directory, whatever the working directory
+STATIC_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# In-memory web assets
+ASSET_CHECK_INTERVAL = float(os.environ.get('ASSET_CHECK_INTERVAL', 2))  # seconds between file checks, 0 = never
+ASSET_MAX_AGE = int(os.environ.get('ASSET_MAX_AGE', 31536000))  # seconds, content-hashed URLs
+ASSET_MIN_COMPRESS = 256  # bytes, smaller files are not worth compressing
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+# src="/web/..." and href="/web/..." references of the HTML pages, rewritten to content-hashed URLs
+ASSET_REFERENCE = re.compile(r'((?:src|href)=")(/web/[^"?#]+)(")')
+
+# Headers that only apply to one connection and must not be forwarded
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+    'transfer-encoding', 'upgrade', 'content-length', 'server', 'date'
+})
+
+
+class UpstreamUnavailable(ConnectionError):
+    """No connection to the upstream server: the request was not sent"""
+
+
+class UpstreamPool:
+    """Keep-alive HTTP connections to the Rasa server, shared by the request threads"""
+
+    def __init__(self, url, size=UPSTREAM_POOL_SIZE, timeout=UPSTREAM_TIMEOUT,
+                 connect_timeout=UPSTREAM_CONNECT_TIMEOUT, idle_timeout=UPSTREAM_IDLE_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.size = size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.stats = {'opened': 0, 'reused': 0, 'retried': 0}
+        self._idle = []  # (connection, released at), most recent last
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection, released_at = self._idle.pop()
+                if now - released_at < self.idle_timeout:
+                    self.stats['reused'] += 1
+                    return connection, True
+                connection.close()
+            self.stats['opened'] += 1
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        try:
+            connection.connect()
+        except OSError as e:
+            raise UpstreamUnavailable(f"{self.host}:{self.port}: {e}") from e
+        return connection, False
+
+    def release(self, connection):
+        """Give back a connection whose response was read completely"""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def request(self, method, path, body, headers, timeout=None):
+        """Send a request; returns (connection, response): read the response, then release() or close()
+
+        A reused connection the server closed in the meantime fails before any
+        response: the request is sent once more on a new connection.
+        """
+        while True:
+            connection, reused = self._acquire()
+            connection.sock.settimeout(timeout or self.timeout)
+            try:
+                connection.request(method, path, body, headers)
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                connection.close()
+                if not reused:
+                    raise
+                with self._lock:
+                    self.stats['retried'] += 1
+            except BaseException:
+                connection.close()
+                raise
+
+
+class Asset:
+    """One file of web/: its representations (identity, gzip, br) and their strong ETags"""
+
+    def __init__(self, data, content_type):
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.bodies = {'identity': data}
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(data) >= ASSET_MIN_COMPRESS:
+            compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(data, quality=11)
+            for encoding, body in compressed.items():
+                if len(body) < len(data):
+                    self.bodies[encoding] = body
+        # A strong ETag identifies the bytes sent: one per encoding
+        self.etags = {encoding: f'"{self.digest[:16]}"' if encoding == 'identity'
+                      else f'"{self.digest[:16]}-{encoding}"' for encoding in self.bodies}
+
+    def negotiate(self, accept_encoding):
+        """Encoding to send for this Accept-Encoding header: br, then gzip, else identity"""
+        accepted = set()
+        for part in (accept_encoding or '').split(','):
+            coding, _, params = part.partition(';')
+            quality = params.strip()
+            if quality.startswith('q='):
+                try:
+                    if float(quality[2:]) == 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(coding.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+
+class AssetCache:
+    """Files of web/ kept in memory, precompressed, reloaded when they change on disk"""
+
+    def __init__(self, root=STATIC_ROOT, prefix='/web/', check_interval=ASSET_CHECK_INTERVAL):
+        self.directory = os.path.join(root, prefix.strip('/'))
+        self.prefix = prefix
+        self.check_interval = check_interval
+        self.assets = {}  # URL path -> (Asset, immutable)
+        self.urls = {}  # file name -> content-hashed URL path
+        self._signature = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def get(self, path):
+        """(Asset, immutable) served at this URL path, or None"""
+        if self.check_interval and time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        return self.assets.get(path)
+
+    def refresh(self):
+        """Reload the files if any was added, removed or modified; True when they were"""
+        # One thread checks, the others keep serving the current assets meanwhile
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            signature = {}
+            for directory, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    signature[os.path.relpath(path, self.directory).replace(os.sep, '/')] = (stat.st_mtime_ns,
+                                                                                             stat.st_size)
+            if signature == self._signature:
+                return False
+            self._load(sorted(signature))
+            self._signature = signature
+            return True
+        except OSError as e:
+            print(f"Error loading web assets: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def _load(self, names):
+        contents = {}
+        for name in names:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                contents[name] = f.read()
+
+        assets, urls = {}, {}
+        pages = [name for name in names if name.endswith(('.html', '.htm'))]
+        for name in names:
+            if name in pages:
+                continue
+            asset = Asset(contents[name], self.content_type(name))
+            stem, extension = os.path.splitext(name)
+            urls[name] = f'{self.prefix}{stem}.{asset.digest[:10]}{extension}'
+            assets[self.prefix + name] = (asset, False)
+            assets[urls[name]] = (asset, True)
+
+        def hashed(match):
+            url = urls.get(match.group(2)[len(self.prefix):])
+            return f'{match.group(1)}{url}{match.group(3)}' if url else match.group(0)
+
+        # Pages are fetched at a fixed URL, always revalidated: they link to the current hashed assets
+        for name in pages:
+            page = ASSET_REFERENCE.sub(hashed, contents[name].decode('utf-8', 'surrogateescape'))
+            assets[self.prefix + name] = (Asset(page.encode('utf-8', 'surrogateescape'), self.content_type(name)),
+                                          False)
+
+        self.assets, self.urls = assets, urls
+        served = [asset for asset, immutable in assets.values() if not immutable]
+        total = sum(len(asset.bodies['identity']) for asset in served)
+        compressed = sum(min(len(body) for body in asset.bodies.values()) for asset in served)
+        print(f"Loaded {len(names)} web assets in memory ({total // 1024} KB, {compressed // 1024} KB compressed)")
+
+    @staticmethod
+    def content_type(name):
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        return content_type
+
+
+class Backend:
+    """One Rasa server of the balancer: its connection pool and health"""
+
+    def __init__(self, url):
+        self.url = url
+        self.pool = UpstreamPool(url)
+        self.outstanding = 0  # requests in progress
+        self.requests = 0
+        self.failures = 0  # failed probes or connections in a row
+        self.ejected_at = None
+
+    def status(self):
+        return {'url': self.url, 'healthy': self.ejected_at is None, 'outstanding': self.outstanding,
+                'requests': self.requests, 'failures': self.failures, **self.pool.stats}
+
+
+class UpstreamBalancer:
+    """Webhook requests spread over the Rasa servers: least outstanding requests, sticky by sender"""
+
+    def __init__(self, urls, timeout=UPSTREAM_TIMEOUT, health_path=UPSTREAM_HEALTH_PATH,
+                 health_interval=UPSTREAM_HEALTH_INTERVAL, max_failures=UPSTREAM_MAX_FAILURES,
+                 eject_seconds=UPSTREAM_EJECT_SECONDS, max_senders=STICKY_MAX_SENDERS):
+        self.backends = [Backend(url) for url in urls]
+        self.timeout = timeout
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.max_senders = max_senders
+        self.affinity = OrderedDict()  # sender -> Backend, least recently used first
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if health_interval and urls:
+            threading.Thread(target=self._probe_loop, name='upstream-health', daemon=True).start()
+
+    def _pick(self, sender, tried):
+        now = time.monotonic()
+        with self._lock:
+            if not self.health_interval:
+                # No probes: an ejected server gets requests again once its ejection time is over
+                for backend in self.backends:
+                    if backend.ejected_at is not None and now - backend.ejected_at >= self.eject_seconds:
+                        backend.ejected_at = None
+            candidates = [backend for backend in self.backends if backend not in tried]
+            # All servers ejected: try them anyway rather than failing every conversation
+            available = [backend for backend in candidates if backend.ejected_at is None] or candidates
+            if not available:
+                return None
+            backend = self.affinity.get(sender) if sender else None
+            if backend not in available:
+                fewest = min((b.outstanding, b.requests) for b in available)
+                backend = random.choice([b for b in available if (b.outstanding, b.requests) == fewest])
+            if sender:
+                self.affinity[sender] = backend
+                self.affinity.move_to_end(sender)
+                if len(self.affinity) > self.max_senders:
+                    self.affinity.popitem(last=False)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def request(self, method, path, body, headers, sender=None):
+        """Send a request; returns (backend, connection, response): relay the response, then finish()"""
+        tried = []
+        while True:
+            backend = self._pick(sender, tried)
+            if backend is None:
+                raise UpstreamUnavailable(f"no Rasa server reachable ({len(tried)} tried)")
+            tried.append(backend)
+            try:
+                connection, response = backend.pool.request(method, path, body, headers, timeout=self.timeout)
+            except UpstreamUnavailable as e:
+                print(f"Rasa server {backend.url} unreachable: {e}")
+                self._done(backend, ok=False)
+                continue
+            except BaseException:
+                self._done(backend, ok=True)  # timeouts and errors after connecting do not eject
+                raise
+            return backend, connection, response
+
+    def finish(self, backend, connection, reusable):
+        if reusable:
+            backend.pool.release(connection)
+        else:
+            connection.close()
+        self._done(backend, ok=True)
+
+    def _done(self, backend, ok):
+        with self._lock:
+            backend.outstanding -= 1
+        self.record(backend, ok)
+
+    def record(self, backend, ok):
+        """Result of a probe or connection: ejects the server after max_failures failures in a row"""
+        with self._lock:
+            if ok:
+                backend.failures = 0
+                if (backend.ejected_at is not None and self.health_interval
+                        and time.monotonic() - backend.ejected_at >= self.eject_seconds):
+                    backend.ejected_at = None
+                    print(f"Rasa server {backend.url} is back in the pool")
+                return
+            backend.failures += 1
+            if backend.failures < self.max_failures or backend.ejected_at is not None:
+                return
+            backend.ejected_at = time.monotonic()
+            # Its conversations move to another server at their next turn
+            for sender in [sender for sender, pinned in self.affinity.items() if pinned is backend]:
+                del self.affinity[sender]
+        print(f"Rasa server {backend.url} ejected after {backend.failures} failures")
+
+    def probe(self, backend):
+        connection = http.client.HTTPConnection(backend.pool.host, backend.pool.port, timeout=UPSTREAM_HEALTH_TIMEOUT)
+        try:
+            connection.request('GET', self.health_path)
+            response = connection.getresponse()
+            response.read()
+            return response.status < 500
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for backend in self.backends:
+                self.record(backend, self.probe(backend))
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            return {'backends': [backend.status() for backend in self.backends], 'senders': len(self.affinity)}
+
+
+class StaticServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # burst of page loads (one connection per asset)
+
+    def __init__(self, server_address, upstream_urls=RASA_URLS, root=STATIC_ROOT):
+        super().__init__(server_address, partial(StaticFileHandler, directory=root))
+        self.upstream = UpstreamBalancer(upstream_urls)
+        self.assets = AssetCache(root)
+
+    def server_close(self):
+        super().server_close()
+        self.upstream.stop()
+
+
 class StaticFileHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive: a page and its assets share one connection
+    # Headers and body are separate writes: without TCP_NODELAY the body waits for the delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+
     def do_GET(self):
+        self.route()
+        cached = self.cached_asset()
+        if cached is not None:
+            return self.send_asset(*cached)
+        # Files are resolved against the directory given to the handler (STATIC_ROOT)
+        return SimpleHTTPRequestHandler.do_GET(self)
+
+    def do_HEAD(self):
+        self.route()
+        cached = self.cached_asset()
+        if cached is not None:
+            return self.send_asset(*cached, head=True)
+        return SimpleHTTPRequestHandler.do_HEAD(self)
+
+    def route(self):
         # Serve static files for web interface
         if self.path == '/' or self.path == '/index.html':
             self.path = '/web/index.html'
@@ -38,86 +468,130 @@ class StaticFileHandler(SimpleHTTPRequestHandler):
             else:
                 # No file extension, serve index.html (for SPA routing)
                 self.path = '/web/index.html'
-        
-        # Set the correct working directory
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(os.path.dirname(os.path.abspath(__file__)))
-            return SimpleHTTPRequestHandler.do_GET(self)
-        finally:
-            os.chdir(original_cwd)
-    
+
+    def cached_asset(self):
+        """(Asset, immutable) of the requested path from the in-memory web assets, or None"""
+        return self.server.assets.get(urlsplit(self.path).path)
+
+    def send_asset(self, asset, immutable, head=False):
+        encoding = asset.negotiate(self.headers.get('Accept-Encoding'))
+        etag = asset.etags[encoding]
+        if_none_match = self.headers.get('If-None-Match')
+        not_modified = if_none_match is not None and (
+            if_none_match.strip() == '*'
+            or etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(',')))
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={ASSET_MAX_AGE}, immutable' if immutable else 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return
+        body = asset.bodies[encoding]
+        self.send_header('Content-Type', asset.content_type)
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_body(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
     def do_POST(self):
         # Forward webhook requests to Rasa server
-        if self.path.startswith('/webhooks/'):
-            try:
-                # Read the request data
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                
-                # Forward to Rasa server (assuming it's running on port 5005)
-                rasa_url = f'http://localhost:5005{self.path}'
-                
-                # Create the request
-                req = urllib.request.Request(
-                    rasa_url,
-                    data=post_data,
-                    headers={
-                        'Content-Type': self.headers['Content-Type'],
-                        'Content-Length': str(len(post_data))
-                    },
-                    method='POST'
-                )
-                
-                # Forward the request to Rasa server
-                with urllib.request.urlopen(req) as response:
-                    response_data = response.read()
-                    self.send_response(response.getcode())
-                    # Forward all headers from Rasa response
-                    for header_name, header_value in response.headers.items():
-                        self.send_header(header_name, header_value)
-                    self.end_headers()
-                    self.wfile.write(response_data)
-                    
-            except urllib.error.HTTPError as e:
-                # Handle HTTP errors from Rasa server
-                print(f"HTTP Error from Rasa server: {e.code} - {e.reason}")
-                self.send_response(e.code)
-                # Forward headers if available
-                for header_name, header_value in e.headers.items():
-                    self.send_header(header_name, header_value)
-                self.end_headers()
-                if e.fp:
-                    self.wfile.write(e.fp.read())
-                    
-            except urllib.error.URLError as e:
-                # Handle URL errors (connection issues)
-                print(f"URL Error connecting to Rasa server: {e.reason}")
-                self.send_response(503)  # Service Unavailable
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error_response = {
-                    "error": "Service Unavailable",
-                    "message": "Unable to connect to Rasa server. Please check that the server is running."
-                }
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
-                
-            except Exception as e:
-                # Handle other errors
-                print(f"Unexpected error: {e}")
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error_response = {
-                    "error": "Internal Server Error",
-                    "message": str(e)
-                }
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
-        else:
+        if not self.path.startswith('/webhooks/'):
             # Handle other POST requests by sending a 404
-            self.send_response(404)
+            self.send_body(404, b'Not Found')
+            return
+
+        upstream = self.server.upstream
+        try:
+            # Read the request data
+            content_length = int(self.headers.get('Content-Length', 0))
+            post_data = self.rfile.read(content_length)
+            headers = {
+                'Content-Type': self.headers.get('Content-Type', 'application/json'),
+                'Content-Length': str(len(post_data))
+            }
+            backend, connection, response = upstream.request('POST', self.path, post_data, headers,
+                                                             sender=self.sender_id(post_data))
+        except TimeoutError:
+            print(f"Timeout waiting for Rasa server: {self.path}")
+            self.send_json(504, {
+                "error": "Gateway Timeout",
+                "message": f"No answer from Rasa server within {upstream.timeout:.0f}s."
+            })
+            return
+        except (OSError, http.client.HTTPException) as e:
+            # Handle connection issues
+            print(f"Error connecting to Rasa server: {e}")
+            self.send_json(503, {
+                "error": "Service Unavailable",
+                "message": "Unable to connect to Rasa server. Please check that the server is running."
+            })
+            return
+        except Exception as e:
+            # Handle other errors
+            print(f"Unexpected error: {e}")
+            self.send_json(500, {"error": "Internal Server Error", "message": str(e)})
+            return
+
+        try:
+            self.relay(response)
+        except (OSError, http.client.HTTPException) as e:
+            # Visitor gone or Rasa failing mid-answer: this connection cannot be reused
+            print(f"Error relaying Rasa response: {e}")
+            upstream.finish(backend, connection, reusable=False)
+            self.close_connection = True
+            return
+        upstream.finish(backend, connection, reusable=not response.will_close)
+
+    @staticmethod
+    def sender_id(post_data):
+        """Conversation id of a webhook message, which keeps its turns on one Rasa server"""
+        try:
+            sender = json.loads(post_data).get('sender')
+        except (ValueError, AttributeError):
+            return None
+        return str(sender) if sender is not None else None
+
+    def relay(self, response):
+        """Forward the Rasa response: status, end-to-end headers and body (streamed if it has no length)"""
+        self.send_response(response.status)
+        for header_name, header_value in response.getheaders():
+            if header_name.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(header_name, header_value)
+
+        if response.status in (204, 304) or response.getheader('Content-Length') is not None:
+            response_data = response.read()
+            self.send_header('Content-Length', str(len(response_data)))
+            self.end_headers()
+            self.wfile.write(response_data)
+        elif self.request_version == 'HTTP/1.1':
+            # Server-Sent Events (/webhooks/rest/stream): forward each chunk as it arrives
+            self.send_header('Transfer-Encoding', 'chunked')
             self.end_headers()
-            self.wfile.write(b'Not Found')
+            while chunk := response.read1(65536):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            # HTTP/1.0 client: no chunked encoding, the end of the body is the end of the connection
+            self.close_connection = True
+            self.end_headers()
+            while chunk := response.read1(65536):
+                self.wfile.write(chunk)
+                self.wfile.flush()
 
     def do_OPTIONS(self):
         # Handle CORS preflight requests
@@ -125,16 +599,21 @@ class StaticFileHandler(SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
 def start_server():
-    # Change to the project directory
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    
-    # Start the HTTP server
+    # The default Rasa URL and PORT are both 5005: forwarding to ourselves would loop
+    for url in RASA_URLS:
+        parsed = urlparse(url)
+        if parsed.hostname in ('localhost', '127.0.0.1', '0.0.0.0') and (parsed.port or 80) == PORT:
+            sys.exit(f"Rasa server {url} is this server (PORT={PORT}): set PORT or RASA_URLS")
+
+    # Start the HTTP server (one thread per request)
     server_address = ('', PORT)
-    httpd = HTTPServer(server_address, StaticFileHandler)
-    print(f"Starting static file server on port {PORT}")
+    httpd = StaticServer(server_address)
+    print(f"Starting static file server on port {PORT} (files from {STATIC_ROOT}, "
+          f"webhooks to {', '.join(RASA_URLS)})")
     print(f"Access the chat interface at: http://localhost:{PORT}/")
     httpd.serve_forever()
 
@@ -142,4 +621,4 @@ if __name__ == '__main__':
     try:
         start_server()
     except KeyboardInterrupt:
-        print("\nShutting down server...")
\ No newline at end of file
+        print("\nShutting down server...")
@@ -0,0 +1,133 @@
+"""
+Test script for the event loop thread serving the Rasa agent (actions/agent_loop.py)
+
+Run with: python test_agent_loop.py  (or pytest test_agent_loop.py)
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from actions.agent_loop import AgentLoop, AgentOverloaded
+
+
+def test_messages_of_a_sender_keep_their_order():
+    runner = AgentLoop(max_in_flight=8)
+    handled = []
+
+    async def message(sender, index, delay):
+        await asyncio.sleep(delay)
+        handled.append((sender, index))
+        return index
+
+    try:
+        start = time.perf_counter()
+        # Later messages are quicker: without the sender lock they would overtake the first ones
+        futures = [runner.submit(message(sender, i, 0.1 - i * 0.02), sender=sender)
+                   for i in range(5) for sender in ('alice', 'bob')]
+        assert [future.result(5) for future in futures] == [i for i in range(5) for _ in range(2)]
+        elapsed = time.perf_counter() - start
+        for sender in ('alice', 'bob'):
+            assert [index for name, index in handled if name == sender] == [0, 1, 2, 3, 4]
+        # The two senders were handled side by side (0.3s each)
+        assert elapsed < 0.5
+        assert runner.stats() == {'in_flight': 0, 'waiting': 0, 'senders': 0, 'rejected': 0}
+    finally:
+        runner.stop()
+
+
+def test_in_flight_messages_are_bounded():
+    runner = AgentLoop(max_in_flight=2)
+    active, peak = [0], [0]
+
+    async def message():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda i: runner.run(message(), sender=f'user-{i}', timeout=5), range(8)))
+        assert peak[0] == 2
+    finally:
+        runner.stop()
+
+
+def test_overload_is_rejected_at_once():
+    runner = AgentLoop(max_in_flight=1, max_pending=2)
+    release = threading.Event()
+
+    async def message():
+        await runner.loop.run_in_executor(None, release.wait)
+
+    try:
+        futures = [runner.submit(message(), sender='a'), runner.submit(message(), sender='b')]
+        try:
+            runner.submit(message(), sender='c')
+            assert False, "third message accepted"
+        except AgentOverloaded as e:
+            assert e.retry_after > 0
+        assert runner.rejected == 1
+        release.set()
+        for future in futures:
+            future.result(5)
+        # Capacity is back once the messages are answered
+        assert runner.run(asyncio.sleep(0, result='ok'), sender='c', timeout=5) == 'ok'
+    finally:
+        runner.stop()
+
+
+def test_timeout_cancels_the_message():
+    runner = AgentLoop()
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    try:
+        try:
+            runner.run(slow(), sender='alice', timeout=0.05)
+            assert False, "no timeout"
+        except TimeoutError:
+            pass
+        assert cancelled.wait(2)
+        # The sender is not blocked by the cancelled message
+        assert runner.run(asyncio.sleep(0, result='next'), sender='alice', timeout=5) == 'next'
+    finally:
+        runner.stop()
+
+
+def test_loop_bound_objects_are_reused():
+    runner = AgentLoop()
+
+    async def load():
+        return asyncio.Queue()  # like the agent's HTTP sessions, bound to the loop that uses it
+
+    async def use(shared, value):
+        await shared.put(value)
+        return await shared.get()
+
+    try:
+        shared = runner.run(load(), timeout=5)
+        with ThreadPoolExecutor(4) as pool:
+            assert list(pool.map(lambda i: runner.run(use(shared, i), sender=str(i), timeout=5), range(20))) \
+                == list(range(20))
+    finally:
+        runner.stop()
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING AGENT LOOP")
+    print("=" * 80)
+    for test in (test_messages_of_a_sender_keep_their_order, test_in_flight_messages_are_bounded,
+                 test_overload_is_rejected_at_once, test_timeout_cancels_the_message,
+                 test_loop_bound_objects_are_reused):
+        test()
+        print(f"✅ {test.__name__}")
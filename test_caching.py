@@ -0,0 +1,152 @@
+"""
+Test script for the query embedding and semantic answer caches (actions/caching.py)
+
+Run with: python test_caching.py  (or pytest test_caching.py)
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from actions.caching import QueryEmbeddingCache, SemanticAnswerCache, TTLCache, docs_key
+from actions.embeddings import HashEmbedder
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self):
+        super().__init__(dim=16)
+        self.calls = 0
+
+    def embed_batch(self, texts):
+        self.calls += 1
+        return super().embed_batch(texts)
+
+
+class FakeRedis:
+    """get/set of redis.Redis, shared between 'replicas', each round trip taking `latency` seconds"""
+
+    def __init__(self, latency=0.0):
+        self.data = {}
+        self.latency = latency
+        self.threads = set()
+
+    def get(self, key):
+        time.sleep(self.latency)
+        self.threads.add(threading.get_ident())
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        time.sleep(self.latency)
+        self.threads.add(threading.get_ident())
+        self.data[key] = value
+
+
+def test_ttl_and_lru_eviction():
+    clock = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: clock[0])
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'a' is now the most recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+
+    clock[0] = 9.9
+    assert cache.get('a') == 1
+    clock[0] = 10.0
+    # Expiry counts from the write, not the last read
+    assert cache.get('a') is None and len(cache) == 1
+    cache.set('d', 4, ttl=1)
+    clock[0] = 11.0
+    assert cache.get('d') is None
+    assert cache.stats() == {'size': 1, 'hits': 4, 'misses': 3, 'hit_rate': 4 / 7}
+
+
+def test_shared_hits_across_replicas():
+    shared = FakeRedis()
+    embedder = CountingEmbedder()
+    replica_a = QueryEmbeddingCache(embedder, shared=shared)
+    replica_b = QueryEmbeddingCache(embedder, shared=shared)
+
+    vector = replica_a.embed("Où se tient le salon ?")
+    # Same normalized text: local hit, no second embedding call
+    assert np.array_equal(replica_a.embed("  où se tient le SALON "), vector) and embedder.calls == 1
+    # Another replica finds it in Redis instead of calling the embedder
+    assert np.array_equal(replica_b.embed("Où se tient le salon"), vector) and embedder.calls == 1
+    assert replica_b.embed("Où se tient le salon") is not None and embedder.calls == 1
+
+    stats = replica_b.stats()
+    assert stats['shared_hits'] == 1 and stats['embedding_calls'] == 0
+    # The shared hit is a hit: nothing was embedded by this replica
+    assert stats['hits'] == 2 and stats['misses'] == 0 and stats['hit_rate'] == 1.0
+    assert replica_a.stats()['hits'] == 1 and replica_a.stats()['misses'] == 1
+
+    # Keys include the model: another embedder does not reuse the vectors
+    other = QueryEmbeddingCache(HashEmbedder(dim=8), shared=shared)
+    assert other.embed("Où se tient le salon ?").shape == (8,) and other.stats()['shared_hits'] == 0
+
+
+def test_shared_cache_round_trips_do_not_block_the_event_loop():
+    shared = FakeRedis(latency=0.2)
+    cache = QueryEmbeddingCache(CountingEmbedder(), shared=shared)
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.05)
+        await cache.aembed("Quel est le prix d'un stand ?")  # miss: one get and one set
+        task.cancel()
+        return max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    assert asyncio.run(main()) < 0.15
+    assert threading.get_ident() not in shared.threads and len(shared.data) == 1
+
+
+def test_answer_cache_threshold_passages_and_version():
+    clock = [0.0]
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=2, ttl=60, clock=lambda: clock[0])
+    passages = docs_key([{'filename': 'b.txt', 'start': 0}, {'filename': 'a.txt', 'start': 1200}])
+    assert passages == docs_key([{'filename': 'a.txt', 'start': 1200}, {'filename': 'b.txt', 'start': 0}])
+    question = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    cache.store(question * 3, passages, "Du 12 au 14 septembre.", latency=2.5, version='v1')
+
+    # Similarity is a cosine: the norm of the query does not matter
+    assert cache.lookup(question * 0.5, passages, 'v1') == "Du 12 au 14 septembre."
+    close = np.array([0.95, 0.3, 0.0], dtype=np.float32)      # cosine 0.95
+    far = np.array([0.8, 0.6, 0.0], dtype=np.float32)         # cosine 0.8
+    assert cache.lookup(close, passages, 'v1') == "Du 12 au 14 septembre."
+    assert cache.lookup(far, passages, 'v1') is None
+    # Same question, other retrieved passages: the cached answer may not hold
+    assert cache.lookup(question, docs_key([{'filename': 'c.txt', 'start': 0}]), 'v1') is None
+    assert cache.stats()['hits'] == 2 and cache.stats()['saved_seconds'] == 5.0
+
+    # A new docs index version drops every answer
+    assert cache.lookup(question, passages, 'v2') is None
+    assert cache.stats()['invalidations'] == 1 and cache.stats()['size'] == 0
+
+    # Entries expire after the TTL and the oldest are dropped beyond maxsize
+    cache.store(question, passages, "un", 1.0, 'v2')
+    clock[0] = 30
+    cache.store(np.array([0, 1, 0], dtype=np.float32), passages, "deux", 1.0, 'v2')
+    cache.store(np.array([0, 0, 1], dtype=np.float32), passages, "trois", 1.0, 'v2')
+    assert cache.stats()['size'] == 2 and cache.lookup(question, passages, 'v2') is None
+    clock[0] = 91
+    assert cache.lookup(np.array([0, 1, 0], dtype=np.float32), passages, 'v2') is None
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING CACHES")
+    print("=" * 80)
+    for test in (test_ttl_and_lru_eviction, test_shared_hits_across_replicas,
+                 test_shared_cache_round_trips_do_not_block_the_event_loop,
+                 test_answer_cache_threshold_passages_and_version):
+        test()
+        print(f"✅ {test.__name__}")
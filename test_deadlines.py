@@ -0,0 +1,122 @@
+"""
+Test script for the retrieval and generation deadlines of the async actions
+(ActionAnswerExpoBeton in actions/actions.py, actions/action_human_handoff.py)
+
+Run with: python test_deadlines.py  (or pytest test_deadlines.py)
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault('EMBEDDING_BACKEND', 'hash')
+os.environ.setdefault('DOCS_INDEX_DIR', tempfile.mkdtemp())
+os.environ.setdefault('ACTION_STREAM_PORT', '0')
+os.environ.setdefault('ACTION_METRICS_PORT', '0')
+
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions import action_human_handoff, actions
+
+ANSWER = "Le salon ExpoBeton se tient à Kinshasa du 12 au 14 septembre, au centre des expositions. 😊"
+PASSAGES = [{'filename': 'dates.txt', 'start': 0, 'end': 40, 'content': "ExpoBeton, du 12 au 14 septembre."}]
+
+
+def fake_retrieval(delay):
+    async def find_relevant_docs(query, top_k=5):
+        await asyncio.sleep(delay)
+        return PASSAGES
+    return find_relevant_docs
+
+
+def fake_generation(delay, calls):
+    async def stream_chat_completion(messages, on_token=None, model='gpt-4o', timeout=None, **kwargs):
+        calls.append(timeout)
+        # Same contract as actions/llm.py: cancelled with asyncio.TimeoutError at the deadline
+        await asyncio.wait_for(asyncio.sleep(delay), timeout)
+        return ANSWER, delay
+    return stream_chat_completion
+
+
+def run_turn(sender, text):
+    tracker = SimpleNamespace(sender_id=sender, latest_message={
+        'text': text, 'intent': {'name': 'ask_question'}, 'metadata': {}})
+    dispatcher = CollectingDispatcher()
+    start = time.perf_counter()
+    asyncio.run(actions.ActionAnswerExpoBeton().run(dispatcher, tracker, {}))
+    return [message['text'] for message in dispatcher.messages], time.perf_counter() - start
+
+
+def with_fakes(retrieval_delay, generation_delay, calls):
+    original = (actions.find_relevant_docs, actions.stream_chat_completion,
+                actions.RETRIEVAL_TIMEOUT, actions.GENERATION_TIMEOUT)
+    actions.find_relevant_docs = fake_retrieval(retrieval_delay)
+    actions.stream_chat_completion = fake_generation(generation_delay, calls)
+    actions.RETRIEVAL_TIMEOUT, actions.GENERATION_TIMEOUT = 0.3, 0.3
+    return original
+
+
+def restore(original):
+    (actions.find_relevant_docs, actions.stream_chat_completion,
+     actions.RETRIEVAL_TIMEOUT, actions.GENERATION_TIMEOUT) = original
+
+
+def test_each_stage_has_its_own_deadline():
+    calls = []
+    original = with_fakes(0.2, 0.25, calls)
+    try:
+        # 0.45s in total, over either budget alone: each stage fits its own deadline
+        messages, _ = run_turn('deadline-1', "Quelles sont les dates xyzzy du salon ?")
+        assert messages == [ANSWER] and calls == [0.3]
+    finally:
+        restore(original)
+
+
+def test_slow_retrieval_falls_back_without_generation():
+    calls = []
+    original = with_fakes(5, 0, calls)
+    try:
+        messages, elapsed = run_turn('deadline-2', "Combien de plugh au salon ?")
+        assert elapsed < 1.5 and calls == []
+        assert messages == [actions.get_multilingual_response('fallback', 'fr')]
+    finally:
+        restore(original)
+
+
+def test_slow_generation_is_cancelled_at_its_deadline():
+    calls = []
+    original = with_fakes(0, 5, calls)
+    try:
+        messages, elapsed = run_turn('deadline-3', "Qui organise le quux du salon ?")
+        assert elapsed < 1.5 and calls == [0.3]
+        assert messages == [actions.get_multilingual_response('fallback', 'fr')]
+    finally:
+        restore(original)
+
+
+def test_handoff_summary_timeout_still_transfers():
+    async def slow_summary(messages, model='gpt-4o', **kwargs):
+        raise asyncio.TimeoutError
+
+    original = action_human_handoff.chat_completion
+    action_human_handoff.chat_completion = slow_summary
+    try:
+        dispatcher = CollectingDispatcher()
+        tracker = SimpleNamespace(sender_id='handoff', events=[{'event': 'user', 'text': "Je veux un humain"}])
+        asyncio.run(action_human_handoff.ActionHumanHandoff().run(dispatcher, tracker, {}))
+        assert dispatcher.messages[0]['response'] == 'utter_transfer_to_manager'
+        assert dispatcher.messages[0]['summary'] == "No summary available"
+    finally:
+        action_human_handoff.chat_completion = original
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING DEADLINES")
+    print("=" * 80)
+    for test in (test_each_stage_has_its_own_deadline, test_slow_retrieval_falls_back_without_generation,
+                 test_slow_generation_is_cancelled_at_its_deadline, test_handoff_summary_timeout_still_transfers):
+        test()
+        print(f"✅ {test.__name__}")
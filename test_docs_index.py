@@ -0,0 +1,112 @@
+"""
+Test script for the persistent docs embedding index (actions/docs_index.py)
+
+Run with: python test_docs_index.py  (or pytest test_docs_index.py)
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from actions.docs_index import build_index, chunk_text, is_stale, load_index, load_or_build_index, split_document
+from actions.embeddings import HashEmbedder
+from actions.vector_index import normalize_rows
+
+
+class CountingEmbedder(HashEmbedder):
+    """Hash embedder that records every text it embeds"""
+
+    def __init__(self):
+        super().__init__(dim=64)
+        self.embedded = []
+
+    def embed_batch(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_batch(texts)
+
+
+def make_docs(files):
+    root = Path(tempfile.mkdtemp())
+    (root / 'docs').mkdir()
+    for name, text in files.items():
+        (root / 'docs' / name).write_text(text, encoding='utf-8')
+    return root
+
+
+def test_only_changed_files_are_re_embedded():
+    root = make_docs({'a.txt': "Le salon ExpoBeton à Kinshasa.", 'b.txt': "Le prix des stands.",
+                      'c.txt': "Les sponsors du salon."})
+    try:
+        embedder = CountingEmbedder()
+        first = build_index(embedder, root / 'docs', root / 'index')
+        assert len(embedder.embedded) == 3 and not is_stale(first, root / 'docs')
+        saved = load_index(root / 'index', embedder.model_name)
+        assert isinstance(saved.embeddings, np.memmap) and saved.version == first.version
+        assert load_index(root / 'index', 'another-model') is None
+
+        # Same bytes: nothing is embedded again
+        embedder.embedded.clear()
+        assert load_or_build_index(embedder, root / 'docs', root / 'index').version == first.version
+        assert embedder.embedded == []
+
+        # One file changed, one removed, one added: only the changed and new files are embedded
+        (root / 'docs' / 'b.txt').write_text("Le prix des stands équipés.", encoding='utf-8')
+        (root / 'docs' / 'c.txt').unlink()
+        (root / 'docs' / 'd.txt').write_text("Les conférences sur le ciment.", encoding='utf-8')
+        assert is_stale(saved, root / 'docs')
+        # Without rebuild the stale index is served as built
+        assert load_or_build_index(embedder, root / 'docs', root / 'index', rebuild=False).version == first.version
+        assert embedder.embedded == []
+
+        second = load_or_build_index(embedder, root / 'docs', root / 'index')
+        assert sorted(embedder.embedded) == ["Le prix des stands équipés.", "Les conférences sur le ciment."]
+        assert [d['filename'] for d in second.documents] == ['a.txt', 'b.txt', 'd.txt']
+        assert second.version != first.version
+        # The reused rows are the ones of the first build
+        assert np.allclose(second.embeddings[0], first.embeddings[0], atol=1e-6)
+        expected = normalize_rows(embedder.embed([d['content'] for d in second.documents]))
+        assert np.allclose(second.embeddings, expected, atol=1e-6)
+
+        # force re-embeds everything
+        embedder.embedded.clear()
+        build_index(embedder, root / 'docs', root / 'index', force=True)
+        assert len(embedder.embedded) == 3
+    finally:
+        shutil.rmtree(root)
+
+
+def test_passages_overlap_and_cover_the_whole_file():
+    words = [f"mot{i}" for i in range(600)]
+    text = ' '.join(words[:300]) + '\n\n' + ' '.join(words[300:])
+    spans = chunk_text(text, size=400, overlap=80)
+    assert len(spans) > 5 and spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        assert end - start <= 400 and next_end > end
+        # Consecutive passages share up to `overlap` characters, no gap between them
+        assert end - 80 <= next_start <= end
+        # Cut on whitespace and restarted on a word: no word is split in two
+        assert text[end] in ' \n' and text[next_start - 1] == ' '
+    # A paragraph break in the second half of a window is preferred to any other whitespace
+    assert text.index('\n\n') in {end for _, end in spans}
+
+    covered = set()
+    for start, end in spans:
+        covered.update(range(start, end))
+    assert covered >= {i for i, c in enumerate(text) if not c.isspace()}
+
+    # A word longer than the window is cut anyway; whitespace-only files give no passage
+    assert chunk_text('x' * 1000, size=400, overlap=80)[-1][1] == 1000
+    assert split_document('blank.txt', ' \n\n ') == []
+    passages = split_document('mots.txt', text)
+    assert all(p['content'] == text[p['start']:p['end']].strip() and p['filename'] == 'mots.txt' for p in passages)
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING DOCS INDEX")
+    print("=" * 80)
+    for test in (test_only_changed_files_are_re_embedded, test_passages_overlap_and_cover_the_whole_file):
+        test()
+        print(f"✅ {test.__name__}")
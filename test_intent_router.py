@@ -0,0 +1,92 @@
+"""
+Test script pinning the keyword routing order of ActionAnswerExpoBeton (actions/routes.yml)
+
+Run with: python test_intent_router.py  (or pytest test_intent_router.py)
+"""
+
+from actions.intent_router import AFTER_RAG, BEFORE_RAG, KeywordRouter
+
+ROUTER = KeywordRouter.from_yaml()
+
+# (message, stage, expected answer key) - order-sensitive cases first
+ROUTING_CASES = [
+    # "how are you" wins over the greeting it contains
+    ("bonjour, comment allez-vous ?", BEFORE_RAG, 'how_are_you'),
+    ("salut, ça va ?", BEFORE_RAG, 'how_are_you'),
+    # "histoire" contains "hi" but is not a greeting
+    ("quelle est l'histoire d'expobeton ?", BEFORE_RAG, 'history'),
+    # Editions count wins over greetings and over the "combien de jours" duration
+    ("bonjour, combien d'éditions ?", BEFORE_RAG, 'editions_count'),
+    ("combien de jours dure l'édition ?", BEFORE_RAG, 'editions_count'),
+    ("hello", BEFORE_RAG, 'greeting'),
+    ("bonjour, je m'appelle marie", BEFORE_RAG, 'greeting'),
+    ("merci beaucoup", BEFORE_RAG, 'thank_you'),
+    # Registration wins over goodbye
+    ("je veux participer, bye", BEFORE_RAG, 'registration'),
+    ("au revoir", BEFORE_RAG, 'goodbye'),
+    # Goodbye words inside a question are not a goodbye
+    ("oui au revoir", BEFORE_RAG, None),
+    ("pourquoi bye ?", BEFORE_RAG, None),
+    # "lubumbashi" contains "hi", so only the truncated variant reaches its route
+    ("pourquoi lubumbashi ?", BEFORE_RAG, 'greeting'),
+    ("pourquoi lubumbash ?", BEFORE_RAG, 'lubumbashi'),
+    ("comment devenir ambassadeur ?", BEFORE_RAG, 'ambassador'),
+    ("parlez-moi du béton armé", BEFORE_RAG, None),
+    # After the document search
+    ("qui est le fondateur ?", AFTER_RAG, 'founder'),
+    ("qui est le vice-président ?", AFTER_RAG, 'vice_president'),
+    ("c'est quoi le grand katanga ?", AFTER_RAG, 'grand_katanga'),
+    ("what is expobeton?", AFTER_RAG, 'what_is_expobeton'),
+    # Dates before location, location before duration
+    ("quand et où ?", AFTER_RAG, 'dates'),
+    ("où a lieu l'événement ?", AFTER_RAG, 'location'),
+    ("combien de jours ?", AFTER_RAG, 'duration'),
+    ("quelles villes du katanga ?", AFTER_RAG, 'katanga_cities'),
+    ("qui a parlé à kolwezi ?", AFTER_RAG, 'kolwezi'),
+    ("quand le président a-t-il dit cela ?", AFTER_RAG, 'dates'),
+    ("qu'a dit le président en 2024 ?", AFTER_RAG, 'presidential_speech_2024'),
+    ("discours du président 2024", AFTER_RAG, 'presidential_speech_2024'),
+    ("rapport 2024", AFTER_RAG, 'final_report_2024'),
+    ("édition 2023", AFTER_RAG, 'edition_2023'),
+    ("types de stands", AFTER_RAG, 'stands'),
+    ("les meilleurs stands", AFTER_RAG, None),
+    ("les corridors africains", AFTER_RAG, 'african_corridors'),
+    ("zones économiques spéciales", AFTER_RAG, 'special_economic_zones'),
+    ("le rôle de kinshasa", AFTER_RAG, 'kinshasa_role'),
+    ("le gouverneur de kinshasa", AFTER_RAG, 'kinshasa_role'),
+    ("les intervenants 2023", AFTER_RAG, 'speakers_2023'),
+    ("le ministre de l'industrie", AFTER_RAG, 'minister_industry'),
+    ("tenke fungurume", AFTER_RAG, 'tfm'),
+    ("le cadastre minier", AFTER_RAG, 'cami'),
+    ("la banque centrale", AFTER_RAG, 'bcc'),
+    ("le thème de l'expo", AFTER_RAG, 'theme'),
+    # Stages never answer each other's routes
+    ("hello", AFTER_RAG, None),
+    ("le thème de l'expo", BEFORE_RAG, None),
+]
+
+
+def test_routing_order():
+    for message, stage, expected in ROUTING_CASES:
+        actual = ROUTER.route(message, stage)
+        assert actual == expected, f"[{stage}] {message!r}: expected {expected}, got {actual}"
+
+
+def test_overlapping_keywords():
+    # Every keyword contained in the text is found, even inside another one
+    assert set(ROUTER.matched_keywords("history")) >= {'history', 'hi'}
+    assert set(ROUTER.matched_keywords("thank you")) >= {'thank', 'thank you'}
+
+
+def test_subset_keeps_given_order():
+    router = ROUTER.subset(['lubumbashi', 'history'])
+    assert router.route("histoire de lubumbashi") == 'lubumbashi'
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING KEYWORD ROUTING ORDER")
+    print("=" * 80)
+    for test in (test_routing_order, test_overlapping_keywords, test_subset_keeps_given_order):
+        test()
+        print(f"✅ {test.__name__}")
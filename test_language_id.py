@@ -0,0 +1,158 @@
+"""
+Test script for the character n-gram language identifier (actions/language_id.py)
+
+Run with: python test_language_id.py  (or pytest test_language_id.py)
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault('EMBEDDING_BACKEND', 'hash')
+os.environ.setdefault('DOCS_INDEX_DIR', tempfile.mkdtemp())
+os.environ.setdefault('ACTION_STREAM_PORT', '0')
+os.environ.setdefault('ACTION_METRICS_PORT', '0')
+
+from actions.language_id import LanguageIdentifier, SessionLanguages, response_language
+
+IDENTIFIER = LanguageIdentifier.load()
+
+DETECTION_CASES = [
+    # Keyword counting got these wrong: 'hi' in 'histoire', 'is'/'are' inside French words
+    ("Quelle est l'histoire d'ExpoBeton ?", 'fr'),
+    ("histoire", 'fr'),
+    ("History", 'en'),
+    ("Qui sont les organisateurs", 'fr'),
+    ("Combien de visiteurs sont attendus ?", 'fr'),
+    ("What is ExpoBeton?", 'en'),
+    ("¿Dónde se celebra la feria?", 'es'),
+    ("Nalingi koyeba ntalo ya stand", 'ln'),
+    ("Ningependa kujua bei ya banda", 'sw'),
+    # Non-Latin scripts, brand names in Latin letters do not matter
+    ("Что такое ExpoBeton?", 'ru'),
+    ("ExpoBeton是什么？", 'zh'),
+    ("ما هو ExpoBeton؟", 'ar'),
+]
+
+
+def test_detection():
+    for text, expected in DETECTION_CASES:
+        assert IDENTIFIER.detect(text) == expected, (text, IDENTIFIER.identify(text))
+
+
+def test_no_letters_defaults_to_french():
+    assert IDENTIFIER.identify("👍 5 !!")[0] is None
+    assert IDENTIFIER.detect("👍 5 !!") == 'fr'
+    # Too short to tell: "ok" and "hi" are not counted as English
+    assert IDENTIFIER.identify("ok")[0] is None and IDENTIFIER.identify("hi !")[0] is None
+    assert IDENTIFIER.detect("ok") == 'fr' and IDENTIFIER.detect("oui") == 'fr'
+
+
+def test_response_language():
+    assert response_language('ln') == 'fr' and response_language('sw') == 'fr'
+    assert response_language('es') == 'es' and response_language(None) == 'fr'
+
+
+def test_session_language_is_smoothed():
+    stored = {'known': 'en'}
+    writes = []
+
+    def store(session_id, language):
+        stored[session_id] = language
+        writes.append((session_id, language))
+
+    sessions = SessionLanguages(IDENTIFIER, load=stored.get, store=store)
+    assert sessions.update('s1', "Where is the exhibition held this year?") == 'en'
+    # Short or letterless replies keep the language of the conversation
+    assert sessions.update('s1', "ok") == 'en'
+    assert sessions.update('s1', "5") == 'en'
+    # A clear message in another language switches it
+    assert sessions.update('s1', "Je préfère continuer en français s'il vous plaît") == 'fr'
+    assert sessions.update('s1', "ok") == 'fr'
+    assert writes == [('s1', 'en'), ('s1', 'fr')]
+    # Sessions started on another replica start from the stored language
+    assert sessions.get('known') == 'en'
+    assert sessions.update('known', "ok") == 'en'
+
+
+def test_store_round_trip_does_not_block_other_sessions():
+    loading = threading.Event()
+
+    def slow_load(session_id):
+        if session_id == 'slow':
+            loading.set()
+            time.sleep(0.5)
+            return 'en'
+        return None
+
+    sessions = SessionLanguages(IDENTIFIER, load=slow_load)
+    sessions.update('fast', "Bonjour, je voudrais un stand au salon")
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(slow=sessions.update('slow', "ok")))
+    thread.start()
+    assert loading.wait(1)
+    start = time.perf_counter()
+    assert sessions.update('fast', "Quel est le prix d'un stand ?") == 'fr'
+    assert time.perf_counter() - start < 0.1
+    thread.join()
+    # The stored language still seeds the session loaded meanwhile
+    assert result['slow'] == 'en' and sessions.get('slow') == 'en'
+
+
+def test_feedback_actions_read_the_stored_language_off_the_event_loop():
+    from rasa_sdk.executor import CollectingDispatcher
+    from actions import actions
+
+    def slow_load(session_id):
+        time.sleep(0.3)  # SQLite/Redis round trip
+        return 'en'
+
+    async def feedback_turns():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        dispatchers = []
+        runs = []
+        for i, action in enumerate((actions.ActionAskFeedbackRating(), actions.ActionThankYouPositive(),
+                                    actions.ActionThankYouNegative())):
+            dispatchers.append(CollectingDispatcher())
+            # "ok" alone says nothing: the stored language of the conversation decides
+            tracker = SimpleNamespace(sender_id=f'feedback-{i}', events=[{'event': 'user', 'text': "ok"}])
+            runs.append(action.run(dispatchers[-1], tracker, {}))
+        await asyncio.gather(*runs)
+        task.cancel()
+        return dispatchers, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    backend = actions.CONVERSATION_LOGS.backend
+    original = actions.SESSION_LANGUAGES.load
+    actions.SESSION_LANGUAGES.load = slow_load
+    backend.persistent = True
+    try:
+        dispatchers, longest_gap = asyncio.run(feedback_turns())
+    finally:
+        actions.SESSION_LANGUAGES.load = original
+        del backend.persistent
+    assert longest_gap < 0.1, longest_gap
+    assert dispatchers[0].messages[0]['text'].startswith("We'd love to hear your feedback")
+    assert dispatchers[1].messages[0]['text'].startswith("That's wonderful")
+    assert dispatchers[2].messages[0]['text'].startswith("We appreciate")
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING LANGUAGE IDENTIFICATION")
+    print("=" * 80)
+    for test in (test_detection, test_no_letters_defaults_to_french, test_response_language,
+                 test_session_language_is_smoothed, test_store_round_trip_does_not_block_other_sessions,
+                 test_feedback_actions_read_the_stored_language_off_the_event_loop):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,134 @@
+"""
+Test script for the BM25 index over docs/ (actions/lexical_index.py) and the hybrid retrieval
+
+Run with: python test_lexical_index.py  (or pytest test_lexical_index.py)
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from actions.lexical_index import (build_lexical_index, is_stale, load_lexical_index, load_or_build_lexical_index,
+                                   reciprocal_rank_fusion, save_lexical_index, tokenize)
+
+DOCS = {
+    'dates.txt': "ExpoBeton RDC 2024 se tient à Kinshasa du 9 au 12 septembre. L'exposition accueille les exposants.",
+    'stands.txt': "Le prix d'un stand d'exposant dépend de sa surface. ExpoBeton propose des stands équipés.",
+    'english.txt': "The ExpoBeton exhibition welcomes sponsors and visitors. Sponsors get a booth.",
+}
+
+
+def make_docs(files=DOCS):
+    root = Path(tempfile.mkdtemp())
+    (root / 'docs').mkdir()
+    for name, text in files.items():
+        (root / 'docs' / name).write_text(text, encoding='utf-8')
+    return root
+
+
+def test_tokenize_folds_accents_elisions_and_plurals():
+    assert tokenize("Où sont les exposants d'ExpoBéton ?") == ['exposant', 'expobeton']
+    assert tokenize("L'ÉTAT des Œuvres, qu'il faut") == ['etat', 'oeuvre', 'faut']
+    assert tokenize("Who are the sponsors in 2024?") == ['sponsor', '2024']
+    assert tokenize("business class") == ['business', 'class']
+
+
+def test_bm25_ranks_rare_terms_first():
+    root = make_docs()
+    try:
+        index = build_lexical_index(root / 'docs')
+        indices, scores = index.search("Quel est le prix des stands ?")
+        assert index.documents[indices[0]]['filename'] == 'stands.txt'
+        assert list(scores) == sorted(scores, reverse=True) and scores[0] > 0
+        # "expobeton" is in every passage: it scores little, and nothing matches no term
+        indices, _ = index.search("sponsors ExpoBeton")
+        assert index.documents[indices[0]]['filename'] == 'english.txt'
+        assert len(index.search("xyzzy")[0]) == 0 and len(index.search("les de la")[0]) == 0
+    finally:
+        shutil.rmtree(root)
+
+
+def test_saved_index_is_memory_mapped_and_rebuilt_when_stale():
+    root = make_docs()
+    try:
+        built = build_lexical_index(root / 'docs')
+        save_lexical_index(built, root / 'index')
+        loaded = load_lexical_index(root / 'index', docs_path=root / 'docs')
+        assert isinstance(loaded.postings, np.memmap) and isinstance(loaded.weights, np.memmap)
+        # Passages are spans read back from docs/, not a copy of their text
+        assert not (root / 'index' / 'bm25' / 'documents.json').exists()
+        assert list(loaded.documents) == built.documents and loaded.documents[1:3] == built.documents[1:3]
+        assert loaded.terms == built.terms and not is_stale(loaded, root / 'docs')
+        indices, scores = loaded.search("septembre Kinshasa")
+        assert np.allclose(scores, built.search("septembre Kinshasa")[1])
+        # Other BM25 parameters: not this index
+        assert load_lexical_index(root / 'index', k1=2.0) is None
+
+        (root / 'docs' / 'new.txt').write_text("Le ciment et le béton armé.", encoding='utf-8')
+        assert is_stale(loaded, root / 'docs')
+        index = load_or_build_lexical_index(root / 'docs', root / 'index')
+        assert index.documents[index.search("béton armé")[0][0]]['filename'] == 'new.txt'
+    finally:
+        shutil.rmtree(root)
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['c', 'a', 'd']], k=60)
+    # In both rankings first, then the best of one ranking
+    assert fused[:2] == ['a', 'c'] and set(fused) == {'a', 'b', 'c', 'd'}
+    assert reciprocal_rank_fusion([[], ['x']]) == ['x']
+
+
+def test_full_corpus_queries_take_single_digit_milliseconds():
+    index = build_lexical_index()
+    queries = ["Où se tient ExpoBeton 2024 ?", "Combien coûte un stand d'exposant ?",
+               "who are the sponsors of the exhibition", "programme des conférences sur le ciment"]
+    timings = []
+    for _ in range(20):
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, 20)
+            timings.append(time.perf_counter() - start)
+    assert sorted(timings)[len(timings) // 2] < 0.005 and max(timings) < 0.05
+
+
+def test_hybrid_retrieval_answers_without_the_embeddings_api():
+    os.environ.setdefault('EMBEDDING_BACKEND', 'hash')
+    os.environ.setdefault('DOCS_INDEX_DIR', tempfile.mkdtemp())
+    from actions import actions
+
+    async def unavailable(query, top_k=5):
+        await asyncio.sleep(10)
+
+    async def over_quota(query, top_k=5):
+        raise RuntimeError("Error code: 429 - insufficient_quota")
+
+    # Loaded at startup by the preload thread
+    assert actions.load_lexical_index() is not None
+    original = actions.find_similar_docs
+    try:
+        for find_similar_docs in (unavailable, over_quota):
+            actions.find_similar_docs = find_similar_docs
+            start = time.perf_counter()
+            passages = asyncio.run(actions.find_relevant_docs("Quand a lieu ExpoBeton 2024 à Kinshasa ?", 5))
+            assert len(passages) == 5 and time.perf_counter() - start < actions.QUERY_EMBEDDING_TIMEOUT + 1
+            assert all({'filename', 'start', 'end', 'content'} <= set(passage) for passage in passages)
+    finally:
+        actions.find_similar_docs = original
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING LEXICAL INDEX")
+    print("=" * 80)
+    for test in (test_tokenize_folds_accents_elisions_and_plurals, test_bm25_ranks_rare_terms_first,
+                 test_saved_index_is_memory_mapped_and_rebuilt_when_stale, test_reciprocal_rank_fusion,
+                 test_full_corpus_queries_take_single_digit_milliseconds,
+                 test_hybrid_retrieval_answers_without_the_embeddings_api):
+        test()
+        print(f"✅ {test.__name__}")
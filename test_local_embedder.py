@@ -0,0 +1,194 @@
+"""
+Test script for the embedder interface (actions/embeddings.py) and the local TF-IDF + SVD embedder
+
+Run with: python test_local_embedder.py  (or pytest test_local_embedder.py)
+"""
+
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from actions import local_embedder
+from actions.caching import QueryEmbeddingCache
+from actions.docs_index import build_index, load_index
+from actions.embeddings import Embedder, HashEmbedder, get_embedder
+from actions.local_embedder import LocalEmbedder, load_local_model
+
+# Two passages per topic: a term of a single passage relates nothing and is not kept
+DOCS = {
+    'dates.txt': "ExpoBeton se tient à Kinshasa en septembre. Le salon ExpoBeton accueille les exposants à Kinshasa.",
+    'lieu.txt': "Le salon ExpoBeton a lieu au centre de Kinshasa, en septembre, avec des conférences.",
+    'stands.txt': "Le prix d'un stand d'exposant dépend de sa surface. Les stands équipés ont un prix fixe.",
+    'tarifs.txt': "Tarifs du salon : le prix du stand, le prix de l'entrée des visiteurs et des exposants.",
+    'ciment.txt': "Le ciment et le béton armé. Les cimentiers présentent le béton et le ciment aux conférences.",
+    'beton.txt': "Béton, ciment et granulats : les cimentiers du salon et leurs innovations.",
+    'sponsors.txt': "The sponsors of the exhibition get a booth. Sponsors and visitors meet at the exhibition.",
+    'partners.txt': "Partners and sponsors of the exhibition: booth, visitors and conferences.",
+}
+
+
+def make_docs(files=DOCS):
+    root = Path(tempfile.mkdtemp())
+    (root / 'docs').mkdir()
+    for name, text in files.items():
+        (root / 'docs' / name).write_text(text, encoding='utf-8')
+    return root
+
+
+class RecordingEmbedder(Embedder):
+    """One-hot rows of the text numbers, batches and threads recorded"""
+
+    model_name = 'recording'
+
+    def __init__(self, batch_size, workers):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.batches = []
+        self.threads = set()
+
+    def embed_batch(self, texts):
+        self.batches.append(len(texts))
+        self.threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return np.eye(100, dtype=np.float32)[[int(text) for text in texts]]
+
+
+def test_embed_batches_on_workers_and_keeps_order():
+    embedder = RecordingEmbedder(batch_size=8, workers=4)
+    texts = [str(i) for i in range(30)]
+    vectors = embedder.embed(texts)
+    assert vectors.shape == (30, 100) and list(vectors.argmax(axis=1)) == list(range(30))
+    assert sorted(embedder.batches) == [6, 8, 8, 8] and len(embedder.threads) > 1
+    assert asyncio.run(embedder.aembed(['7'])).argmax() == 7
+
+    sequential = RecordingEmbedder(batch_size=8, workers=1)
+    assert np.array_equal(sequential.embed(texts), vectors) and len(sequential.threads) == 1
+    assert isinstance(get_embedder('hash'), HashEmbedder) and isinstance(get_embedder('local'), LocalEmbedder)
+
+
+def test_local_embedder_relates_passages_without_network():
+    root = make_docs()
+    try:
+        embedder = LocalEmbedder(root / 'docs', root / 'index', dim=3)
+        vectors = embedder.embed(list(DOCS.values()))
+        assert vectors.shape == (len(DOCS), 3) and np.allclose(np.linalg.norm(vectors, axis=1), 1, atol=1e-5)
+        for query, topic in (("Quel est le prix des stands ?", {'stands.txt', 'tarifs.txt'}),
+                             ("béton et ciment", {'ciment.txt', 'beton.txt'}),
+                             ("exhibition sponsors", {'sponsors.txt', 'partners.txt'})):
+            query_vector = asyncio.run(embedder.aembed([query]))[0]
+            assert {list(DOCS)[i] for i in np.argsort(-(vectors @ query_vector))[:2]} == topic
+        # Accents, plurals and case fold like the BM25 terms; unknown words give a zero vector
+        assert np.allclose(embedder.embed(["CIMENTS Béton"]), embedder.embed(["ciment beton"]))
+        assert not embedder.embed(["xyzzy"]).any()
+    finally:
+        shutil.rmtree(root)
+
+
+def test_saved_model_is_reused_and_retrained_when_docs_change():
+    root = make_docs()
+    try:
+        first = LocalEmbedder(root / 'docs', root / 'index', dim=3)
+        vectors = first.embed(list(DOCS.values()))
+        saved = load_local_model(root / 'index', dim=3)
+        assert isinstance(saved.components, np.memmap) and saved.name == first.model_name
+        assert load_local_model(root / 'index', dim=4) is None
+
+        second = LocalEmbedder(root / 'docs', root / 'index', dim=3)
+        assert second.model_name == first.model_name
+        assert np.allclose(second.embed(list(DOCS.values())), vectors)
+
+        (root / 'docs' / 'new.txt').write_text("Les conférences sur le ciment du salon.", encoding='utf-8')
+        assert LocalEmbedder(root / 'docs', root / 'index', dim=3).model_name != first.model_name
+    finally:
+        shutil.rmtree(root)
+
+
+def test_docs_index_is_rebuilt_offline_and_re_embedded_with_a_retrained_model():
+    root = make_docs()
+    try:
+        index = build_index(LocalEmbedder(root / 'docs', root / 'index', dim=3), root / 'docs', root / 'index')
+        assert len(index) == len(DOCS) and index.embeddings.shape == (len(DOCS), 3)
+        assert load_index(root / 'index', index.model_name) is not None
+
+        (root / 'docs' / 'new.txt').write_text("Les conférences sur le ciment du salon.", encoding='utf-8')
+        embedder = LocalEmbedder(root / 'docs', root / 'index', dim=3)
+        # New projection: the vectors of the unchanged files cannot be reused
+        assert load_index(root / 'index', embedder.model_name) is None
+        rebuilt = build_index(embedder, root / 'docs', root / 'index')
+        assert len(rebuilt) == len(DOCS) + 1 and rebuilt.model_name == embedder.model_name != index.model_name
+    finally:
+        shutil.rmtree(root)
+
+
+def test_query_cache_does_not_load_the_model_on_the_event_loop():
+    root = make_docs()
+    original = local_embedder.load_or_train_local_model
+
+    def slow_training(*args):
+        time.sleep(1)
+        return original(*args)
+
+    async def query_with_deadline(cache):
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.05)
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(cache.aembed('exposants'), 0.3)
+            timed_out = False
+        except asyncio.TimeoutError:
+            timed_out = True
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        return timed_out, elapsed, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    local_embedder.load_or_train_local_model = slow_training
+    try:
+        embedder = LocalEmbedder(root / 'docs', root / 'index', dim=3)
+        cache = QueryEmbeddingCache(embedder)
+        assert embedder.model_name.startswith('lsa-3-') and embedder._model is None
+        timed_out, elapsed, longest_gap = asyncio.run(query_with_deadline(cache))
+        # The deadline fires on time and the loop keeps running while the model loads in a thread
+        assert timed_out and elapsed < 0.6 and longest_gap < 0.2
+        assert embedder.model.name == embedder.model_name
+    finally:
+        local_embedder.load_or_train_local_model = original
+        shutil.rmtree(root)
+
+
+def test_full_corpus_query_embedding_is_sub_millisecond():
+    index_dir = Path(tempfile.mkdtemp())
+    try:
+        embedder = LocalEmbedder(index_dir=index_dir)
+        embedder.embed(["warm up"])
+        timings = []
+        for query in ["Où se tient ExpoBeton 2024 ?", "Combien coûte un stand d'exposant ?",
+                      "who are the sponsors of the exhibition", "programme des conférences sur le ciment"] * 10:
+            start = time.perf_counter()
+            embedder.embed([query])
+            timings.append(time.perf_counter() - start)
+        assert sorted(timings)[len(timings) // 2] < 0.001
+    finally:
+        shutil.rmtree(index_dir)
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING EMBEDDERS")
+    print("=" * 80)
+    for test in (test_embed_batches_on_workers_and_keeps_order, test_local_embedder_relates_passages_without_network,
+                 test_saved_model_is_reused_and_retrained_when_docs_change,
+                 test_docs_index_is_rebuilt_offline_and_re_embedded_with_a_retrained_model,
+                 test_query_cache_does_not_load_the_model_on_the_event_loop, test_full_corpus_query_embedding_is_sub_millisecond):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,184 @@
+"""
+Test script for the durable email outbox (actions/mail_outbox.py)
+
+Runs against LocalSMTPServer, a small in-process SMTP stand-in (EHLO, AUTH
+PLAIN, MAIL/RCPT/DATA) that can be told to reject the next messages with a
+temporary error.
+
+Run with: python test_mail_outbox.py  (or pytest test_mail_outbox.py)
+"""
+
+import base64
+import socketserver
+import tempfile
+import threading
+import time
+from email.mime.text import MIMEText
+
+from actions.mail_outbox import MailOutbox
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.delay = delay  # seconds per command, a slow mail server
+        self.messages = []
+        self.logins = []
+        self.connections = 0
+        self.reject_next = 0  # answer 451 to the next DATA commands
+        self.wrong_password = False  # answer 535 to AUTH
+        self.refused_recipients = {}  # address -> reply to its RCPT command
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        time.sleep(self.server.delay)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost ESMTP test")
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.wfile.write(b"250-localhost\r\n")
+                self.reply("250 AUTH PLAIN")
+            elif command == 'AUTH':
+                credentials = base64.b64decode(line.split()[-1]).split(b'\0')
+                if self.server.wrong_password:
+                    self.reply("535 Authentication credentials invalid")
+                    continue
+                self.server.logins.append(credentials[1].decode())
+                self.reply("235 Authentication successful")
+            elif command == 'RCPT' and (address := line.split(':', 1)[1].strip('<> ')) in self.server.refused_recipients:
+                self.reply(self.server.refused_recipients[address])
+            elif command == 'DATA':
+                if self.server.reject_next:
+                    self.server.reject_next -= 1
+                    self.reply("451 Try again later")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while (line := self.rfile.readline()) != b".\r\n":
+                    data.append(line)
+                self.server.messages.append(b''.join(data).decode())
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+
+def make_message(subject, to='bot@expobetonrdc.com'):
+    msg = MIMEText(f"Transcript {subject}", 'plain')
+    msg['From'] = 'noreply@expobetonrdc.com'
+    msg['To'] = to
+    msg['Subject'] = subject
+    return msg
+
+
+def test_one_connection_for_many_messages():
+    server = LocalSMTPServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MailOutbox('127.0.0.1', server.port, 'bot', 'secret', directory=tmp)
+        for i in range(5):
+            outbox.enqueue(make_message(f"conversation {i}"))
+        assert len(outbox) == 5
+        assert outbox.drain() is None
+        assert len(outbox) == 0
+        assert len(server.messages) == 5 and 'conversation 4' in server.messages[-1]
+        assert server.connections == 1 and server.logins == ['bot']
+        outbox.flush()
+    server.shutdown()
+
+
+def test_enqueue_does_not_wait_for_the_server():
+    server = LocalSMTPServer(delay=0.05)
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MailOutbox('127.0.0.1', server.port, directory=tmp)
+        outbox.start()
+        start = time.perf_counter()
+        outbox.enqueue(make_message("goodbye"))
+        assert time.perf_counter() - start < 0.05
+        # Delivered in the background, anything left is sent by the exit flush
+        assert outbox.flush(timeout=5) == 0
+        assert len(server.messages) == 1
+    server.shutdown()
+
+
+def test_retry_with_backoff_then_give_up():
+    server = LocalSMTPServer()
+    server.reject_next = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MailOutbox('127.0.0.1', server.port, directory=tmp, retry_base=0.1, max_attempts=2)
+        outbox.enqueue(make_message("retried"))
+        next_due = outbox.drain()
+        assert next_due is not None and 0 < next_due <= 0.1
+        assert len(outbox) == 1 and not server.messages
+        time.sleep(next_due)
+        assert outbox.drain() is None and len(server.messages) == 1
+
+        server.reject_next = 2
+        outbox.enqueue(make_message("undeliverable"))
+        outbox.drain()
+        time.sleep(0.1)
+        outbox.drain()
+        assert len(outbox) == 0 and outbox.failed == 1
+        assert len(list(outbox.failed_directory.glob('*.json'))) == 1
+    server.shutdown()
+
+
+def test_permanent_errors_are_not_retried():
+    server = LocalSMTPServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MailOutbox('127.0.0.1', server.port, 'bot', 'wrong', directory=tmp, retry_base=0.1)
+        server.wrong_password = True
+        outbox.enqueue(make_message("wrong password"))
+        assert outbox.drain() is None and outbox.failed == 1
+
+        server.wrong_password = False
+        server.refused_recipients = {'nobody@expobetonrdc.com': "550 No such user",
+                                     'full@expobetonrdc.com': "452 Mailbox full, try later"}
+        outbox.enqueue(make_message("unknown recipient", to='nobody@expobetonrdc.com'))
+        assert outbox.drain() is None and outbox.failed == 2
+        # A temporary refusal (4xx) is retried
+        outbox.enqueue(make_message("mailbox full", to='full@expobetonrdc.com'))
+        assert outbox.drain() is not None and len(outbox) == 1 and outbox.failed == 2
+        failed = [path.read_text() for path in outbox.failed_directory.glob('*.json')]
+        assert len(failed) == 2 and all('"attempts": 1' in entry for entry in failed)
+    server.shutdown()
+
+
+def test_queued_mail_survives_restart():
+    server = LocalSMTPServer()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Mail server down: the message stays on disk
+        MailOutbox('127.0.0.1', 1, directory=tmp, smtp_timeout=1).enqueue(make_message("persisted"))
+        restarted = MailOutbox('127.0.0.1', server.port, directory=tmp)
+        assert len(restarted) == 1
+        restarted.drain()
+        assert len(restarted) == 0 and 'persisted' in server.messages[0]
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING EMAIL OUTBOX")
+    print("=" * 80)
+    for test in (test_one_connection_for_many_messages, test_enqueue_does_not_wait_for_the_server,
+                 test_retry_with_backoff_then_give_up, test_permanent_errors_are_not_retried,
+                 test_queued_mail_survives_restart):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,97 @@
+"""
+Test script for the Prometheus metrics of the action server (actions/metrics.py)
+
+Run with: python test_metrics.py  (or pytest test_metrics.py)
+"""
+
+import os
+import tempfile
+import urllib.request
+
+import numpy as np
+
+os.environ.setdefault('EMBEDDING_BACKEND', 'hash')
+os.environ.setdefault('DOCS_INDEX_DIR', tempfile.mkdtemp())
+os.environ.setdefault('ACTION_STREAM_PORT', '0')
+os.environ.setdefault('ACTION_METRICS_PORT', '0')
+
+from actions.metrics import CallbackMetric, Counter, Histogram, Registry, start_metrics_server, REGISTRY
+
+
+def test_counter_and_labels():
+    registry = Registry()
+    turns = Counter('turns_total', 'Turns', ['outcome'], registry=registry)
+    turns.inc(outcome='rag')
+    turns.inc(outcome='rag')
+    turns.inc(outcome='say "hi"\n')
+    assert turns.value(outcome='rag') == 2 and turns.value(outcome='fallback') == 0
+    text = registry.render()
+    assert '# TYPE turns_total counter' in text
+    assert 'turns_total{outcome="rag"} 2' in text
+    assert 'turns_total{outcome="say \\"hi\\"\\n"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram('stage_seconds', 'Stages', ['stage'], buckets=(0.01, 0.1, 1), registry=registry)
+    for value in (0.005, 0.01, 0.05, 2):
+        latency.observe(value, stage='generation')
+    with latency.time(stage='routing'):
+        pass
+    assert latency.count(stage='generation') == 4 and latency.count(stage='routing') == 1
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="generation",le="0.01"} 2' in lines
+    assert 'stage_seconds_bucket{stage="generation",le="0.1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="generation",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="generation",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="generation"} 4' in lines
+    assert 'stage_seconds_sum{stage="generation"} 2.065' in lines
+
+
+def test_callback_metrics_are_read_at_scrape_time():
+    registry = Registry()
+    stats = {'hits': 1, 'misses': 3}
+    CallbackMetric('cache_requests_total', 'Cache', lambda: {('answer', k): v for k, v in stats.items()},
+                   kind='counter', labelnames=['cache', 'result'], registry=registry)
+    CallbackMetric('broken', 'Raises', lambda: 1 / 0, registry=registry)
+    stats['hits'] = 5
+    text = registry.render()
+    assert 'cache_requests_total{cache="answer",result="hits"} 5' in text
+    assert 'cache_requests_total{cache="answer",result="misses"} 3' in text
+    # A failing callback does not break the scrape
+    assert '# broken unavailable' in text
+
+
+def test_metrics_endpoint():
+    Counter('test_endpoint_total', 'Endpoint test').inc()
+    # Port 0 means disabled, the server is started once per process
+    assert start_metrics_server(port=0) is None
+    port = start_metrics_server(port=18757).server_address[1]
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert 'test_endpoint_total 1' in response.read().decode('utf-8')
+    assert 'expobeton_stage_seconds' in REGISTRY.render()
+
+
+def test_answer_cache_savings_are_exported():
+    from actions.actions import ANSWER_CACHE
+
+    question = np.array([1.0, 0.0], dtype=np.float32)
+    ANSWER_CACHE.store(question, ('dates.txt:0',), "Du 12 au 14 septembre.", latency=1.5, version='v1')
+    ANSWER_CACHE.lookup(question, ('dates.txt:0',), 'v1')
+    ANSWER_CACHE.lookup(question, ('dates.txt:0',), 'v2')
+    text = REGISTRY.render()
+    assert 'expobeton_answer_cache_saved_seconds_total 1.5' in text
+    assert 'expobeton_answer_cache_invalidations_total 1' in text
+    assert '# TYPE expobeton_answer_cache_saved_seconds_total counter' in text
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING PROMETHEUS METRICS")
+    print("=" * 80)
+    for test in (test_counter_and_labels, test_histogram_buckets_are_cumulative,
+                 test_callback_metrics_are_read_at_scrape_time, test_metrics_endpoint,
+                 test_answer_cache_savings_are_exported):
+        test()
+        print(f"✅ {test.__name__}")
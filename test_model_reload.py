@@ -0,0 +1,93 @@
+"""
+Test script for the zero-downtime model reload of flask_app.py (actions/model_reload.py)
+
+Run with: python test_model_reload.py  (or pytest test_model_reload.py)
+"""
+
+import gc
+import threading
+
+from actions.model_reload import ModelReloader
+
+
+class Model:
+    def __init__(self, version):
+        self.version = version
+        self.warm = False
+        self.payload = bytearray(8 * 2 ** 20)
+
+
+def make_reloader(gate=None, fail_on=None):
+    versions = iter(range(1, 100))
+    warmed = []
+
+    def load():
+        version = next(versions)
+        if gate is not None:
+            gate.wait(5)
+        if version == fail_on:
+            raise RuntimeError("corrupt model")
+        return Model(version)
+
+    def warm_up(model):
+        model.warm = True
+        warmed.append(model.version)
+
+    return ModelReloader(load, warm_up), warmed
+
+
+def test_old_model_serves_until_the_new_one_is_warm():
+    reloader, warmed = make_reloader()
+    assert reloader.start() and reloader.wait(5)
+    assert reloader.current.version == 1 and reloader.generation == 1
+
+    gate = threading.Event()
+    reloader.load = lambda: (gate.wait(5), Model(2))[1]
+    assert reloader.start()
+    # Loading: requests still get the old model, a second reload is refused
+    assert reloader.reloading and reloader.state == 'loading'
+    assert reloader.current.version == 1
+    assert not reloader.start()
+    gate.set()
+    assert reloader.wait(5)
+    assert reloader.current.version == 2 and reloader.current.warm
+    report = reloader.last
+    assert report['result'] == 'success' and report['generation'] == 2
+    assert report['load_s'] >= 0 and report['warm_up_s'] >= 0 and report['total_s'] >= report['load_s']
+    assert set(report['rss_mb']) >= {'before', 'loaded', 'peak', 'after_swap'}
+    assert report['old_released'] is True
+    assert reloader.status()['state'] == 'idle'
+
+
+def test_failed_reload_keeps_the_old_model():
+    reloader, _ = make_reloader(fail_on=2)
+    reloader.start()
+    reloader.wait(5)
+    reloader.start()
+    reloader.wait(5)
+    assert reloader.current.version == 1 and reloader.generation == 1
+    assert reloader.last['result'] == 'failed' and reloader.last['error'] == 'corrupt model'
+
+
+def test_in_flight_message_finishes_on_the_old_model():
+    reloader, _ = make_reloader()
+    reloader.start()
+    reloader.wait(5)
+    in_flight = reloader.current  # a message that started before the swap
+    reloader.start()
+    reloader.wait(5)
+    assert reloader.current.version == 2 and in_flight.version == 1
+    assert reloader.last['old_released'] is False
+    del in_flight
+    gc.collect()
+    assert reloader.last['old_released'] is True
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING MODEL RELOAD")
+    print("=" * 80)
+    for test in (test_old_model_serves_until_the_new_one_is_warm, test_failed_reload_keeps_the_old_model,
+                 test_in_flight_message_finishes_on_the_old_model):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,301 @@
+"""
+Test script for the conversation store backends (actions/session_store.py)
+
+Two SessionStore instances sharing one backend stand for two action-server
+replicas. The Redis backend runs against FakeRedis, an in-process stand-in
+for the few commands it uses.
+
+Run with: python test_session_store.py  (or pytest test_session_store.py)
+"""
+
+import asyncio
+import fnmatch
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from actions.session_store import MemoryBackend, RedisBackend, SQLiteBackend, SessionStore
+
+
+class FakeRedis:
+    """Minimal in-process Redis: lists, hashes, sorted sets, non-transactional pipelines and the
+    append script of RedisBackend (run under a lock: Redis runs a script as a single command)"""
+
+    def __init__(self):
+        self.data = {}
+        self.script_lock = threading.Lock()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get(self, key):
+        value = self.data.get(key)
+        return value.encode('utf-8') if isinstance(value, str) else value
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def incrby(self, key, amount):
+        self.data[key] = str(int(self.data.get(key, 0)) + amount)
+        return int(self.data[key])
+
+    def eval(self, script, numkeys, *keys_and_args):
+        assert script == RedisBackend.APPEND_SCRIPT
+        (counter_key, messages_key), (head, ttl) = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        with self.script_lock:
+            seq = self.incrby(counter_key, 1)
+            time.sleep(0)  # let the other replicas run: only the lock keeps the two steps together
+            self.rpush(messages_key, f'{head},{seq}]')
+        return seq
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(v.encode('utf-8') if isinstance(v, str) else v for v in values)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode('utf-8')] = str(value).encode('utf-8')
+        return 1
+
+    def hsetnx(self, key, field, value):
+        if field.encode('utf-8') in self.data.get(key, {}):
+            return 0
+        return self.hset(key, field, value)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(member)
+
+    def zrem(self, key, member):
+        return 1 if self.data.get(key, {}).pop(member, None) is not None else 0
+
+    def zcard(self, key):
+        return len(self.data.get(key, {}))
+
+    def _sorted(self, key):
+        return [m.encode('utf-8') for m, _ in sorted(self.data.get(key, {}).items(), key=lambda item: item[1])]
+
+    def zrange(self, key, start, end):
+        members = self._sorted(key)
+        return members[start:] if end == -1 else members[start:end + 1]
+
+    def zrangebyscore(self, key, low, high, start=0, num=None):
+        scores = self.data.get(key, {})
+        members = [m for m in self._sorted(key) if float(low) <= scores[m.decode('utf-8')] <= float(high)]
+        return members[start:start + num if num is not None else None]
+
+    def expire(self, key, seconds):
+        return 1
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def keys(self, pattern='*'):
+        return [key for key in self.data if fnmatch.fnmatch(key, pattern)]
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        time.sleep(random.uniform(0, 0.002))  # network round trip: other replicas' commands get in between
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+def make_backends(tmp):
+    yield 'memory', MemoryBackend, None
+    db = str(Path(tmp) / 'conversations.db')
+    yield 'sqlite', lambda: SQLiteBackend(db), db
+    redis = FakeRedis()
+    yield 'redis', lambda: RedisBackend(redis), redis
+
+
+def check_backend(name, make_backend):
+    clock = [1000.0]
+    flushed = []
+    backend = make_backend()
+    replica_a = SessionStore(backend, idle_timeout=60, max_sessions=2, batch_size=3,
+                             on_evict=flushed.append, clock=lambda: clock[0])
+    # Second replica: same store, its own connection/client
+    replica_b = SessionStore(make_backend() if backend.persistent else backend, idle_timeout=60, max_sessions=2,
+                             batch_size=3, on_evict=flushed.append, clock=lambda: clock[0])
+
+    replica_a.append('s1', 'user', 'Bonjour', {'name': 'Marie'})
+    replica_a.append('s1', 'bot', 'Bonjour Marie!')
+    clock[0] += 1
+    replica_b.append('s1', 'user', "C'est quoi ExpoBeton ?")
+    replica_b.flush()
+    # Appends are batched: the sweeper thread writes them within CONVERSATION_FLUSH_INTERVAL,
+    # the messages stay in timestamp order even when batches land out of order
+    replica_a.flush()
+
+    session = replica_b.get('s1')
+    assert session is not None, name
+    assert [m.text for m in session.messages] == ['Bonjour', 'Bonjour Marie!', "C'est quoi ExpoBeton ?"], name
+    assert session.user_info == {'name': 'Marie'}, name
+    assert session.transcript()[0]['sender'] == 'user', name
+
+    replica_a.set_language('s1', 'fr')
+    assert replica_b.get_language('s1') == 'fr', name
+
+    # Only one replica gets the session when ending the conversation
+    assert replica_b.pop('s1') is not None, name
+    assert replica_a.pop('s1') is None, name
+    assert 's1' not in replica_a, name
+
+    # Idle sessions are evicted to the sink, once
+    replica_a.append('idle', 'user', 'Allô ?')
+    replica_a.flush()
+    clock[0] += 120
+    replica_a.append('active', 'user', 'Toujours là')
+    assert replica_b.sweep() == 1 and replica_a.sweep() == 0, name
+    assert [s.session_id for s in flushed] == ['idle'], name
+
+    # Beyond max_sessions the least recently active ones are evicted
+    for i in range(3):
+        clock[0] += 1
+        replica_a.append(f'x{i}', 'user', 'Bonjour')
+    replica_a.sweep()
+    assert sorted(replica_a.keys()) == ['x1', 'x2'], (name, replica_a.keys())
+
+    # Transcript ledger: each message is emitted once, by one replica, later emissions get the delta
+    clock[0] += 1
+    replica_a.append('t1', 'user', 'Bonjour')
+    replica_a.append('t1', 'bot', 'Bonjour!')
+    transcript = replica_a.get('t1').transcript()
+    assert [m['text'] for m in replica_b.claim_transcript('t1', transcript)] == ['Bonjour', 'Bonjour!'], name
+    assert replica_a.claim_transcript('t1', transcript) == [], name
+    clock[0] += 1
+    replica_a.append('t1', 'user', 'Au revoir')
+    transcript = replica_a.get('t1').transcript()
+    assert [m['text'] for m in replica_a.claim_transcript('t1', transcript)] == ['Au revoir'], name
+    assert replica_b.claim_transcript('t1', transcript) == [], name
+    # A replica whose clock is behind: its message is older by timestamp, newer in the ledger
+    clock[0] -= 30
+    replica_b.append('t1', 'bot', 'À bientôt')
+    transcript = replica_b.get('t1').transcript()
+    assert [m['text'] for m in replica_b.claim_transcript('t1', transcript)] == ['À bientôt'], name
+    assert replica_a.claim_transcript('t1', transcript) == [], name
+    clock[0] += 30
+    # Still known once the session itself is gone (end of conversation, then eviction)
+    replica_a.pop('t1')
+    assert replica_b.claim_transcript('t1', transcript) == [], name
+    # The same id coming back only gets its new messages emitted
+    replica_a.append('t1', 'user', 'Re-bonjour')
+    assert [m['text'] for m in replica_b.claim_transcript('t1', replica_a.get('t1').transcript())] == ['Re-bonjour'], name
+
+
+def test_backends():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make_backend, _ in make_backends(tmp):
+            check_backend(name, make_backend)
+
+
+def test_sqlite_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / 'conversations.db')
+        store = SessionStore(SQLiteBackend(db))
+        store.append('s1', 'user', 'Bonjour')
+        store.flush_all()
+        restarted = SessionStore(SQLiteBackend(db))
+        assert [m.text for m in restarted.get('s1').messages] == ['Bonjour']
+
+
+class SlowBackend(MemoryBackend):
+    """A persistent backend with a 0.2s round trip"""
+
+    persistent = True
+
+    def append(self, records):
+        time.sleep(0.2)
+        super().append(records)
+
+    def load(self, session_id):
+        time.sleep(0.2)
+        return super().load(session_id)
+
+    def remove(self, session_id):
+        time.sleep(0.2)
+        return super().remove(session_id)
+
+
+def test_async_methods_keep_the_event_loop_running():
+    store = SessionStore(SlowBackend(), batch_size=1)
+
+    async def turns():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        await asyncio.gather(*(store.aappend(f's{i}', 'user', 'Bonjour') for i in range(4)))
+        sessions = await asyncio.gather(*(store.aget(f's{i}') for i in range(4)))
+        popped = await store.apop('s0')
+        task.cancel()
+        return sessions, popped, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    sessions, popped, longest_gap = asyncio.run(turns())
+    assert [s.messages[0].text for s in sessions] == ['Bonjour'] * 4 and popped.session_id == 's0'
+    assert longest_gap < 0.1, longest_gap
+
+
+def test_redis_replicas_store_messages_in_sequence_order():
+    redis = FakeRedis()
+    replicas = [SessionStore(RedisBackend(redis), batch_size=5) for _ in range(4)]
+
+    def write(replica, name):
+        for i in range(50):
+            replica.append('shared', 'user', f'{name}-{i}')
+            time.sleep(0)
+        replica.flush()
+
+    threads = [threading.Thread(target=write, args=(replica, f'r{n}')) for n, replica in enumerate(replicas)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Numbered and pushed in one step: list order is sequence order, no number missing or repeated
+    stored = [json.loads(raw)[3] for raw in redis.lrange('conv:m:shared', 0, -1)]
+    assert stored == list(range(1, 201)), stored[:20]
+    message = json.loads(redis.lrange('conv:m:shared', 0, 0)[0])
+    assert message[0] == 'user' and isinstance(message[2], float)
+    session = replicas[0].get('shared')
+    assert len(replicas[0].claim_transcript('shared', session.transcript())) == 200
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING CONVERSATION STORE BACKENDS")
+    print("=" * 80)
+    for test in (test_backends, test_sqlite_survives_restart, test_async_methods_keep_the_event_loop_running,
+                 test_redis_replicas_store_messages_in_sequence_order):
+        test()
+        print(f"✅ {test.__name__}")
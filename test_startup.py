@@ -0,0 +1,82 @@
+"""
+Test script for the startup timeline of the servers (actions/startup.py)
+
+Run with: python test_startup.py  (or pytest test_startup.py)
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from actions.startup import StartupTimeline, process_start_time
+
+
+def test_process_start_is_in_the_past():
+    start = process_start_time()
+    assert 0 < time.time() - start < 24 * 3600
+
+
+def test_phases_are_recorded_until_ready():
+    timeline = StartupTimeline('test', origin=time.time() - 1.0)
+    timeline.mark('imports')
+    with timeline.phase('model_load'):
+        time.sleep(0.01)
+    try:
+        with timeline.phase('docs_index'):
+            raise OSError("read-only filesystem")
+    except OSError:
+        pass
+    # A loader that logs its error and returns nothing
+    with timeline.phase('lexical_index') as phase:
+        phase.fail('no lexical index')
+    timeline.ready()
+    # A later reload is not part of the startup
+    with timeline.phase('model_load'):
+        pass
+
+    phases = timeline.status()['phases']
+    assert [phase['phase'] for phase in phases] == ['imports', 'model_load', 'docs_index', 'lexical_index']
+    assert phases[0]['start_s'] == 0 and phases[0]['duration_s'] >= 1.0
+    assert phases[1]['duration_s'] >= 0.01 and phases[1]['start_s'] >= phases[0]['duration_s']
+    assert phases[1]['ok'] is True and 'error' not in phases[1]
+    assert phases[2]['ok'] is False and phases[2]['error'] == 'OSError: read-only filesystem'
+    assert phases[3]['ok'] is False and phases[3]['error'] == 'no lexical index'
+    assert timeline.status()['failed'] == ['docs_index', 'lexical_index']
+    assert timeline.ready_at >= 1.0 and timeline.status()['ready_s'] == timeline.ready_at
+
+
+def test_missing_docs_index_is_not_rebuilt_with_a_billed_embedder():
+    os.environ.setdefault('EMBEDDING_BACKEND', 'hash')
+    os.environ.setdefault('DOCS_INDEX_DIR', tempfile.mkdtemp())
+    from actions import actions
+    from actions.embeddings import Embedder
+
+    class BilledEmbedder(Embedder):
+        model_name = 'billed-test'  # no index built for it
+        billed = True
+
+        def embed_batch(self, texts):
+            raise AssertionError(f"{len(texts)} texts embedded at startup")
+
+    while actions.TIMELINE.ready_at is None:  # the preload is done
+        time.sleep(0.05)
+    saved = actions.EMBEDDER, actions.DOCS_CACHE, actions.RETRIEVAL_MODE
+    actions.EMBEDDER, actions.DOCS_CACHE = BilledEmbedder(), None
+    try:
+        assert actions.load_and_embed_docs() == ([], [])
+        # BM25 answers instead, without waiting for a query embedding
+        assert actions.RETRIEVAL_MODE == 'lexical'
+        assert len(asyncio.run(actions.find_relevant_docs("Quand a lieu ExpoBeton 2024 à Kinshasa ?", 5))) == 5
+    finally:
+        actions.EMBEDDER, actions.DOCS_CACHE, actions.RETRIEVAL_MODE = saved
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING STARTUP TIMELINE")
+    print("=" * 80)
+    for test in (test_process_start_is_in_the_past, test_phases_are_recorded_until_ready,
+                 test_missing_docs_index_is_not_rebuilt_with_a_billed_embedder):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,301 @@
+"""
+Test script for the static file server and webhook proxy (static_server.py)
+
+Run with: python test_static_server.py  (or pytest test_static_server.py)
+"""
+
+import functools
+import gzip
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from static_server import STATIC_ROOT, AssetCache, StaticFileHandler, StaticServer, UpstreamBalancer
+
+
+class QuietHandler(StaticFileHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class RasaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        # Health probe
+        body = b'Hello from Rasa: 3.6.21'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path == '/webhooks/rest/stream':
+            # Server-Sent Events without Content-Length: the body ends with the connection
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for token in ('Expo', 'Beton'):
+                self.wfile.write(f'event: token\ndata: {token}\n\n'.encode())
+                self.wfile.flush()
+            self.close_connection = True
+            return
+        time.sleep(data.get('delay', 0))
+        body = json.dumps([{'recipient_id': data['sender'], 'text': 'ok',
+                            'server': self.server.server_address[1]}]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Keep-alive timeout of the server: the connection is closed without telling the client
+        self.close_connection = data.get('close', False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_rasa():
+    rasa = ThreadingHTTPServer(('127.0.0.1', 0), RasaHandler)
+    rasa.daemon_threads = True
+    rasa.handle_error = lambda request, client_address: None  # proxy gone after its timeout
+    serve(rasa)
+    return f'http://127.0.0.1:{rasa.server_address[1]}'
+
+
+def start(*upstream_urls):
+    server = StaticServer(('127.0.0.1', 0), upstream_urls=upstream_urls or [start_rasa()])
+    server.RequestHandlerClass = functools.partial(QuietHandler, directory=STATIC_ROOT)
+    return serve(server)
+
+
+def post(server, path, payload):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    connection.request('POST', path, json.dumps(payload), {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_files_are_served_whatever_the_working_directory():
+    server = start()
+    cwd = os.getcwd()
+    os.chdir(tempfile.gettempdir())
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+        with open(os.path.join(STATIC_ROOT, 'web', 'chat-widget.js'), 'rb') as f:
+            widget = f.read()
+        # SPA route, the widget and a file outside web/, over one keep-alive connection
+        bodies = []
+        for path in ('/', '/some/page', '/web/chat-widget.js', '/static_server.py'):
+            connection.request('GET', path)
+            response = connection.getresponse()
+            bodies.append(response.read())
+            assert response.status == 200
+        assert bodies[0] == bodies[1] and b'<html' in bodies[0].lower()
+        assert bodies[2] == widget and bodies[3].startswith(b'#!/usr/bin/env python3')
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+
+
+def get(connection, path, headers=None):
+    connection.request('GET', path, headers=headers or {})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def test_assets_are_compressed_and_revalidated():
+    server = start()
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    _, index = get(connection, '/', {'Accept-Encoding': 'gzip'})
+    index = gzip.decompress(index).decode()
+    widget_url = server.assets.urls['chat-widget.js']
+    assert f'src="{widget_url}"' in index and f'href="{server.assets.urls["chat-widget.css"]}"' in index
+
+    with open(os.path.join(STATIC_ROOT, 'web', 'chat-widget.js'), 'rb') as f:
+        widget = f.read()
+    response, body = get(connection, widget_url, {'Accept-Encoding': 'gzip, deflate, br;q=0'})
+    assert response.getheader('Content-Encoding') == 'gzip' and gzip.decompress(body) == widget
+    assert len(body) < len(widget) / 3
+    assert 'immutable' in response.getheader('Cache-Control')
+    assert response.getheader('Vary') == 'Accept-Encoding'
+
+    # Plain URL: revalidated with the strong ETag of the representation sent
+    response, body = get(connection, '/web/chat-widget.js')
+    etag = response.getheader('ETag')
+    assert body == widget and response.getheader('Cache-Control') == 'no-cache' and etag.startswith('"')
+    response, body = get(connection, '/web/chat-widget.js?v=2', {'If-None-Match': f'"other", {etag}'})
+    assert response.status == 304 and body == b'' and response.getheader('ETag') == etag
+    # Another encoding is another representation
+    response, body = get(connection, '/web/chat-widget.js', {'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+    assert response.status == 200 and response.getheader('ETag') != etag
+
+    connection.request('HEAD', widget_url)
+    response = connection.getresponse()
+    assert response.read() == b'' and int(response.getheader('Content-Length')) == len(widget)
+    server.shutdown()
+
+
+def test_changed_files_get_new_hashed_urls():
+    root = tempfile.mkdtemp()
+    try:
+        os.mkdir(os.path.join(root, 'web'))
+        with open(os.path.join(root, 'web', 'app.js'), 'w') as f:
+            f.write('console.log(1);')
+        with open(os.path.join(root, 'web', 'index.html'), 'w') as f:
+            f.write('<script src="/web/app.js"></script><img src="/web/missing.png">')
+        assets = AssetCache(root, check_interval=0)
+        first_url = assets.urls['app.js']
+        assert assets.get(first_url) is not None
+
+        with open(os.path.join(root, 'web', 'app.js'), 'w') as f:
+            f.write('console.log(2);')
+        os.utime(os.path.join(root, 'web', 'app.js'), ns=(0, 10 ** 9))
+        assert assets.refresh() and not assets.refresh()
+        page, _ = assets.get('/web/index.html')
+        assert assets.urls['app.js'] != first_url and assets.get(first_url) is None
+        assert page.bodies['identity'] == (f'<script src="{assets.urls["app.js"]}"></script>'
+                                           '<img src="/web/missing.png">').encode()
+    finally:
+        shutil.rmtree(root)
+
+
+def test_webhooks_reuse_upstream_connections_and_run_concurrently():
+    server = start()
+    for _ in range(3):
+        response, body = post(server, '/webhooks/rest/webhook', {'sender': 'a', 'message': 'hi'})
+        assert response.status == 200 and json.loads(body)[0]['text'] == 'ok'
+    stats = server.upstream.backends[0].pool.stats
+    assert stats['opened'] == 1 and stats['reused'] == 2
+
+    # Four slow turns at once take about one turn, not four
+    started = time.perf_counter()
+    threads = [threading.Thread(target=post, args=(server, '/webhooks/rest/webhook',
+                                                   {'sender': str(i), 'message': 'hi', 'delay': 0.3}))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - started < 1.0
+    server.shutdown()
+
+
+def test_stale_upstream_connection_is_retried():
+    server = start()
+    post(server, '/webhooks/rest/webhook', {'sender': 'a', 'message': 'hi', 'close': True})
+    time.sleep(0.05)
+    # Rasa closed the idle connection: the request is sent again on a new one
+    response, _ = post(server, '/webhooks/rest/webhook', {'sender': 'a', 'message': 'hi'})
+    assert response.status == 200
+    stats = server.upstream.backends[0].pool.stats
+    assert stats['retried'] == 1 and stats['opened'] == 2
+    server.shutdown()
+
+
+def test_upstream_errors_and_streamed_answers():
+    server = start()
+    response, body = post(server, '/webhooks/rest/stream', {'sender': 'a', 'message': 'hi'})
+    assert response.status == 200 and response.getheader('Transfer-Encoding') == 'chunked'
+    assert body == b'event: token\ndata: Expo\n\nevent: token\ndata: Beton\n\n'
+
+    server.upstream.timeout = 0.1
+    response, body = post(server, '/webhooks/rest/webhook', {'sender': 'a', 'message': 'hi', 'delay': 0.5})
+    assert response.status == 504 and json.loads(body)['error'] == 'Gateway Timeout'
+    server.shutdown()
+
+    server = start('http://127.0.0.1:1')
+    response, body = post(server, '/webhooks/rest/webhook', {'sender': 'a', 'message': 'hi'})
+    assert response.status == 503 and json.loads(body)['error'] == 'Service Unavailable'
+    response, _ = post(server, '/other', {})
+    assert response.status == 404
+    server.shutdown()
+
+
+def test_conversations_stick_to_one_server_and_spread():
+    server = start(start_rasa(), start_rasa())
+    servers = {}
+    for turn in range(3):
+        for sender in range(8):
+            _, body = post(server, '/webhooks/rest/webhook', {'sender': f'user-{sender}', 'message': 'hi'})
+            servers.setdefault(sender, set()).add(json.loads(body)[0]['server'])
+    assert all(len(used) == 1 for used in servers.values())
+    assert len(set.union(*servers.values())) == 2
+
+    # A new conversation goes to the server with the fewest requests in progress
+    slow = threading.Thread(target=post, args=(server, '/webhooks/rest/webhook',
+                                               {'sender': 'slow', 'message': 'hi', 'delay': 0.5}))
+    slow.start()
+    time.sleep(0.1)
+    busy = next(backend for backend in server.upstream.backends if backend.outstanding)
+    for sender in range(3):
+        _, body = post(server, '/webhooks/rest/webhook', {'sender': f'new-{sender}', 'message': 'hi'})
+        assert json.loads(body)[0]['server'] != busy.pool.port
+    slow.join()
+    server.shutdown()
+
+
+def send(balancer, sender):
+    backend, connection, response = balancer.request(
+        'POST', '/webhooks/rest/webhook', json.dumps({'sender': sender, 'message': 'hi'}).encode(),
+        {'Content-Type': 'application/json'}, sender=sender)
+    response.read()
+    balancer.finish(backend, connection, reusable=True)
+    return backend
+
+
+def test_unreachable_server_is_ejected_then_retried():
+    dead_url, live_url = 'http://127.0.0.1:1', start_rasa()
+    balancer = UpstreamBalancer([dead_url, live_url], health_interval=0, max_failures=2, eject_seconds=1.0)
+    dead, live = balancer.backends
+    # Messages that cannot connect to the dead server are sent to the other one
+    assert all(send(balancer, f'user-{i}') is live for i in range(6))
+    assert dead.ejected_at is not None and dead.failures == 2
+    tries = dead.requests
+    for i in range(6):
+        send(balancer, f'other-{i}')
+    assert dead.requests == tries and dead.outstanding == live.outstanding == 0
+
+    # Ejection over: the server is tried again (and ejected again at once)
+    time.sleep(1.0)
+    assert send(balancer, 'late') is live
+    assert dead.requests == tries + 1 and dead.ejected_at is not None
+
+
+def test_probes_eject_and_readmit_servers():
+    balancer = UpstreamBalancer(['http://127.0.0.1:1', start_rasa()], health_interval=0.05, max_failures=1,
+                                eject_seconds=0.2)
+    dead, live = balancer.backends
+    balancer.record(live, ok=False)
+    time.sleep(0.1)
+    assert [backend['healthy'] for backend in balancer.status()['backends']] == [False, False]
+    time.sleep(0.4)
+    assert [backend['healthy'] for backend in balancer.status()['backends']] == [False, True]
+    balancer.stop()
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING STATIC SERVER")
+    print("=" * 80)
+    for test in (test_files_are_served_whatever_the_working_directory, test_assets_are_compressed_and_revalidated,
+                 test_changed_files_get_new_hashed_urls,
+                 test_webhooks_reuse_upstream_connections_and_run_concurrently,
+                 test_stale_upstream_connection_is_retried, test_upstream_errors_and_streamed_answers,
+                 test_conversations_stick_to_one_server_and_spread, test_unreachable_server_is_ejected_then_retried,
+                 test_probes_eject_and_readmit_servers):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,154 @@
+"""
+Test script for the token streaming side channel (actions/streaming.py, /webhooks/rest/stream of flask_app.py)
+
+Run with: python test_streaming.py  (or pytest test_streaming.py)
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+os.environ.setdefault('EMBEDDING_BACKEND', 'hash')
+os.environ.setdefault('DOCS_INDEX_DIR', tempfile.mkdtemp())
+os.environ.setdefault('ACTION_STREAM_PORT', '0')
+os.environ.setdefault('ACTION_METRICS_PORT', '0')
+
+from actions import streaming
+from actions.streaming import STREAMS, StreamHandler
+
+
+def start_stream_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_tokens_are_delivered_in_order_until_the_end_event():
+    server = start_stream_server()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+        connection.request('GET', '/stream/alice%40expo')
+        response = connection.getresponse()
+        # Headers come once subscribed: nothing published from now on is missed
+        assert response.status == 200 and response.getheader('Content-Type') == 'text/event-stream'
+        assert STREAMS.has_subscribers('alice@expo')
+        for text in ('Bon', 'jour', ' 😊'):
+            STREAMS.publish('alice@expo', {'type': 'token', 'text': text})
+        STREAMS.publish('someone-else', {'type': 'token', 'text': 'not for alice'})
+        STREAMS.publish('alice@expo', {'type': 'end'})
+        events = [json.loads(line[len(b'data: '):]) for line in response if line.startswith(b'data: ')]
+        assert events == [{'type': 'token', 'text': 'Bon'}, {'type': 'token', 'text': 'jour'},
+                          {'type': 'token', 'text': ' 😊'}, {'type': 'end'}]
+        assert wait_until(lambda: not STREAMS.has_subscribers('alice@expo'))
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_subscription_ends_when_the_subscriber_disconnects():
+    server = start_stream_server()
+    try:
+        sock = socket.create_connection(server.server_address, timeout=5)
+        sock.sendall(b'GET /stream/bob HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        assert sock.recv(1024).startswith(b'HTTP/1.1 200')
+        assert STREAMS.has_subscribers('bob')
+        # No 'end' is ever published (e.g. a turn answered by a Rasa response, without any action)
+        sock.shutdown(socket.SHUT_RDWR)
+        sock.close()
+        assert wait_until(lambda: not STREAMS.has_subscribers('bob'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_keyword_turn_publishes_end():
+    from rasa_sdk.executor import CollectingDispatcher
+    from actions.actions import ActionAnswerExpoBeton
+
+    events = STREAMS.subscribe('carol')
+    try:
+        tracker = SimpleNamespace(sender_id='carol', latest_message={
+            'text': 'Bonjour', 'intent': {'name': 'greet'}, 'metadata': {}})
+        dispatcher = CollectingDispatcher()
+        asyncio.run(ActionAnswerExpoBeton().run(dispatcher, tracker, {}))
+        assert dispatcher.messages
+        assert events.get(timeout=1) == {'type': 'end'}
+    finally:
+        STREAMS.unsubscribe('carol', events)
+
+
+def test_streamed_keyword_turn_leaves_no_thread_behind():
+    import flask_app
+
+    server = start_stream_server()
+
+    async def keyword_answer(sender_id, message_text, metadata):
+        # Rasa answered without running ActionAnswerExpoBeton: no token, no 'end' event
+        return [{'recipient_id': sender_id, 'text': 'Bonjour ! 😊'}]
+
+    original = flask_app.handle_message, flask_app.ACTION_STREAM_URL, flask_app.RELOADER.current
+    flask_app.handle_message = keyword_answer
+    flask_app.ACTION_STREAM_URL = f'http://127.0.0.1:{server.server_address[1]}'
+    flask_app.RELOADER.current = object()
+    try:
+        client = flask_app.app.test_client()
+
+        def turn(sender):
+            body = client.post('/webhooks/rest/stream', json={'sender': sender, 'message': 'Bonjour'}).get_data()
+            assert b'event: message' in body and 'Bonjour ! 😊'.encode('utf-8') in body
+
+        turn('dave-0')  # starts the agent loop thread
+        assert wait_until(lambda: not STREAMS.has_subscribers('dave-0'))
+        baseline = threading.active_count()
+        for i in range(1, 6):
+            turn(f'dave-{i}')
+        # Reader threads (flask) and handler threads (action server) end with their turn, not after 60s
+        assert wait_until(lambda: threading.active_count() <= baseline)
+        assert not any(STREAMS.has_subscribers(f'dave-{i}') for i in range(6))
+    finally:
+        flask_app.handle_message, flask_app.ACTION_STREAM_URL, flask_app.RELOADER.current = original
+        server.shutdown()
+        server.server_close()
+
+
+def test_stream_server_listens_on_loopback_by_default():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = streaming.start_stream_server(port=port)
+    try:
+        # No authentication on the stream: not reachable from other hosts unless ACTION_STREAM_HOST says so
+        assert server.server_address == ('127.0.0.1', port)
+    finally:
+        server.shutdown()
+        server.server_close()
+        streaming._server = None
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING TOKEN STREAMING")
+    print("=" * 80)
+    for test in (test_tokens_are_delivered_in_order_until_the_end_event,
+                 test_subscription_ends_when_the_subscriber_disconnects, test_keyword_turn_publishes_end,
+                 test_streamed_keyword_turn_leaves_no_thread_behind, test_stream_server_listens_on_loopback_by_default):
+        test()
+        print(f"✅ {test.__name__}")
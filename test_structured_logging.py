@@ -0,0 +1,102 @@
+"""
+Test script for the structured, queue-backed logging (actions/structured_logging.py)
+
+Run with: python test_structured_logging.py  (or pytest test_structured_logging.py)
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+
+from actions.structured_logging import DroppingQueueHandler, JsonFormatter, StructuredLogger, TextFormatter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, formatter):
+        super().__init__()
+        self.setFormatter(formatter)
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+def make_logger(name, formatter):
+    handler = ListHandler(formatter)
+    logger = logging.getLogger(f'test.{name}')
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return StructuredLogger(logger), handler.lines
+
+
+def test_json_fields():
+    log, lines = make_logger('json', JsonFormatter(max_field_chars=20, sample_rate=0))
+    log.info('route_matched', session='s1', route='history', latency_ms=1.5, ok=True, filename='a.txt')
+    log.debug('not_written', session='s1')
+    record = json.loads(lines[0])
+    assert len(lines) == 1
+    assert record['level'] == 'info' and record['event'] == 'route_matched'
+    assert record['session'] == 's1' and record['route'] == 'history'
+    assert record['latency_ms'] == 1.5 and record['ok'] is True
+    # Names of LogRecord attributes do not clash
+    assert record['filename_'] == 'a.txt'
+
+
+def test_large_payloads_are_cut_unless_sampled():
+    log, lines = make_logger('cut', JsonFormatter(max_field_chars=20, sample_rate=0))
+    log.info('rag_answer', answer='x' * 100, metadata={'messages': ['y' * 50]})
+    record = json.loads(lines[0])
+    assert record['answer'] == 'x' * 20 + '… (+80 chars)'
+    assert record['metadata'].startswith('{"messages": ["yyy') and record['metadata'].endswith('chars)')
+    assert 'sampled' not in record
+
+    log, lines = make_logger('sampled', JsonFormatter(max_field_chars=20, sample_rate=1.0))
+    log.info('rag_answer', answer='x' * 100)
+    record = json.loads(lines[0])
+    assert record['answer'] == 'x' * 100 and record['sampled'] is True
+
+
+def test_exceptions_and_text_format():
+    log, lines = make_logger('text', TextFormatter(sample_rate=0))
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        log.exception('generation_failed', session='s1')
+    first, *traceback_lines = lines[0].splitlines()
+    assert first.endswith('error   generation_failed session=s1')
+    assert traceback_lines[-1] == 'ZeroDivisionError: division by zero'
+
+
+def test_queue_handler_does_not_format_and_drops_when_full():
+    log_queue = queue.SimpleQueue()
+    handler = DroppingQueueHandler(log_queue, maxsize=2)
+    logger = logging.getLogger('test.queue')
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    log = StructuredLogger(logger)
+    for i in range(5):
+        log.info('turn', index=i)
+    assert handler.dropped == 3 and log_queue.qsize() == 2
+    # Records are queued untouched, the listener formats them
+    record = log_queue.get_nowait()
+    assert record.msg == 'turn' and record.index == 0 and not hasattr(record, 'message')
+
+    output = ListHandler(JsonFormatter(sample_rate=0))
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    log.info('turn', index=5)
+    listener.stop()
+    assert [json.loads(line)['index'] for line in output.lines] == [1, 5]
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING STRUCTURED LOGGING")
+    print("=" * 80)
+    for test in (test_json_fields, test_large_payloads_are_cut_unless_sampled, test_exceptions_and_text_format,
+                 test_queue_handler_does_not_format_and_drops_when_full):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,85 @@
+"""
+Test script for the unanswered-question digest (actions/unanswered_digest.py)
+
+Run with: python test_unanswered_digest.py  (or pytest test_unanswered_digest.py)
+"""
+
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+from actions.unanswered_digest import UnansweredDigest, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  Où se trouve le PARKING ?? ") == "ou se trouve le parking"
+    assert normalize_question("Où se trouve le parking") == normalize_question("ou se trouve le parking!")
+
+
+def test_dedup_count_and_rank():
+    clock = [1000.0]
+    digests = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'digest.json'
+        digest = UnansweredDigest(on_digest=digests.append, window=3600, path=str(path), clock=lambda: clock[0])
+        for session, question in [('s1', "Où se trouve le parking ?"),
+                                  ('s2', "ou se trouve le parking"),        # exact after normalization
+                                  ('s3', "Où se trouve les parkings ?"),    # similar
+                                  ('s1', "Quel est le prix du ticket ?"),
+                                  ('s4', "Qui gagne la coupe du monde ?")]:
+            clock[0] += 1
+            digest.add(question, session)
+
+        ranked = digest.ranked()
+        assert [q['count'] for q in ranked] == [3, 1, 1]
+        assert ranked[0]['question'] == "Où se trouve le parking ?" and ranked[0]['sessions'] == 3
+        assert "Où se trouve les parkings ?" in ranked[0]['variants']
+        # Ties: most recent first
+        assert ranked[1]['question'] == "Qui gagne la coupe du monde ?"
+
+        # Nothing is sent before the end of the window, but the file is up to date for tooling
+        assert digest.flush() is None and not digests
+        state = json.loads(path.read_text(encoding='utf-8'))
+        assert state['current'][0]['count'] == 3
+
+        # The window survives a restart
+        restarted = UnansweredDigest(on_digest=digests.append, window=3600, path=str(path), clock=lambda: clock[0])
+        restarted.add("Où se trouve le parking", 's5')
+        clock[0] += 3600
+        sent = restarted.flush()
+        assert digests == [sent] and sent['total'] == 6 and sent['unique'] == 3
+        assert sent['questions'][0]['count'] == 4
+
+        # The next window starts empty, the last digest stays in the file
+        assert restarted.ranked() == [] and restarted.flush(force=True) is None
+        state = json.loads(path.read_text(encoding='utf-8'))
+        assert state['current'] == [] and state['last_digest']['total'] == 6
+
+
+def test_questions_added_during_a_flush_are_not_lost():
+    digests = []
+    # In memory only: the window reloaded from UNANSWERED_DIGEST_FILE would count in the totals
+    digest = UnansweredDigest(on_digest=digests.append, window=3600, path=None)
+    added = 2000
+
+    def ask():
+        for i in range(added):
+            digest.add(f"question numéro {i}", 's1')
+
+    asker = threading.Thread(target=ask)
+    asker.start()
+    while asker.is_alive():
+        digest.flush(force=True)
+    asker.join()
+    # Every question is in exactly one digest or still in the current window
+    assert sum(sent['total'] for sent in digests) + sum(q['count'] for q in digest.ranked()) == added
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING UNANSWERED QUESTION DIGEST")
+    print("=" * 80)
+    for test in (test_normalize_question, test_dedup_count_and_rank, test_questions_added_during_a_flush_are_not_lost):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,85 @@
+"""
+Test script for the vector search (actions/vector_index.py) over the docs index
+
+Run with: python test_vector_index.py  (or pytest test_vector_index.py)
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from actions.docs_index import build_index, load_index
+from actions.embeddings import HashEmbedder
+from actions.vector_index import VectorIndex, normalize_rows, top_k_indices
+
+
+def clustered_vectors(n=4000, dim=32, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    queries = centers[rng.integers(clusters, size=100)] + 0.3 * rng.normal(size=(100, dim))
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+
+def test_exact_search_matches_brute_force():
+    vectors, queries = clustered_vectors()
+    index = VectorIndex(vectors * 5, mode='exact')
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1, atol=1e-5)
+    for query in queries[:10]:
+        indices, scores = index.search(query, top_k=5)
+        expected = np.argsort(-(normalize_rows(vectors) @ normalize_rows(query)))[:5]
+        assert list(indices) == list(expected) and np.all(np.diff(scores) <= 0)
+    assert list(top_k_indices(np.array([0.1, 0.9, 0.5]), 5)) == [1, 2, 0]
+    empty_indices, _ = VectorIndex(np.zeros((0, 4), dtype=np.float32)).search(np.ones(4))
+    assert len(empty_indices) == 0
+
+
+def test_ivf_recall_against_exact_top_k():
+    vectors, queries = clustered_vectors()
+    exact = VectorIndex(vectors, mode='exact')
+    ivf = VectorIndex(vectors, mode='ivf', nlist=64)
+    assert ivf.list_offsets[-1] == len(vectors) and sorted(ivf.list_ids) == list(range(len(vectors)))
+
+    def recall(nprobe):
+        found = sum(len(set(ivf.search(q, 10, nprobe=nprobe)[0]) & set(exact.search(q, 10)[0])) for q in queries)
+        return found / (10 * len(queries))
+
+    # More clusters probed, better recall; probing every cluster is exact
+    assert recall(1) <= recall(8) <= recall(64) == 1.0
+    assert recall(8) >= 0.9
+
+
+def test_normalized_docs_index_is_searched_on_the_memory_map():
+    root = Path(tempfile.mkdtemp())
+    try:
+        (root / 'docs').mkdir()
+        for i in range(5):
+            (root / 'docs' / f'{i}.txt').write_text(f"Passage numéro {i} du salon ExpoBeton. " * (i + 1), encoding='utf-8')
+        embedder = HashEmbedder()
+        build_index(embedder, root / 'docs', root / 'index')
+        index = load_index(root / 'index', embedder.model_name)
+        assert index.normalized and isinstance(index.embeddings, np.memmap)
+        assert np.allclose(np.linalg.norm(index.embeddings, axis=1), 1, atol=1e-5)
+
+        vectors = VectorIndex(index.embeddings, normalized=index.normalized)
+        # No copy: the search reads the file pages
+        assert isinstance(vectors.vectors, np.memmap) and np.shares_memory(vectors.vectors, index.embeddings)
+        query = embedder.embed([index.documents[3]['content']])[0]
+        assert vectors.search(query, top_k=1)[0][0] == 3
+
+        # Without the flag (index saved before normalization) the rows are normalized in a copy
+        assert not isinstance(VectorIndex(index.embeddings).vectors, np.memmap)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("TESTING VECTOR INDEX")
+    print("=" * 80)
+    for test in (test_exact_search_matches_brute_force, test_ivf_recall_against_exact_top_k,
+                 test_normalized_docs_index_is_searched_on_the_memory_map):
+        test()
+        print(f"✅ {test.__name__}")
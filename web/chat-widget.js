@@ -4,6 +4,10 @@ const RASA_SERVER_URL = window.location.origin;
 
 const INACTIVITY_TIMEOUT = 10 * 60 * 1000; // 10 minutes in milliseconds
 
+// Stream GPT-4o answers token by token (/webhooks/rest/stream, flask_app.py).
+// Falls back to the regular webhook when the server does not provide it.
+let STREAMING_ENABLED = true;
+
 // Sound notification system using Web Audio API
 let audioContext = null;
 
@@ -159,7 +163,7 @@ async function sendGreeting() {
     resetInactivityTimer();
     
     // Send to Rasa
-    await sendToRasa(greetingMessage);
+    await sendToRasaStreaming(greetingMessage);
 }
 
 // Send Message
@@ -184,7 +188,7 @@ async function sendMessage() {
     resetInactivityTimer();
     
     // Send to Rasa
-    await sendToRasa(message);
+    await sendToRasaStreaming(message);
     
     // Enable send button
     sendButton.disabled = false;
@@ -236,24 +240,147 @@ async function sendToRasa(message) {
     }
 }
 
-// Add Message to UI
-function addMessage(text, sender) {
-    return new Promise((resolve) => {
-        const messageDiv = document.createElement('div');
-        messageDiv.className = `message ${sender}`;
+// Send Message to Rasa Server, rendering the answer while it is generated
+async function sendToRasaStreaming(message) {
+    if (!STREAMING_ENABLED) {
+        return sendToRasa(message);
+    }
+    
+    showTypingIndicator();
+    const startTime = performance.now();
+    let firstTokenTime = null;
+    let partial = null;
+    let finalMessages = null;
+    
+    try {
+        const response = await fetch(`${RASA_SERVER_URL}/webhooks/rest/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                sender: chatState.sessionId,
+                message: message,
+                metadata: chatState.userInfo
+            })
+        });
         
-        const avatarDiv = document.createElement('div');
-        avatarDiv.className = 'message-avatar';
-        avatarDiv.textContent = sender === 'bot' ? '🤖' : '👤';
+        if (response.status === 404 || response.status === 405 || !response.body) {
+            // No streaming endpoint on this server: use the regular webhook from now on
+            STREAMING_ENABLED = false;
+            hideTypingIndicator();
+            return sendToRasa(message);
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
         
-        const contentDiv = document.createElement('div');
-        contentDiv.className = 'message-content';
-        contentDiv.textContent = text;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
         
-        messageDiv.appendChild(avatarDiv);
-        messageDiv.appendChild(contentDiv);
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Server-Sent Events are separated by a blank line
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseServerSentEvent(buffer.slice(0, separator));
+                buffer = buffer.slice(separator + 2);
+                
+                if (event.type === 'token') {
+                    if (!partial) {
+                        firstTokenTime = performance.now();
+                        hideTypingIndicator();
+                        partial = createMessageElement('bot');
+                        partial.text = '';
+                    }
+                    partial.text += event.data.text;
+                    partial.content.textContent = partial.text;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event.type === 'message') {
+                    finalMessages = event.data;
+                } else if (event.type === 'error') {
+                    throw new Error(event.data.error);
+                } else if (event.type === 'done') {
+                    const clientTtft = firstTokenTime ? Math.round(firstTokenTime - startTime) : null;
+                    console.log(`[STREAM] first token ${clientTtft} ms, total ${Math.round(performance.now() - startTime)} ms (server: ${event.data.ttft_ms} / ${event.data.total_ms} ms)`);
+                }
+            }
+        }
         
-        messagesList.appendChild(messageDiv);
+        hideTypingIndicator();
+        
+        // The final messages are authoritative: the streamed bubble becomes the first one
+        if (finalMessages && finalMessages.length > 0) {
+            for (const [i, msg] of finalMessages.entries()) {
+                if (i === 0 && partial) {
+                    await finishMessage(partial, msg.text, 'bot');
+                } else {
+                    await addMessage(msg.text, 'bot');
+                    await sleep(300); // Slight delay between multiple messages
+                }
+            }
+        } else if (partial) {
+            await finishMessage(partial, partial.text, 'bot');
+        } else {
+            await addMessage("Désolé, je n'ai pas pu traiter votre message. Veuillez réessayer.", 'bot');
+        }
+        
+    } catch (error) {
+        console.error('Error streaming message from Rasa:', error);
+        hideTypingIndicator();
+        if (partial) {
+            partial.element.remove();
+        }
+        
+        await addMessage(
+            "Désolé, une erreur s'est produite. Veuillez vérifier que le serveur Rasa est en cours d'exécution.",
+            'bot'
+        );
+    }
+}
+
+// Parse one Server-Sent Event block ("event: ..." and "data: ..." lines)
+function parseServerSentEvent(block) {
+    let type = 'message';
+    let data = '';
+    for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) {
+            type = line.slice(7);
+        } else if (line.startsWith('data: ')) {
+            data += line.slice(6);
+        }
+    }
+    return { type, data: data ? JSON.parse(data) : null };
+}
+
+// Create an empty message bubble in the UI
+function createMessageElement(sender) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}`;
+    
+    const avatarDiv = document.createElement('div');
+    avatarDiv.className = 'message-avatar';
+    avatarDiv.textContent = sender === 'bot' ? '🤖' : '👤';
+    
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+    
+    messageDiv.appendChild(avatarDiv);
+    messageDiv.appendChild(contentDiv);
+    
+    messagesList.appendChild(messageDiv);
+    
+    return { element: messageDiv, content: contentDiv };
+}
+
+// Set the final text of a message bubble and record it
+function finishMessage(message, text, sender) {
+    return new Promise((resolve) => {
+        message.content.textContent = text;
         
         // Scroll to bottom
         chatMessages.scrollTop = chatMessages.scrollHeight;
@@ -274,6 +401,11 @@ function addMessage(text, sender) {
     });
 }
 
+// Add Message to UI
+function addMessage(text, sender) {
+    return finishMessage(createMessageElement(sender), text, sender);
+}
+
 // Show Typing Indicator
 function showTypingIndicator() {
     typingIndicator.style.display = 'flex';